@@ -6,12 +6,47 @@ Tool for analyzing acceleration enrichment events in MegaSquirt log files
 
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
-import pandas as pd
-import numpy as np
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
-from matplotlib.figure import Figure
+import importlib
+import math
 import os
+import threading
+import time
+
+from ae_io import resolve_engine, CSV_ENGINES
+from ae_core import guess_columns, CONTEXT_SECONDS, MAX_GAP_SECONDS, STOICH_AFR
+from ae_events import EventTable
+from ae_pipeline import Pipeline, load_config, save_config, DEFAULTS as PIPELINE_DEFAULTS
+from ae_workspace import Workspace, DEFAULT_BUDGET_MB, MB
+from ae_convert import MLGConverter
+
+# pandas, matplotlib and ae_render are not imported here - they load on a
+# background thread while the window paints (see preload_modules)
+
+
+# Delay before a navigation redraw; key-repeat steps inside it are merged
+PLOT_COALESCE_MS = 15
+
+# Heavy modules imported in the background at startup, slowest first
+PRELOAD_MODULES = ('matplotlib.figure', 'pandas', 'ae_render')
+PRELOAD_POLL_MS = 50
+
+# Progress refresh while MLG files convert in the background
+CONVERT_POLL_MS = 200
+
+
+def preload_modules(names=PRELOAD_MODULES):
+    """Import heavy modules on a daemon thread so the GUI can paint meanwhile"""
+    def run():
+        for name in names:
+            try:
+                importlib.import_module(name)
+            except ImportError:
+                # Reported properly when the module is first really needed
+                pass
+    
+    thread = threading.Thread(target=run, name='ae-preload', daemon=True)
+    thread.start()
+    return thread
 
 
 class AEAnalyzer:
@@ -24,9 +59,41 @@ class AEAnalyzer:
         
         # Data storage
         self.data = None
-        self.ae_events = []
+        self.log_path = None
+        self.log = None  # LogData view of self.data for time-range queries
+        self.ae_events = EventTable()
+        self.segments = []
         self.current_event_index = 0
         
+        # Loading and detection run through a cached pipeline, so only the
+        # stages whose settings changed are redone; pipeline configs saved
+        # here also run headless with `ae_cli.py run`. Every open log has
+        # its own pipeline in the workspace, which evicts the parsed data of
+        # the least recently viewed logs beyond the memory budget
+        self.workspace = Workspace()
+        self.workspace_entry = None
+        self.pipeline = Pipeline()
+        self.memory_budget = tk.IntVar(value=DEFAULT_BUDGET_MB)  # MB
+        
+        # MLG files convert in the background into the content-hashed
+        # conversion cache and load when ready: path -> (job, notify, on_loaded)
+        self.converter = MLGConverter()
+        self._conversions = {}
+        self._convert_poll = None
+        
+        # Event display: reusable figure layout, background payload prefetch
+        # and the pending (coalesced) redraw for key-repeat navigation
+        self.event_plot = None
+        self.prefetcher = None
+        self._plot_pending = None
+        
+        # Similar-event search: last opened catalog, per-log and per-catalog
+        # kNN indexes, and the open Similar window's refresh callback
+        self.catalog_path = None
+        self._log_similarity = None
+        self._catalog_similarity = {}
+        self._similar_refresh = None
+        
         # Column names
         self.rpm_col = None
         self.tps_col = None
@@ -37,8 +104,20 @@ class AEAnalyzer:
         # Detection parameters
         self.tps_dot_threshold = tk.DoubleVar(value=10.0)  # %/s
         self.duration_threshold = tk.DoubleVar(value=0.1)  # seconds
+        self.context_seconds = tk.DoubleVar(value=CONTEXT_SECONDS)  # seconds
+        self.max_gap = tk.DoubleVar(value=MAX_GAP_SECONDS)  # seconds
+        self.clean_sensors = tk.BooleanVar(value=False)  # repair channels first
+        
+        # CSV ingestion engine ('auto' uses pyarrow when installed)
+        self.csv_engine = tk.StringVar(value='auto')
+        
+        # Matplotlib figure and canvas, created once the preload finishes
+        self.fig = None
+        self.canvas = None
+        self._preload = preload_modules()
         
         self.create_widgets()
+        self.root.after(PRELOAD_POLL_MS, self._poll_preload)
         
     def create_widgets(self):
         """Create the GUI layout"""
@@ -53,6 +132,37 @@ class AEAnalyzer:
         self.file_label = ttk.Label(top_frame, text="No file loaded")
         self.file_label.grid(row=0, column=1, padx=5)
         
+        ttk.Label(top_frame, text="CSV Engine:").grid(row=0, column=2, padx=(20, 0))
+        ttk.Combobox(top_frame, textvariable=self.csv_engine, values=CSV_ENGINES,
+                     state="readonly", width=10).grid(row=0, column=3, padx=5)
+        
+        ttk.Button(top_frame, text="Open Pipeline...", 
+                  command=self.open_pipeline).grid(row=0, column=4, padx=(20, 5))
+        ttk.Button(top_frame, text="Save Pipeline...", 
+                  command=self.save_pipeline).grid(row=0, column=5, padx=5)
+        
+        # Open logs: switching keeps each log's columns, settings and events
+        ttk.Label(top_frame, text="Open Logs:").grid(row=1, column=0, sticky=tk.E, pady=(5, 0))
+        self.log_combo = ttk.Combobox(top_frame, state="readonly", width=40)
+        self.log_combo.grid(row=1, column=1, columnspan=3, sticky=tk.W, padx=5, pady=(5, 0))
+        self.log_combo.bind('<<ComboboxSelected>>', self._on_log_selected)
+        ttk.Button(top_frame, text="Close Log", 
+                  command=self.close_log).grid(row=1, column=4, padx=(20, 5), pady=(5, 0))
+        ttk.Label(top_frame, text="Memory (MB):").grid(row=1, column=5, sticky=tk.E, pady=(5, 0))
+        budget = ttk.Spinbox(top_frame, from_=64, to=65536, increment=256, width=8,
+                             textvariable=self.memory_budget, command=self._apply_budget)
+        budget.grid(row=1, column=6, padx=5, pady=(5, 0))
+        budget.bind('<Return>', self._apply_budget)
+        self.memory_label = ttk.Label(top_frame, text="")
+        self.memory_label.grid(row=1, column=7, padx=5, pady=(5, 0))
+        
+        # Background MLG conversions
+        self.cancel_button = ttk.Button(top_frame, text="Cancel Conversions", state=tk.DISABLED,
+                                        command=self.cancel_conversions)
+        self.cancel_button.grid(row=2, column=0, padx=5, pady=(5, 0))
+        self.convert_label = ttk.Label(top_frame, text="")
+        self.convert_label.grid(row=2, column=1, columnspan=7, sticky=tk.W, padx=5, pady=(5, 0))
+        
         # Column selection frame
         col_frame = ttk.LabelFrame(self.root, text="Column Selection", padding="10")
         col_frame.grid(row=1, column=0, sticky=(tk.W, tk.E), padx=10, pady=5)
@@ -87,8 +197,17 @@ class AEAnalyzer:
         ttk.Label(param_frame, text="Duration Threshold (s):").grid(row=0, column=2, sticky=tk.W, padx=(20, 0))
         ttk.Entry(param_frame, textvariable=self.duration_threshold, width=10).grid(row=0, column=3, padx=5)
         
+        ttk.Label(param_frame, text="Context (s):").grid(row=0, column=4, sticky=tk.W, padx=(20, 0))
+        ttk.Entry(param_frame, textvariable=self.context_seconds, width=10).grid(row=0, column=5, padx=5)
+        
+        ttk.Label(param_frame, text="Max Gap (s):").grid(row=0, column=6, sticky=tk.W, padx=(20, 0))
+        ttk.Entry(param_frame, textvariable=self.max_gap, width=10).grid(row=0, column=7, padx=5)
+        
+        ttk.Checkbutton(param_frame, text="Clean Sensors",
+                        variable=self.clean_sensors).grid(row=0, column=8, padx=(20, 0))
+        
         ttk.Button(param_frame, text="Detect AE Events", 
-                  command=self.detect_ae_events).grid(row=0, column=4, padx=20)
+                  command=self.detect_ae_events).grid(row=0, column=9, padx=20)
         
         # Events info frame
         events_frame = ttk.Frame(self.root, padding="10")
@@ -101,139 +220,173 @@ class AEAnalyzer:
                   command=self.previous_event).grid(row=0, column=1, padx=5)
         ttk.Button(events_frame, text="Next Event ▶", 
                   command=self.next_event).grid(row=0, column=2, padx=5)
+        ttk.Button(events_frame, text="Export Report...", 
+                  command=self.export_events).grid(row=0, column=3, padx=20)
+        ttk.Button(events_frame, text="Segments...", 
+                  command=self.show_segments).grid(row=0, column=4, padx=5)
+        ttk.Button(events_frame, text="Catalog...", 
+                  command=self.show_catalog).grid(row=0, column=5, padx=5)
+        ttk.Button(events_frame, text="Similar...", 
+                  command=self.show_similar).grid(row=0, column=6, padx=5)
+        ttk.Button(events_frame, text="AFR Map...", 
+                  command=self.show_afr_map).grid(row=0, column=7, padx=5)
+        ttk.Button(events_frame, text="Quality...", 
+                  command=self.show_quality).grid(row=0, column=8, padx=5)
+        ttk.Button(events_frame, text="AE Fuel...", 
+                  command=self.show_ae_fuel).grid(row=0, column=9, padx=5)
         
         # Plot frame
-        plot_frame = ttk.Frame(self.root)
-        plot_frame.grid(row=4, column=0, sticky=(tk.W, tk.E, tk.N, tk.S), padx=10, pady=10)
+        self.plot_frame = ttk.Frame(self.root)
+        self.plot_frame.grid(row=4, column=0, sticky=(tk.W, tk.E, tk.N, tk.S), padx=10, pady=10)
         
         # Configure grid weights for resizing
         self.root.columnconfigure(0, weight=1)
         self.root.rowconfigure(4, weight=1)
         
+        # Placeholder until matplotlib has loaded in the background
+        self.plot_placeholder = ttk.Label(self.plot_frame, text="Loading plot engine...")
+        self.plot_placeholder.pack(expand=True)
+        
+        # Arrow keys step through events (held keys are coalesced)
+        self.root.bind('<Left>', lambda e: self._on_arrow_key(e, self.previous_event))
+        self.root.bind('<Right>', lambda e: self._on_arrow_key(e, self.next_event))
+        
+    def _poll_preload(self):
+        """Build the plot area as soon as the background imports are done"""
+        if self._preload.is_alive():
+            self.root.after(PRELOAD_POLL_MS, self._poll_preload)
+        else:
+            self.create_plot_area()
+    
+    def create_plot_area(self):
+        """Create the matplotlib figure, canvas and toolbar (once)"""
+        if self.canvas is not None:
+            return
+        
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
+        
+        self.plot_placeholder.destroy()
+        
         # Create matplotlib figure
         self.fig = Figure(figsize=(12, 6))
-        self.canvas = FigureCanvasTkAgg(self.fig, master=plot_frame)
+        self.canvas = FigureCanvasTkAgg(self.fig, master=self.plot_frame)
         self.canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
         
         # Add toolbar
-        toolbar = NavigationToolbar2Tk(self.canvas, plot_frame)
+        toolbar = NavigationToolbar2Tk(self.canvas, self.plot_frame)
         toolbar.update()
-        
+    
     def load_file(self):
-        """Load a CSV or MLG file"""
-        filename = filedialog.askopenfilename(
-            title="Select log file",
-            filetypes=[("CSV files", "*.csv"), ("MLG files", "*.mlg"), ("All files", "*.*")]
+        """Load one or more CSV, MLG or archive files"""
+        filenames = filedialog.askopenfilenames(
+            title="Select log files",
+            filetypes=[("CSV files", "*.csv"), ("MLG files", "*.mlg"),
+                       ("AE archives", "*.aelog"), ("All files", "*.*")]
         )
         
-        if not filename:
-            return
-            
+        for filename in filenames:
+            self.load_path(filename, notify=len(filenames) == 1)
+    
+    def load_path(self, filename, notify=True, on_loaded=None):
+        """
+        Load a CSV, MLG or archive file by name, returning True on success
+        
+        An MLG that is not in the conversion cache yet is converted in the
+        background and loaded when it is ready, then on_loaded() is called;
+        load_path returns False meanwhile.
+        """
         try:
-            # Check if it's an MLG file
-            if filename.lower().endswith('.mlg'):
-                # Try to convert MLG to CSV using mlg-converter if available
-                csv_filename = self.convert_mlg_to_csv(filename)
-                if csv_filename:
-                    filename = csv_filename
-                else:
-                    messagebox.showerror("Error", 
-                        "Cannot read .mlg files directly. Please:\n"
-                        "1. Install Node.js and mlg-converter: npm install -g mlg-converter\n"
-                        "2. Convert to CSV: npx mlg-converter --format=csv yourfile.mlg\n"
-                        "3. Load the resulting CSV file")
-                    return
-            
-            # Try reading with different separators
-            # First try semicolon, but verify it parsed correctly (multiple columns)
-            try:
-                self.data = pd.read_csv(filename, sep=';')
-                # If semicolon parse resulted in only 1 column, it's likely comma-separated
-                if len(self.data.columns) == 1:
-                    self.data = pd.read_csv(filename, sep=',')
-            except (pd.errors.ParserError, pd.errors.EmptyDataError):
-                # If semicolon fails, try comma
-                self.data = pd.read_csv(filename, sep=',')
+            if (filename.lower().endswith('.mlg')
+                    and not self.converter.cache.cached(filename)):
+                self.start_conversion(filename, notify, on_loaded)
+                return False
             
-            self.file_label.config(text=f"Loaded: {os.path.basename(filename)}")
+            # Separator detection and the pandas fallback live in ae_io; the
+            # pipeline's source stage skips the read if the file is unchanged.
+            # A log that is already open is switched to
+            engine = resolve_engine(self.csv_engine.get())
+            self._remember_view()
+            entry, results = self.workspace.open(filename, engine)
+            self._show_log(entry, results)
             
-            # Populate column dropdowns
-            # Convert to tuple for proper tkinter Combobox display
-            # Using tuple() ensures columns appear as separate dropdown items
-            # rather than as a single comma-separated string
-            columns = tuple(str(col) for col in self.data.columns)
-            self.time_combo['values'] = columns
-            self.rpm_combo['values'] = columns
-            self.tps_combo['values'] = columns
-            self.pw_combo['values'] = columns
-            self.afr_combo['values'] = columns
-            
-            # Try to auto-select common column names
-            self.auto_select_columns(columns)
-            
-            messagebox.showinfo("Success", 
-                f"File loaded successfully!\n"
-                f"Rows: {len(self.data)}\n"
-                f"Columns: {len(self.data.columns)}")
+            if notify:
+                messagebox.showinfo("Success", 
+                    f"File loaded successfully!\n"
+                    f"Rows: {len(self.data)}\n"
+                    f"Columns: {len(self.data.columns)}\n"
+                    f"Engine: {engine}")
+            return True
             
         except Exception as e:
             messagebox.showerror("Error", f"Failed to load file:\n{str(e)}")
+            return False
     
-    def convert_mlg_to_csv(self, mlg_file):
-        """Convert MLG file to CSV using mlg-converter if available"""
-        try:
-            import subprocess
-            output_file = mlg_file.rsplit('.', 1)[0] + '.csv'
-            result = subprocess.run(
-                ['npx', 'mlg-converter', '--format=csv', mlg_file],
-                capture_output=True,
-                text=True,
-                timeout=30
-            )
-            if result.returncode == 0 and os.path.exists(output_file):
-                return output_file
-        except (subprocess.TimeoutExpired, FileNotFoundError, 
-                subprocess.CalledProcessError, OSError):
-            pass
-        return None
+    def start_conversion(self, filename, notify=True, on_loaded=None):
+        """Convert an MLG in the background (several may run at once)"""
+        job = self.converter.submit(filename)
+        self._conversions[job.path] = (job, notify, on_loaded)
+        self._update_conversions()
+        if self._convert_poll is None:
+            self._convert_poll = self.root.after(CONVERT_POLL_MS, self._poll_conversions)
+    
+    def _poll_conversions(self):
+        """Show conversion progress and load the MLG files that are ready"""
+        self._convert_poll = None
+        for path, (job, notify, on_loaded) in list(self._conversions.items()):
+            if job.active:
+                continue
+            del self._conversions[path]
+            self.converter.forget(job)
+            if job.status == 'done':
+                # The pipeline reads the MLG through the cache, so the
+                # workspace keeps the MLG's own name and path
+                if self.load_path(job.path, notify) and on_loaded:
+                    on_loaded()
+            elif job.status == 'failed':
+                # The error says why: converter missing, timed out or its message
+                messagebox.showerror("Error", f"Cannot convert {job.name}:\n{job.error}")
+        self._update_conversions()
+        if self._conversions:
+            self._convert_poll = self.root.after(CONVERT_POLL_MS, self._poll_conversions)
+    
+    def _update_conversions(self):
+        text = '; '.join(f"{job.name}: {job.describe()}"
+                         for job, _, _ in self._conversions.values())
+        self.convert_label.config(text=text)
+        self.cancel_button.config(state=tk.NORMAL if self._conversions else tk.DISABLED)
+    
+    def cancel_conversions(self):
+        """Stop every running or queued MLG conversion"""
+        for job, _, _ in self._conversions.values():
+            job.cancel()
     
     def auto_select_columns(self, columns):
         """Auto-select columns based on common naming patterns"""
-        # Convert to lowercase for matching
-        cols_lower = {col.lower(): col for col in columns}
-        
-        # Time column
-        for pattern in ['time', 'timestamp', 't']:
-            if pattern in cols_lower:
-                self.time_combo.set(cols_lower[pattern])
-                break
-        
-        # RPM column
-        for pattern in ['rpm', 'engine speed']:
-            if pattern in cols_lower:
-                self.rpm_combo.set(cols_lower[pattern])
-                break
-        
-        # TPS column
-        for pattern in ['tps', 'throttle', 'throttle position']:
-            if pattern in cols_lower:
-                self.tps_combo.set(cols_lower[pattern])
-                break
-        
-        # Pulsewidth column
-        for pattern in ['pw', 'pulsewidth', 'injector pulse', 'pw1', 'inj_pw']:
-            if pattern in cols_lower:
-                self.pw_combo.set(cols_lower[pattern])
-                break
-        
-        # AFR column
-        for pattern in ['afr', 'lambda', 'o2', 'air/fuel', 'air fuel']:
-            if pattern in cols_lower:
-                self.afr_combo.set(cols_lower[pattern])
-                break
-    
-    def detect_ae_events(self):
-        """Detect acceleration enrichment events in the loaded data"""
+        combos = {
+            'time': self.time_combo,
+            'rpm': self.rpm_combo,
+            'tps': self.tps_combo,
+            'pw': self.pw_combo,
+            'afr': self.afr_combo,
+        }
+        for role, col in guess_columns(columns).items():
+            # Roles without a dropdown (coolant, MAP) are guessed where needed
+            if col and role in combos:
+                combos[role].set(col)
+    
+    def selected_columns(self):
+        """Column names currently used for each plotted channel"""
+        return {
+            'time': self.time_col,
+            'rpm': self.rpm_col,
+            'tps': self.tps_col,
+            'pw': self.pw_col,
+            'afr': self.afr_col,
+        }
+    
+    def detect_ae_events(self, notify=True):
+        """Detect acceleration enrichment events (notify=False shows no result box)"""
         if self.data is None:
             messagebox.showwarning("Warning", "Please load a file first")
             return
@@ -250,169 +403,821 @@ class AEAnalyzer:
             return
         
         try:
-            # Calculate TPS rate of change (TPS_dot)
-            time = self.data[self.time_col].values
-            tps = self.data[self.tps_col].values
-            
-            # Calculate time differences
-            dt = np.diff(time)
-            dt = np.where(dt == 0, 1e-6, dt)  # Avoid division by zero
-            
-            # Calculate TPS rate of change (%/s)
-            tps_dot = np.diff(tps) / dt
-            tps_dot = np.concatenate([[0], tps_dot])  # Add zero at beginning to match length
-            
-            # Add TPS_dot to dataframe for analysis
-            self.data['TPS_dot'] = tps_dot
-            
-            # Detect events where TPS_dot exceeds threshold
-            threshold = self.tps_dot_threshold.get()
-            duration_thresh = self.duration_threshold.get()
-            
-            # Find periods where TPS_dot exceeds threshold
-            exceeds_threshold = tps_dot > threshold
-            
-            # Find start and end of each event
-            self.ae_events = []
-            in_event = False
-            event_start = 0
-            
-            for i in range(len(exceeds_threshold)):
-                if exceeds_threshold[i] and not in_event:
-                    # Start of new event
-                    event_start = i
-                    in_event = True
-                elif not exceeds_threshold[i] and in_event:
-                    # End of event
-                    event_end = i
-                    event_duration = time[event_end] - time[event_start]
-                    
-                    if event_duration >= duration_thresh:
-                        # Valid event - add some context before and after
-                        context_samples = 50
-                        start_idx = max(0, event_start - context_samples)
-                        end_idx = min(len(self.data), event_end + context_samples)
-                        
-                        self.ae_events.append({
-                            'start_idx': start_idx,
-                            'end_idx': end_idx,
-                            'event_start': event_start,
-                            'event_end': event_end,
-                            'duration': event_duration,
-                            'max_tps_dot': np.max(tps_dot[event_start:event_end])
-                        })
-                    
-                    in_event = False
-            
-            # Handle case where event extends to end of data
-            if in_event:
-                event_end = len(exceeds_threshold) - 1
-                event_duration = time[event_end] - time[event_start]
-                if event_duration >= duration_thresh:
-                    context_samples = 50
-                    start_idx = max(0, event_start - context_samples)
-                    end_idx = len(self.data)
-                    
-                    self.ae_events.append({
-                        'start_idx': start_idx,
-                        'end_idx': end_idx,
-                        'event_start': event_start,
-                        'event_end': event_end,
-                        'duration': event_duration,
-                        'max_tps_dot': np.max(tps_dot[event_start:event_end])
-                    })
+            # Segment the log at time resets and gaps, compute TPS rate of
+            # change (TPS_dot) per segment as a derived channel and detect
+            # events where it exceeds the threshold. Cleaning (if ticked)
+            # repairs dropouts, stuck sensors and spikes in derived channels;
+            # the loaded DataFrame keeps the logged values
+            self.pipeline.update(**self.pipeline_settings())
+            results = self.workspace.run(self.workspace_entry, 'triggers')
+            self._use_results(results)
+            self._update_workspace_list()
             
             if self.ae_events:
                 self.current_event_index = 0
-                self.events_label.config(text=f"Found {len(self.ae_events)} AE events")
+                self.events_label.config(text=f"Found {len(self.ae_events)} AE events "
+                                              f"in {len(self.segments)} segment(s)")
                 self.plot_event(0)
-                messagebox.showinfo("Success", 
-                    f"Detected {len(self.ae_events)} acceleration enrichment events")
+                stats = self.ae_events.summary()
+                if notify:
+                    messagebox.showinfo("Success", 
+                        f"Detected {stats['count']} acceleration enrichment events\n"
+                        f"Mean duration: {stats['mean_duration']:.2f} s\n"
+                        f"Peak TPS rate: {stats['max_tps_dot']:.1f} %/s")
             else:
                 self.events_label.config(text="No AE events detected")
-                messagebox.showinfo("Info", 
-                    "No acceleration enrichment events detected.\n"
-                    "Try adjusting the threshold parameters.")
+                if notify:
+                    messagebox.showinfo("Info", 
+                        "No acceleration enrichment events detected.\n"
+                        "Try adjusting the threshold parameters.")
                 
         except Exception as e:
             messagebox.showerror("Error", f"Failed to detect events:\n{str(e)}")
     
+    def _use_results(self, results):
+        """Make a detection run's log, segments and events the displayed ones"""
+        log, self.segments = results['derivative']
+        if log is not self.log:
+            self._log_similarity = None
+        self.log = log
+        self.ae_events = results['triggers']
+        
+        # Payloads for the events around the displayed one are prepared
+        # in the background from here on
+        from ae_render import EventPrefetcher
+        if self.prefetcher:
+            self.prefetcher.close()
+        self.prefetcher = EventPrefetcher(self.log, self.ae_events, self.selected_columns(),
+                                          self.pipeline.config['triggers']['threshold'])
+    
+    def _show_log(self, entry, results):
+        """Switch the window to a workspace log (its data, columns, settings and events)"""
+        self.workspace_entry = entry
+        self.pipeline = entry.pipeline
+        self.data = results['source']
+        self.log_path = entry.path
+        self.file_label.config(text=f"Loaded: {entry.name}")
+        
+        # Populate column dropdowns
+        # Convert to tuple for proper tkinter Combobox display
+        # Using tuple() ensures columns appear as separate dropdown items
+        # rather than as a single comma-separated string
+        columns = tuple(str(col) for col in self.data.columns)
+        self.time_combo['values'] = columns
+        self.rpm_combo['values'] = columns
+        self.tps_combo['values'] = columns
+        self.pw_combo['values'] = columns
+        self.afr_combo['values'] = columns
+        
+        if entry.detected:
+            # Back to a log detected before: its own columns and settings
+            self.apply_config(entry.pipeline.config)
+            for role, combo in self._column_combos().items():
+                combo.set(results['channels'].get(role) or '')
+            for role in ('time', 'rpm', 'tps', 'pw', 'afr'):
+                setattr(self, f'{role}_col', results['channels'].get(role))
+            self._use_results(results)
+            self.current_event_index = min(entry.current_event, max(len(self.ae_events) - 1, 0))
+            if self.ae_events:
+                self.events_label.config(text=f"Found {len(self.ae_events)} AE events "
+                                              f"in {len(self.segments)} segment(s)")
+                self.request_plot()
+            else:
+                self.events_label.config(text="No AE events detected")
+        else:
+            # Try to auto-select common column names
+            self.auto_select_columns(columns)
+            self.log = None
+            self.ae_events = EventTable()
+            self.segments = []
+            self.current_event_index = 0
+            self.events_label.config(text="No events detected")
+            self._clear_plot()
+        self._update_workspace_list()
+    
+    def _remember_view(self):
+        """Store the displayed event on the current workspace log"""
+        if self.workspace_entry is not None:
+            self.workspace_entry.current_event = self.current_event_index
+    
+    def _update_workspace_list(self):
+        """Refresh the open-logs list and the memory readout"""
+        entries = list(self.workspace)
+        self._workspace_items = entries
+        self.log_combo['values'] = tuple(
+            f"{entry.name}" + ("" if entry.loaded else " (unloaded)")
+            + (f" - {len(entry.events)} events" if entry.detected else "")
+            for entry in entries)
+        if self.workspace_entry in entries:
+            self.log_combo.current(entries.index(self.workspace_entry))
+        else:
+            self.log_combo.set('')
+        stats = self.workspace.stats()
+        self.memory_label.config(text=f"{stats['bytes'] / MB:.0f} MB in {stats['loaded']} of "
+                                      f"{stats['open']} log(s)")
+    
+    def _on_log_selected(self, _event=None):
+        """Switch to the log picked in the open-logs list (reloading it if evicted)"""
+        entry = self._workspace_items[self.log_combo.current()]
+        if entry is self.workspace_entry:
+            return
+        self._remember_view()
+        try:
+            self.root.config(cursor="watch")
+            self.root.update_idletasks()
+            self._show_log(entry, self.workspace.activate(entry))
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to reload {entry.name}:\n{str(e)}")
+            self._update_workspace_list()
+        finally:
+            self.root.config(cursor="")
+    
+    def close_log(self):
+        """Close the current log and show the most recently used remaining one"""
+        entry = self.workspace_entry
+        if entry is None:
+            return
+        self.workspace.close(entry)
+        self.workspace_entry = None
+        remaining = list(self.workspace)
+        if remaining:
+            self._show_log(remaining[-1], self.workspace.activate(remaining[-1]))
+            return
+        
+        self.data = self.log = None
+        self.log_path = None
+        self.ae_events = EventTable()
+        self.segments = []
+        self.pipeline = Pipeline()
+        self.file_label.config(text="No file loaded")
+        self.events_label.config(text="No events detected")
+        for combo in self._column_combos().values():
+            combo.set('')
+            combo['values'] = ()
+        self._clear_plot()
+        self._update_workspace_list()
+    
+    def _clear_plot(self):
+        """Blank the event plot when no detected log is shown"""
+        if self.prefetcher:
+            self.prefetcher.close()
+            self.prefetcher = None
+        if self.fig is not None:
+            self.fig.clear()
+            self.event_plot = None
+            self.canvas.draw()
+    
+    def _apply_budget(self, _event=None):
+        """Apply the memory budget spinbox, evicting logs if it shrank"""
+        try:
+            budget = int(self.memory_budget.get())
+        except (tk.TclError, ValueError):
+            return
+        self.workspace.set_budget(max(budget, 1) * MB)
+        self._update_workspace_list()
+    
+    def _column_combos(self):
+        return {'time': self.time_combo, 'rpm': self.rpm_combo, 'tps': self.tps_combo,
+                'pw': self.pw_combo, 'afr': self.afr_combo}
+    
+    def apply_config(self, config):
+        """Set the detection widgets from a pipeline config"""
+        self.tps_dot_threshold.set(config['triggers']['threshold'])
+        self.duration_threshold.set(config['triggers']['duration'])
+        self.context_seconds.set(config['triggers']['context'])
+        self.max_gap.set(config['derivative']['max_gap'])
+        self.clean_sensors.set(bool(config['clean']['enabled']))
+    
+    def pipeline_settings(self):
+        """Pipeline sections set by the GUI's widgets"""
+        return {
+            'channels': {role: col or None for role, col in self.selected_columns().items()},
+            'clean': {'enabled': self.clean_sensors.get()},
+            'derivative': {'max_gap': self.max_gap.get()},
+            'triggers': {'threshold': self.tps_dot_threshold.get(),
+                         'duration': self.duration_threshold.get(),
+                         'context': self.context_seconds.get()},
+        }
+    
+    def open_pipeline(self):
+        """Load a pipeline config, apply it to the widgets and run it"""
+        path = filedialog.askopenfilename(
+            title="Open pipeline config",
+            filetypes=[("Pipeline config", "*.toml *.yaml *.yml *.json"), ("All files", "*.*")]
+        )
+        if not path:
+            return
+        try:
+            config = load_config(path)
+        except (OSError, ValueError) as e:
+            messagebox.showerror("Error", f"Failed to read pipeline:\n{str(e)}")
+            return
+        
+        self.csv_engine.set(config['source']['engine'])
+        source = config['source']['path']
+        # An MLG source may convert in the background first
+        if source and self.load_path(source, notify=False,
+                                     on_loaded=lambda: self.run_pipeline_config(config)):
+            self.run_pipeline_config(config)
+    
+    def run_pipeline_config(self, config):
+        """Apply a pipeline config to the loaded log, detect and run its exports"""
+        # Settings without a widget (detector, cleaned roles, exports, ...)
+        # stay in the log's pipeline config
+        self.pipeline.update(**config)
+        self.apply_config(config)
+        for role, combo in self._column_combos().items():
+            if config['channels'].get(role):
+                combo.set(config['channels'][role])
+        self.detect_ae_events(notify=False)
+        if not config['exports']:
+            return
+        
+        try:
+            self.root.config(cursor="watch")
+            self.root.update_idletasks()
+            written = self.pipeline.run('exports')['exports']
+            messagebox.showinfo("Success", "Pipeline wrote:\n" + "\n".join(written))
+        except Exception as e:
+            messagebox.showerror("Error", f"Pipeline export failed:\n{str(e)}")
+        finally:
+            self.root.config(cursor="")
+    
+    def save_pipeline(self):
+        """Save the current file, columns and parameters as a pipeline config"""
+        path = filedialog.asksaveasfilename(
+            title="Save pipeline config",
+            defaultextension=".toml",
+            filetypes=[("TOML", "*.toml"), ("JSON", "*.json")]
+        )
+        if not path:
+            return
+        self.pipeline.update(**self.pipeline_settings())
+        try:
+            save_config(self.pipeline.config, path)
+        except OSError as e:
+            messagebox.showerror("Error", f"Failed to save pipeline:\n{str(e)}")
+    
     def plot_event(self, event_idx):
         """Plot the data for a specific AE event"""
         if not self.ae_events or event_idx >= len(self.ae_events):
             return
         
-        event = self.ae_events[event_idx]
-        
-        # Extract data for this event
-        event_data = self.data.iloc[event['start_idx']:event['end_idx']]
-        time = event_data[self.time_col].values
-        
-        # Clear previous plot
-        self.fig.clear()
-        
-        # Create subplots
-        ax1 = self.fig.add_subplot(4, 1, 1)
-        ax2 = self.fig.add_subplot(4, 1, 2, sharex=ax1)
-        ax3 = self.fig.add_subplot(4, 1, 3, sharex=ax1)
-        ax4 = self.fig.add_subplot(4, 1, 4, sharex=ax1)
-        
-        # Highlight the actual event region
-        event_time_start = self.data[self.time_col].iloc[event['event_start']]
-        event_time_end = self.data[self.time_col].iloc[event['event_end']]
-        
-        # Plot RPM
-        if self.rpm_col:
-            ax1.plot(time, event_data[self.rpm_col], 'b-', linewidth=1.5)
-            ax1.axvspan(event_time_start, event_time_end, alpha=0.2, color='red')
-            ax1.set_ylabel('RPM', fontweight='bold')
-            ax1.grid(True, alpha=0.3)
-        
-        # Plot TPS and TPS_dot
-        ax2_twin = ax2.twinx()
-        ax2.plot(time, event_data[self.tps_col], 'g-', linewidth=1.5, label='TPS')
-        ax2_twin.plot(time, event_data['TPS_dot'], 'r--', linewidth=1, label='TPS Rate', alpha=0.7)
-        ax2_twin.axhline(y=self.tps_dot_threshold.get(), color='orange', 
-                        linestyle=':', label='Threshold')
-        ax2.axvspan(event_time_start, event_time_end, alpha=0.2, color='red')
-        ax2.set_ylabel('TPS (%)', fontweight='bold', color='g')
-        ax2_twin.set_ylabel('TPS Rate (%/s)', fontweight='bold', color='r')
-        ax2.tick_params(axis='y', labelcolor='g')
-        ax2_twin.tick_params(axis='y', labelcolor='r')
-        ax2.grid(True, alpha=0.3)
-        
-        # Combine legends
-        lines1, labels1 = ax2.get_legend_handles_labels()
-        lines2, labels2 = ax2_twin.get_legend_handles_labels()
-        ax2.legend(lines1 + lines2, labels1 + labels2, loc='upper left')
-        
-        # Plot Pulsewidth
-        if self.pw_col:
-            ax3.plot(time, event_data[self.pw_col], 'm-', linewidth=1.5)
-            ax3.axvspan(event_time_start, event_time_end, alpha=0.2, color='red')
-            ax3.set_ylabel('Pulsewidth (ms)', fontweight='bold')
-            ax3.grid(True, alpha=0.3)
-        
-        # Plot AFR
-        if self.afr_col:
-            ax4.plot(time, event_data[self.afr_col], 'c-', linewidth=1.5)
-            ax4.axvspan(event_time_start, event_time_end, alpha=0.2, color='red')
-            ax4.set_ylabel('AFR', fontweight='bold')
-            ax4.axhline(y=14.7, color='gray', linestyle='--', alpha=0.5, label='Stoich (14.7)')
-            ax4.legend(loc='upper left')
-            ax4.grid(True, alpha=0.3)
-        
-        ax4.set_xlabel('Time (s)', fontweight='bold')
-        
-        # Add title
-        self.fig.suptitle(
-            f'AE Event {event_idx + 1} of {len(self.ae_events)} - '
-            f'Duration: {event["duration"]:.2f}s, Max TPS Rate: {event["max_tps_dot"]:.1f} %/s',
-            fontsize=12, fontweight='bold'
-        )
+        from ae_render import EventFigure
+        self.create_plot_area()
         
-        self.fig.tight_layout()
+        # Prepared slices, decimated traces and limits come from the prefetch
+        # cache, so only the line data and title change on screen
+        payload = self.prefetcher.get(event_idx)
+        columns = self.selected_columns()
+        threshold = self.prefetcher.threshold
+        if self.event_plot is None or not self.event_plot.matches(self.fig, columns, threshold):
+            self.event_plot = EventFigure(self.fig, columns, threshold)
+        self.event_plot.show_prepared(payload, event_idx, len(self.ae_events))
         self.canvas.draw()
+        
+        # Get the neighbours ready while the user looks at this one
+        self.prefetcher.prefetch(event_idx)
+        
+        if self._similar_refresh:
+            self._similar_refresh()
+    
+    def request_plot(self):
+        """
+        Draw the current event once the event queue is idle
+        
+        Repeated requests before the draw runs collapse into one, so holding
+        an arrow key only draws the event it stops on.
+        """
+        if self._plot_pending is None:
+            self._plot_pending = self.root.after(PLOT_COALESCE_MS, self._draw_pending)
+    
+    def _draw_pending(self):
+        """Run the coalesced redraw scheduled by request_plot"""
+        self._plot_pending = None
+        self.plot_event(self.current_event_index)
+    
+    def _on_arrow_key(self, event, step):
+        """Navigate with arrow keys unless a text field has focus"""
+        if isinstance(event.widget, (tk.Entry, ttk.Entry)):
+            return
+        step()
+    
+    def export_events(self):
+        """Render every detected event to a PDF or HTML report"""
+        if not self.ae_events:
+            messagebox.showwarning("Warning", "Please detect AE events first")
+            return
+        
+        output = filedialog.asksaveasfilename(
+            title="Export event report",
+            defaultextension=".pdf",
+            filetypes=[("PDF report", "*.pdf"), ("HTML report", "*.html")]
+        )
+        if not output:
+            return
+        
+        try:
+            from ae_render import export_report
+            self.root.config(cursor="watch")
+            self.root.update_idletasks()
+            export_report(self.log, self.ae_events, self.selected_columns(),
+                          self.tps_dot_threshold.get(), output)
+            messagebox.showinfo("Success", 
+                f"Exported {len(self.ae_events)} events to\n{output}")
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to export report:\n{str(e)}")
+        finally:
+            self.root.config(cursor="")
+    
+    def show_segments(self):
+        """Show the table of continuous log segments"""
+        if not self.segments:
+            messagebox.showinfo("Info", "Detect AE events first to segment the log")
+            return
+        
+        counts = self.ae_events.segment_counts(len(self.segments))
+        
+        window = tk.Toplevel(self.root)
+        window.title("Log Segments")
+        columns = ('start', 'end', 'samples', 'reason', 'events')
+        tree = ttk.Treeview(window, columns=columns, show='headings', height=15)
+        for col, heading in zip(columns, ("Start (s)", "End (s)", "Samples", "Starts At", "Events")):
+            tree.heading(col, text=heading)
+            tree.column(col, width=100, anchor=tk.E)
+        for seg, count in zip(self.segments, counts):
+            tree.insert('', tk.END, values=(f"{seg['t_start']:.3f}", f"{seg['t_end']:.3f}",
+                                            seg['stop'] - seg['start'], seg['reason'], count))
+        tree.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+    
+    def show_catalog(self):
+        """Search a log catalog (built with 'ae_cli.py catalog scan') for events"""
+        db_path = filedialog.askopenfilename(
+            title="Open log catalog",
+            filetypes=[("Catalog database", "*.sqlite *.db"), ("All files", "*.*")]
+        )
+        if not db_path:
+            return
+        
+        from ae_catalog import open_catalog, query_events, parse_conditions, catalog_summary
+        conn = open_catalog(db_path)
+        totals = catalog_summary(conn)
+        self.catalog_path = db_path
+        self._catalog_similarity.pop(db_path, None)  # may have been rescanned
+        
+        window = tk.Toplevel(self.root)
+        window.title(f"Log Catalog - {os.path.basename(db_path)} "
+                     f"({totals['logs']} logs, {totals['events']} events)")
+        window.protocol("WM_DELETE_WINDOW", lambda: (conn.close(), window.destroy()))
+        
+        search_frame = ttk.Frame(window, padding="10")
+        search_frame.pack(fill=tk.X)
+        ttk.Label(search_frame, text="Filter:").pack(side=tk.LEFT)
+        filter_text = tk.StringVar(value="max_tps_dot > 200, rpm < 3000")
+        filter_entry = ttk.Entry(search_frame, textvariable=filter_text, width=50)
+        filter_entry.pack(side=tk.LEFT, padx=5, fill=tk.X, expand=True)
+        status = ttk.Label(search_frame, text="")
+        
+        columns = ('log', 'event', 'time', 'tps_dot', 'duration', 'rpm', 'clt')
+        tree = ttk.Treeview(window, columns=columns, show='headings', height=20)
+        for col, heading, width in zip(columns,
+                                       ("Log", "Event", "Time (s)", "TPS_dot (%/s)",
+                                        "Duration (s)", "RPM", "CLT"),
+                                       (260, 60, 80, 100, 90, 70, 60)):
+            tree.heading(col, text=heading)
+            tree.column(col, width=width, anchor=tk.W if col == 'log' else tk.E)
+        tree.pack(fill=tk.BOTH, expand=True, padx=10, pady=(0, 10))
+        matches = {}
+        
+        def fmt(value, spec):
+            return '' if value is None else format(value, spec)
+        
+        def search(*_):
+            try:
+                rows = query_events(conn, parse_conditions(filter_text.get()))
+            except ValueError as e:
+                messagebox.showerror("Error", str(e), parent=window)
+                return
+            tree.delete(*tree.get_children())
+            matches.clear()
+            for row in rows:
+                item = tree.insert('', tk.END, values=(
+                    os.path.basename(row['path']), row['idx'] + 1,
+                    fmt(row['t_start'], '.2f'), fmt(row['max_tps_dot'], '.1f'),
+                    fmt(row['duration'], '.2f'), fmt(row['rpm'], '.0f'),
+                    fmt(row['clt'], '.0f')))
+                matches[item] = row
+            status.config(text=f"{len(rows)} event(s)")
+        
+        def open_selected(_event):
+            selection = tree.selection()
+            if selection:
+                self.open_catalog_event(matches[selection[0]])
+        
+        ttk.Button(search_frame, text="Search", command=search).pack(side=tk.LEFT, padx=5)
+        status.pack(side=tk.LEFT, padx=10)
+        filter_entry.bind('<Return>', search)
+        tree.bind('<Double-1>', open_selected)
+        search()
+    
+    def open_catalog_event(self, match):
+        """Load a cataloged log with its cataloged settings and show one event"""
+        if not self.load_path(match['path'], notify=False):
+            return
+        
+        # Detect with the same columns and settings the catalog used, so the
+        # cataloged event number and sample index refer to the same event
+        combos = {
+            'time': self.time_combo,
+            'rpm': self.rpm_combo,
+            'tps': self.tps_combo,
+            'pw': self.pw_combo,
+            'afr': self.afr_combo,
+        }
+        for role, combo in combos.items():
+            combo.set(match['columns'].get(role) or '')
+        params = match['params']
+        self.tps_dot_threshold.set(params['threshold'])
+        self.duration_threshold.set(params['duration'])
+        self.context_seconds.set(params['context'])
+        self.max_gap.set(params['max_gap'])
+        # The catalog detects on the logged values with the default detector.
+        # That is a one-off override: the user's Clean Sensors switch and
+        # this log's detector are restored for the next detection
+        saved_clean = self.clean_sensors.get()
+        saved = {'clean': dict(self.pipeline.config['clean']),
+                 'triggers': {'detector': self.pipeline.config['triggers']['detector']}}
+        catalog_detector = PIPELINE_DEFAULTS['triggers']['detector']
+        self.clean_sensors.set(False)
+        self.pipeline.update(clean=PIPELINE_DEFAULTS['clean'],
+                             triggers={'detector': catalog_detector})
+        try:
+            self.detect_ae_events(notify=False)
+        finally:
+            self.clean_sensors.set(saved_clean)
+            self.pipeline.update(**saved)
+        if self.ae_events and (saved_clean or saved['triggers']['detector'] != catalog_detector):
+            self.events_label.config(text=self.events_label.cget('text') +
+                                     f" (catalog settings: uncleaned, {catalog_detector} "
+                                     "detector)")
+        
+        hits = (self.ae_events['event_start'] == match['event_start']).nonzero()[0]
+        if len(hits) == 0:
+            messagebox.showwarning("Warning", 
+                "The log has changed since it was cataloged - rescan the catalog")
+            return
+        self.current_event_index = int(hits[0])
+        self.request_plot()
+    
+    def show_similar(self):
+        """
+        List the events that look most like the displayed one
+        
+        Searches this log's events, or every event in the last opened
+        catalog. The list follows the displayed event while the window is
+        open; double-click a match to show it.
+        """
+        if not self.ae_events:
+            messagebox.showwarning("Warning", "Please detect AE events first")
+            return
+        if self._similar_refresh:
+            return
+        
+        from ae_catalog import open_catalog
+        window = tk.Toplevel(self.root)
+        window.title("Similar Events")
+        conn = open_catalog(self.catalog_path) if self.catalog_path else None
+        
+        scope = tk.StringVar(value='catalog' if conn else 'log')
+        scope_frame = ttk.Frame(window, padding="10")
+        scope_frame.pack(fill=tk.X)
+        ttk.Radiobutton(scope_frame, text="This log", variable=scope, value='log',
+                        command=lambda: refresh()).pack(side=tk.LEFT)
+        ttk.Radiobutton(scope_frame, text="Catalog", variable=scope, value='catalog',
+                        state=tk.NORMAL if conn else tk.DISABLED,
+                        command=lambda: refresh()).pack(side=tk.LEFT, padx=10)
+        status = ttk.Label(scope_frame, text="")
+        status.pack(side=tk.LEFT, padx=10)
+        
+        columns = ('log', 'event', 'time', 'tps_dot', 'afr_max', 'distance')
+        tree = ttk.Treeview(window, columns=columns, show='headings', height=12)
+        for col, heading, width in zip(columns,
+                                       ("Log", "Event", "Time (s)", "TPS_dot (%/s)",
+                                        "AFR Max", "Distance"),
+                                       (240, 60, 80, 100, 70, 80)):
+            tree.heading(col, text=heading)
+            tree.column(col, width=width, anchor=tk.W if col == 'log' else tk.E)
+        tree.pack(fill=tk.BOTH, expand=True, padx=10, pady=(0, 10))
+        matches = {}
+        
+        def refresh():
+            start = time.perf_counter()
+            if scope.get() == 'catalog':
+                rows, size = self._similar_in_catalog(conn)
+            else:
+                rows, size = self._similar_in_log()
+            tree.delete(*tree.get_children())
+            matches.clear()
+            for row in rows:
+                afr = row['afr_max']
+                afr = '' if afr is None or math.isnan(afr) else f"{afr:.1f}"
+                item = tree.insert('', tk.END, values=(
+                    os.path.basename(row['path']), row['idx'] + 1, f"{row['t_start']:.2f}",
+                    f"{row['max_tps_dot']:.1f}", afr, f"{row['distance']:.2f}"))
+                matches[item] = row
+            status.config(text=f"Event {self.current_event_index + 1}: {len(rows)} nearest "
+                               f"of {size} in {(time.perf_counter() - start) * 1000:.0f} ms")
+        
+        def open_selected(_event):
+            selection = tree.selection()
+            if not selection:
+                return
+            row = matches[selection[0]]
+            if scope.get() == 'log':
+                self.current_event_index = row['idx']
+                self.request_plot()
+            else:
+                self.open_catalog_event(row)
+        
+        def close():
+            self._similar_refresh = None
+            if conn:
+                conn.close()
+            window.destroy()
+        
+        tree.bind('<Double-1>', open_selected)
+        window.protocol("WM_DELETE_WINDOW", close)
+        self._similar_refresh = refresh
+        refresh()
+    
+    def _similar_in_log(self, k=10):
+        """Nearest events to the displayed one within this log"""
+        from ae_features import event_features
+        from ae_similarity import SimilarityIndex, event_vectors
+        
+        columns = self.selected_columns()
+        if self._log_similarity is None:
+            vectors = event_vectors(self.log, self.ae_events, columns)
+            features = event_features(self.log, self.ae_events, columns)
+            self._log_similarity = (SimilarityIndex(vectors), vectors, features)
+        index, vectors, features = self._log_similarity
+        
+        i = self.current_event_index
+        rows_found, _, distances = index.query(vectors[i], k=k, exclude=[i])
+        rows = [{'path': self.log_path, 'idx': int(j),
+                 't_start': float(features['t_start'][j]),
+                 'max_tps_dot': float(self.ae_events['max_tps_dot'][j]),
+                 'afr_max': float(features['afr_max'][j]),
+                 'distance': float(d)} for j, d in zip(rows_found, distances)]
+        return rows, len(index)
+    
+    def _similar_in_catalog(self, conn, k=10):
+        """Nearest cataloged events to the displayed one"""
+        from ae_catalog import build_similarity_index, find_event, similar_events
+        from ae_similarity import event_vectors
+        
+        if self.catalog_path not in self._catalog_similarity:
+            self.root.config(cursor="watch")
+            self.root.update_idletasks()
+            try:
+                self._catalog_similarity[self.catalog_path] = build_similarity_index(conn)
+            finally:
+                self.root.config(cursor="")
+        index = self._catalog_similarity[self.catalog_path]
+        
+        i = self.current_event_index
+        vector = event_vectors(self.log, self.ae_events[[i]], self.selected_columns())[0]
+        event = self.ae_events[i]
+        own = find_event(conn, self.log_path, event['event_start']) if self.log_path else None
+        rows = similar_events(conn, vector, k=k, exclude=[own] if own else (), index=index)
+        return rows, len(index)
+    
+    def show_quality(self):
+        """Show the sensor quality report from the last cleaned detection"""
+        if self.log is None or self.log.quality is None:
+            messagebox.showinfo("Info", 
+                "Tick \"Clean Sensors\" and detect events to get a quality report")
+            return
+        
+        window = tk.Toplevel(self.root)
+        window.title("Sensor Quality")
+        columns = ('channel', 'samples', 'missing', 'out_of_range', 'stuck', 'stuck_runs',
+                   'spikes', 'good')
+        tree = ttk.Treeview(window, columns=columns, show='headings', height=8)
+        for col, heading in zip(columns, ("Channel", "Samples", "Missing", "Out of Range",
+                                          "Stuck", "Stuck Runs", "Spikes", "Good")):
+            tree.heading(col, text=heading)
+            tree.column(col, width=140 if col == 'channel' else 90,
+                        anchor=tk.W if col == 'channel' else tk.E)
+        for row in self.log.quality:
+            tree.insert('', tk.END, values=(
+                row['channel'], row['samples'], row['missing'], row['out_of_range'],
+                row['stuck'], row['stuck_runs'], row['spikes'],
+                f"{row['good_fraction']:.1%}"))
+        tree.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+    
+    def show_afr_map(self):
+        """
+        Heatmap of AFR error over RPM x load for every event window
+        
+        The target is a fixed AFR or an AFR target channel. Click a cell to
+        list the events behind it; double-click an event to show it.
+        """
+        if not self.ae_events:
+            messagebox.showwarning("Warning", "Please detect AE events first")
+            return
+        
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+        from ae_heatmap import AFRHeatmap, AE_WINDOWS, LOAD_EDGES, draw_heatmap
+        
+        columns = self.selected_columns()
+        guessed = guess_columns(self.data.columns)
+        channels = list(self.data.columns)
+        
+        window = tk.Toplevel(self.root)
+        window.title("AFR Error Map")
+        controls = ttk.Frame(window, padding="10")
+        controls.pack(fill=tk.X)
+        
+        ttk.Label(controls, text="AFR Target:").pack(side=tk.LEFT)
+        target = tk.StringVar(value=str(STOICH_AFR))
+        ttk.Combobox(controls, textvariable=target, values=[str(STOICH_AFR)] + channels,
+                     width=18).pack(side=tk.LEFT, padx=5)
+        ttk.Label(controls, text="Load:").pack(side=tk.LEFT, padx=(15, 0))
+        load_role = tk.StringVar(value='map' if guessed['map'] else 'tps')
+        ttk.Combobox(controls, textvariable=load_role, values=list(LOAD_EDGES),
+                     state="readonly", width=6).pack(side=tk.LEFT, padx=5)
+        ttk.Label(controls, text="Samples:").pack(side=tk.LEFT, padx=(15, 0))
+        span = tk.StringVar(value='after')
+        ttk.Combobox(controls, textvariable=span, values=list(AE_WINDOWS),
+                     state="readonly", width=8).pack(side=tk.LEFT, padx=5)
+        status = ttk.Label(controls, text="")
+        
+        fig = Figure(figsize=(8, 5))
+        canvas = FigureCanvasTkAgg(fig, master=window)
+        canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+        
+        tree = ttk.Treeview(window, columns=('event', 'time', 'samples', 'error'),
+                            show='headings', height=6)
+        for col, heading in zip(('event', 'time', 'samples', 'error'),
+                                ("Event", "Time (s)", "Samples in Cell", "Mean AFR Error")):
+            tree.heading(col, text=heading)
+            tree.column(col, width=110, anchor=tk.E)
+        tree.pack(fill=tk.X, padx=10, pady=(0, 10))
+        state = {}
+        
+        def update(*_):
+            text = target.get().strip()
+            try:
+                goal = float(text)
+            except ValueError:
+                goal = text  # an AFR target channel
+            roles = dict(columns, map=guessed['map'])
+            try:
+                start = time.perf_counter()
+                state['map'] = AFRHeatmap.from_log(self.log, self.ae_events, roles,
+                                                   target=goal, load=load_role.get(),
+                                                   window=span.get())
+            except ValueError as e:
+                messagebox.showerror("Error", str(e), parent=window)
+                return
+            draw_heatmap(fig, state['map'])
+            canvas.draw()
+            tree.delete(*tree.get_children())
+            status.config(text=f"{state['map'].samples:,} samples binned in "
+                               f"{(time.perf_counter() - start) * 1000:.0f} ms - click a cell")
+        
+        def on_click(event):
+            heatmap = state.get('map')
+            if heatmap is None or event.xdata is None:
+                return
+            cell = heatmap.cell_at(event.xdata, event.ydata)
+            tree.delete(*tree.get_children())
+            if cell is None:
+                return
+            starts = self.log.time[self.ae_events['event_start']]
+            for row in heatmap.cell_events(*cell):
+                k = row['event']
+                tree.insert('', tk.END, iid=str(k), values=(
+                    k + 1, f"{starts[k]:.2f}", row['samples'], f"{row['mean_error']:+.2f}"))
+            status.config(text=f"RPM {heatmap.rpm_edges[cell[0]]:.0f}-"
+                               f"{heatmap.rpm_edges[cell[0] + 1]:.0f}, load "
+                               f"{heatmap.load_edges[cell[1]]:.0f}-"
+                               f"{heatmap.load_edges[cell[1] + 1]:.0f}: "
+                               f"{heatmap.count[cell]} samples from "
+                               f"{heatmap.event_count[cell]} event(s)")
+        
+        def open_selected(_event):
+            selection = tree.selection()
+            if selection:
+                self.current_event_index = int(selection[0])
+                self.request_plot()
+        
+        ttk.Button(controls, text="Update", command=update).pack(side=tk.LEFT, padx=10)
+        status.pack(side=tk.LEFT, padx=10)
+        canvas.mpl_connect('button_press_event', on_click)
+        tree.bind('<Double-1>', open_selected)
+        update()
+    
+    def show_ae_fuel(self):
+        """
+        Fuel each event added over a baseline PW fitted to the steady-state samples
+        
+        Plots added fuel against peak TPS_dot and lists every event; the
+        table can be exported to CSV. Double-click an event to show it.
+        """
+        if not self.ae_events:
+            messagebox.showwarning("Warning", "Please detect AE events first")
+            return
+        
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+        from ae_fuel import AEFuel, draw_fuel
+        from ae_heatmap import AE_WINDOWS, LOAD_EDGES
+        
+        columns = self.selected_columns()
+        guessed = guess_columns(self.data.columns)
+        
+        window = tk.Toplevel(self.root)
+        window.title("AE Fuel")
+        controls = ttk.Frame(window, padding="10")
+        controls.pack(fill=tk.X)
+        
+        ttk.Label(controls, text="Load:").pack(side=tk.LEFT)
+        load_role = tk.StringVar(value='map' if guessed['map'] else 'tps')
+        ttk.Combobox(controls, textvariable=load_role, values=list(LOAD_EDGES),
+                     state="readonly", width=6).pack(side=tk.LEFT, padx=5)
+        ttk.Label(controls, text="Samples:").pack(side=tk.LEFT, padx=(15, 0))
+        span = tk.StringVar(value='after')
+        ttk.Combobox(controls, textvariable=span, values=list(AE_WINDOWS),
+                     state="readonly", width=8).pack(side=tk.LEFT, padx=5)
+        ttk.Label(controls, text="Squirts/Cycle:").pack(side=tk.LEFT, padx=(15, 0))
+        squirts = tk.IntVar(value=1)
+        ttk.Spinbox(controls, from_=1, to=8, textvariable=squirts,
+                    width=4).pack(side=tk.LEFT, padx=5)
+        ttk.Label(controls, text="Flow (mg/ms):").pack(side=tk.LEFT, padx=(15, 0))
+        flow = tk.StringVar(value="")
+        ttk.Entry(controls, textvariable=flow, width=8).pack(side=tk.LEFT, padx=5)
+        status = ttk.Label(controls, text="")
+        
+        fig = Figure(figsize=(8, 6))
+        canvas = FigureCanvasTkAgg(fig, master=window)
+        canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+        
+        fields = ('event', 'time', 'tps_dot', 'base', 'added', 'pct', 'open', 'mg')
+        tree = ttk.Treeview(window, columns=fields, show='headings', height=6)
+        for col, heading in zip(fields, ("Event", "Time (s)", "Peak TPS_dot", "Baseline PW",
+                                         "Added PW", "Added %", "Open ms", "Fuel mg")):
+            tree.heading(col, text=heading)
+            tree.column(col, width=95, anchor=tk.E)
+        tree.pack(fill=tk.X, padx=10, pady=(0, 10))
+        state = {}
+        
+        def update(*_):
+            try:
+                mg = float(flow.get()) if flow.get().strip() else None
+                start = time.perf_counter()
+                roles = dict(columns, map=guessed['map'])
+                state['fuel'] = fuel = AEFuel.from_log(
+                    self.log, self.ae_events, roles, load=load_role.get(), window=span.get(),
+                    squirts=squirts.get(), flow=mg, max_gap=self.max_gap.get())
+            except (ValueError, tk.TclError) as e:
+                messagebox.showerror("Error", str(e), parent=window)
+                return
+            draw_fuel(fig, fuel)
+            canvas.draw()
+            tree.delete(*tree.get_children())
+            for row in fuel.table():
+                tree.insert('', tk.END, iid=str(row['event'] - 1), values=(
+                    row['event'], f"{row['t_start']:.2f}", f"{row['max_tps_dot']:.1f}",
+                    f"{row['baseline_pw']:.2f}", f"{row['added_pw']:+.2f}",
+                    f"{row['added_pct']:+.1f}", f"{row['added_open_ms']:.1f}",
+                    '' if mg is None else f"{row['added_fuel_mg']:.1f}"))
+            status.config(text=f"{len(fuel)} events in "
+                               f"{(time.perf_counter() - start) * 1000:.0f} ms, "
+                               f"baseline R² {fuel.model.r2:.3f}")
+        
+        def export():
+            if 'fuel' not in state:
+                return
+            filename = filedialog.asksaveasfilename(
+                parent=window, title="Export AE Fuel Table", defaultextension=".csv",
+                filetypes=[("CSV files", "*.csv")])
+            if filename:
+                state['fuel'].to_csv(filename)
+        
+        def open_selected(_event):
+            selection = tree.selection()
+            if selection:
+                self.current_event_index = int(selection[0])
+                self.request_plot()
+        
+        ttk.Button(controls, text="Update", command=update).pack(side=tk.LEFT, padx=10)
+        ttk.Button(controls, text="Export Table...", command=export).pack(side=tk.LEFT)
+        status.pack(side=tk.LEFT, padx=10)
+        tree.bind('<Double-1>', open_selected)
+        update()
     
     def previous_event(self):
         """Show previous AE event"""
@@ -420,7 +1225,7 @@ class AEAnalyzer:
             return
         
         self.current_event_index = (self.current_event_index - 1) % len(self.ae_events)
-        self.plot_event(self.current_event_index)
+        self.request_plot()
     
     def next_event(self):
         """Show next AE event"""
@@ -428,7 +1233,7 @@ class AEAnalyzer:
             return
         
         self.current_event_index = (self.current_event_index + 1) % len(self.ae_events)
-        self.plot_event(self.current_event_index)
+        self.request_plot()
 
 
 def main():
@@ -0,0 +1,358 @@
+#!/usr/bin/env python3
+"""
+Compressed columnar archive format (.aelog) for the AE Analyzer
+Stores a log channel by channel in row chunks, each chunk of each channel
+delta-encoded and compressed on its own, with a chunk index keyed by time,
+so a time window or a few channels decode without reading the whole file
+
+    write_archive(frame, 'run1.aelog')
+    import_log('run1.csv')                  # -> run1.aelog
+    reader = ArchiveReader('run1.aelog')
+    reader.read_window(120.0, 180.0, ['Time', 'TPS'])
+
+Layout: magic, then the chunk blobs, then a zlib-compressed JSON index
+(columns, codec and per chunk its rows, time range and blob offsets),
+then the index length and the magic again.
+
+Encodings are lossless. Float channels logged with a few decimals (most
+CSV exports) are stored as scaled integers; other floats as the XOR of
+consecutive bit patterns. Integers are delta-encoded. Every integer stream
+is narrowed to the smallest width that fits and byte-shuffled (all low
+bytes, then the next bytes ...) before compression with zlib, lzma or, when
+the zstandard package is installed, zstd.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import importlib.util
+import json
+import lzma
+import os
+import struct
+import time
+import zlib
+import numpy as np
+
+# zstandard is optional - without it archives use zlib or lzma
+HAVE_ZSTD = importlib.util.find_spec('zstandard') is not None
+
+
+ARCHIVE_EXTENSION = '.aelog'
+MAGIC = b'AELOG\x00\x01\x00'
+FORMAT_VERSION = 1
+
+CODECS = ('zlib', 'lzma', 'zstd')
+DEFAULT_CODEC = 'zstd' if HAVE_ZSTD else 'zlib'
+DEFAULT_LEVELS = {'zlib': 6, 'lzma': 6, 'zstd': 9}
+
+CHUNK_ROWS = 1 << 14  # rows per chunk: the unit of random access
+MAX_DECIMALS = 6      # floats with up to this many decimals are stored as integers
+
+# Blob encodings
+ENC_RAW = 0     # values as stored (bool, uint64)
+ENC_DELTA = 1   # integer deltas
+ENC_SCALED = 2  # round(value * 10**decimals) deltas
+ENC_XOR = 3     # float64 bits XOR the previous value's bits
+ENC_JSON = 4    # text channels
+
+_BLOB_HEADER = struct.Struct('<BBbI')  # encoding, stored width, decimals, count
+_TRAILER = struct.Struct('<Q8s')       # index length, magic
+_WIDTHS = {1: np.int8, 2: np.int16, 4: np.int32, 8: np.int64}
+
+
+def _compressor(codec, level):
+    if codec == 'zlib':
+        return lambda data: zlib.compress(data, level)
+    if codec == 'lzma':
+        return lambda data: lzma.compress(data, preset=level)
+    if codec == 'zstd':
+        import zstandard
+        return zstandard.ZstdCompressor(level=level).compress
+
+
+def _decompressor(codec):
+    if codec == 'zlib':
+        return zlib.decompress
+    if codec == 'lzma':
+        return lzma.decompress
+    if codec == 'zstd':
+        if not HAVE_ZSTD:
+            raise ImportError("this archive uses zstd: pip install zstandard")
+        import zstandard
+        return zstandard.ZstdDecompressor().decompress
+    raise ValueError(f"unknown codec '{codec}'")
+
+
+def _narrow(values):
+    """int64 values in the smallest signed width that holds them"""
+    if len(values) == 0:
+        return values.astype(np.int8)
+    lo, hi = int(values.min()), int(values.max())
+    for dtype in _WIDTHS.values():
+        info = np.iinfo(dtype)
+        if info.min <= lo and hi <= info.max:
+            return values.astype(dtype, copy=False)
+
+
+def _shuffle(values):
+    """Bytes grouped by significance, so slowly changing high bytes compress away"""
+    return np.ascontiguousarray(values.view(np.uint8).reshape(-1, values.itemsize).T).tobytes()
+
+
+def _unshuffle(data, dtype, count):
+    width = np.dtype(dtype).itemsize
+    planes = np.frombuffer(data, dtype=np.uint8).reshape(width, count)
+    return np.ascontiguousarray(planes.T).view(dtype).ravel()
+
+
+def _decimals(values):
+    """Fewest decimals that represent every value exactly, or None"""
+    if not np.all(np.isfinite(values)):
+        return None
+    for decimals in range(MAX_DECIMALS + 1):
+        scale = 10.0 ** decimals
+        scaled = np.rint(values * scale)
+        if np.abs(scaled).max(initial=0) >= 2 ** 52:
+            return None
+        if np.array_equal(scaled / scale, values):
+            return decimals
+    return None
+
+
+def encode_chunk(values, compress):
+    """One channel's values for one chunk as a compressed blob"""
+    values = np.asarray(values)
+    kind = values.dtype.kind
+    decimals = 0
+    if kind == 'f':
+        values = values.astype(np.float64, copy=False)
+        decimals = _decimals(values)
+        if decimals is not None:
+            ints = np.rint(values * 10.0 ** decimals).astype(np.int64)
+            encoding, stored = ENC_SCALED, _narrow(np.diff(ints, prepend=0))
+        else:
+            bits = values.view(np.uint64)
+            encoding, stored = ENC_XOR, bits ^ np.concatenate([np.zeros(1, np.uint64), bits[:-1]])
+            decimals = 0
+    elif kind in 'iu' and not (kind == 'u' and values.itemsize == 8):
+        encoding, stored = ENC_DELTA, _narrow(np.diff(values.astype(np.int64), prepend=0))
+    elif kind in 'biu':
+        encoding, stored = ENC_RAW, values
+    else:
+        text = [None if v is None or (isinstance(v, float) and v != v) else str(v)
+                for v in values.tolist()]
+        payload = json.dumps(text).encode()
+        return _BLOB_HEADER.pack(ENC_JSON, 0, 0, len(values)) + compress(payload)
+    payload = _shuffle(np.ascontiguousarray(stored))
+    return _BLOB_HEADER.pack(encoding, stored.itemsize, decimals, len(values)) + compress(payload)
+
+
+def decode_chunk(blob, dtype, decompress):
+    """Values of one blob as an array of dtype"""
+    encoding, width, decimals, count = _BLOB_HEADER.unpack_from(blob)
+    payload = decompress(blob[_BLOB_HEADER.size:])
+    if encoding == ENC_JSON:
+        return np.array(json.loads(payload), dtype=object)
+    if encoding == ENC_RAW:
+        return _unshuffle(payload, dtype, count)
+    if encoding == ENC_XOR:
+        bits = np.bitwise_xor.accumulate(_unshuffle(payload, np.uint64, count))
+        return bits.view(np.float64).astype(dtype, copy=False)
+    ints = np.cumsum(_unshuffle(payload, _WIDTHS[width], count), dtype=np.int64)
+    if encoding == ENC_SCALED:
+        return (ints / 10.0 ** decimals).astype(dtype, copy=False)
+    return ints.astype(dtype, copy=False)
+
+
+def write_archive(frame, path, time_col=None, codec=DEFAULT_CODEC, level=None,
+                  chunk_rows=CHUNK_ROWS, source=None):
+    """
+    Write a DataFrame as an archive, returning the index
+
+    time_col keys the chunk index (auto-detected if None). source is
+    recorded in the index (e.g. the imported file name).
+    """
+    from ae_core import guess_columns
+
+    if codec not in CODECS:
+        raise ValueError(f"unknown codec '{codec}' (expected one of {', '.join(CODECS)})")
+    if codec == 'zstd' and not HAVE_ZSTD:
+        raise ImportError("zstd compression requires zstandard: pip install zstandard")
+    compress = _compressor(codec, DEFAULT_LEVELS[codec] if level is None else level)
+    names = [str(col) for col in frame.columns]
+    time_col = time_col or guess_columns(names)['time']
+    arrays = [frame[col].to_numpy() for col in frame.columns]
+    dtypes = [a.dtype.str if a.dtype.kind in 'biuf' else 'object' for a in arrays]
+    times = (np.asarray(arrays[names.index(time_col)], dtype=float)
+             if time_col in names else None)
+
+    chunks = []
+    with open(path, 'wb') as f:
+        f.write(MAGIC)
+        offset = len(MAGIC)
+        for start in range(0, len(frame), chunk_rows):
+            stop = min(start + chunk_rows, len(frame))
+            blobs = []
+            for values in arrays:
+                blob = encode_chunk(values[start:stop], compress)
+                f.write(blob)
+                blobs.append([offset, len(blob)])
+                offset += len(blob)
+            chunk = {'start': start, 'rows': stop - start, 'blobs': blobs,
+                     't_min': None, 't_max': None}
+            if times is not None:
+                window = times[start:stop]
+                finite = window[np.isfinite(window)]
+                if len(finite):
+                    chunk['t_min'], chunk['t_max'] = float(finite.min()), float(finite.max())
+            chunks.append(chunk)
+
+        index = {'version': FORMAT_VERSION, 'codec': codec, 'rows': len(frame),
+                 'columns': names, 'dtypes': dtypes, 'time_col': time_col,
+                 'chunk_rows': chunk_rows, 'chunks': chunks, 'source': source,
+                 'created': time.time()}
+        packed = zlib.compress(json.dumps(index).encode())
+        f.write(packed)
+        f.write(_TRAILER.pack(len(packed), MAGIC))
+    return index
+
+
+def is_archive(path):
+    """True for a file that starts with the archive magic"""
+    try:
+        with open(path, 'rb') as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+class ArchiveReader:
+    """
+    Random access to an archive: whole channels, row chunks or time windows
+
+    Only the index is read on open; each read fetches and decodes just the
+    blobs of the chunks and channels it needs.
+    """
+
+    def __init__(self, path, threads=None):
+        self.path = path
+        self.threads = threads or os.cpu_count() or 1
+        with open(path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} is not an AE archive")
+            f.seek(-_TRAILER.size, os.SEEK_END)
+            length, magic = _TRAILER.unpack(f.read(_TRAILER.size))
+            if magic != MAGIC:
+                raise ValueError(f"{path} is truncated (no archive index)")
+            f.seek(-_TRAILER.size - length, os.SEEK_END)
+            self.index = json.loads(zlib.decompress(f.read(length)))
+        if self.index['version'] > FORMAT_VERSION:
+            raise ValueError(f"{path} needs a newer AE Analyzer (format "
+                             f"{self.index['version']})")
+        self.columns = self.index['columns']
+        self.rows = self.index['rows']
+        self.time_col = self.index['time_col']
+        self.chunks = self.index['chunks']
+        self._decompress = _decompressor(self.index['codec'])
+        self._dtypes = dict(zip(self.columns, self.index['dtypes']))
+
+    def __len__(self):
+        return self.rows
+
+    def chunks_for(self, t0, t1):
+        """Numbers of the chunks whose time range overlaps [t0, t1]"""
+        return [i for i, chunk in enumerate(self.chunks)
+                if chunk['t_min'] is not None and chunk['t_max'] >= t0 and chunk['t_min'] <= t1]
+
+    def read_chunks(self, chunk_ids, columns=None):
+        """{column: values} for a set of chunks, concatenated in row order"""
+        columns = list(columns or self.columns)
+        missing = [col for col in columns if col not in self._dtypes]
+        if missing:
+            raise KeyError(f"no channel(s) {', '.join(missing)} in {self.path}")
+        positions = [self.columns.index(col) for col in columns]
+        # Blobs are read in file order through one handle; decoding runs in
+        # threads, since zlib, lzma and zstd release the GIL
+        jobs = sorted(((i, k) for i in chunk_ids for k in positions),
+                      key=lambda job: self.chunks[job[0]]['blobs'][job[1]][0])
+        blobs = {}
+        with open(self.path, 'rb') as f:
+            for i, k in jobs:
+                offset, length = self.chunks[i]['blobs'][k]
+                f.seek(offset)
+                blobs[(i, k)] = f.read(length)
+
+        def decode(job):
+            return decode_chunk(blobs[job], self._dtypes[self.columns[job[1]]],
+                                self._decompress)
+
+        if self.threads > 1 and len(jobs) > 1:
+            with ThreadPoolExecutor(max_workers=self.threads) as pool:
+                decoded = dict(zip(jobs, pool.map(decode, jobs)))
+        else:
+            decoded = {job: decode(job) for job in jobs}
+
+        out = {}
+        for col, k in zip(columns, positions):
+            parts = [decoded[(i, k)] for i in chunk_ids]
+            dtype = object if self._dtypes[col] == 'object' else self._dtypes[col]
+            out[col] = np.concatenate(parts) if parts else np.zeros(0, dtype=dtype)
+        return out
+
+    def read_arrays(self, columns=None):
+        """Whole channels as {column: array}"""
+        return self.read_chunks(range(len(self.chunks)), columns)
+
+    def read(self, columns=None):
+        """The whole log (or some channels) as a DataFrame"""
+        import pandas as pd
+        return pd.DataFrame(self.read_arrays(columns))
+
+    def read_window(self, t0, t1, columns=None):
+        """
+        Rows with t0 <= time <= t1 as a DataFrame, decoding only the chunks
+        whose time range overlaps the window
+        """
+        import pandas as pd
+
+        if not self.time_col:
+            raise ValueError(f"{self.path} has no time channel to window on")
+        columns = list(columns or self.columns)
+        wanted = columns if self.time_col in columns else columns + [self.time_col]
+        arrays = self.read_chunks(self.chunks_for(t0, t1), wanted)
+        times = arrays[self.time_col]
+        mask = (times >= t0) & (times <= t1)
+        return pd.DataFrame({col: arrays[col][mask] for col in columns})
+
+    def info(self):
+        """Summary of the archive for display"""
+        size = os.path.getsize(self.path)
+        times = [(c['t_min'], c['t_max']) for c in self.chunks if c['t_min'] is not None]
+        return {'path': self.path, 'rows': self.rows, 'channels': len(self.columns),
+                'chunks': len(self.chunks), 'codec': self.index['codec'], 'bytes': size,
+                'time_col': self.time_col, 'source': self.index.get('source'),
+                't_start': min(t[0] for t in times) if times else None,
+                't_end': max(t[1] for t in times) if times else None}
+
+
+def read_archive(path, channels=None):
+    """Read an archive into a DataFrame (the reader behind ae_io.read_log)"""
+    return ArchiveReader(path).read(channels)
+
+
+def import_log(path, output=None, engine='auto', codec=DEFAULT_CODEC, level=None,
+               chunk_rows=CHUNK_ROWS):
+    """
+    Convert a CSV or MLG log to an archive next to it (or at output)
+
+    Returns (output path, index).
+    """
+    from ae_io import read_log_csv, convert_mlg
+
+    source = path
+    if path.lower().endswith('.mlg'):
+        path = convert_mlg(path)
+    frame = read_log_csv(path, engine=engine)
+    output = output or os.path.splitext(source)[0] + ARCHIVE_EXTENSION
+    index = write_archive(frame, output, codec=codec, level=level, chunk_rows=chunk_rows,
+                          source=os.path.basename(source))
+    return output, index
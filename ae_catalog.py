@@ -0,0 +1,382 @@
+#!/usr/bin/env python3
+"""
+Log library catalog for the AE Analyzer
+Scans a directory tree of logs in parallel and records per-log metadata,
+channel lists and per-event features in a local SQLite database, so events
+across thousands of logs can be searched without reopening the files
+
+    conn = open_catalog('logs.sqlite')
+    scan_directory(conn, '/mnt/logs', workers=8)
+    query_events(conn, ['max_tps_dot > 200', 'rpm < 3000', 'clt < 40'])
+    key = event_key(conn, '/mnt/logs/run1.csv', 3)
+    similar_events(conn, stored_vector(conn, key), k=10, exclude=[key])
+"""
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import fnmatch
+import json
+import os
+import re
+import sqlite3
+import time
+import numpy as np
+
+from ae_core import guess_columns, analyze_log, LogData, CONTEXT_SECONDS, MAX_GAP_SECONDS
+from ae_features import EVENT_FEATURES
+from ae_similarity import TRACE_ROLES, TRACE_POINTS
+
+
+# Bumped whenever the tables change; older catalogs are rebuilt by the next scan
+CATALOG_VERSION = 2
+
+# Files picked up by a scan (matched case-insensitively)
+LOG_PATTERNS = ('*.csv', '*.aelog')
+
+# Detection settings used when the caller does not give any
+DEFAULT_PARAMS = {
+    'threshold': 10.0,
+    'duration': 0.1,
+    'context': CONTEXT_SECONDS,
+    'max_gap': MAX_GAP_SECONDS,
+}
+
+# Event columns that can appear in a query condition
+QUERY_FIELDS = ('max_tps_dot', 'duration', 'segment') + EVENT_FEATURES
+
+QUERY_OPERATORS = ('<=', '>=', '!=', '<', '>', '=')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS logs (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    rows INTEGER,
+    duration REAL,
+    segments INTEGER,
+    events INTEGER,
+    columns TEXT,          -- JSON role -> channel name used for detection
+    params TEXT,           -- JSON detection settings
+    error TEXT,            -- why the log could not be read, NULL if it was
+    scanned_at REAL
+);
+CREATE TABLE IF NOT EXISTS channels (
+    log_id INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    PRIMARY KEY (log_id, name)
+);
+CREATE TABLE IF NOT EXISTS events (
+    log_id INTEGER NOT NULL,
+    idx INTEGER NOT NULL,  -- position in the log's event list
+    segment INTEGER,
+    event_start INTEGER,
+    event_end INTEGER,
+    duration REAL,
+    max_tps_dot REAL,
+    {features},
+    vector BLOB,           -- float32 trace vector for ae_similarity
+    PRIMARY KEY (log_id, idx)
+);
+CREATE INDEX IF NOT EXISTS channels_name ON channels (name);
+CREATE INDEX IF NOT EXISTS events_max_tps_dot ON events (max_tps_dot);
+CREATE INDEX IF NOT EXISTS events_duration ON events (duration);
+CREATE INDEX IF NOT EXISTS events_rpm ON events (rpm);
+CREATE INDEX IF NOT EXISTS events_clt ON events (clt);
+CREATE INDEX IF NOT EXISTS events_map ON events (map);
+""".format(features=',\n    '.join(f'{name} REAL' for name in EVENT_FEATURES))
+
+EVENT_COLUMNS = ('idx', 'segment', 'event_start', 'event_end', 'duration',
+                 'max_tps_dot') + EVENT_FEATURES
+
+
+def open_catalog(db_path):
+    """Open (creating if needed) a catalog database"""
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    if conn.execute("PRAGMA user_version").fetchone()[0] != CATALOG_VERSION:
+        # The catalog only indexes the logs, so an old layout is simply dropped
+        conn.executescript("DROP TABLE IF EXISTS events; DROP TABLE IF EXISTS channels; "
+                           "DROP TABLE IF EXISTS logs;")
+        conn.execute(f"PRAGMA user_version = {CATALOG_VERSION}")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def find_logs(root, patterns=LOG_PATTERNS):
+    """Every log file under root, in a stable order"""
+    found = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for name in sorted(filenames):
+            if any(fnmatch.fnmatch(name.lower(), pattern) for pattern in patterns):
+                found.append(os.path.abspath(os.path.join(dirpath, name)))
+    return found
+
+
+def catalog_log(path, params, engine='auto'):
+    """
+    Load one log, detect its events and summarize it as a catalog record
+
+    Runs in a worker process. A log that cannot be read still gets a record
+    (with 'error' set) so it is not retried until the file changes.
+    """
+    from ae_io import read_log
+    from ae_features import add_event_features
+    from ae_similarity import event_vectors
+
+    stat = os.stat(path)
+    record = {'path': path, 'size': stat.st_size, 'mtime': stat.st_mtime,
+              'params': params, 'channels': [], 'columns': {}, 'events': [],
+              'rows': None, 'duration': None, 'segments': None, 'error': None}
+    try:
+        data = read_log(path, engine=engine)
+        columns = guess_columns(data.columns)
+        record['channels'] = [str(col) for col in data.columns]
+        record['columns'] = columns
+        record['rows'] = len(data)
+        if not columns['time'] or not columns['tps']:
+            raise ValueError("no Time/TPS columns")
+
+        log = LogData(data, columns['time'])
+        segments, events = analyze_log(log, columns['tps'], params['threshold'],
+                                       params['duration'], context_s=params['context'],
+                                       max_gap=params['max_gap'])
+        add_event_features(log, events, columns)
+        record['segments'] = len(segments)
+        record['duration'] = sum(seg['t_end'] - seg['t_start'] for seg in segments)
+        fields = [name for name in EVENT_COLUMNS if name != 'idx']
+        vectors = event_vectors(log, events, columns)
+        record['events'] = [(i,) + tuple(row) + (vector.tobytes(),)
+                            for i, (row, vector)
+                            in enumerate(zip(events.select(fields).tolist(), vectors))]
+    except Exception as e:
+        record['error'] = f"{type(e).__name__}: {e}"
+    return record
+
+
+def write_record(conn, record):
+    """Replace everything the catalog holds for one log with a fresh record"""
+    remove_log(conn, record['path'])
+    cursor = conn.execute(
+        "INSERT INTO logs (path, size, mtime, rows, duration, segments, events, "
+        "columns, params, error, scanned_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        (record['path'], record['size'], record['mtime'], record['rows'],
+         record['duration'], record['segments'], len(record['events']),
+         json.dumps(record['columns']), json.dumps(record['params'], sort_keys=True),
+         record['error'], time.time()))
+    log_id = cursor.lastrowid
+    conn.executemany("INSERT INTO channels (log_id, name) VALUES (?, ?)",
+                     [(log_id, name) for name in dict.fromkeys(record['channels'])])
+    placeholders = ', '.join('?' * (len(EVENT_COLUMNS) + 2))
+    conn.executemany(f"INSERT INTO events (log_id, {', '.join(EVENT_COLUMNS)}, vector) "
+                     f"VALUES ({placeholders})",
+                     [(log_id,) + tuple(event) for event in record['events']])
+    return log_id
+
+
+def stale_logs(conn, paths, params):
+    """Paths that are new, changed on disk or were scanned with other settings"""
+    params_json = json.dumps(params, sort_keys=True)
+    known = {row['path']: (row['size'], row['mtime'], row['params'])
+             for row in conn.execute("SELECT path, size, mtime, params FROM logs")}
+    stale = []
+    for path in paths:
+        stat = os.stat(path)
+        if known.get(path) != (stat.st_size, stat.st_mtime, params_json):
+            stale.append(path)
+    return stale
+
+
+def scan_directory(conn, root, workers=None, engine='auto', progress=None, **params):
+    """
+    Catalog every log under root that changed since the last scan
+
+    workers -- processes reading logs (None = all cores, 1 = in-process)
+    params  -- detection settings overriding DEFAULT_PARAMS
+    progress(done, total, path) is called after each log is written.
+    Returns {'found', 'scanned', 'failed', 'removed'}.
+    """
+    params = dict(DEFAULT_PARAMS, **params)
+    paths = find_logs(root)
+    todo = stale_logs(conn, paths, params)
+
+    # Logs under root that no longer exist drop out of the catalog
+    present = set(paths)
+    prefix = os.path.join(os.path.abspath(root), '')
+    gone = [row['path'] for row in conn.execute("SELECT path FROM logs")
+            if row['path'].startswith(prefix) and row['path'] not in present]
+    for path in gone:
+        remove_log(conn, path)
+
+    def results():
+        if workers == 1 or len(todo) <= 1:
+            for path in todo:
+                yield catalog_log(path, params, engine)
+            return
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(catalog_log, path, params, engine) for path in todo]
+            for future in as_completed(futures):
+                yield future.result()
+
+    # Workers only parse; this process is the single SQLite writer
+    failed = 0
+    for done, record in enumerate(results(), 1):
+        write_record(conn, record)
+        failed += record['error'] is not None
+        conn.commit()
+        if progress:
+            progress(done, len(todo), record['path'])
+    conn.commit()
+    return {'found': len(paths), 'scanned': len(todo), 'failed': failed,
+            'removed': len(gone)}
+
+
+def remove_log(conn, path):
+    """Drop one log and its channels and events from the catalog"""
+    row = conn.execute("SELECT id FROM logs WHERE path = ?", (path,)).fetchone()
+    if row:
+        conn.execute("DELETE FROM channels WHERE log_id = ?", (row['id'],))
+        conn.execute("DELETE FROM events WHERE log_id = ?", (row['id'],))
+        conn.execute("DELETE FROM logs WHERE id = ?", (row['id'],))
+
+
+def parse_condition(text):
+    """Split 'rpm < 3000' into ('rpm', '<', 3000.0)"""
+    match = re.fullmatch(r'\s*(\w+)\s*(<=|>=|!=|<|>|==?)\s*(\S+)\s*', text)
+    if not match:
+        raise ValueError(f"Cannot parse condition '{text}' (expected e.g. 'rpm < 3000')")
+    field, op, value = match.groups()
+    if field not in QUERY_FIELDS:
+        raise ValueError(f"Unknown field '{field}' (expected one of {', '.join(QUERY_FIELDS)})")
+    return field, '=' if op == '==' else op, float(value)
+
+
+def parse_conditions(text):
+    """Parse a comma or 'and' separated filter string into conditions"""
+    parts = re.split(r',|\band\b', text, flags=re.IGNORECASE)
+    return [parse_condition(part) for part in parts if part.strip()]
+
+
+def query_events(conn, conditions=(), channel=None, order_by='max_tps_dot',
+                 descending=True, limit=200):
+    """
+    Events matching every condition, best first
+
+    conditions -- 'field op value' strings or (field, op, value) tuples
+    channel    -- only logs that recorded this channel
+    Returns a list of dicts with the event features plus the log 'path',
+    'columns' and 'params' needed to reopen it at the event.
+    """
+    where = ["l.error IS NULL"]
+    values = []
+    for condition in conditions:
+        field, op, value = (parse_condition(condition) if isinstance(condition, str)
+                            else condition)
+        if field not in QUERY_FIELDS or op not in QUERY_OPERATORS:
+            raise ValueError(f"Invalid condition {condition!r}")
+        where.append(f"e.{field} {op} ?")
+        values.append(value)
+    if channel:
+        where.append("e.log_id IN (SELECT log_id FROM channels WHERE name = ?)")
+        values.append(channel)
+    if order_by not in QUERY_FIELDS:
+        raise ValueError(f"Cannot order by '{order_by}'")
+
+    order = f"e.{order_by} {'DESC' if descending else 'ASC'}, l.path, e.idx"
+    return _select_events(conn, ' AND '.join(where), values, order, limit)
+
+
+def _select_events(conn, where, values, order, limit):
+    """Run an event search and decode each row into a dict"""
+    sql = (f"SELECT l.path, l.columns, l.params, e.log_id, "
+           f"{', '.join('e.' + name for name in EVENT_COLUMNS)} "
+           f"FROM events e JOIN logs l ON l.id = e.log_id "
+           f"WHERE {where} ORDER BY {order} LIMIT ?")
+    rows = []
+    for row in conn.execute(sql, list(values) + [int(limit)]):
+        row = dict(row)
+        row['columns'] = json.loads(row['columns'])
+        row['params'] = json.loads(row['params'])
+        rows.append(row)
+    return rows
+
+
+def find_event(conn, path, event_start):
+    """(log_id, idx) of the cataloged event starting at a sample, or None"""
+    row = conn.execute("SELECT e.log_id, e.idx FROM events e JOIN logs l ON l.id = e.log_id "
+                       "WHERE l.path = ? AND e.event_start = ?",
+                       (os.path.abspath(path), int(event_start))).fetchone()
+    return (row['log_id'], row['idx']) if row else None
+
+
+def load_vectors(conn):
+    """Every stored trace vector as ((log_id, idx) keys, float32 vectors)"""
+    keys, blobs = [], []
+    for log_id, idx, blob in conn.execute(
+            "SELECT log_id, idx, vector FROM events WHERE vector IS NOT NULL "
+            "ORDER BY log_id, idx"):
+        keys.append((log_id, idx))
+        blobs.append(blob)
+    vectors = np.frombuffer(b''.join(blobs), dtype=np.float32)
+    return (np.array(keys, dtype=np.int64).reshape(-1, 2),
+            vectors.reshape(len(keys), len(TRACE_ROLES) * TRACE_POINTS))
+
+
+def event_key(conn, path, idx):
+    """(log_id, idx) of event number idx (0-based) of a cataloged log, or None"""
+    row = conn.execute("SELECT e.log_id, e.idx FROM events e JOIN logs l ON l.id = e.log_id "
+                       "WHERE l.path = ? AND e.idx = ?",
+                       (os.path.abspath(path), int(idx))).fetchone()
+    return (row['log_id'], row['idx']) if row else None
+
+
+def stored_vector(conn, key):
+    """Trace vector of the cataloged event with a (log_id, idx) key, or None"""
+    row = conn.execute("SELECT vector FROM events WHERE log_id = ? AND idx = ?",
+                       (int(key[0]), int(key[1]))).fetchone()
+    if row is None or row['vector'] is None:
+        return None
+    return np.frombuffer(row['vector'], dtype=np.float32)
+
+
+def build_similarity_index(conn):
+    """A SimilarityIndex over every cataloged event"""
+    from ae_similarity import SimilarityIndex
+
+    keys, vectors = load_vectors(conn)
+    return SimilarityIndex(vectors, keys=keys)
+
+
+def events_by_keys(conn, keys):
+    """Catalog rows (as from query_events) for (log_id, idx) keys, in key order"""
+    rows = []
+    for log_id, idx in keys:
+        rows += _select_events(conn, "e.log_id = ? AND e.idx = ?", (int(log_id), int(idx)),
+                               "e.idx", 1)
+    return rows
+
+
+def similar_events(conn, vector, k=10, exclude=(), index=None):
+    """
+    The k cataloged events whose traces are closest to a trace vector
+
+    Pass a prebuilt index from build_similarity_index to skip the build
+    when searching repeatedly. Each row also gets its 'distance'.
+    """
+    if index is None:
+        index = build_similarity_index(conn)
+    if len(index) == 0:
+        return []
+    _, keys, distances = index.query(vector, k=k, exclude=exclude)
+    rows = events_by_keys(conn, keys)
+    for row, distance in zip(rows, distances):
+        row['distance'] = float(distance)
+    return rows
+
+
+def catalog_summary(conn):
+    """Counts of logs, unreadable logs and events in the catalog"""
+    logs, failed = conn.execute(
+        "SELECT COUNT(*), COUNT(error) FROM logs").fetchone()
+    events = conn.execute("SELECT COUNT(*) FROM events").fetchone()[0]
+    return {'logs': logs, 'failed': failed, 'events': events}
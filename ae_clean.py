@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+Sensor cleaning for the AE Analyzer
+An optional stage ahead of detection that finds and repairs dropouts
+(NaN), out-of-range values, stuck sensors and isolated spikes, so they do
+not turn into spurious AE events
+
+Everything is vectorized over shifted array views: rolling medians run a
+min/max sorting network across the window offsets in cache-sized chunks,
+and the MAD test for spikes only runs on the few samples that stand out
+from their median.
+Flagged samples are repaired by linear interpolation between the nearest
+good samples (spikes take their rolling median). clean_log registers the
+cleaned channels as derived channels of a LogData, so the loaded DataFrame
+is never modified and LogData.raw() still returns the logged values.
+"""
+
+import time
+import numpy as np
+
+
+# Bit flags recorded per sample
+FLAG_MISSING = 1   # NaN or inf
+FLAG_RANGE = 2     # outside the role's physical range
+FLAG_STUCK = 4     # part of a run of identical values
+FLAG_SPIKE = 8     # isolated spike replaced by the rolling median
+
+# Plausible values per channel role
+CHANNEL_LIMITS = {
+    'rpm': (0, 15000),
+    'tps': (-5, 105),    # %
+    'pw': (0, 50),       # ms
+    'afr': (5, 25),
+    'clt': (-40, 150),   # deg C
+    'map': (0, 500),     # kPa
+}
+
+# Smallest jump from the rolling median that can be a spike, per role
+SPIKE_FLOOR = {'rpm': 500, 'tps': 5.0, 'pw': 2.0, 'afr': 1.5, 'clt': 5.0, 'map': 15.0}
+
+# Identical readings for this many seconds mean a stuck sensor. TPS, PW and
+# coolant legitimately hold still (closed throttle, fuel cut, warm engine)
+STUCK_SECONDS = {'rpm': 2.0, 'afr': 3.0, 'map': 2.0}
+
+MEDIAN_WINDOW = 5   # samples; spikes up to MEDIAN_WINDOW // 2 samples wide are removed
+SPIKE_SIGMAS = 5.0  # deviations (robust sigma = 1.4826 * MAD) that make a spike
+MAD_SIGMA = 1.4826
+CHUNK_SAMPLES = 1 << 14  # rolling medians run in chunks that stay in L2 cache
+
+
+def _median_chunks(padded, window):
+    """
+    Yield (start, stop, medians) of a centred rolling median, chunk by chunk
+
+    padded holds the values with window // 2 extra samples each side. The
+    medians array is a reused buffer, valid until the next chunk. Windows
+    of 3 and 5 run a min/max sorting network over shifted views into
+    preallocated buffers; other odd windows use np.median over a
+    sliding_window_view.
+    """
+    if window % 2 == 0:
+        raise ValueError("window must be odd")
+    n = max(len(padded) - window + 1, 0)
+    size = min(CHUNK_SAMPLES, n)
+    out, t1, t2, t3 = (np.empty(size) for _ in range(4))
+    for start in range(0, n, CHUNK_SAMPLES):
+        stop = min(start + CHUNK_SAMPLES, n)
+        m = stop - start
+        views = [padded[start + k:start + k + m] for k in range(window)]
+        o, a, b, c = out[:m], t1[:m], t2[:m], t3[:m]
+        if window == 1:
+            o[:] = views[0]
+        elif window == 3:
+            x, y, z = views
+            np.minimum(x, y, out=a)
+            np.maximum(x, y, out=o)
+            np.minimum(o, z, out=o)
+            np.maximum(o, a, out=o)
+        elif window == 5:
+            x, y, z, w, v = views
+            # Dropping the min of one pair and the max of the other leaves
+            # the median of the three remaining values
+            np.minimum(x, y, out=a)
+            np.minimum(z, w, out=b)
+            np.maximum(a, b, out=a)
+            np.maximum(x, y, out=b)
+            np.maximum(z, w, out=c)
+            np.minimum(b, c, out=b)
+            np.minimum(v, a, out=c)
+            np.maximum(v, a, out=o)
+            np.minimum(o, b, out=o)
+            np.maximum(o, c, out=o)
+        else:
+            block = padded[start:stop + window - 1]
+            np.median(np.lib.stride_tricks.sliding_window_view(block, window), axis=1, out=o)
+        yield start, stop, o
+
+
+def rolling_median(values, window=MEDIAN_WINDOW):
+    """Centred rolling median, edges padded with the first/last value"""
+    values = np.asarray(values, dtype=float)
+    out = np.empty(len(values))
+    if len(values):
+        padded = np.pad(values, window // 2, mode='edge')
+        for start, stop, median in _median_chunks(padded, window):
+            out[start:stop] = median
+    return out
+
+
+def _spike_candidates(values, window, floor):
+    """
+    (indices, medians) of samples more than floor from their rolling median
+
+    Found chunk by chunk, so the full median and deviation arrays are never
+    materialized.
+    """
+    padded = np.pad(values, window // 2, mode='edge')
+    deviation = np.empty(min(CHUNK_SAMPLES, len(values)))
+    indices, medians = [np.zeros(0, dtype=np.int64)], [np.zeros(0)]
+    for start, stop, median in _median_chunks(padded, window):
+        d = deviation[:stop - start]
+        np.subtract(values[start:stop], median, out=d)
+        np.abs(d, out=d)
+        hits = np.flatnonzero(d > floor)
+        if len(hits):
+            indices.append(hits + start)
+            medians.append(median[hits])
+    return np.concatenate(indices), np.concatenate(medians)
+
+
+def stuck_runs(values, time=None, min_seconds=2.0):
+    """
+    (starts, stops) of runs of identical values lasting at least min_seconds
+
+    Without a time base min_seconds counts samples. NaN never matches.
+    """
+    values = np.asarray(values)
+    if len(values) < 2:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    # Runs of equal neighbours - a noisy channel has few, so only they are
+    # ever indexed. Pair i is (values[i], values[i + 1])
+    same = np.zeros(len(values) + 1, dtype=np.int8)
+    same[1:-1] = values[1:] == values[:-1]
+    edges = np.diff(same)
+    starts = np.flatnonzero(edges == 1)
+    stops = np.flatnonzero(edges == -1) + 1
+    if time is None:
+        length = stops - starts
+    else:
+        time = np.asarray(time, dtype=float)
+        with np.errstate(invalid='ignore'):
+            length = np.abs(time[stops - 1] - time[starts])
+    with np.errstate(invalid='ignore'):
+        long = length >= min_seconds
+    return starts[long], stops[long]
+
+
+def _run_mask(n, starts, stops):
+    """Boolean mask covering [start, stop) runs"""
+    edges = np.zeros(n + 1, dtype=np.int32)
+    np.add.at(edges, starts, 1)
+    np.add.at(edges, stops, -1)
+    return np.cumsum(edges[:-1]) > 0
+
+
+def clean_channel(values, role=None, time=None, limits=None, spike_floor=None,
+                  stuck_seconds=None, window=MEDIAN_WINDOW, sigmas=SPIKE_SIGMAS):
+    """
+    Clean one channel, returning (cleaned values, per-sample flags)
+
+    Thresholds default to the role's entries in CHANNEL_LIMITS, SPIKE_FLOOR
+    and STUCK_SECONDS; pass a value to override one, or False to skip that
+    check. flags is a uint8 array of FLAG_* bits.
+    """
+    def setting(given, table):
+        return table.get(role) if given is None else (given or None)
+
+    limits = setting(limits, CHANNEL_LIMITS)
+    spike_floor = setting(spike_floor, SPIKE_FLOOR)
+    stuck_seconds = setting(stuck_seconds, STUCK_SECONDS)
+
+    raw = np.asarray(values, dtype=float)
+    n = len(raw)
+
+    # FLAG_MISSING is 1, so the mask converts directly
+    flags = (~np.isfinite(raw)).view(np.uint8)
+    if limits:
+        with np.errstate(invalid='ignore'):
+            out = (raw < limits[0]) | (raw > limits[1])
+        flags |= out.view(np.uint8) << 1
+    if stuck_seconds:
+        starts, stops = stuck_runs(raw, time, stuck_seconds)
+        if len(starts):
+            flags[_run_mask(n, starts, stops)] |= FLAG_STUCK
+
+    # Interpolate across everything flagged so far, anchored on the good
+    # samples either side of each bad run
+    bad = flags != 0
+    cleaned = raw.copy()
+    if bad.any():
+        edges = np.diff(bad.view(np.int8), prepend=0, append=0)
+        anchors = np.union1d(np.flatnonzero(edges == 1) - 1, np.flatnonzero(edges == -1))
+        anchors = anchors[(anchors >= 0) & (anchors < n)]
+        if len(anchors) == 0:
+            cleaned[:] = np.nan
+            return cleaned, flags
+        index = np.flatnonzero(bad)
+        cleaned[index] = np.interp(index, anchors, raw[anchors])
+
+    # Spikes: far from the rolling median both absolutely and in MADs
+    if spike_floor and n >= window:
+        candidates, median = _spike_candidates(cleaned, window, spike_floor)
+        if len(candidates):
+            half = window // 2
+            windows = np.lib.stride_tricks.sliding_window_view(
+                np.pad(cleaned, half, mode='edge'), window)[candidates]
+            mad = np.median(np.abs(windows - median[:, None]), axis=1)
+            spike = np.abs(cleaned[candidates] - median) > sigmas * MAD_SIGMA * mad
+            cleaned[candidates[spike]] = median[spike]
+            flags[candidates[spike]] |= FLAG_SPIKE
+    return cleaned, flags
+
+
+def channel_report(channel, role, flags, seconds=None):
+    """Quality summary of one cleaned channel"""
+    n = len(flags)
+    stuck = (flags & FLAG_STUCK) != 0
+    runs = int(np.count_nonzero(np.diff(stuck.astype(np.int8), prepend=0) == 1))
+    flagged = int(np.count_nonzero(flags))
+    return {
+        'channel': channel,
+        'role': role,
+        'samples': n,
+        'missing': int(np.count_nonzero(flags & FLAG_MISSING)),
+        'out_of_range': int(np.count_nonzero(flags & FLAG_RANGE)),
+        'stuck': int(np.count_nonzero(stuck)),
+        'stuck_runs': runs,
+        'spikes': int(np.count_nonzero(flags & FLAG_SPIKE)),
+        'repaired': flagged,
+        'good_fraction': 1.0 - flagged / n if n else 1.0,
+        'seconds': seconds,
+    }
+
+
+def clean_log(log, columns, roles=None, **settings):
+    """
+    Clean a LogData's channels in place (as derived channels)
+
+    columns maps roles to channel names; every role with a channel is
+    cleaned unless roles limits the set (time is never cleaned). settings
+    are passed to clean_channel. Returns the quality report, also kept as
+    log.quality: one channel_report dict per cleaned channel, plus its
+    per-sample FLAG_* array under 'flags'.
+    """
+    roles = [role for role in (roles or columns) if role != 'time']
+    time_base = log.time
+    report = []
+    for role in roles:
+        col = columns.get(role)
+        if not col or col not in log:
+            continue
+        start = time.perf_counter()
+        cleaned, flags = clean_channel(log.raw(col), role, time_base, **settings)
+        elapsed = time.perf_counter() - start
+        log.define(col, lambda log, cleaned=cleaned: cleaned)
+        report.append(dict(channel_report(col, role, flags, elapsed), flags=flags))
+    log.quality = report
+    return report
+
+
+def format_report(report):
+    """The quality report as a text table"""
+    lines = [f"{'channel':<20} {'role':<5} {'samples':>9} {'missing':>8} {'range':>7} "
+             f"{'stuck':>7} {'runs':>5} {'spikes':>7} {'good':>7} {'Msamp/s':>8}"]
+    for row in report:
+        rate = row['samples'] / row['seconds'] / 1e6 if row['seconds'] else float('nan')
+        lines.append(f"{row['channel'][:20]:<20} {row['role']:<5} {row['samples']:>9} "
+                     f"{row['missing']:>8} {row['out_of_range']:>7} {row['stuck']:>7} "
+                     f"{row['stuck_runs']:>5} {row['spikes']:>7} "
+                     f"{row['good_fraction']:>6.1%} {rate:>8.1f}")
+    return '\n'.join(lines)
@@ -0,0 +1,713 @@
+#!/usr/bin/env python3
+"""
+Command line interface for the AE Analyzer
+Runs detection and exports without the Tk GUI
+
+Usage:
+    python ae_cli.py export log.csv -o report.pdf
+    python ae_cli.py export log.csv -o report.html --workers 8
+    python ae_cli.py segments log.csv --max-gap 0.5
+    python ae_cli.py quality log.csv
+    python ae_cli.py afrmap log.csv --target 14.7 --load map -o afrmap.png
+    python ae_cli.py aefuel log.csv --flow 4.2 --table aefuel.csv -o aefuel.png
+    python ae_cli.py resample log.csv --rate 100 -o uniform.csv
+    python ae_cli.py run pipeline.toml --set triggers.threshold=20
+    python ae_cli.py catalog scan /mnt/logs --db logs.sqlite
+    python ae_cli.py catalog query --db logs.sqlite -w "max_tps_dot > 200" -w "rpm < 3000"
+    python ae_cli.py catalog similar --db logs.sqlite /mnt/logs/run1.csv --event 4
+    python ae_cli.py serve --port 8765 --workers 4
+    python ae_cli.py ingest /mnt/drop -o /mnt/results --workers 2
+    python ae_cli.py convert run1.mlg run2.mlg --workers 2
+    python ae_cli.py archive import run1.csv run2.mlg --codec lzma
+    python ae_cli.py archive window run1.aelog --start 120 --end 180 -o pull.csv
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+from ae_io import read_log, CSV_ENGINES
+from ae_core import (guess_columns, analyze_log, LogData, COLUMN_PATTERNS,
+                     CONTEXT_SECONDS, MAX_GAP_SECONDS, STOICH_AFR)
+
+
+def add_log_arguments(parser):
+    """Arguments shared by every command that loads and analyzes a log"""
+    parser.add_argument('log', help="log file (CSV, MLG or .aelog archive)")
+    parser.add_argument('--engine', choices=CSV_ENGINES, default='auto',
+                        help="CSV ingestion engine (default: auto)")
+    for role in COLUMN_PATTERNS:
+        parser.add_argument(f'--{role}', dest=f'{role}_col', default=None,
+                            help=f"{role.upper()} column (default: auto-detect)")
+    parser.add_argument('--threshold', type=float, default=10.0,
+                        help="TPS rate threshold in %%/s (default: 10)")
+    parser.add_argument('--duration', type=float, default=0.1,
+                        help="minimum event duration in seconds (default: 0.1)")
+    parser.add_argument('--context', type=float, default=CONTEXT_SECONDS,
+                        help=f"seconds of context around each event (default: {CONTEXT_SECONDS})")
+    parser.add_argument('--max-gap', type=float, default=MAX_GAP_SECONDS,
+                        help=f"time step in seconds that splits the log (default: {MAX_GAP_SECONDS})")
+    parser.add_argument('--jobs', type=int, default=1,
+                        help="processes for per-segment detection (default: 1)")
+    parser.add_argument('--clean', action='store_true',
+                        help="repair dropouts, out-of-range values, stuck sensors and "
+                             "spikes before detection")
+
+
+def load_and_detect(args):
+    """Load the log named in args and detect AE events in it"""
+    data = read_log(args.log, engine=args.engine)
+
+    columns = guess_columns(data.columns)
+    for role in columns:
+        override = getattr(args, f'{role}_col')
+        if override:
+            columns[role] = override
+    if not columns['time'] or not columns['tps']:
+        raise SystemExit("error: could not find Time and TPS columns, use --time/--tps")
+
+    log = LogData(data, columns['time'])
+    if args.clean:
+        from ae_clean import clean_log
+        clean_log(log, columns)
+    segments, events = analyze_log(log, columns['tps'], args.threshold, args.duration,
+                                   context_s=args.context, max_gap=args.max_gap,
+                                   workers=args.jobs)
+    return log, columns, segments, events
+
+
+def cmd_export(args):
+    """Render every detected event to a PDF or HTML report"""
+    from ae_render import export_report
+
+    data, columns, segments, events = load_and_detect(args)
+    print(f"{os.path.basename(args.log)}: {len(data)} rows, {len(events)} AE events")
+    if not events:
+        return 0
+
+    def progress(done, total):
+        print(f"\r  rendered {done}/{total}", end='', flush=True)
+
+    start = time.perf_counter()
+    export_report(data, events, columns, args.threshold, args.output,
+                  workers=args.workers, progress=progress)
+    print(f"\n  wrote {args.output} in {time.perf_counter() - start:.1f} s")
+    return 0
+
+
+def cmd_segments(args):
+    """Print the table of continuous log segments"""
+    data, columns, segments, events = load_and_detect(args)
+    counts = events.segment_counts(len(segments))
+
+    print(f"{os.path.basename(args.log)}: {len(data)} rows, "
+          f"{len(segments)} segment(s), {len(events)} AE events")
+    print(f"{'#':>4} {'start (s)':>12} {'end (s)':>12} {'samples':>9} {'starts at':>10} {'events':>7}")
+    for i, (seg, count) in enumerate(zip(segments, counts)):
+        print(f"{i + 1:>4} {seg['t_start']:>12.3f} {seg['t_end']:>12.3f} "
+              f"{seg['stop'] - seg['start']:>9} {seg['reason']:>10} {count:>7}")
+    return 0
+
+
+def cmd_afrmap(args):
+    """Print (and optionally plot) AFR error over RPM x load during AE"""
+    import csv
+    from ae_heatmap import AFRHeatmap
+
+    log, columns, segments, events = load_and_detect(args)
+    try:
+        target = float(args.target)
+    except ValueError:
+        target = args.target  # an AFR target channel
+    try:
+        heatmap = AFRHeatmap.from_log(log, events, columns, target=target, load=args.load,
+                                      window=args.window)
+    except ValueError as e:
+        raise SystemExit(f"error: {e}")
+
+    cells = sorted(heatmap.cells(), key=lambda cell: -abs(cell['mean_error']))
+    cells = [cell for cell in cells if cell['samples'] >= args.min_samples]
+    print(f"{os.path.basename(args.log)}: {len(events)} AE events, {heatmap.samples} samples "
+          f"in {len(cells)} cell(s), target {heatmap.describe_target()}")
+    print(f"{'rpm':>11} {args.load + ' load':>11} {'samples':>8} {'events':>7} "
+          f"{'AFR error':>10} {'std':>6}")
+    for cell in cells[:args.limit]:
+        print(f"{cell['rpm_lo']:>5.0f}-{cell['rpm_hi']:<5.0f} "
+              f"{cell['load_lo']:>5.0f}-{cell['load_hi']:<5.0f} {cell['samples']:>8} "
+              f"{cell['events']:>7} {cell['mean_error']:>+10.2f} {cell['std_error']:>6.2f}")
+
+    if args.cells:
+        with open(args.cells, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=list(cells[0]) if cells else ['samples'])
+            writer.writeheader()
+            writer.writerows(cells)
+        print(f"  wrote {args.cells}")
+    if args.output:
+        from matplotlib.figure import Figure
+        from ae_heatmap import draw_heatmap
+        fig = Figure(figsize=(10, 6))
+        draw_heatmap(fig, heatmap)
+        fig.savefig(args.output, dpi=100)
+        print(f"  wrote {args.output}")
+    return 0
+
+
+def cmd_aefuel(args):
+    """Print (and optionally plot) the fuel each AE event added over the baseline"""
+    from ae_fuel import AEFuel
+
+    log, columns, segments, events = load_and_detect(args)
+    try:
+        fuel = AEFuel.from_log(log, events, columns, load=args.load, window=args.window,
+                               squirts=args.squirts, flow=args.flow, max_gap=args.max_gap)
+    except ValueError as e:
+        raise SystemExit(f"error: {e}")
+
+    print(f"{os.path.basename(args.log)}: {len(events)} AE events, {fuel.describe_model()}")
+    print(f"{'event':>6} {'t (s)':>10} {'TPS_dot':>9} {'base PW':>8} {'added':>7} "
+          f"{'peak':>7} {'added %':>8} {'open ms':>8} {'fuel mg':>8}")
+    for row in fuel.table()[:args.limit]:
+        print(f"{row['event']:>6} {row['t_start']:>10.2f} {row['max_tps_dot']:>9.1f} "
+              f"{row['baseline_pw']:>8.2f} {row['added_pw']:>+7.2f} "
+              f"{row['added_pw_peak']:>+7.2f} {row['added_pct']:>+8.1f} "
+              f"{row['added_open_ms']:>8.1f} {row['added_fuel_mg']:>8.1f}")
+
+    if args.table:
+        fuel.to_csv(args.table)
+        print(f"  wrote {args.table}")
+    if args.output:
+        from matplotlib.figure import Figure
+        from ae_fuel import draw_fuel
+        fig = Figure(figsize=(10, 8))
+        draw_fuel(fig, fuel)
+        fig.savefig(args.output, dpi=100)
+        print(f"  wrote {args.output}")
+    return 0
+
+
+def cmd_quality(args):
+    """Print the per-channel sensor quality report"""
+    from ae_clean import format_report
+
+    args.clean = True
+    log, columns, segments, events = load_and_detect(args)
+    print(f"{os.path.basename(args.log)}: {len(log)} rows, {len(events)} AE events "
+          f"after cleaning")
+    print(format_report(log.quality))
+    return 0
+
+
+def pipeline_for(args, **sections):
+    """A Pipeline running the log-command arguments in args, plus extra sections"""
+    from ae_pipeline import Pipeline
+
+    config = {
+        'source': {'path': args.log, 'engine': args.engine},
+        'channels': {role: getattr(args, f'{role}_col') for role in COLUMN_PATTERNS},
+        'clean': {'enabled': args.clean},
+        'derivative': {'max_gap': args.max_gap},
+        'triggers': {'threshold': args.threshold, 'duration': args.duration,
+                     'context': args.context, 'workers': args.jobs},
+    }
+    config.update(sections)
+    return Pipeline(config)
+
+
+def cmd_resample(args):
+    """Write the log's channels on a uniform time grid to CSV"""
+    pipeline = pipeline_for(args, features={'enabled': False},
+                            resample={'enabled': True, 'rate': args.rate,
+                                      'channels': args.channels, 'hold': args.hold})
+    try:
+        results = pipeline.run('resample')
+    except (OSError, ValueError) as e:
+        raise SystemExit(f"error: {e}")
+    elapsed = pipeline.timings['resample']
+    resampler, frame = results['resample']
+    print(f"{os.path.basename(args.log)}: {len(results['source'])} rows -> {len(resampler)} "
+          f"points at {resampler.rate:g} Hz in {len(resampler.segments)} segment(s), "
+          f"{len(frame.columns) - 2} channel(s) in {elapsed:.2f} s")
+    for event in resampler.events_to_grid(results['triggers'])[:args.limit]:
+        print(f"  event at {resampler.time[event['event_start']]:.3f} s: grid points "
+              f"{event['event_start']}-{event['event_end']}")
+    if args.output:
+        frame.to_csv(args.output, index=False)
+        print(f"  wrote {args.output}")
+    return 0
+
+
+def parse_setting(text):
+    """'section.key=value' from --set, the value read as JSON where possible"""
+    name, sep, value = text.partition('=')
+    section, dot, key = name.partition('.')
+    if not sep or not dot:
+        raise SystemExit(f"error: --set expects section.key=value, got '{text}'")
+    try:
+        value = json.loads(value)
+    except ValueError:
+        pass  # a bare string such as a channel name
+    return section, key, value
+
+
+def cmd_run(args):
+    """Run a declarative pipeline config (see ae_pipeline.py)"""
+    from ae_pipeline import Pipeline, load_config, dump_config, summarize_run
+
+    try:
+        pipeline = Pipeline(load_config(args.config))
+        for text in args.set:
+            section, key, value = parse_setting(text)
+            pipeline.update(**{section: {key: value}})
+        if args.source:
+            pipeline.update(source={'path': args.source})
+    except (OSError, ValueError) as e:
+        raise SystemExit(f"error: {e}")
+    if args.dump:
+        print(dump_config(pipeline.config))
+        return 0
+
+    rendered = []
+
+    def progress(path, done, total):
+        rendered.append(path)
+        print(f"\r  {os.path.basename(path)}: rendered {done}/{total}", end='', flush=True)
+
+    pipeline.progress = progress
+    try:
+        results = pipeline.run(args.until)
+    except (OSError, ValueError) as e:
+        raise SystemExit(f"error: {e}")
+    if rendered:
+        print()
+    print(f"{os.path.basename(pipeline.config['source']['path'])}: pipeline up to {args.until}")
+    print(summarize_run(pipeline, results))
+    return 0
+
+
+def cmd_catalog_scan(args):
+    """Catalog every new or changed log under a directory"""
+    from ae_catalog import open_catalog, scan_directory, catalog_summary
+
+    def progress(done, total, path):
+        print(f"\r  cataloged {done}/{total}", end='', flush=True)
+
+    start = time.perf_counter()
+    conn = open_catalog(args.db)
+    try:
+        result = scan_directory(conn, args.root, workers=args.workers, engine=args.engine,
+                                progress=progress, threshold=args.threshold,
+                                duration=args.duration, context=args.context,
+                                max_gap=args.max_gap)
+        totals = catalog_summary(conn)
+    finally:
+        conn.close()
+    if result['scanned']:
+        print()
+    print(f"{result['found']} logs found, {result['scanned']} scanned "
+          f"({result['failed']} unreadable), {result['removed']} removed "
+          f"in {time.perf_counter() - start:.1f} s")
+    print(f"{args.db}: {totals['logs']} logs, {totals['events']} events")
+    return 0
+
+
+def cmd_catalog_query(args):
+    """Print the cataloged events matching every --where condition"""
+    from ae_catalog import open_catalog, query_events, parse_condition
+
+    start = time.perf_counter()
+    conn = open_catalog(args.db)
+    try:
+        conditions = [parse_condition(text) for text in args.where]
+        rows = query_events(conn, conditions, channel=args.channel, order_by=args.order,
+                            descending=not args.ascending, limit=args.limit)
+    except ValueError as e:
+        raise SystemExit(f"error: {e}")
+    finally:
+        conn.close()
+    elapsed = time.perf_counter() - start
+
+    # Event number and onset time locate each match in its original log
+    print(f"{'event':>6} {'t (s)':>10} {'TPS_dot':>9} {'dur (s)':>8} {'RPM':>7} "
+          f"{'CLT':>6}  log")
+    for row in rows:
+        rpm = '' if row['rpm'] is None else f"{row['rpm']:.0f}"
+        clt = '' if row['clt'] is None else f"{row['clt']:.0f}"
+        print(f"{row['idx'] + 1:>6} {row['t_start']:>10.2f} {row['max_tps_dot']:>9.1f} "
+              f"{row['duration']:>8.2f} {rpm:>7} {clt:>6}  {row['path']}")
+    print(f"{len(rows)} event(s) in {elapsed * 1000:.1f} ms")
+    return 0
+
+
+def cmd_catalog_similar(args):
+    """Print the cataloged events that look most like one event"""
+    from ae_catalog import (open_catalog, event_key, stored_vector, similar_events,
+                            build_similarity_index)
+
+    conn = open_catalog(args.db)
+    try:
+        key = event_key(conn, args.log, args.event - 1)
+        if key is None:
+            raise SystemExit(f"error: event {args.event} of {args.log} is not in {args.db}")
+
+        start = time.perf_counter()
+        index = build_similarity_index(conn)
+        built = time.perf_counter() - start
+        start = time.perf_counter()
+        rows = similar_events(conn, stored_vector(conn, key), k=args.k, index=index,
+                              exclude=[key])
+        searched = time.perf_counter() - start
+    finally:
+        conn.close()
+
+    print(f"{'event':>6} {'t (s)':>10} {'TPS_dot':>9} {'AFR max':>8} {'distance':>9}  log")
+    for row in rows:
+        afr = '' if row['afr_max'] is None else f"{row['afr_max']:.1f}"
+        print(f"{row['idx'] + 1:>6} {row['t_start']:>10.2f} {row['max_tps_dot']:>9.1f} "
+              f"{afr:>8} {row['distance']:>9.2f}  {row['path']}")
+    print(f"{len(rows)} similar event(s): index of {len(index)} built in "
+          f"{built * 1000:.0f} ms, searched in {searched * 1000:.1f} ms")
+    return 0
+
+
+def cmd_serve(args):
+    """Run the local HTTP/JSON service"""
+    from ae_service import serve
+
+    serve(args.host, args.port, workers=args.workers, cache_size=args.cache)
+    return 0
+
+
+def cmd_ingest(args):
+    """Watch a drop folder and ingest every log that lands in it"""
+    from ae_ingest import IngestDaemon, format_metrics
+    from ae_pipeline import load_config
+
+    try:
+        config = load_config(args.config) if args.config else None
+        daemon = IngestDaemon(args.drop, args.output, workers=args.workers, config=config,
+                              poll_s=args.poll, settle_s=args.settle)
+    except (OSError, ValueError) as e:
+        raise SystemExit(f"error: {e}")
+    print(f"Watching {daemon.drop_dir} -> {daemon.out_dir} ({args.workers} workers, "
+          f"metrics in {os.path.join(daemon.out_dir, 'metrics.json')}) - Ctrl+C to stop")
+
+    last = [None]
+
+    def report(metrics):
+        line = format_metrics(metrics)
+        if line != last[0]:
+            print(f"[{time.strftime('%H:%M:%S')}] {line}", flush=True)
+            last[0] = line
+
+    try:
+        daemon.run(until_idle=args.once, report=report)
+    except KeyboardInterrupt:
+        print("stopped; unfinished logs are picked up on the next start")
+    return 0
+
+
+def cmd_convert(args):
+    """Convert MLG logs into the conversion cache, several at once"""
+    from ae_convert import MLGConverter, MLGCache, CACHE_DIR
+
+    cache = MLGCache(args.cache or CACHE_DIR)
+    if args.clear:
+        cache.clear()
+        print(f"Cleared {cache.cache_dir}")
+    converter = MLGConverter(cache, workers=args.workers)
+    jobs = [converter.submit(path, timeout=args.timeout) for path in args.logs]
+    failed = 0
+    try:
+        while any(job.active for job in jobs):
+            line = '; '.join(f"{job.name}: {job.describe()}" for job in jobs if job.active)
+            print(f"\r  {line[:100]:<100}", end='', flush=True)
+            time.sleep(0.2)
+    except KeyboardInterrupt:
+        print("\ncancelling...")
+        converter.shutdown(cancel=True)
+    else:
+        converter.shutdown(cancel=False)
+    if jobs:
+        print()
+    for job in jobs:
+        if job.status == 'done':
+            print(f"{job.path} -> {job.csv} ({job.finished - job.started:.1f} s)")
+        else:
+            failed += 1
+            print(f"{job.path}: {job.describe()}")
+    stats = cache.stats()
+    print(f"{cache.cache_dir}: {stats['logs']} converted log(s), "
+          f"{stats['bytes'] / 1e6:.1f} MB, {stats['hits']} found in the cache, "
+          f"{stats['misses']} conversion(s) run")
+    return 1 if failed else 0
+
+
+def cmd_archive_import(args):
+    """Convert CSV/MLG logs to compressed .aelog archives"""
+    from ae_archive import import_log
+
+    for path in args.logs:
+        output = None
+        if args.output:
+            os.makedirs(args.output, exist_ok=True)
+            name = os.path.splitext(os.path.basename(path))[0] + '.aelog'
+            output = os.path.join(args.output, name)
+        start = time.perf_counter()
+        try:
+            output, index = import_log(path, output, engine=args.engine, codec=args.codec,
+                                       level=args.level)
+        except (OSError, ValueError, ImportError) as e:
+            raise SystemExit(f"error: {path}: {e}")
+        before, after = os.path.getsize(path), os.path.getsize(output)
+        print(f"{output}: {index['rows']} rows, {len(index['columns'])} channels, "
+              f"{before / 1e6:.1f} MB -> {after / 1e6:.1f} MB ({before / max(after, 1):.1f}x, "
+              f"{index['codec']}) in {time.perf_counter() - start:.1f} s")
+    return 0
+
+
+def cmd_archive_info(args):
+    """Describe an archive from its index"""
+    from ae_archive import ArchiveReader
+
+    info = ArchiveReader(args.archive).info()
+    print(f"{info['path']}: {info['rows']} rows, {info['channels']} channels in "
+          f"{info['chunks']} chunks, {info['codec']}, {info['bytes'] / 1e6:.2f} MB")
+    if info['source']:
+        print(f"  imported from {info['source']}")
+    if info['t_start'] is not None:
+        print(f"  {info['time_col']}: {info['t_start']:.2f} to {info['t_end']:.2f} s")
+    return 0
+
+
+def cmd_archive_window(args):
+    """Decode the rows of one time window"""
+    from ae_archive import ArchiveReader
+
+    reader = ArchiveReader(args.archive)
+    start = time.perf_counter()
+    try:
+        frame = reader.read_window(args.start, args.end, args.channels)
+    except (KeyError, ValueError) as e:
+        raise SystemExit(f"error: {e}")
+    elapsed = time.perf_counter() - start
+    chunks = len(reader.chunks_for(args.start, args.end))
+    print(f"{len(frame)} rows from {chunks} of {len(reader.chunks)} chunks "
+          f"in {elapsed * 1000:.1f} ms")
+    if args.output:
+        frame.to_csv(args.output, index=False)
+        print(f"Wrote {args.output}")
+    return 0
+
+
+def build_parser():
+    """Create the argument parser with one sub-command per tool"""
+    parser = argparse.ArgumentParser(description="AE Event Analyzer (headless)")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    export = commands.add_parser('export', help="render every event to PDF/HTML")
+    add_log_arguments(export)
+    export.add_argument('-o', '--output', required=True,
+                        help="report file (.pdf or .html)")
+    export.add_argument('--workers', type=int, default=None,
+                        help="render processes (default: all cores)")
+    export.set_defaults(func=cmd_export)
+
+    segments = commands.add_parser('segments', help="list time resets and gaps in a log")
+    add_log_arguments(segments)
+    segments.set_defaults(func=cmd_segments)
+
+    quality = commands.add_parser('quality', help="report dropouts, stuck sensors and spikes")
+    add_log_arguments(quality)
+    quality.set_defaults(func=cmd_quality)
+
+    from ae_heatmap import AE_WINDOWS, LOAD_EDGES
+    afrmap = commands.add_parser('afrmap', help="AFR error over RPM x load during AE events")
+    add_log_arguments(afrmap)
+    afrmap.add_argument('--target', default=str(STOICH_AFR),
+                        help=f"AFR target: a number or a target channel (default: {STOICH_AFR})")
+    afrmap.add_argument('--load', choices=list(LOAD_EDGES), default='map',
+                        help="load axis (default: map)")
+    afrmap.add_argument('--window', choices=list(AE_WINDOWS), default='after',
+                        help="event samples binned: the threshold run, onset to end of "
+                             "context, or the whole plot window (default: after)")
+    afrmap.add_argument('--min-samples', type=int, default=1,
+                        help="hide cells with fewer samples (default: 1)")
+    afrmap.add_argument('--limit', type=int, default=20,
+                        help="cells listed, largest error first (default: 20)")
+    afrmap.add_argument('--cells', metavar='CSV', help="write every cell to a CSV file")
+    afrmap.add_argument('-o', '--output', help="save the heatmap image (e.g. .png)")
+    afrmap.set_defaults(func=cmd_afrmap)
+
+    aefuel = commands.add_parser('aefuel', help="fuel each AE event added over a fitted "
+                                                 "baseline PW")
+    add_log_arguments(aefuel)
+    aefuel.add_argument('--load', choices=list(LOAD_EDGES), default='map',
+                        help="load channel of the baseline model (default: map)")
+    aefuel.add_argument('--window', choices=list(AE_WINDOWS), default='after',
+                        help="event samples measured (default: after)")
+    aefuel.add_argument('--squirts', type=int, default=1,
+                        help="injections per injector per engine cycle (default: 1)")
+    aefuel.add_argument('--flow', type=float, default=None,
+                        help="mg of fuel per ms of PW per squirt, over the injectors that "
+                             "fire together (gives added fuel mass)")
+    aefuel.add_argument('--limit', type=int, default=20,
+                        help="events listed (default: 20)")
+    aefuel.add_argument('--table', metavar='CSV', help="write the per-event table to CSV")
+    aefuel.add_argument('-o', '--output', help="save the plot image (e.g. .png)")
+    aefuel.set_defaults(func=cmd_aefuel)
+
+    resample = commands.add_parser('resample', help="put channels on a uniform time grid")
+    add_log_arguments(resample)
+    resample.add_argument('--rate', type=float, default=None,
+                          help="grid rate in Hz (default: the log's median sample rate)")
+    resample.add_argument('--channels', nargs='+', default=None,
+                          help="channels to resample (default: the detected columns)")
+    resample.add_argument('--hold', nargs='+', default=[],
+                          help="channels resampled by zero-order hold instead of "
+                               "linear interpolation (e.g. status bits)")
+    resample.add_argument('--limit', type=int, default=10,
+                          help="events listed with their grid points (default: 10)")
+    resample.add_argument('-o', '--output', help="write the grid and channels to CSV, with "
+                                                 "each point's raw row in raw_index")
+    resample.set_defaults(func=cmd_resample)
+
+    from ae_pipeline import STAGES
+    run = commands.add_parser('run', help="run a TOML/YAML/JSON pipeline config")
+    run.add_argument('config', help="pipeline config file")
+    run.add_argument('--source', help="log file, replacing [source] path")
+    run.add_argument('--set', action='append', default=[], metavar='SECTION.KEY=VALUE',
+                     help="override one setting, e.g. triggers.threshold=20 (repeatable)")
+    run.add_argument('--until', choices=list(STAGES), default='exports',
+                     help="last stage to run (default: exports)")
+    run.add_argument('--dump', action='store_true',
+                     help="print the complete config as TOML and exit")
+    run.set_defaults(func=cmd_run)
+
+    catalog = commands.add_parser('catalog', help="index a log library in SQLite and search it")
+    catalog_commands = catalog.add_subparsers(dest='catalog_command', required=True)
+
+    scan = catalog_commands.add_parser('scan', help="catalog new and changed logs under a directory")
+    scan.add_argument('root', help="directory searched recursively for CSV logs")
+    scan.add_argument('--db', required=True, help="catalog database file")
+    scan.add_argument('--engine', choices=CSV_ENGINES, default='auto',
+                      help="CSV ingestion engine (default: auto)")
+    scan.add_argument('--threshold', type=float, default=10.0,
+                      help="TPS rate threshold in %%/s (default: 10)")
+    scan.add_argument('--duration', type=float, default=0.1,
+                      help="minimum event duration in seconds (default: 0.1)")
+    scan.add_argument('--context', type=float, default=CONTEXT_SECONDS,
+                      help=f"seconds of context around each event (default: {CONTEXT_SECONDS})")
+    scan.add_argument('--max-gap', type=float, default=MAX_GAP_SECONDS,
+                      help=f"time step in seconds that splits a log (default: {MAX_GAP_SECONDS})")
+    scan.add_argument('--workers', type=int, default=None,
+                      help="processes reading logs (default: all cores)")
+    scan.set_defaults(func=cmd_catalog_scan)
+
+    query = catalog_commands.add_parser('query', help="find cataloged events")
+    query.add_argument('--db', required=True, help="catalog database file")
+    query.add_argument('-w', '--where', action='append', default=[],
+                       help="condition such as 'rpm < 3000' (repeatable, all must hold)")
+    query.add_argument('--channel', default=None,
+                       help="only logs that recorded this channel")
+    query.add_argument('--order', default='max_tps_dot',
+                       help="event field to sort by (default: max_tps_dot)")
+    query.add_argument('--ascending', action='store_true',
+                       help="sort smallest first")
+    query.add_argument('--limit', type=int, default=50,
+                       help="maximum events shown (default: 50)")
+    query.set_defaults(func=cmd_catalog_query)
+
+    similar = catalog_commands.add_parser('similar', help="find events that look like one event")
+    similar.add_argument('log', help="cataloged log containing the reference event")
+    similar.add_argument('--db', required=True, help="catalog database file")
+    similar.add_argument('--event', type=int, required=True,
+                         help="reference event number (as listed by 'catalog query')")
+    similar.add_argument('-k', type=int, default=10,
+                         help="number of similar events shown (default: 10)")
+    similar.set_defaults(func=cmd_catalog_similar)
+
+    from ae_service import DEFAULT_HOST, DEFAULT_PORT, LOG_CACHE_SIZE
+    serve = commands.add_parser('serve', help="run the local HTTP/JSON job service")
+    serve.add_argument('--host', default=DEFAULT_HOST,
+                       help=f"interface to listen on (default: {DEFAULT_HOST})")
+    serve.add_argument('--port', type=int, default=DEFAULT_PORT,
+                       help=f"TCP port (default: {DEFAULT_PORT})")
+    serve.add_argument('--workers', type=int, default=4,
+                       help="jobs run at once (default: 4)")
+    serve.add_argument('--cache', type=int, default=LOG_CACHE_SIZE,
+                       help=f"parsed logs kept in memory (default: {LOG_CACHE_SIZE})")
+    serve.set_defaults(func=cmd_serve)
+
+    from ae_ingest import POLL_SECONDS, SETTLE_SECONDS
+    ingest = commands.add_parser('ingest', help="watch a drop folder and ingest new logs")
+    ingest.add_argument('drop', help="folder polled (recursively) for CSV logs")
+    ingest.add_argument('-o', '--output', required=True,
+                        help="results folder (per-log results, ledger and metrics.json)")
+    ingest.add_argument('--config', help="pipeline config with the detection settings")
+    ingest.add_argument('--workers', type=int, default=2,
+                        help="logs processed at once (default: 2)")
+    ingest.add_argument('--poll', type=float, default=POLL_SECONDS,
+                        help=f"seconds between folder scans (default: {POLL_SECONDS:g})")
+    ingest.add_argument('--settle', type=float, default=SETTLE_SECONDS,
+                        help="seconds a file's size must stay unchanged before it is "
+                             f"processed (default: {SETTLE_SECONDS:g})")
+    ingest.add_argument('--once', action='store_true',
+                        help="exit once every complete log has been processed")
+    ingest.set_defaults(func=cmd_ingest)
+
+    convert = commands.add_parser('convert', help="convert MLG logs into the conversion cache")
+    convert.add_argument('logs', nargs='*', help="MLG log files")
+    convert.add_argument('--workers', type=int, default=2,
+                         help="conversions run at once (default: 2)")
+    convert.add_argument('--timeout', type=float, default=None,
+                         help="seconds per conversion (default: scaled to the file size)")
+    convert.add_argument('--cache', default=None,
+                         help="cache folder (default: ~/.cache/ae_analyzer/mlg or "
+                              "$AE_MLG_CACHE)")
+    convert.add_argument('--clear', action='store_true',
+                         help="empty the cache first")
+    convert.set_defaults(func=cmd_convert)
+
+    from ae_archive import CODECS, DEFAULT_CODEC
+    archive = commands.add_parser('archive', help="compressed columnar .aelog archives")
+    archive_commands = archive.add_subparsers(dest='archive_command', required=True)
+
+    archive_import = archive_commands.add_parser('import', help="convert CSV/MLG logs")
+    archive_import.add_argument('logs', nargs='+', help="CSV or MLG log files")
+    archive_import.add_argument('-o', '--output',
+                                help="folder for the archives (default: next to each log)")
+    archive_import.add_argument('--codec', choices=CODECS, default=DEFAULT_CODEC,
+                                help=f"compression (default: {DEFAULT_CODEC}; "
+                                     "zstd needs zstandard)")
+    archive_import.add_argument('--level', type=int, default=None,
+                                help="compression level (default: the codec's default)")
+    archive_import.add_argument('--engine', choices=CSV_ENGINES, default='auto',
+                                help="CSV ingestion engine (default: auto)")
+    archive_import.set_defaults(func=cmd_archive_import)
+
+    archive_info = archive_commands.add_parser('info', help="describe an archive")
+    archive_info.add_argument('archive', help=".aelog file")
+    archive_info.set_defaults(func=cmd_archive_info)
+
+    window = archive_commands.add_parser('window', help="extract a time window")
+    window.add_argument('archive', help=".aelog file")
+    window.add_argument('--start', type=float, required=True, help="window start (s)")
+    window.add_argument('--end', type=float, required=True, help="window end (s)")
+    window.add_argument('--channels', nargs='+', default=None,
+                        help="channels extracted (default: all)")
+    window.add_argument('-o', '--output', help="write the rows to CSV")
+    window.set_defaults(func=cmd_archive_window)
+
+    return parser
+
+
+def main(argv=None):
+    """Main entry point"""
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,394 @@
+#!/usr/bin/env python3
+"""
+Cached, asynchronous MLG to CSV conversion for the AE Analyzer
+MLG logs are converted by mlg-converter (Node.js). Conversions run in the
+background, several at once, with progress, cancellation and a timeout
+that grows with the file size; each result is stored in a conversion cache
+keyed by the SHA-256 of the MLG's content, so a log is converted once no
+matter where it is opened from, and nothing is written next to the source
+
+    converter = MLGConverter(workers=2)
+    job = converter.submit('run1.mlg')
+    job.describe()        # 'hashing 40%', 'converting, 3.1 MB written', ...
+    job.cancel()
+    job.result()          # CSV path in the cache (raises if it failed)
+
+A small index maps (path, size, modification time) to the content hash, so
+reopening an unchanged MLG finds its CSV without reading the file again.
+"""
+
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as WaitTimeout
+import hashlib
+import json
+import os
+import shutil
+import signal
+import subprocess
+import tempfile
+import threading
+import time
+
+
+CONVERTER = ('npx', 'mlg-converter', '--format=csv')
+
+# Cache location; AE_MLG_CACHE overrides it
+CACHE_DIR = os.environ.get('AE_MLG_CACHE') or os.path.join(
+    os.path.expanduser('~'), '.cache', 'ae_analyzer', 'mlg')
+INDEX_FILE = 'index.json'
+
+# Conversion timeout: a fixed allowance plus this much per MB of MLG
+BASE_TIMEOUT_SECONDS = 30
+TIMEOUT_SECONDS_PER_MB = 5
+
+HASH_BLOCK = 1 << 20
+POLL_SECONDS = 0.1
+MB = 1 << 20
+
+# Job states, in the order a job moves through them
+JOB_STATES = ('queued', 'hashing', 'converting', 'done', 'failed', 'cancelled')
+
+
+class ConversionCancelled(Exception):
+    """A conversion was cancelled before it finished"""
+
+
+def conversion_timeout(size):
+    """Seconds a conversion of size bytes may take before it is killed"""
+    return BASE_TIMEOUT_SECONDS + TIMEOUT_SECONDS_PER_MB * size / MB
+
+
+def content_hash(path, progress=None, cancel=None):
+    """
+    SHA-256 of a file's content, read in blocks
+
+    progress(done, total) is called after each block; a set cancel Event
+    stops the read with ConversionCancelled.
+    """
+    total = os.path.getsize(path)
+    digest = hashlib.sha256()
+    done = 0
+    with open(path, 'rb') as f:
+        while True:
+            if cancel is not None and cancel.is_set():
+                raise ConversionCancelled(path)
+            block = f.read(HASH_BLOCK)
+            if not block:
+                break
+            digest.update(block)
+            done += len(block)
+            if progress:
+                progress(done, total)
+    return digest.hexdigest()
+
+
+def _terminate(proc):
+    """Kill the converter and everything it started (npx runs node as a child)"""
+    try:
+        if os.name == 'posix':
+            os.killpg(proc.pid, signal.SIGKILL)
+        else:
+            proc.kill()
+    except OSError:
+        pass
+    proc.wait()
+
+
+class MLGCache:
+    """
+    Content-addressed store of converted MLG logs
+
+    convert() returns the cached CSV of an MLG, converting it first if
+    needed. Threads converting the same content share one conversion.
+    command is the converter, run as command + [mlg path].
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, command=CONVERTER):
+        self.cache_dir = cache_dir
+        self.command = list(command)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._running = {}  # content hash -> Future of its CSV path
+        os.makedirs(cache_dir, exist_ok=True)
+        self._index = self._load_index()
+
+    def _load_index(self):
+        try:
+            with open(os.path.join(self.cache_dir, INDEX_FILE)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_index(self):
+        """Write the index atomically (lock must be held)"""
+        path = os.path.join(self.cache_dir, INDEX_FILE)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump(self._index, f)
+        os.replace(tmp, path)
+
+    @staticmethod
+    def _stat_key(path):
+        stat = os.stat(path)
+        return f"{os.path.abspath(path)}|{stat.st_size}|{stat.st_mtime_ns}"
+
+    def csv_path(self, digest):
+        return os.path.join(self.cache_dir, digest + '.csv')
+
+    def cached(self, path):
+        """The cached CSV of an unchanged, already converted MLG, or None (never hashes)"""
+        with self._lock:
+            digest = self._index.get(self._stat_key(path))
+        if digest and os.path.exists(self.csv_path(digest)):
+            return self.csv_path(digest)
+        return None
+
+    def digest(self, path, progress=None, cancel=None):
+        """Content hash of an MLG, from the index when the file is unchanged"""
+        key = self._stat_key(path)
+        with self._lock:
+            digest = self._index.get(key)
+        if digest is None:
+            digest = content_hash(path, progress, cancel)
+            with self._lock:
+                self._index[key] = digest
+                self._save_index()
+        return digest
+
+    def convert(self, path, progress=None, cancel=None, timeout=None):
+        """
+        CSV path of an MLG log, converting it unless its content is cached
+
+        progress(phase, done, total) reports 'hashing' (bytes read of the
+        MLG) and 'converting' (CSV bytes written so far, total None).
+        Raises ConversionCancelled, TimeoutError (after timeout seconds,
+        by default conversion_timeout of the file size) or RuntimeError.
+        """
+        def hashing(done, total):
+            if progress:
+                progress('hashing', done, total)
+
+        digest = self.digest(path, hashing, cancel)
+        output = self.csv_path(digest)
+        with self._lock:
+            if os.path.exists(output):
+                self.hits += 1
+                return output
+            future = self._running.get(digest)
+            owner = future is None
+            if owner:
+                future = self._running[digest] = Future()
+                self.misses += 1
+        if not owner:
+            # The same content is being converted (perhaps under another name)
+            while True:
+                if cancel is not None and cancel.is_set():
+                    raise ConversionCancelled(path)
+                try:
+                    return future.result(timeout=POLL_SECONDS)
+                except WaitTimeout:
+                    continue
+
+        try:
+            if timeout is None:
+                timeout = conversion_timeout(os.path.getsize(path))
+            self._run_converter(path, digest, progress, cancel, timeout)
+        except BaseException as e:
+            with self._lock:
+                del self._running[digest]
+            future.set_exception(e)
+            raise
+        with self._lock:
+            del self._running[digest]
+        future.set_result(output)
+        return output
+
+    def _run_converter(self, path, digest, progress, cancel, timeout):
+        """Convert in a private folder of the cache, then move the CSV into place"""
+        work = tempfile.mkdtemp(prefix='convert-', dir=self.cache_dir)
+        try:
+            # The converter writes <name>.csv beside its input, so it gets a
+            # link (or copy) of the MLG in the private folder
+            source = os.path.join(work, digest + '.mlg')
+            try:
+                os.link(path, source)
+            except OSError:
+                shutil.copyfile(path, source)
+            produced = os.path.join(work, digest + '.csv')
+            errors = os.path.join(work, 'stderr.txt')
+
+            try:
+                with open(errors, 'w') as stderr:
+                    proc = subprocess.Popen(self.command + [source], cwd=work,
+                                            stdout=subprocess.DEVNULL, stderr=stderr,
+                                            start_new_session=os.name == 'posix')
+            except FileNotFoundError:
+                raise RuntimeError("mlg-converter not found: install Node.js and "
+                                   "mlg-converter (npm install -g mlg-converter)")
+            start = time.monotonic()
+            while proc.poll() is None:
+                if cancel is not None and cancel.is_set():
+                    _terminate(proc)
+                    raise ConversionCancelled(path)
+                if time.monotonic() - start > timeout:
+                    _terminate(proc)
+                    raise TimeoutError(f"converting {os.path.basename(path)} took more "
+                                       f"than {timeout:.0f} s")
+                if progress:
+                    written = os.path.getsize(produced) if os.path.exists(produced) else 0
+                    progress('converting', written, None)
+                time.sleep(POLL_SECONDS)
+
+            if proc.returncode != 0 or not os.path.exists(produced):
+                with open(errors, errors='replace') as f:
+                    message = f.read().strip().splitlines()
+                raise RuntimeError(f"mlg-converter failed on {os.path.basename(path)}"
+                                   + (f": {message[-1]}" if message else ""))
+            os.replace(produced, self.csv_path(digest))
+        finally:
+            shutil.rmtree(work, ignore_errors=True)
+
+    def clear(self):
+        """Delete every cached CSV and the index"""
+        with self._lock:
+            for name in os.listdir(self.cache_dir):
+                if name.endswith('.csv') or name == INDEX_FILE:
+                    os.remove(os.path.join(self.cache_dir, name))
+            self._index = {}
+
+    def stats(self):
+        """Cached logs, their total size and the hit/miss counts"""
+        files = [os.path.join(self.cache_dir, name) for name in os.listdir(self.cache_dir)
+                 if name.endswith('.csv')]
+        return {'logs': len(files), 'bytes': sum(os.path.getsize(f) for f in files),
+                'hits': self.hits, 'misses': self.misses, 'dir': self.cache_dir}
+
+
+class ConversionJob:
+    """
+    One background conversion
+
+    status is one of JOB_STATES; done and total are the bytes of the
+    current phase (total None while converting, when the CSV size is not
+    known in advance). csv and error are set when the job ends.
+    """
+
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+        self.name = os.path.basename(path)
+        self.status = 'queued'
+        self.done = 0
+        self.total = None
+        self.csv = None
+        self.error = None
+        self.started = None
+        self.finished = None
+        self.future = None
+        self._cancel = threading.Event()
+
+    def cancel(self):
+        """Stop the job (a queued job never starts, a running one is killed)"""
+        self._cancel.set()
+        if self.future is not None and self.future.cancel():
+            self.status = 'cancelled'
+
+    @property
+    def active(self):
+        return self.status in ('queued', 'hashing', 'converting')
+
+    def result(self, timeout=None):
+        """The cached CSV path, waiting for the job; raises the job's error"""
+        return self.future.result(timeout)
+
+    def describe(self):
+        """Short progress text for status bars"""
+        if self.status == 'hashing' and self.total:
+            return f"hashing {self.done / self.total:.0%}"
+        if self.status == 'converting':
+            return f"converting, {self.done / 1e6:.1f} MB written"
+        if self.status == 'failed':
+            return f"failed: {self.error}"
+        return self.status
+
+
+class MLGConverter:
+    """
+    Runs MLG conversions on a thread pool (the converter processes do the work)
+
+    submit() returns a ConversionJob; submitting an MLG that is already
+    being converted returns its job.
+    """
+
+    def __init__(self, cache=None, workers=2):
+        self._cache = cache
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='ae-mlg')
+
+    @property
+    def cache(self):
+        # The shared cache folder is only created once a conversion needs it
+        if self._cache is None:
+            self._cache = default_cache()
+        return self._cache
+
+    def submit(self, path, timeout=None):
+        with self._lock:
+            job = self._jobs.get(os.path.abspath(path))
+            if job is not None and job.active:
+                return job
+            job = ConversionJob(path)
+            self._jobs[job.path] = job
+            job.future = self._pool.submit(self._run, job, timeout)
+        return job
+
+    def _run(self, job, timeout):
+        def progress(phase, done, total):
+            job.status, job.done, job.total = phase, done, total
+
+        job.started = time.time()
+        job.status = 'hashing'
+        try:
+            job.csv = self.cache.convert(job.path, progress, job._cancel, timeout)
+            job.status = 'done'
+            return job.csv
+        except ConversionCancelled:
+            job.status = 'cancelled'
+            raise
+        except Exception as e:
+            job.error = (str(e) if isinstance(e, (RuntimeError, TimeoutError))
+                         else f"{type(e).__name__}: {e}")
+            job.status = 'failed'
+            raise
+        finally:
+            job.finished = time.time()
+
+    def jobs(self):
+        with self._lock:
+            return list(self._jobs.values())
+
+    def active(self):
+        return [job for job in self.jobs() if job.active]
+
+    def forget(self, job):
+        """Drop a finished job from jobs()"""
+        with self._lock:
+            if self._jobs.get(job.path) is job and not job.active:
+                del self._jobs[job.path]
+
+    def shutdown(self, cancel=True):
+        if cancel:
+            for job in self.active():
+                job.cancel()
+        self._pool.shutdown(wait=True, cancel_futures=cancel)
+
+
+_default_cache = None
+
+
+def default_cache():
+    """The shared MLGCache in CACHE_DIR, created on first use"""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = MLGCache()
+    return _default_cache
@@ -0,0 +1,574 @@
+#!/usr/bin/env python3
+"""
+Core AE detection logic for the AE Analyzer
+Shared by the Tk GUI and the headless tools - nothing in here imports tkinter
+"""
+
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+from ae_events import EventTable, EVENT_DTYPE
+
+
+# Common channel names for each role, checked in order (lowercase)
+COLUMN_PATTERNS = {
+    'time': ['time', 'timestamp', 't'],
+    'rpm': ['rpm', 'engine speed'],
+    'tps': ['tps', 'throttle', 'throttle position'],
+    'pw': ['pw', 'pulsewidth', 'injector pulse', 'pw1', 'inj_pw'],
+    'afr': ['afr', 'lambda', 'o2', 'air/fuel', 'air fuel'],
+    'clt': ['clt', 'coolant', 'coolant temp', 'ect'],
+    'map': ['map', 'manifold pressure', 'kpa'],
+}
+
+# Seconds of context shown before and after each event
+CONTEXT_SECONDS = 2.5
+
+# Largest forward time step (s) that still counts as continuous logging
+MAX_GAP_SECONDS = 1.0
+
+# Stoichiometric AFR for gasoline, the default AFR target
+STOICH_AFR = 14.7
+
+# Result of LogData.query: the index (a slice, or an index array on
+# non-monotonic time) plus the channel values at it
+Window = namedtuple('Window', ['index', 'channels'])
+
+
+def guess_columns(columns):
+    """Pick a column for each role based on common naming patterns"""
+    # Convert to lowercase for matching
+    cols_lower = {str(col).lower(): str(col) for col in columns}
+
+    selected = {}
+    for role, patterns in COLUMN_PATTERNS.items():
+        selected[role] = None
+        for pattern in patterns:
+            if pattern in cols_lower:
+                selected[role] = cols_lower[pattern]
+                break
+    return selected
+
+
+def time_slice(time, t0, t1, monotonic=True):
+    """
+    Index of the samples with t0 <= time <= t1
+
+    Uses binary search (O(log n)) on a non-decreasing time column and
+    returns a slice. Logs whose time goes backwards fall back to a linear
+    scan and return the array of matching indices, so samples from before
+    or after a time reset that fall outside the range are never included.
+    """
+    if monotonic:
+        start = int(np.searchsorted(time, t0, side='left'))
+        stop = int(np.searchsorted(time, t1, side='right'))
+        return slice(start, max(start, stop))
+    return np.flatnonzero((time >= t0) & (time <= t1))
+
+
+def is_monotonic(time):
+    """True if the time column never goes backwards"""
+    return bool(np.all(np.diff(time) >= 0))
+
+
+class LogData:
+    """
+    A loaded log - the raw DataFrame plus a time base for range queries
+
+    Channels are exposed as NumPy arrays (data[col]), so a LogData can be
+    passed anywhere a dict of arrays is expected, e.g. ae_render.draw_event.
+
+    Computed channels such as TPS_dot live in a separate derived namespace
+    registered with define(). They are evaluated lazily on first access and
+    never written into the DataFrame, so a large frame is not copied or
+    consolidated and a logged channel of the same name is not overwritten.
+    data[name] prefers the derived channel; raw(name) always reads the log.
+    """
+
+    def __init__(self, frame, time_col):
+        self.frame = frame
+        self.time_col = time_col
+        self.time = np.asarray(frame[time_col], dtype=float)
+        self.monotonic = is_monotonic(self.time)
+        self.quality = None  # per-channel report once ae_clean.clean_log has run
+        self._arrays = {}
+        self._derived_funcs = {}
+        self._derived = {}
+
+    def __len__(self):
+        return len(self.time)
+
+    def __contains__(self, col):
+        return col in self._derived_funcs or col in self.frame.columns
+
+    def __getitem__(self, col):
+        """Channel values as a NumPy array (derived first, then raw)"""
+        if col in self._derived_funcs:
+            if col not in self._derived:
+                self._derived[col] = self._derived_funcs[col](self)
+            return self._derived[col]
+        return self.raw(col)
+
+    def raw(self, col):
+        """Logged channel values as a NumPy array (cached view, no copy per access)"""
+        if col not in self._arrays:
+            self._arrays[col] = self.frame[col].to_numpy()
+        return self._arrays[col]
+
+    def define(self, name, func):
+        """Register a derived channel, computed as func(self) when first read"""
+        self._derived_funcs[name] = func
+        self._derived.pop(name, None)
+
+    def copy(self):
+        """
+        A LogData over the same frame with its own derived namespace
+
+        Derived channels defined so far (and values already computed) carry
+        over, but define() on the copy leaves this one untouched.
+        """
+        other = LogData.__new__(LogData)
+        other.__dict__.update(self.__dict__)
+        other._derived_funcs = dict(self._derived_funcs)
+        other._derived = dict(self._derived)
+        return other
+
+    @property
+    def nbytes(self):
+        """Memory held by the frame and the derived channels computed so far"""
+        total = int(self.frame.memory_usage(index=True).sum()) + self.time.nbytes
+        return total + sum(np.asarray(values).nbytes for values in self._derived.values())
+
+    @property
+    def derived_names(self):
+        return tuple(self._derived_funcs)
+
+    @property
+    def columns(self):
+        return self.frame.columns
+
+    def query(self, t0, t1, channels=(), rows=None):
+        """
+        Samples with t0 <= time <= t1
+
+        Returns a Window of the index (a slice found in O(log n), or the
+        matching indices when time is non-monotonic) and a dict of the
+        requested channels at it - zero-copy views for a slice. rows
+        (start, stop) limits the search to those rows, e.g. one event's
+        window, so a log whose time resets does not match elsewhere.
+        """
+        if rows is None:
+            index = time_slice(self.time, t0, t1, self.monotonic)
+        else:
+            start, stop = int(rows[0]), int(rows[1])
+            index = time_slice(self.time[start:stop], t0, t1, self.monotonic)
+            if isinstance(index, slice):
+                index = slice(index.start + start, index.stop + start)
+            else:
+                index = index + start
+        return Window(index, {col: self[col][index] for col in channels})
+
+
+def as_log(data, time_col):
+    """A LogData for data (returned as is), a DataFrame or a dict of arrays"""
+    if isinstance(data, LogData):
+        return data
+    import pandas as pd
+    frame = data if isinstance(data, pd.DataFrame) else pd.DataFrame(data, copy=False)
+    return LogData(frame, time_col)
+
+
+def compute_tps_dot(time, tps):
+    """Calculate the TPS rate of change (%/s), zero for the first sample"""
+    time = np.asarray(time, dtype=float)
+    tps = np.asarray(tps, dtype=float)
+
+    # Calculate time differences
+    dt = np.diff(time)
+    dt = np.where(dt == 0, 1e-6, dt)  # Avoid division by zero
+
+    # Calculate TPS rate of change (%/s)
+    tps_dot = np.diff(tps) / dt
+    return np.concatenate([[0], tps_dot])  # Add zero at beginning to match length
+
+
+def context_window(time, event_start, event_end, context_s, monotonic=True):
+    """Plot window (start_idx, end_idx) with context_s seconds either side of an event"""
+    t0, t1 = time[event_start] - context_s, time[event_end] + context_s
+    if monotonic:
+        window = time_slice(time, t0, t1)
+        # Never cut into the event itself
+        return min(window.start, event_start), max(window.stop, event_end + 1)
+    # The window is the unbroken run of in-range samples around the event,
+    # so it ends at a time reset instead of spanning whatever lies past it
+    inside = (time >= t0) & (time <= t1)
+    inside[event_start:event_end + 1] = True
+    before = np.flatnonzero(~inside[:event_start])
+    after = np.flatnonzero(~inside[event_end + 1:])
+    start = int(before[-1]) + 1 if len(before) else 0
+    stop = event_end + 1 + int(after[0]) if len(after) else len(time)
+    return start, stop
+
+
+def detect_events(time, tps_dot, threshold, duration_thresh,
+                  context_s=CONTEXT_SECONDS):
+    """
+    Find periods where TPS_dot exceeds threshold for at least duration_thresh
+
+    Returns an EventTable with start_idx/end_idx (plot window including
+    context_s seconds either side), event_start/event_end (the event
+    itself), duration and max_tps_dot.
+    """
+    time = np.asarray(time)
+    tps_dot = np.asarray(tps_dot)
+    n = len(tps_dot)
+    monotonic = is_monotonic(time)
+
+    # Find periods where TPS_dot exceeds threshold
+    exceeds_threshold = tps_dot > threshold
+
+    # Find start and end of each event (rows in EVENT_DTYPE field order)
+    rows = []
+    in_event = False
+    event_start = 0
+
+    for i in range(n):
+        if exceeds_threshold[i] and not in_event:
+            # Start of new event
+            event_start = i
+            in_event = True
+        elif not exceeds_threshold[i] and in_event:
+            # End of event
+            event_end = i
+            event_duration = time[event_end] - time[event_start]
+
+            if event_duration >= duration_thresh:
+                # Valid event - add some context before and after
+                start_idx, end_idx = context_window(time, event_start, event_end,
+                                                    context_s, monotonic)
+
+                rows.append((start_idx, end_idx, event_start, event_end,
+                             event_duration, np.max(tps_dot[event_start:event_end]), 0))
+
+            in_event = False
+
+    # Handle case where event extends to end of data
+    if in_event:
+        event_end = n - 1
+        event_duration = time[event_end] - time[event_start]
+        if event_duration >= duration_thresh:
+            start_idx, _ = context_window(time, event_start, event_end,
+                                          context_s, monotonic)
+            end_idx = n
+
+            # A run starting on the last sample has only that sample to peak on
+            peak = np.max(tps_dot[event_start:max(event_end, event_start + 1)])
+            rows.append((start_idx, end_idx, event_start, event_end,
+                         event_duration, peak, 0))
+
+    return EventTable.from_rows(rows)
+
+
+def detect_events_vectorized(time, tps_dot, threshold, duration_thresh,
+                             context_s=CONTEXT_SECONDS):
+    """
+    NumPy version of detect_events with identical results
+
+    Threshold crossings come from one diff of the exceed mask, peak rates
+    from one reduceat and (on monotonic time) every context window from two
+    searchsorted calls, so there is no per-sample Python loop.
+    """
+    time = np.asarray(time)
+    tps_dot = np.asarray(tps_dot)
+    n = len(tps_dot)
+    if n == 0:
+        return EventTable()
+
+    # +1 where a run of exceeding samples starts, -1 one past where it ends
+    exceeds = (tps_dot > threshold).astype(np.int8)
+    edges = np.diff(exceeds, prepend=0, append=0)
+    starts = np.flatnonzero(edges == 1)
+    stops = np.flatnonzero(edges == -1)
+
+    # A run still going at the end of the data ends on the last sample
+    at_end = stops == n
+    ends = np.where(at_end, n - 1, stops)
+    with np.errstate(invalid='ignore'):
+        durations = time[ends] - time[starts]
+        valid = durations >= duration_thresh
+    starts, ends, durations, at_end = starts[valid], ends[valid], durations[valid], at_end[valid]
+    if len(starts) == 0:
+        return EventTable()
+
+    # Peak over [start, end) - the closing sample is not part of the event
+    bounds = np.column_stack([starts, ends]).ravel()
+    peaks = np.maximum.reduceat(np.append(tps_dot, 0), bounds)[::2]
+
+    if is_monotonic(time):
+        lo = np.searchsorted(time, time[starts] - context_s, side='left')
+        hi = np.searchsorted(time, time[ends] + context_s, side='right')
+        start_idx = np.minimum(lo, starts)
+        end_idx = np.maximum(hi, ends + 1)
+    else:
+        windows = [context_window(time, s, e, context_s, False) for s, e in zip(starts, ends)]
+        start_idx, end_idx = (np.array(column) for column in zip(*windows))
+    end_idx = np.where(at_end, n, end_idx)
+
+    records = np.zeros(len(starts), dtype=EVENT_DTYPE)
+    records['start_idx'] = start_idx
+    records['end_idx'] = end_idx
+    records['event_start'] = starts
+    records['event_end'] = ends
+    records['duration'] = durations
+    records['max_tps_dot'] = peaks
+    return EventTable(records)
+
+
+# Per-segment detectors, all returning identical events ('loop' is the reference)
+DETECTORS = {
+    'loop': detect_events,
+    'vectorized': detect_events_vectorized,
+}
+
+
+def find_segments(time, max_gap=MAX_GAP_SECONDS):
+    """
+    Split a log into continuous segments at time resets and gaps
+
+    A new segment starts wherever time goes backwards ('reset'), jumps
+    forward by more than max_gap seconds ('gap') or is not a number
+    ('invalid'). Returns a list of dicts with start/stop sample indices
+    (stop exclusive), t_start/t_end and the reason the segment starts.
+    """
+    time = np.asarray(time, dtype=float)
+    n = len(time)
+    if n == 0:
+        return []
+
+    # One vectorized pass over the time steps
+    dt = np.diff(time)
+    with np.errstate(invalid='ignore'):
+        reset = dt < 0
+        gap = dt > max_gap
+    invalid = np.isnan(dt)
+    breaks = np.flatnonzero(reset | gap | invalid) + 1
+
+    starts = np.concatenate([[0], breaks])
+    stops = np.concatenate([breaks, [n]])
+    reasons = ['start'] + ['reset' if reset[b - 1] else 'gap' if gap[b - 1] else 'invalid'
+                           for b in breaks]
+
+    return [{
+        'start': int(start),
+        'stop': int(stop),
+        't_start': float(time[start]),
+        't_end': float(time[stop - 1]),
+        'reason': reason,
+    } for start, stop, reason in zip(starts, stops, reasons)]
+
+
+def compute_tps_dot_segmented(time, tps, segments):
+    """TPS rate of change with the first sample of every segment set to zero"""
+    tps_dot = compute_tps_dot(time, tps)
+    # Differences across a reset or gap are meaningless
+    tps_dot[[seg['start'] for seg in segments]] = 0
+    return tps_dot
+
+
+def _detect_segment(detector, time, tps_dot, threshold, duration_thresh, context_s):
+    """Detect events inside one segment (module level so it can be pickled)"""
+    return DETECTORS[detector](time, tps_dot, threshold, duration_thresh, context_s)
+
+
+def detect_events_segmented(time, tps_dot, segments, threshold, duration_thresh,
+                            context_s=CONTEXT_SECONDS, workers=1, detector='vectorized',
+                            executor=None):
+    """
+    Run event detection separately on every segment
+
+    Returns one EventTable whose indices refer to the whole log. Each event
+    records its 'segment', and neither events nor their context windows
+    cross a segment boundary. workers > 1 spreads segments across a
+    process pool (or pass an existing executor to reuse one). detector
+    names an entry of DETECTORS.
+    """
+    if detector not in DETECTORS:
+        raise ValueError(f"Unknown detector '{detector}' (expected one of {tuple(DETECTORS)})")
+    time = np.asarray(time)
+    tps_dot = np.asarray(tps_dot)
+    jobs = [(detector, time[seg['start']:seg['stop']], tps_dot[seg['start']:seg['stop']],
+             threshold, duration_thresh, context_s) for seg in segments]
+
+    if executor is not None and jobs:
+        results = list(executor.map(_detect_segment, *zip(*jobs)))
+    elif workers > 1 and len(segments) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_detect_segment, *zip(*jobs)))
+    else:
+        results = [_detect_segment(*job) for job in jobs]
+
+    tables = []
+    for seg_idx, (seg, seg_events) in enumerate(zip(segments, results)):
+        seg_events = seg_events.offset(seg['start'])
+        seg_events['segment'][:] = seg_idx
+        tables.append(seg_events)
+    return EventTable.concat(tables)
+
+
+class StreamingDetector:
+    """
+    Event detection for a log that arrives in chunks
+
+    feed(time, tps) takes raw samples and returns the events whose trailing
+    context has fully arrived; finish() returns the rest at the end of the
+    log. Segments, TPS_dot and every event field (indices are into the whole
+    stream) match analyze_log on the complete log. Only about context_s
+    seconds of time stamps plus the event in progress are kept in memory.
+    """
+
+    def __init__(self, threshold, duration_thresh, context_s=CONTEXT_SECONDS,
+                 max_gap=MAX_GAP_SECONDS):
+        self.threshold = threshold
+        self.duration_thresh = duration_thresh
+        self.context_s = context_s
+        self.max_gap = max_gap
+        self.samples = 0      # samples consumed so far
+        self.segment = -1     # index of the current segment
+        self._last = None     # (time, tps) of the previous sample
+        self._base = 0        # stream index of the first buffered sample
+        self._time = np.zeros(0)
+        self._tps_dot = np.zeros(0)
+        self._run = None      # stream index where the open threshold run started
+        self._pending = []    # [row, time limit] waiting for trailing context
+
+    def feed(self, time, tps):
+        """Consume the next samples, returning the events completed so far"""
+        time = np.asarray(time, dtype=float)
+        tps = np.asarray(tps, dtype=float)
+        n = len(time)
+        if n == 0:
+            return EventTable()
+
+        # Same arithmetic as find_segments/compute_tps_dot on the whole log
+        prev_time, prev_tps = self._last if self._last else (np.nan, np.nan)
+        dt = np.diff(time, prepend=prev_time)
+        with np.errstate(invalid='ignore'):
+            breaks = (dt < 0) | (dt > self.max_gap) | np.isnan(dt)
+        breaks[0] |= self._last is None
+        tps_dot = np.diff(tps, prepend=prev_tps) / np.where(dt == 0, 1e-6, dt)
+        tps_dot[breaks] = 0
+        self._last = (time[-1], tps[-1])
+
+        rows = []
+        cuts = np.concatenate([[0], np.flatnonzero(breaks), [n]])
+        for a, b in zip(cuts[:-1], cuts[1:]):
+            if a == b:
+                continue
+            if breaks[a]:
+                rows += self._close_segment()
+                self.segment += 1
+                self._base = self.samples + a
+            rows += self._scan(time[a:b], tps_dot[a:b])
+        self.samples += n
+        return EventTable.from_rows(rows)
+
+    def finish(self):
+        """Events still waiting at the end of the log"""
+        return EventTable.from_rows(self._close_segment())
+
+    def _scan(self, time, tps_dot):
+        """Detect within new samples of the current segment"""
+        first = self._base + len(self._time)
+        rows = []
+
+        # Earlier events whose trailing context ends inside these samples
+        while self._pending:
+            row, limit = self._pending[0]
+            stop = int(np.searchsorted(time, limit, side='right'))
+            if stop == len(time):
+                break
+            row[1] = max(first + stop, row[3] + 1)
+            rows.append(tuple(row))
+            self._pending.pop(0)
+
+        self._time = np.concatenate([self._time, time])
+        self._tps_dot = np.concatenate([self._tps_dot, tps_dot])
+
+        # Threshold runs, continuing one left open by the previous chunk
+        exceeds = (tps_dot > self.threshold).astype(np.int8)
+        edges = np.diff(exceeds, prepend=int(self._run is not None))
+        starts = list(np.flatnonzero(edges == 1) + first)
+        stops = np.flatnonzero(edges == -1) + first
+        if self._run is not None:
+            starts.insert(0, self._run)
+        for start, stop in zip(starts, stops):
+            rows += self._complete(int(start), int(stop))
+        self._run = int(starts[-1]) if len(starts) > len(stops) else None
+
+        # Keep context_s of history (more while a run is open)
+        keep_time = self._time[-1] - self.context_s
+        if self._run is not None:
+            keep_time = min(keep_time, self._time[self._run - self._base] - self.context_s)
+        keep = int(np.searchsorted(self._time, keep_time, side='left'))
+        if keep:
+            self._time = self._time[keep:]
+            self._tps_dot = self._tps_dot[keep:]
+            self._base += keep
+        return rows
+
+    def _complete(self, start, end, segment_end=False):
+        """Rows for a finished run from start to end (both stream indices)"""
+        base = self._base
+        duration = self._time[end - base] - self._time[start - base]
+        if not duration >= self.duration_thresh:
+            return []
+        window = self._tps_dot[start - base:end - base]
+        peak = window.max() if len(window) else self._tps_dot[start - base]
+        lookback = np.searchsorted(self._time, self._time[start - base] - self.context_s,
+                                   side='left')
+        row = [min(base + int(lookback), start), None, start, end, duration, peak,
+               self.segment]
+        if segment_end:
+            row[1] = end + 1
+            return [tuple(row)]
+
+        limit = self._time[end - base] + self.context_s
+        stop = int(np.searchsorted(self._time, limit, side='right'))
+        if stop < len(self._time):
+            row[1] = max(base + stop, end + 1)
+            return [tuple(row)]
+        self._pending.append([row, limit])
+        return []
+
+    def _close_segment(self):
+        """Flush the open run and pending events when a segment ends"""
+        stop = self._base + len(self._time)
+        rows = []
+        for row, _ in self._pending:
+            row[1] = stop
+            rows.append(tuple(row))
+        self._pending = []
+        if self._run is not None:
+            rows += self._complete(self._run, stop - 1, segment_end=True)
+            self._run = None
+        self._time = np.zeros(0)
+        self._tps_dot = np.zeros(0)
+        return rows
+
+
+def analyze_log(log, tps_col, threshold, duration_thresh, context_s=CONTEXT_SECONDS,
+                max_gap=MAX_GAP_SECONDS, workers=1):
+    """
+    Segment a log, define its derived TPS_dot channel and detect events
+
+    Returns (segments, events). The loaded DataFrame is left untouched.
+    TPS is read as log[tps_col], so a cleaned channel registered by
+    ae_clean.clean_log takes the place of the logged one.
+    """
+    segments = find_segments(log.time, max_gap)
+    log.define('TPS_dot', lambda log: compute_tps_dot_segmented(log.time, log[tps_col],
+                                                                segments))
+    events = detect_events_segmented(log.time, log['TPS_dot'], segments, threshold,
+                                     duration_thresh, context_s=context_s, workers=workers)
+    return segments, events
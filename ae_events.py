@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Compact event table for the AE Analyzer
+Detected events are stored as one NumPy structured array instead of a
+list of dicts, so filtering, sorting and statistics are vectorized
+"""
+
+import numpy as np
+from numpy.lib import recfunctions
+
+
+# Core fields every event has (indices are into the whole log, end indices exclusive
+# for the plot window and inclusive for the event itself)
+EVENT_DTYPE = np.dtype([
+    ('start_idx', np.int64),    # plot window start (includes context)
+    ('end_idx', np.int64),      # plot window end (exclusive)
+    ('event_start', np.int64),  # first sample above the threshold
+    ('event_end', np.int64),    # sample where the event ended
+    ('duration', np.float64),   # seconds
+    ('max_tps_dot', np.float64),  # %/s
+    ('segment', np.int32),      # log segment the event belongs to
+])
+
+INDEX_FIELDS = ('start_idx', 'end_idx', 'event_start', 'event_end')
+
+
+class EventTable:
+    """
+    Detected AE events as a structured array
+
+    table[i] is one event record (fields read like dict keys, e.g.
+    table[i]['duration']), table['duration'] is a whole column, and
+    table[mask] or table[indices] is a new table. Extra feature columns can
+    be added with add_column.
+    """
+
+    def __init__(self, records=None):
+        if records is None:
+            records = np.zeros(0, dtype=EVENT_DTYPE)
+        self.records = records
+
+    @classmethod
+    def from_rows(cls, rows, dtype=EVENT_DTYPE):
+        """Build a table from a sequence of tuples in dtype field order"""
+        return cls(np.array(rows, dtype=dtype))
+
+    @classmethod
+    def from_dicts(cls, events):
+        """Build a table from the old list-of-dicts event format"""
+        rows = [tuple(event.get(name, 0) for name in EVENT_DTYPE.names) for event in events]
+        return cls.from_rows(rows)
+
+    @classmethod
+    def concat(cls, tables):
+        """Stack tables with the same fields, e.g. events pooled across logs"""
+        tables = list(tables)
+        if not tables:
+            return cls()
+        return cls(np.concatenate([table.records for table in tables]))
+
+    def __len__(self):
+        return len(self.records)
+
+    def __iter__(self):
+        return iter(self.records)
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return self.records[key]
+        if isinstance(key, (int, np.integer)):
+            return self.records[key]
+        return EventTable(self.records[key])
+
+    def __repr__(self):
+        return f"EventTable({len(self)} events, fields={self.fields})"
+
+    @property
+    def fields(self):
+        return self.records.dtype.names
+
+    @property
+    def nbytes(self):
+        return self.records.nbytes
+
+    def offset(self, samples):
+        """Copy of the table with every index field shifted by samples"""
+        records = self.records.copy()
+        for name in INDEX_FIELDS:
+            records[name] += samples
+        return EventTable(records)
+
+    def add_column(self, name, values, dtype=np.float64):
+        """Add (or replace) a per-event feature column in place"""
+        values = np.asarray(values, dtype=dtype)
+        if len(values) != len(self):
+            raise ValueError(f"Column '{name}' has {len(values)} values for {len(self)} events")
+        if name in self.fields:
+            self.records[name] = values
+        else:
+            self.records = recfunctions.append_fields(self.records, name, values,
+                                                      usemask=False)
+
+    def filter(self, mask):
+        """Events where the boolean mask is True"""
+        return EventTable(self.records[np.asarray(mask, dtype=bool)])
+
+    def sort(self, by, descending=False):
+        """Events ordered by one field (stable, so ties keep log order)"""
+        key = self.records[by]
+        if descending:
+            # Sort the negated key rather than reversing, which would flip ties
+            key = -key.astype(np.float64)
+        order = np.argsort(key, kind='stable')
+        return EventTable(self.records[order])
+
+    def select(self, names):
+        """A plain structured array with just the named fields"""
+        return recfunctions.repack_fields(self.records[list(names)])
+
+    def to_dicts(self):
+        """Events as a list of dicts with Python scalars (for JSON and tests)"""
+        return [dict(zip(self.fields, row)) for row in self.records.tolist()]
+
+    def segment_counts(self, n_segments):
+        """Number of events in each of n_segments log segments"""
+        return np.bincount(self.records['segment'], minlength=n_segments)
+
+    def summary(self):
+        """Count, mean/max duration and peak TPS rate of all events"""
+        if len(self) == 0:
+            return {'count': 0, 'mean_duration': 0.0, 'max_duration': 0.0,
+                    'max_tps_dot': 0.0}
+        return {
+            'count': len(self),
+            'mean_duration': float(self.records['duration'].mean()),
+            'max_duration': float(self.records['duration'].max()),
+            'max_tps_dot': float(self.records['max_tps_dot'].max()),
+        }
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Per-event features for the AE Analyzer
+Summarizes each detected event (engine state at onset, TPS travel, AFR
+swing, peak pulsewidth) with one vectorized pass over all events, for
+searching and comparing events across logs
+"""
+
+import numpy as np
+
+
+# Feature columns, in the order they are added to an EventTable
+EVENT_FEATURES = (
+    't_start',    # log time at event onset (s)
+    'rpm',        # RPM at onset
+    'clt',        # coolant temperature at onset
+    'map',        # manifold pressure at onset
+    'tps_start',  # TPS at onset (%)
+    'tps_end',    # TPS when the event ended (%)
+    'afr_min',    # richest AFR during the event
+    'afr_max',    # leanest AFR during the event
+    'pw_max',     # peak injector pulsewidth during the event
+)
+
+
+def window_reduce(ufunc, values, starts, stops):
+    """
+    ufunc.reduceat over arbitrary [start, stop) windows in a single call
+
+    Windows may overlap and must not be empty. NaN-aware ufuncs such as
+    np.fmax/np.fmin skip missing samples.
+    """
+    # A trailing NaN lets stop == len(values) be a valid reduceat index
+    values = np.append(np.asarray(values, dtype=float), np.nan)
+    bounds = np.column_stack([starts, stops]).ravel()
+    if len(bounds) == 0:
+        return np.zeros(0)
+    return ufunc.reduceat(values, bounds)[::2]
+
+
+def event_features(log, events, columns):
+    """
+    Feature arrays (one value per event) keyed by EVENT_FEATURES name
+
+    columns maps roles ('rpm', 'clt', 'map', 'tps', 'pw', 'afr') to channel
+    names; features of a missing channel are NaN.
+    """
+    starts = events['event_start']
+    stops = events['event_end'] + 1
+    n = len(events)
+    time = np.asarray(log.time, dtype=float)
+
+    # On monotonic time query() of an event's time range is exactly its rows,
+    # so one reduceat covers every event; when time goes backwards each
+    # event's samples come from query() so none outside its range count
+    windows = None
+    if not log.monotonic:
+        windows = []
+        for start, stop in zip(starts, stops):
+            bounds = time[[start, stop - 1]]
+            windows.append(log.query(bounds.min(), bounds.max(), rows=(start, stop)).index)
+
+    def channel(role):
+        col = columns.get(role)
+        if col and col in log:
+            return np.asarray(log[col], dtype=float)
+        return None
+
+    def at(values, index):
+        return values[index] if values is not None else np.full(n, np.nan)
+
+    def reduce(ufunc, values):
+        if values is None:
+            return np.full(n, np.nan)
+        with np.errstate(invalid='ignore'):
+            if windows is None:
+                return window_reduce(ufunc, values, starts, stops)
+            return np.array([ufunc.reduce(values[index]) for index in windows], dtype=float)
+
+    tps = channel('tps')
+    afr = channel('afr')
+    return {
+        't_start': time[starts],
+        'rpm': at(channel('rpm'), starts),
+        'clt': at(channel('clt'), starts),
+        'map': at(channel('map'), starts),
+        'tps_start': at(tps, starts),
+        'tps_end': at(tps, events['event_end']),
+        'afr_min': reduce(np.fmin, afr),
+        'afr_max': reduce(np.fmax, afr),
+        'pw_max': reduce(np.fmax, channel('pw')),
+    }
+
+
+def add_event_features(log, events, columns):
+    """Add every EVENT_FEATURES column to an EventTable in place"""
+    for name, values in event_features(log, events, columns).items():
+        events.add_column(name, values)
+    return events
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Added fuel per AE event for the AE Analyzer
+The pulsewidth channel is the steady-state fuel plus the enrichment, and
+only the enrichment is what AE tuning changes. A baseline PW model is fitted
+per log by least squares on RPM and load over the samples outside every
+event window, and subtracted inside each event window: the residual is the
+fuel AE added
+
+    fuel = AEFuel.from_log(log, events, columns, load='map')
+    fuel.table()          # one row per event: added PW, open time, mass
+    draw_fuel(fig, fuel)  # added fuel against peak TPS_dot
+
+The fit is one lstsq call and the residuals of every event window are one
+gather plus bincount, so there is no per-event Python loop.
+"""
+
+import numpy as np
+
+from ae_core import MAX_GAP_SECONDS
+from ae_heatmap import window_indices, AE_WINDOWS
+
+
+# Baseline model terms, in coefficient order (RPM in thousands, load in hundreds)
+BASELINE_TERMS = ('1', 'rpm', 'load', 'rpm^2', 'rpm*load', 'load^2')
+RPM_SCALE = 1000.0
+LOAD_SCALE = 100.0
+
+# Fewer steady-state samples than this and the fit is refused
+MIN_BASELINE_SAMPLES = 50
+
+# Per-event table columns, in order
+FUEL_FIELDS = (
+    'event',          # event number (from 1, as shown in the GUI)
+    't_start',        # log time at onset (s)
+    'max_tps_dot',    # peak TPS rate (%/s)
+    'samples',        # window samples with a valid residual
+    'baseline_pw',    # mean modelled steady-state PW over the window (ms)
+    'added_pw',       # mean PW above the baseline (ms)
+    'added_pw_peak',  # largest PW above the baseline (ms)
+    'added_pct',      # added_pw as a percentage of baseline_pw
+    'added_open_ms',  # extra injector open time summed over the window's injections (ms)
+    'added_fuel_mg',  # added_open_ms times the injector flow (NaN without one)
+)
+
+
+def _design(rpm, load):
+    """Quadratic RPM x load design matrix (one column per BASELINE_TERMS)"""
+    r = np.asarray(rpm, dtype=float) / RPM_SCALE
+    l = np.asarray(load, dtype=float) / LOAD_SCALE
+    return np.column_stack([np.ones_like(r), r, l, r * r, r * l, l * l])
+
+
+def outside_windows(n, events, window='context'):
+    """Boolean mask of the samples outside every event window (a difference array)"""
+    first, last, offset = AE_WINDOWS[window]
+    marks = np.zeros(n + 1, dtype=np.int64)
+    np.add.at(marks, np.asarray(events[first], dtype=np.int64), 1)
+    np.add.at(marks, np.minimum(np.asarray(events[last], dtype=np.int64) + offset, n), -1)
+    return np.cumsum(marks[:n]) == 0
+
+
+class BaselineModel:
+    """
+    Steady-state PW as a quadratic in RPM and load
+
+    coef follows BASELINE_TERMS. samples, rmse and r2 describe the fit on
+    the steady-state samples it was fitted to.
+    """
+
+    def __init__(self, coef, samples=0, rmse=np.nan, r2=np.nan):
+        self.coef = np.asarray(coef, dtype=float)
+        self.samples = samples
+        self.rmse = rmse
+        self.r2 = r2
+
+    @classmethod
+    def fit(cls, rpm, load, pw):
+        """Least-squares fit over the samples where RPM, load and PW are valid"""
+        rpm, load, pw = (np.asarray(v, dtype=float) for v in (rpm, load, pw))
+        # Fuel cut (PW 0 on overrun) is not steady-state fuelling
+        valid = np.isfinite(rpm) & np.isfinite(load) & np.isfinite(pw) & (pw > 0)
+        if valid.sum() < MIN_BASELINE_SAMPLES:
+            raise ValueError(f"only {int(valid.sum())} steady-state samples to fit the "
+                             f"baseline PW (need {MIN_BASELINE_SAMPLES})")
+        X, y = _design(rpm[valid], load[valid]), pw[valid]
+        coef = np.linalg.lstsq(X, y, rcond=None)[0]
+        residual = y - X @ coef
+        spread = float(np.sum((y - y.mean()) ** 2))
+        r2 = 1.0 - float(residual @ residual) / spread if spread > 0 else np.nan
+        return cls(coef, int(valid.sum()), float(np.sqrt(np.mean(residual ** 2))), r2)
+
+    def predict(self, rpm, load):
+        """Baseline PW at each RPM/load point"""
+        return _design(rpm, load) @ self.coef
+
+
+class AEFuel:
+    """
+    Added fuel of every event in a log
+
+    model is the log's BaselineModel. values maps each FUEL_FIELDS name to
+    one array over the events. owners, residual and index hold every window
+    sample (its event, PW above the baseline and row in the log) for
+    plotting. Build one with from_log().
+    """
+
+    def __init__(self, model, values, owners, residual, index, load_name='map',
+                 flow=None):
+        self.model = model
+        self.values = values
+        self.owners = owners
+        self.residual = residual
+        self.index = index
+        self.load_name = load_name
+        self.flow = flow
+
+    def __len__(self):
+        return len(self.values['event'])
+
+    def __getitem__(self, name):
+        return self.values[name]
+
+    @classmethod
+    def from_log(cls, log, events, columns, load='map', window='after', squirts=1,
+                 flow=None, max_gap=MAX_GAP_SECONDS):
+        """
+        Fit a log's baseline and measure every event's added fuel
+
+        columns maps roles to channel names and needs 'rpm', 'pw' and the
+        load role ('map' or 'tps'). The baseline is fitted outside every
+        event's whole plot window, so trailing enrichment is never mistaken
+        for steady state; window picks the samples measured (see
+        ae_heatmap.AE_WINDOWS). squirts is injections per injector per
+        engine cycle and flow the fuel (mg) one ms of PW delivers per
+        squirt, summed over the injectors that fire together.
+        """
+        names = {role: columns.get(role) for role in ('rpm', 'pw', load)}
+        missing = [role.upper() for role, col in names.items() if not col or col not in log]
+        if missing:
+            raise ValueError(f"the AE fuel estimate needs {' and '.join(missing)} channel(s)")
+
+        rpm = np.asarray(log[names['rpm']], dtype=float)
+        pw = np.asarray(log[names['pw']], dtype=float)
+        load_values = np.asarray(log[names[load]], dtype=float)
+        steady = outside_windows(len(pw), events, 'context')
+        model = BaselineModel.fit(rpm[steady], load_values[steady], pw[steady])
+
+        # Each sample stands for the time until the next one (none across a gap)
+        time = np.asarray(log.time, dtype=float)
+        dt = np.diff(time, append=np.nan)
+        dt[~((dt > 0) & (dt <= max_gap))] = 0.0
+
+        index, owners = window_indices(events, window, log)
+        baseline = model.predict(rpm[index], load_values[index])
+        residual = pw[index] - baseline
+        valid = np.isfinite(residual)
+        n = len(events)
+
+        def per_event(weights):
+            return np.bincount(owners[valid], weights=weights[valid], minlength=n)
+
+        count = np.bincount(owners[valid], minlength=n)
+        injections = rpm[index] / 120.0 * squirts * dt[index]  # 4-stroke: 2 revs per cycle
+        with np.errstate(invalid='ignore', divide='ignore'):
+            baseline_pw = per_event(baseline) / count
+            added = per_event(residual) / count
+            peak = np.full(n, -np.inf)
+            np.maximum.at(peak, owners[valid], residual[valid])
+            peak[count == 0] = np.nan
+            open_ms = per_event(residual * np.nan_to_num(injections))
+            open_ms[count == 0] = np.nan
+            values = {
+                'event': np.arange(1, n + 1),
+                't_start': time[np.asarray(events['event_start'], dtype=np.int64)],
+                'max_tps_dot': np.asarray(events['max_tps_dot'], dtype=float),
+                'samples': count,
+                'baseline_pw': baseline_pw,
+                'added_pw': added,
+                'added_pw_peak': peak,
+                'added_pct': 100.0 * added / baseline_pw,
+                'added_open_ms': open_ms,
+                'added_fuel_mg': open_ms * flow if flow else np.full(n, np.nan),
+            }
+        return cls(model, values, owners, residual, index, load, flow)
+
+    def table(self):
+        """Events as a list of dicts in FUEL_FIELDS order (for CSV and display)"""
+        columns = [self.values[name].tolist() for name in FUEL_FIELDS]
+        return [dict(zip(FUEL_FIELDS, row)) for row in zip(*columns)]
+
+    def to_csv(self, path):
+        """Write the per-event table"""
+        import csv
+        with open(path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=FUEL_FIELDS)
+            writer.writeheader()
+            writer.writerows(self.table())
+
+    def describe_model(self):
+        """One line describing the baseline fit"""
+        return (f"baseline PW ~ RPM x {self.load_name.upper()} from "
+                f"{self.model.samples:,} steady-state samples, RMSE "
+                f"{self.model.rmse:.3f} ms, R² {self.model.r2:.3f}")
+
+
+def draw_fuel(fig, fuel):
+    """
+    Draw added fuel against peak TPS_dot on a matplotlib Figure
+
+    The top axes show each event's added fuel (mass when an injector flow is
+    set, else extra open time), the bottom axes every window sample's PW
+    above the baseline. Returns the two axes.
+    """
+    fig.clear()
+    top = fig.add_subplot(2, 1, 1)
+    bottom = fig.add_subplot(2, 1, 2, sharex=top)
+    tps_dot = fuel['max_tps_dot']
+
+    if fuel.flow:
+        added, label = fuel['added_fuel_mg'], 'Added fuel (mg)'
+    else:
+        added, label = fuel['added_open_ms'], 'Added open time (ms)'
+    points = top.scatter(tps_dot, added, c=fuel['added_pct'], cmap='viridis', s=25)
+    fig.colorbar(points, ax=top, label='Added PW (% of baseline)')
+    top.axhline(0, color='gray', linewidth=0.8)
+    top.set_ylabel(label, fontweight='bold')
+    top.set_title(f"AE fuel: {len(fuel)} events", fontweight='bold')
+    top.grid(True, alpha=0.3)
+
+    bottom.scatter(tps_dot[fuel.owners], fuel.residual, s=2, alpha=0.3, color='tab:orange')
+    bottom.axhline(0, color='gray', linewidth=0.8)
+    bottom.set_xlabel('Peak TPS_dot (%/s)', fontweight='bold')
+    bottom.set_ylabel('PW - baseline (ms)', fontweight='bold')
+    bottom.set_title(fuel.describe_model(), fontsize=9)
+    bottom.grid(True, alpha=0.3)
+    fig.tight_layout()
+    return top, bottom
@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+Golden-corpus equivalence harness for the event detectors
+Generates a seeded corpus of synthetic TPS traces, including the edge
+cases that have bitten the detectors before, and checks every detection
+backend against the reference loop detector for identical events
+
+Backends (all start from raw time and TPS arrays):
+    loop        find_segments + detect_events per segment (the reference)
+    vectorized  the same segments through detect_events_vectorized
+    streaming   StreamingDetector fed in random chunk sizes
+    parallel    detect_events_segmented on a process pool
+
+Run directly to check a corpus and record each backend's throughput:
+
+    python ae_golden.py --traces 500 --record golden.json
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import json
+import platform
+import sys
+import time
+import numpy as np
+
+from ae_core import (find_segments, compute_tps_dot, compute_tps_dot_segmented,
+                     detect_events, detect_events_vectorized, detect_events_segmented,
+                     StreamingDetector)
+from ae_events import EventTable
+
+
+# Trace shapes in the corpus; make_corpus cycles through them
+TRACE_KINDS = ('random', 'event_at_end', 'event_at_start', 'zero_dt', 'nan', 'plateau',
+               'resets', 'noisy', 'constant', 'tiny')
+
+BACKENDS = ('loop', 'vectorized', 'streaming', 'parallel')
+
+
+def _stabs(rng, n, dt):
+    """A TPS trace with a handful of throttle stabs and some drift"""
+    tps = np.clip(np.cumsum(rng.normal(0, 0.3, n)), -5, 5) + 10
+    for start in rng.integers(0, max(n, 1), rng.integers(1, 6)):
+        length = int(rng.integers(2, 40))
+        rate = rng.uniform(5, 400)  # %/s, around and well above the threshold
+        tps[start:start + length] += rate * dt * np.arange(len(tps[start:start + length]))
+        tps[start + length:] += rate * dt * length
+    return tps
+
+
+def make_trace(kind, rng):
+    """One corpus entry: dict of time, tps and detection parameters"""
+    n = int(rng.integers(50, 600))
+    dt = rng.choice([0.01, 0.02, 0.05, 0.1])
+    time = np.cumsum(np.full(n, dt) * rng.uniform(0.8, 1.2, n))
+    tps = _stabs(rng, n, dt)
+
+    if kind == 'event_at_end':
+        # A run of rising TPS that is still going on the last sample
+        k = int(rng.integers(2, 30))
+        tps[-k:] = tps[-k - 1] + 50 * dt * np.arange(1, k + 1)
+    elif kind == 'event_at_start':
+        k = int(rng.integers(2, 30))
+        tps[:k] = tps[k] - 50 * dt * np.arange(k, 0, -1)
+    elif kind == 'zero_dt':
+        # Repeated time stamps (logger stalls); TPS_dot divides by 1e-6
+        repeat = rng.random(n) < 0.1
+        time = np.maximum.accumulate(np.where(repeat, np.roll(time, 1), time))
+    elif kind == 'nan':
+        tps[rng.random(n) < 0.02] = np.nan
+        time[rng.random(n) < 0.01] = np.nan
+    elif kind == 'plateau':
+        # Flat full-throttle holds and ramps at exactly the threshold rate
+        time = np.arange(n) * 0.05
+        tps = np.repeat(rng.choice([0.0, 50.0, 100.0], n // 20 + 1), 20)[:n]
+        tps[n // 3:n // 2] = np.arange(n // 2 - n // 3) * 0.5  # 10 %/s
+    elif kind == 'resets':
+        # Several logs back to back, plus gaps longer than max_gap
+        for cut in np.sort(rng.integers(1, n, 3)):
+            time[cut:] -= time[cut] - rng.uniform(-5, 5)
+        for gap in rng.integers(1, n, 2):
+            time[gap:] += rng.uniform(1.5, 10)
+    elif kind == 'noisy':
+        # Sensor noise straddling the threshold gives many short runs
+        tps = 50 + np.cumsum(rng.normal(0, 10 * dt, n)) + rng.normal(0, 0.5, n)
+    elif kind == 'constant':
+        tps = np.full(n, rng.uniform(0, 100))
+    elif kind == 'tiny':
+        n = int(rng.integers(0, 4))
+        time, tps = time[:n], tps[:n]
+
+    return {'kind': kind, 'time': time, 'tps': tps,
+            'threshold': float(rng.choice([10.0, 25.0, 50.0])),
+            'duration': float(rng.choice([0.0, 0.05, 0.1, 0.3])),
+            'context': float(rng.choice([0.2, 1.0, 2.5])),
+            'max_gap': 1.0}
+
+
+def make_corpus(traces=200, seed=0):
+    """A reproducible list of traces covering every TRACE_KINDS entry"""
+    rng = np.random.default_rng(seed)
+    return [make_trace(TRACE_KINDS[i % len(TRACE_KINDS)], rng) for i in range(traces)]
+
+
+def _segmented(trace, detector, executor=None):
+    segments = find_segments(trace['time'], trace['max_gap'])
+    tps_dot = compute_tps_dot_segmented(trace['time'], trace['tps'], segments)
+    return detect_events_segmented(trace['time'], tps_dot, segments, trace['threshold'],
+                                   trace['duration'], context_s=trace['context'],
+                                   detector=detector, executor=executor)
+
+
+def _streaming(trace, rng):
+    detector = StreamingDetector(trace['threshold'], trace['duration'], trace['context'],
+                                 trace['max_gap'])
+    time, tps = trace['time'], trace['tps']
+    tables, i = [], 0
+    while i < len(time):
+        step = int(rng.choice([1, 2, 7, 64, 1000]))
+        tables.append(detector.feed(time[i:i + step], tps[i:i + step]))
+        i += step
+    tables.append(detector.finish())
+    return EventTable.concat(tables)
+
+
+def run_backend(name, trace, executor=None, rng=None):
+    """Events for one trace from the named backend"""
+    if name == 'loop':
+        return _segmented(trace, 'loop')
+    if name == 'vectorized':
+        return _segmented(trace, 'vectorized')
+    if name == 'streaming':
+        return _streaming(trace, rng if rng is not None else np.random.default_rng(0))
+    if name == 'parallel':
+        return _segmented(trace, 'vectorized', executor)
+    raise ValueError(f"unknown backend '{name}' (expected one of {', '.join(BACKENDS)})")
+
+
+def compare_events(expected, actual):
+    """Description of the first difference between two EventTables, or None"""
+    if len(expected) != len(actual):
+        return f"{len(actual)} events, expected {len(expected)}"
+    for name in expected.fields:
+        a, b = expected[name], actual[name]
+        same = (a == b) | (np.isnan(a) & np.isnan(b)) if a.dtype.kind == 'f' else a == b
+        if not np.all(same):
+            i = int(np.argmin(same))
+            return f"event {i} {name} = {b[i]!r}, expected {a[i]!r}"
+    return None
+
+
+def check_corpus(corpus, backends=BACKENDS, workers=2, seed=0):
+    """
+    Run every backend over the corpus and compare with the loop reference
+
+    Returns {backend: {'samples', 'events', 'seconds', 'samples_per_s',
+    'mismatches': [(trace index, kind, difference), ...]}}. Raw (unsegmented)
+    detect_events vs detect_events_vectorized results are under 'raw'.
+    """
+    reference = [run_backend('loop', trace) for trace in corpus]
+    samples = sum(len(trace['time']) for trace in corpus)
+    results = {}
+    executor = ProcessPoolExecutor(max_workers=workers) if 'parallel' in backends else None
+    try:
+        for name in backends:
+            rng = np.random.default_rng(seed)
+            start = time.perf_counter()
+            found = [run_backend(name, trace, executor, rng) for trace in corpus]
+            seconds = time.perf_counter() - start
+            results[name] = _result(corpus, reference, found, samples, seconds)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    # The detectors on whole traces, where time may reset or be NaN
+    raw_ref, raw_vec = [], []
+    for trace in corpus:
+        if len(trace['time']) == 0:
+            raw_ref.append(EventTable())
+            raw_vec.append(EventTable())
+            continue
+        tps_dot = compute_tps_dot(trace['time'], trace['tps'])
+        args = (trace['time'], tps_dot, trace['threshold'], trace['duration'], trace['context'])
+        raw_ref.append(detect_events(*args))
+        raw_vec.append(detect_events_vectorized(*args))
+    results['raw'] = _result(corpus, raw_ref, raw_vec, samples, None)
+    return results
+
+
+def _result(corpus, reference, found, samples, seconds):
+    mismatches = []
+    for i, (trace, expected, actual) in enumerate(zip(corpus, reference, found)):
+        difference = compare_events(expected, actual)
+        if difference:
+            mismatches.append((i, trace['kind'], difference))
+    return {'samples': samples, 'events': sum(len(events) for events in found),
+            'seconds': seconds,
+            'samples_per_s': samples / seconds if seconds else None,
+            'mismatches': mismatches}
+
+
+def throughput(samples=1_000_000, seed=0, workers=2, repeat=3):
+    """
+    Samples per second of each backend on one long multi-segment log
+
+    The corpus traces are too short to time the detectors themselves, so
+    this builds a drive-length log (stabs every few seconds, a time reset
+    and a gap every 100k samples) and reports the best of `repeat` runs.
+    """
+    rng = np.random.default_rng(seed)
+    stamps = np.arange(samples) * 0.01
+    for cut in range(100_000, samples, 100_000):
+        stamps[cut:] += 5.0 if cut % 200_000 else -stamps[cut]
+    phase = np.arange(samples) % 400
+    tps = np.where(phase < 20, phase * 3.0, 60.0 * np.exp(-(phase - 20) / 100))
+    tps += rng.normal(0, 0.2, samples)
+    trace = {'kind': 'drive', 'time': stamps, 'tps': tps, 'threshold': 10.0,
+             'duration': 0.1, 'context': 2.5, 'max_gap': 1.0}
+
+    rates = {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for name in BACKENDS:
+            best = np.inf
+            for _ in range(repeat):
+                start = time.perf_counter()
+                run_backend(name, trace, executor, np.random.default_rng(seed))
+                best = min(best, time.perf_counter() - start)
+            rates[name] = samples / best
+    return rates
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--traces', type=int, default=500, help="corpus size (default 500)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=2, help="parallel backend workers")
+    parser.add_argument('--samples', type=int, default=1_000_000,
+                        help="length of the throughput log (0 to skip)")
+    parser.add_argument('--record', metavar='JSON', help="write the results to a JSON file")
+    args = parser.parse_args(argv)
+
+    corpus = make_corpus(args.traces, args.seed)
+    results = check_corpus(corpus, workers=args.workers, seed=args.seed)
+    rates = throughput(args.samples, args.seed, args.workers) if args.samples else {}
+
+    print("=" * 70)
+    print(f"Golden corpus: {args.traces} traces, {results['loop']['samples']:,} samples, "
+          f"seed {args.seed}")
+    print("=" * 70)
+    print(f"{'backend':<12} {'events':>8} {'mismatch':>9} {'corpus (samp/s)':>16} "
+          f"{'long log (samp/s)':>18}")
+    ok = True
+    for name, result in results.items():
+        corpus_rate = f"{result['samples_per_s']:,.0f}" if result['samples_per_s'] else '-'
+        long_rate = f"{rates[name]:,.0f}" if name in rates else '-'
+        print(f"{name:<12} {result['events']:>8} {len(result['mismatches']):>9} "
+              f"{corpus_rate:>16} {long_rate:>18}")
+        for i, kind, difference in result['mismatches'][:5]:
+            print(f"    trace {i} ({kind}): {difference}")
+        ok &= not result['mismatches']
+
+    if args.record:
+        with open(args.record, 'w') as f:
+            json.dump({'traces': args.traces, 'seed': args.seed, 'workers': args.workers,
+                       'long_log_samples': args.samples, 'python': platform.python_version(),
+                       'numpy': np.__version__, 'recorded': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                       'backends': {name: dict(result, long_log_samples_per_s=rates.get(name))
+                                    for name, result in results.items()}},
+                      f, indent=2)
+        print(f"Results written to {args.record}")
+    print("✓ All backends identical to the reference" if ok else "✗ Backends disagree")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+AFR error heatmap for the AE Analyzer
+Concatenates the samples of every event window and bins their AFR error
+(AFR - target, positive is lean) over an RPM x load grid, with MAP or TPS
+as load, to show where in the operating map AE runs lean or rich
+
+Binning is one vectorized pass (searchsorted + bincount) over every window
+sample, and each cell keeps the events that contributed to it for
+drill-down. A sample inside two overlapping windows counts for both events.
+"""
+
+import numpy as np
+
+from ae_core import STOICH_AFR
+
+
+# Samples of each event that are binned: (first field, last field, stop offset)
+AE_WINDOWS = {
+    'event': ('event_start', 'event_end', 1),  # while TPS_dot is over the threshold
+    'after': ('event_start', 'end_idx', 0),    # onset through the trailing context
+    'context': ('start_idx', 'end_idx', 0),    # the whole plot window
+}
+
+# Default bin edges (RPM, and load per load role)
+RPM_EDGES = np.arange(0, 8001, 500)
+LOAD_EDGES = {
+    'map': np.arange(0, 251, 10),  # kPa
+    'tps': np.arange(0, 101, 5),   # %
+}
+
+# Cells annotated with their sample count when the grid is at most this big
+MAX_ANNOTATED_CELLS = 600
+
+
+def window_indices(events, window='after', log=None):
+    """
+    (sample indices, event numbers) for every sample of every event window
+
+    On monotonic time an event window's rows are exactly what
+    log.query(..., rows=...) returns for its time range, so they are built
+    with np.repeat/cumsum and no per-event Python loop. Pass the log so
+    that when its time goes backwards each window comes from query()
+    instead, and samples outside the window's time range are dropped.
+    """
+    if window not in AE_WINDOWS:
+        raise ValueError(f"unknown window '{window}' (expected one of {', '.join(AE_WINDOWS)})")
+    first, last, offset = AE_WINDOWS[window]
+    starts = np.asarray(events[first], dtype=np.int64)
+    stops = np.asarray(events[last], dtype=np.int64) + offset
+    if log is not None and not log.monotonic:
+        time = np.asarray(log.time, dtype=float)
+        windows = [np.zeros(0, dtype=np.int64)]
+        for start, stop in zip(starts, stops):
+            if stop > start:
+                bounds = time[[start, stop - 1]]
+                windows.append(log.query(bounds.min(), bounds.max(), rows=(start, stop)).index)
+            else:
+                windows.append(windows[0])
+        lengths = np.array([len(index) for index in windows[1:]], dtype=np.int64)
+        return np.concatenate(windows), np.repeat(np.arange(len(starts)), lengths)
+    lengths = stops - starts
+    owners = np.repeat(np.arange(len(starts)), lengths)
+    firsts = np.repeat(np.cumsum(lengths) - lengths, lengths)
+    return np.repeat(starts, lengths) + np.arange(len(owners)) - firsts, owners
+
+
+def _bin(values, edges):
+    """Bin number of each value (histogram convention: last edge inclusive), -1 outside"""
+    index = np.searchsorted(edges, values, side='right') - 1
+    index[values == edges[-1]] = len(edges) - 2
+    index[(index < 0) | (index >= len(edges) - 1)] = -1  # also NaN
+    return index
+
+
+class AFRHeatmap:
+    """
+    AFR error statistics on an RPM x load grid
+
+    count, event_count, mean and std are arrays of shape
+    (len(rpm_edges) - 1, len(load_edges) - 1), mean and std NaN where a cell
+    is empty. cell_events(i, j) lists the events whose samples fell in cell
+    (i, j). The constructor takes per-sample rpm, load and error arrays and
+    owners, the event number of each sample in ascending order (as
+    window_indices returns it). Build one with from_log().
+    """
+
+    def __init__(self, rpm, load, error, owners, rpm_edges=RPM_EDGES,
+                 load_edges=LOAD_EDGES['map'], target=STOICH_AFR, load_name='map'):
+        self.rpm_edges = np.asarray(rpm_edges, dtype=float)
+        self.load_edges = np.asarray(load_edges, dtype=float)
+        self.target = target
+        self.load_name = load_name
+        shape = (len(self.rpm_edges) - 1, len(self.load_edges) - 1)
+        self.shape = shape
+
+        rows, cols = _bin(rpm, self.rpm_edges), _bin(load, self.load_edges)
+        valid = (rows >= 0) & (cols >= 0) & np.isfinite(error)
+        cells = rows[valid] * shape[1] + cols[valid]
+        error = error[valid]
+        self.samples = len(cells)
+        self.events = len(np.unique(owners[valid]))
+
+        size = shape[0] * shape[1]
+        count = np.bincount(cells, minlength=size)
+        total = np.bincount(cells, weights=error, minlength=size)
+        squares = np.bincount(cells, weights=error * error, minlength=size)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = total / count
+            std = np.sqrt(np.maximum(squares / count - mean * mean, 0))
+        self.count = count.reshape(shape)
+        self.mean = mean.reshape(shape)
+        self.std = std.reshape(shape)
+
+        # Owners grouped by cell: cell k's samples are _owners[_offsets[k]:_offsets[k + 1]].
+        # A narrow dtype lets the stable argsort use radix sort
+        narrow = np.int16 if size <= np.iinfo(np.int16).max else np.int32
+        order = np.argsort(cells.astype(narrow), kind='stable')
+        cells = cells[order]
+        self._owners = owners[valid][order]
+        self._errors = error[order]
+        self._offsets = np.concatenate([[0], np.cumsum(count)])
+
+        # owners ascend (as window_indices gives them), and the sort is stable,
+        # so each cell's events are sorted too: count where the event changes
+        first = np.ones(len(cells), dtype=bool)
+        first[1:] = (cells[1:] != cells[:-1]) | (self._owners[1:] != self._owners[:-1])
+        self.event_count = np.bincount(cells[first], minlength=size).reshape(shape)
+
+    @classmethod
+    def from_log(cls, log, events, columns, target=STOICH_AFR, load='map', window='after',
+                 rpm_edges=None, load_edges=None):
+        """
+        Heatmap of a log's event windows
+
+        columns maps roles to channel names and needs 'rpm', 'afr' and the
+        load role ('map' or 'tps'). target is a fixed AFR or the name of an
+        AFR target channel.
+        """
+        names = {role: columns.get(role) for role in ('rpm', 'afr', load)}
+        missing = [role.upper() for role, col in names.items() if not col or col not in log]
+        if missing:
+            raise ValueError(f"the AFR map needs {' and '.join(missing)} channel(s)")
+
+        index, owners = window_indices(events, window, log)
+
+        def gather(col):
+            # Only the window samples are ever converted
+            return np.asarray(log[col])[index].astype(float, copy=False)
+
+        if isinstance(target, str):
+            if target not in log:
+                raise ValueError(f"no AFR target channel '{target}'")
+            error = gather(names['afr']) - gather(target)
+        else:
+            error = gather(names['afr']) - float(target)
+        if load_edges is None:
+            load_edges = LOAD_EDGES.get(load, LOAD_EDGES['map'])
+        return cls(gather(names['rpm']), gather(names[load]), error, owners,
+                   RPM_EDGES if rpm_edges is None else rpm_edges, load_edges,
+                   target, load)
+
+    def cell_at(self, rpm, load):
+        """(row, col) of the cell holding an RPM/load point, or None"""
+        row = _bin(np.array([rpm], dtype=float), self.rpm_edges)[0]
+        col = _bin(np.array([load], dtype=float), self.load_edges)[0]
+        return (int(row), int(col)) if row >= 0 and col >= 0 else None
+
+    def cell_events(self, row, col):
+        """
+        The events contributing to one cell, most samples first
+
+        Returns a list of dicts: event (index into the EventTable), samples
+        and mean_error (that event's mean AFR error in the cell).
+        """
+        k = row * self.shape[1] + col
+        start, stop = self._offsets[k], self._offsets[k + 1]
+        owners, errors = self._owners[start:stop], self._errors[start:stop]
+        events, inverse, counts = np.unique(owners, return_inverse=True, return_counts=True)
+        means = np.bincount(inverse, weights=errors, minlength=len(events)) / np.maximum(counts, 1)
+        order = np.argsort(-counts, kind='stable')
+        return [{'event': int(events[i]), 'samples': int(counts[i]),
+                 'mean_error': float(means[i])} for i in order]
+
+    def cells(self):
+        """Non-empty cells as dicts (bin ranges, count, mean and std error)"""
+        return [{'rpm_lo': float(self.rpm_edges[i]), 'rpm_hi': float(self.rpm_edges[i + 1]),
+                 'load_lo': float(self.load_edges[j]), 'load_hi': float(self.load_edges[j + 1]),
+                 'samples': int(self.count[i, j]), 'events': int(self.event_count[i, j]),
+                 'mean_error': float(self.mean[i, j]), 'std_error': float(self.std[i, j])}
+                for i, j in zip(*np.nonzero(self.count))]
+
+    def describe_target(self):
+        """The target as shown in labels (a number or a channel name)"""
+        return self.target if isinstance(self.target, str) else f"{self.target:g}"
+
+
+def draw_heatmap(fig, heatmap, annotate=MAX_ANNOTATED_CELLS):
+    """
+    Draw the mean AFR error grid on a matplotlib Figure
+
+    Lean cells are red and rich cells blue, centred on zero error. Small
+    grids show each cell's sample count. Returns the axes.
+    """
+    from matplotlib.colors import TwoSlopeNorm
+
+    fig.clear()
+    ax = fig.add_subplot(1, 1, 1)
+    mean = np.ma.masked_invalid(heatmap.mean.T)
+    limit = float(np.abs(mean).max()) if mean.count() else 1.0
+    limit = limit or 1.0
+    mesh = ax.pcolormesh(heatmap.rpm_edges, heatmap.load_edges, mean, cmap='RdBu_r',
+                         norm=TwoSlopeNorm(0.0, -limit, limit), shading='flat')
+    fig.colorbar(mesh, ax=ax, label=f"AFR - target ({heatmap.describe_target()}), lean +")
+
+    if heatmap.count.size <= annotate:
+        rpm_mid = (heatmap.rpm_edges[:-1] + heatmap.rpm_edges[1:]) / 2
+        load_mid = (heatmap.load_edges[:-1] + heatmap.load_edges[1:]) / 2
+        for i, j in zip(*np.nonzero(heatmap.count)):
+            dark = abs(heatmap.mean[i, j]) > 0.6 * limit
+            ax.text(rpm_mid[i], load_mid[j], str(heatmap.count[i, j]), ha='center',
+                    va='center', fontsize=7, color='white' if dark else 'black')
+
+    ax.set_xlabel('RPM', fontweight='bold')
+    ax.set_ylabel('MAP (kPa)' if heatmap.load_name == 'map' else 'TPS (%)', fontweight='bold')
+    ax.set_title(f"AFR error during AE: {heatmap.events} events, "
+                 f"{heatmap.samples:,} samples", fontweight='bold')
+    fig.tight_layout()
+    return ax
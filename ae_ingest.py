@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+"""
+Watched-folder ingest for the AE Analyzer
+Polls a drop folder (no platform file-watch APIs) and runs every log that
+lands there through the pipeline once it has finished being written
+
+    daemon = IngestDaemon('/mnt/drop', '/mnt/results', workers=2)
+    daemon.run()                    # until interrupted
+    daemon.metrics()                # throughput and backlog
+
+A file counts as complete once its size and modification time have stayed
+the same for STABLE_POLLS polls and SETTLE_SECONDS. Complete files wait in
+a backlog and at most workers + QUEUE_SLACK of them are handed to the
+process pool at a time. Each worker writes the log's events CSV, an HTML
+report with thumbnails and a summary.json into its own result folder.
+Finished (and failed) files are recorded with their size and mtime in a
+SQLite ledger in the results folder, so a restart skips them until they
+change. Metrics are rewritten to metrics.json there after every poll.
+
+A worker process that dies (e.g. out of memory) breaks the whole pool and
+every file in flight with it. Those files go back to the backlog and are
+retried one at a time on a fresh pool, so only a file that crashes a pool
+on its own MAX_POOL_CRASHES times is recorded as failed.
+"""
+
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import json
+import os
+import sqlite3
+import time
+
+from ae_catalog import find_logs, LOG_PATTERNS
+
+
+POLL_SECONDS = 2.0
+STABLE_POLLS = 2       # unchanged polls before a file counts as complete
+SETTLE_SECONDS = 5.0   # and at least this long since it last changed
+QUEUE_SLACK = 2        # files submitted beyond the busy workers
+RATE_WINDOW_SECONDS = 300.0  # throughput averaged over this window
+MAX_POOL_CRASHES = 2   # pool crashes a file is in flight for before it is failed
+
+LEDGER_FILE = 'ingest.sqlite'
+METRICS_FILE = 'metrics.json'
+
+LEDGER_SCHEMA = """
+CREATE TABLE IF NOT EXISTS ingested (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    status TEXT NOT NULL,  -- 'done' or 'failed'
+    rows INTEGER,
+    events INTEGER,
+    seconds REAL,          -- worker time
+    output TEXT,           -- result folder
+    error TEXT,
+    finished_at REAL
+);
+"""
+
+
+def result_dir(drop_dir, out_dir, path):
+    """Result folder of one log: its path under the drop folder, flattened"""
+    relative = os.path.relpath(path, drop_dir)
+    name = os.path.splitext(relative)[0].replace(os.sep, '__')
+    return os.path.join(out_dir, name)
+
+
+def ingest_log(path, output, config):
+    """
+    Parse one log, detect its events and write its results
+
+    Runs in a worker process. Returns a ledger record; errors are recorded
+    in it rather than raised, so a bad file is not retried until it changes.
+    """
+    from ae_pipeline import Pipeline
+
+    stat = os.stat(path)
+    record = {'path': path, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+              'status': 'done', 'rows': None, 'events': None, 'output': output,
+              'error': None}
+    start = time.perf_counter()
+    try:
+        os.makedirs(output, exist_ok=True)
+        exports = [{'kind': 'events', 'path': os.path.join(output, 'events.csv')},
+                   {'kind': 'report', 'path': os.path.join(output, 'report.html'),
+                    'workers': 1}]
+        pipeline = Pipeline(dict(config, source=dict(config.get('source') or {}, path=path),
+                                 exports=exports))
+        results = pipeline.run()
+        events = results['features']
+        record['rows'] = len(results['source'])
+        record['events'] = len(events)
+        summary = {'path': path, 'rows': record['rows'], 'columns': results['channels'],
+                   'segments': len(results['derivative'][1]), 'summary': events.summary(),
+                   'settings': {name: pipeline.config[name]
+                                for name in ('clean', 'derivative', 'triggers')}}
+        # Written last: a result folder with summary.json is complete
+        with open(os.path.join(output, 'summary.json'), 'w') as f:
+            json.dump(summary, f, indent=2, default=str)
+    except Exception as e:
+        record.update(status='failed', error=f"{type(e).__name__}: {e}")
+    record['seconds'] = time.perf_counter() - start
+    return record
+
+
+class IngestDaemon:
+    """
+    Polls a drop folder and ingests complete logs on a bounded process pool
+
+    config is a pipeline config (see ae_pipeline) whose source path and
+    exports are filled in per file. Call poll() repeatedly, or run().
+    """
+
+    def __init__(self, drop_dir, out_dir, workers=2, config=None, poll_s=POLL_SECONDS,
+                 stable_polls=STABLE_POLLS, settle_s=SETTLE_SECONDS,
+                 patterns=LOG_PATTERNS, executor=None):
+        from ae_pipeline import normalize_config
+
+        self.drop_dir = os.path.abspath(drop_dir)
+        self.out_dir = os.path.abspath(out_dir)
+        self.workers = workers
+        self.config = normalize_config(config)
+        self.poll_s = poll_s
+        self.stable_polls = stable_polls
+        self.settle_s = settle_s
+        self.patterns = patterns
+        os.makedirs(self.out_dir, exist_ok=True)
+
+        self._ledger = sqlite3.connect(os.path.join(self.out_dir, LEDGER_FILE))
+        self._ledger.row_factory = sqlite3.Row
+        self._ledger.executescript(LEDGER_SCHEMA)
+        self._done = {row['path']: (row['size'], row['mtime_ns'])
+                      for row in self._ledger.execute("SELECT path, size, mtime_ns FROM ingested")}
+
+        self._owns_executor = executor is None
+        self._executor = executor or ProcessPoolExecutor(max_workers=workers)
+        self._watching = {}       # path -> [(size, mtime_ns), first seen unchanged, polls]
+        self._backlog = deque()   # (path, became complete at)
+        self._in_flight = {}      # future -> (path, became complete at)
+        self._recent = deque()    # (finished at, rows) inside RATE_WINDOW_SECONDS
+        self._crashes = {}        # path -> pool crashes it was in flight for
+        self._started = time.monotonic()
+        self.counts = {'polls': 0, 'processed': 0, 'failed': 0, 'skipped': 0,
+                       'events': 0, 'rows': 0, 'worker_seconds': 0.0, 'latency_seconds': 0.0}
+        self.last_error = None
+
+    def poll(self):
+        """One pass: collect finished work, look for complete files, refill the pool"""
+        now = time.monotonic()
+        self._collect(now)
+        self._scan(now)
+        self._submit()
+        self.counts['polls'] += 1
+        self._write_metrics()
+
+    def _scan(self, now):
+        queued = {path for path, _ in self._backlog}
+        queued.update(path for path, _ in self._in_flight.values())
+        present = set()
+        out_prefix = os.path.join(self.out_dir, '')
+        for path in find_logs(self.drop_dir, self.patterns):
+            if path.startswith(out_prefix) or path in queued:
+                continue
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue  # moved away between the listing and the stat
+            present.add(path)
+            signature = (stat.st_size, stat.st_mtime_ns)
+            if self._done.get(path) == signature:
+                if path not in self._watching:
+                    self.counts['skipped'] += 1
+                    self._watching[path] = None  # counted once, never watched
+                continue
+            watch = self._watching.get(path)
+            if watch is None or watch[0] != signature:
+                self._watching[path] = [signature, now, 1]
+                continue
+            watch[2] += 1
+            if watch[2] >= self.stable_polls and now - watch[1] >= self.settle_s:
+                del self._watching[path]
+                self._backlog.append((path, now))
+        # Forget files that disappeared before completing
+        for path in [path for path in self._watching if path not in present]:
+            del self._watching[path]
+
+    def _submit(self):
+        while self._backlog and len(self._in_flight) < self.workers + QUEUE_SLACK:
+            path, ready = self._backlog[0]
+            # A file that was in flight when the pool crashed runs alone, so
+            # if it crashes the pool again it is the one to blame
+            if self._in_flight and (path in self._crashes or any(
+                    running in self._crashes for running, _ in self._in_flight.values())):
+                break
+            self._backlog.popleft()
+            output = result_dir(self.drop_dir, self.out_dir, path)
+            try:
+                future = self._executor.submit(ingest_log, path, output, self.config)
+            except BrokenProcessPool:
+                if not self._owns_executor:
+                    raise
+                # A crashed worker takes the pool with it; start a fresh one
+                self._executor.shutdown(wait=False)
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                future = self._executor.submit(ingest_log, path, output, self.config)
+            self._in_flight[future] = (path, ready)
+
+    def _collect(self, now):
+        for future in [future for future in self._in_flight if future.done()]:
+            path, ready = self._in_flight.pop(future)
+            try:
+                record = future.result()
+            except BrokenProcessPool as e:
+                # A worker died and failed every file in flight, not only its
+                # own - retry them unless this one keeps crashing the pool
+                crashes = self._crashes.get(path, 0) + 1
+                if crashes < MAX_POOL_CRASHES:
+                    self._crashes[path] = crashes
+                    self._backlog.appendleft((path, ready))
+                    continue
+                record = self._failure(path, f"worker crashed {crashes} times: {e}")
+            except Exception as e:
+                record = self._failure(path, f"{type(e).__name__}: {e}")
+            self._crashes.pop(path, None)
+            self._record(record)
+            self.counts['latency_seconds'] += now - ready
+            self._recent.append((now, record['rows'] or 0))
+        while self._recent and now - self._recent[0][0] > RATE_WINDOW_SECONDS:
+            self._recent.popleft()
+
+    @staticmethod
+    def _failure(path, error):
+        """Ledger record of a file whose worker raised instead of returning one"""
+        stat = os.stat(path) if os.path.exists(path) else None
+        return {'path': path, 'size': stat.st_size if stat else -1,
+                'mtime_ns': stat.st_mtime_ns if stat else -1, 'status': 'failed',
+                'rows': None, 'events': None, 'seconds': 0.0, 'output': None,
+                'error': error}
+
+    def _record(self, record):
+        self._ledger.execute(
+            "INSERT OR REPLACE INTO ingested (path, size, mtime_ns, status, rows, events, "
+            "seconds, output, error, finished_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (record['path'], record['size'], record['mtime_ns'], record['status'],
+             record['rows'], record['events'], record['seconds'], record['output'],
+             record['error'], time.time()))
+        self._ledger.commit()
+        self._done[record['path']] = (record['size'], record['mtime_ns'])
+        self._watching[record['path']] = None
+        if record['status'] == 'failed':
+            self.counts['failed'] += 1
+            self.last_error = f"{record['path']}: {record['error']}"
+        else:
+            self.counts['processed'] += 1
+            self.counts['events'] += record['events']
+            self.counts['rows'] += record['rows']
+        self.counts['worker_seconds'] += record['seconds']
+
+    @property
+    def idle(self):
+        """True when no file is waiting to settle, queued or being processed"""
+        return not (self._backlog or self._in_flight
+                    or any(watch is not None for watch in self._watching.values()))
+
+    def metrics(self):
+        """Throughput and backlog counters as a JSON-ready dict"""
+        now = time.monotonic()
+        finished = self.counts['processed'] + self.counts['failed']
+        window = min(RATE_WINDOW_SECONDS, now - self._started) or 1.0
+        oldest = min((ready for _, ready in self._backlog), default=None)
+        return dict(
+            self.counts,
+            uptime_seconds=now - self._started,
+            settling=sum(watch is not None for watch in self._watching.values()),
+            backlog=len(self._backlog),
+            in_flight=len(self._in_flight),
+            oldest_backlog_seconds=now - oldest if oldest is not None else 0.0,
+            files_per_minute=60.0 * len(self._recent) / window,
+            rows_per_second=sum(rows for _, rows in self._recent) / window,
+            mean_latency_seconds=self.counts['latency_seconds'] / finished if finished else None,
+            workers=self.workers,
+            last_error=self.last_error,
+        )
+
+    def _write_metrics(self):
+        path = os.path.join(self.out_dir, METRICS_FILE)
+        with open(path + '.tmp', 'w') as f:
+            json.dump(self.metrics(), f, indent=2)
+        os.replace(path + '.tmp', path)  # readers never see a half-written file
+
+    def run(self, until_idle=False, report=None):
+        """
+        Poll every poll_s seconds until interrupted (or, with until_idle,
+        until every complete file is processed). report(metrics) is called
+        after each poll. Files still in flight when stopped are picked up
+        again on the next start.
+        """
+        try:
+            while True:
+                self.poll()
+                if report:
+                    report(self.metrics())
+                if until_idle and self.idle:
+                    return self.metrics()
+                time.sleep(self.poll_s)
+        finally:
+            self.close()
+
+    def close(self):
+        if self._owns_executor:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+        self._ledger.close()
+
+
+def format_metrics(metrics):
+    """One status line for the console"""
+    return (f"{metrics['processed']} done, {metrics['failed']} failed, "
+            f"{metrics['in_flight']} running, {metrics['backlog']} queued, "
+            f"{metrics['settling']} settling | {metrics['files_per_minute']:.1f} files/min, "
+            f"{metrics['rows_per_second']:,.0f} rows/s")
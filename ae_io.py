@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Log file ingestion for the AE Analyzer
+Reads CSV log exports with either the pandas C parser or Arrow's
+multithreaded CSV reader (when pyarrow is installed), .aelog archives
+(ae_archive) and MLG logs via the mlg-converter cache (ae_convert)
+"""
+
+import os
+import importlib.util
+import numpy as np
+
+# pandas and pyarrow are imported on first read, not at module load, so the
+# GUI window and the CLI start without paying for them.
+# pyarrow is optional - without it every read goes through pandas
+HAVE_PYARROW = importlib.util.find_spec('pyarrow') is not None
+
+
+# Supported CSV engines, in the order shown in the GUI
+CSV_ENGINES = ('auto', 'pandas', 'pyarrow')
+
+
+def detect_separator(filename):
+    """Guess the field separator (';' or ',') from the header line"""
+    with open(filename, 'r', errors='replace') as f:
+        header = f.readline()
+    # A semicolon header that splits into several fields is a semicolon file,
+    # anything else is read as comma-separated
+    if len(header.split(';')) > 1:
+        return ';'
+    return ','
+
+
+def resolve_engine(engine='auto'):
+    """Map a requested engine name to the engine that will actually run"""
+    if engine not in CSV_ENGINES:
+        raise ValueError(f"Unknown CSV engine '{engine}' (expected one of {CSV_ENGINES})")
+    if engine == 'auto':
+        return 'pyarrow' if HAVE_PYARROW else 'pandas'
+    if engine == 'pyarrow' and not HAVE_PYARROW:
+        raise ImportError("The pyarrow CSV engine requires pyarrow: pip install pyarrow")
+    return engine
+
+
+def _read_csv_pandas(filename, sep, channels):
+    """Read a CSV file with the pandas C parser"""
+    import pandas as pd
+
+    if channels:
+        dtype = {col: np.float64 for col in channels}
+        return pd.read_csv(filename, sep=sep, usecols=list(channels), dtype=dtype)
+    return pd.read_csv(filename, sep=sep)
+
+
+def _read_csv_pyarrow(filename, sep, channels, use_threads):
+    """Read a CSV file with Arrow's multithreaded CSV reader"""
+    import pyarrow as pa
+    from pyarrow import csv as pa_csv
+
+    # Threading is switched per read; the pool size is process-wide
+    # (pa.set_cpu_count) and is left to the application
+    read_options = pa_csv.ReadOptions(use_threads=use_threads)
+    parse_options = pa_csv.ParseOptions(delimiter=sep)
+    if channels:
+        # Explicit float schema - skips type inference for the selected channels
+        convert_options = pa_csv.ConvertOptions(
+            column_types={col: pa.float64() for col in channels},
+            include_columns=list(channels)
+        )
+    else:
+        convert_options = pa_csv.ConvertOptions()
+    table = pa_csv.read_csv(filename, read_options=read_options,
+                            parse_options=parse_options,
+                            convert_options=convert_options)
+    return table.to_pandas()
+
+
+def read_log_csv(filename, engine='auto', channels=None, use_threads=True):
+    """
+    Read a CSV log export into a DataFrame
+
+    engine      -- 'auto' (pyarrow when installed, else pandas), 'pandas' or 'pyarrow'
+    channels    -- optional list of columns to load, each parsed as float64
+    use_threads -- read on Arrow's CPU pool with the pyarrow engine (False
+                   reads single-threaded)
+    """
+    if not os.path.exists(filename):
+        raise FileNotFoundError(filename)
+
+    import pandas as pd
+
+    engine = resolve_engine(engine)
+    sep = detect_separator(filename)
+
+    if engine == 'pyarrow':
+        import pyarrow as pa
+        try:
+            return _read_csv_pyarrow(filename, sep, channels, use_threads)
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+            # Files Arrow refuses (ragged rows, odd quoting) still load via pandas
+            pass
+
+    try:
+        data = _read_csv_pandas(filename, sep, channels)
+        # If semicolon parse resulted in only 1 column, it's likely comma-separated
+        if sep == ';' and len(data.columns) == 1:
+            data = _read_csv_pandas(filename, ',', channels)
+    except (pd.errors.ParserError, pd.errors.EmptyDataError):
+        # If semicolon fails, try comma
+        data = _read_csv_pandas(filename, ',', channels)
+    return data
+
+
+def convert_mlg(mlg_file, timeout=None):
+    """
+    CSV of an MLG log, converted by mlg-converter
+
+    Conversions go through the content-hashed cache in ae_convert, so an
+    MLG is converted once and nothing is written next to it. timeout
+    defaults to one scaled to the file size. A failed conversion raises
+    ValueError with the converter's reason (not installed, timed out or
+    its error message).
+    """
+    from ae_convert import default_cache
+
+    if not os.path.exists(mlg_file):
+        raise FileNotFoundError(mlg_file)
+    try:
+        return default_cache().convert(mlg_file, timeout=timeout)
+    except (RuntimeError, TimeoutError, OSError) as e:
+        raise ValueError(f"Cannot read {mlg_file}: {e}") from e
+
+
+def read_log(filename, engine='auto', channels=None, use_threads=True):
+    """
+    Read any supported log into a DataFrame
+
+    .aelog archives are decoded by ae_archive (engine does not apply), .mlg
+    logs are converted to CSV first and everything else is read as CSV.
+    """
+    from ae_archive import ARCHIVE_EXTENSION, read_archive
+
+    if filename.lower().endswith(ARCHIVE_EXTENSION):
+        if not os.path.exists(filename):
+            raise FileNotFoundError(filename)
+        return read_archive(filename, channels)
+    if filename.lower().endswith('.mlg'):
+        filename = convert_mlg(filename)
+    return read_log_csv(filename, engine=engine, channels=channels, use_threads=use_threads)
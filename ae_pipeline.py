@@ -0,0 +1,428 @@
+#!/usr/bin/env python3
+"""
+Declarative analysis pipeline for the AE Analyzer
+One config (TOML, YAML or a dict) describes a whole analysis - source,
+channel map, cleaning, derivative, triggers, features, resampling and
+exports - and
+drives both the GUI and `ae_cli.py run`
+
+    [source]
+    path = "run1.csv"
+
+    [channels]
+    tps = "TPS"            # any role left out is auto-detected
+
+    [clean]
+    enabled = true
+
+    [triggers]
+    threshold = 20.0
+
+    [[exports]]
+    kind = "report"
+    path = "run1.pdf"
+
+Stages run as a DAG (STAGES). Each result is cached under a key hashed
+from the stage's settings and the keys of the stages it reads, and the
+source key includes the file's size and modification time, so changing a
+setting re-runs that stage and the ones after it and nothing else. Exports
+write files, so they are never cached and run on every run().
+"""
+
+import copy
+import hashlib
+import importlib.util
+import json
+import os
+import time
+
+from ae_core import (guess_columns, find_segments, compute_tps_dot_segmented,
+                     detect_events_segmented, LogData, COLUMN_PATTERNS, CONTEXT_SECONDS,
+                     MAX_GAP_SECONDS, DETECTORS)
+from ae_events import EventTable
+
+# PyYAML is optional - TOML (tomllib, Python 3.11+) and JSON configs always work
+HAVE_YAML = importlib.util.find_spec('yaml') is not None
+HAVE_TOMLLIB = importlib.util.find_spec('tomllib') is not None
+
+
+# Settings per section and their defaults. channels maps roles to channel
+# names (None = auto-detect); exports is a list of EXPORT_KINDS tables
+DEFAULTS = {
+    'source': {'path': None, 'engine': 'auto'},
+    'channels': {role: None for role in COLUMN_PATTERNS},
+    'clean': {'enabled': False, 'roles': None},
+    'derivative': {'max_gap': MAX_GAP_SECONDS},
+    'triggers': {'threshold': 10.0, 'duration': 0.1, 'context': CONTEXT_SECONDS,
+                 'detector': 'vectorized', 'workers': 1},
+    'features': {'enabled': True},
+    # Uniform-grid resampling (ae_resample): rate None is the log's median
+    # rate, max_gap None the derivative's segments, channels None the mapped
+    # roles; channels in hold/linear use that method, others default_method
+    'resample': {'enabled': False, 'rate': None, 'max_gap': None, 'channels': None,
+                 'hold': None, 'linear': None},
+    'exports': [],
+}
+
+# Stages in run order, with the stages each one reads
+STAGES = {
+    'source': (),
+    'channels': ('source',),
+    'clean': ('source', 'channels'),
+    'derivative': ('clean', 'channels'),
+    'triggers': ('derivative',),
+    'features': ('derivative', 'triggers', 'channels'),
+    'resample': ('derivative', 'channels'),
+    'exports': ('derivative', 'features', 'channels', 'triggers'),
+}
+
+# Stages that run every time: their results are files that may have been
+# moved or deleted since the last run
+UNCACHED_STAGES = ('exports',)
+
+# Export kinds and their extra settings
+EXPORT_KINDS = {
+    'report': {'workers': None},  # PDF/HTML event report
+    'events': {},                 # events and features as CSV
+    'afrmap': {'target': None, 'load': 'map', 'window': 'after'},  # AFR heatmap image
+    'aefuel': {'load': 'map', 'window': 'after', 'squirts': 1,
+               'flow': None},  # added fuel per event (.csv table, else plot image)
+}
+
+CONFIG_FORMATS = ('.toml', '.yaml', '.yml', '.json')
+
+
+def normalize_config(config):
+    """
+    A complete config: defaults filled in, unknown settings rejected
+
+    Raises ValueError naming the first unknown section, setting or export
+    kind.
+    """
+    config = config or {}
+    unknown = set(config) - set(DEFAULTS)
+    if unknown:
+        raise ValueError(f"unknown pipeline section(s): {', '.join(sorted(unknown))}")
+    out = {}
+    for section, defaults in DEFAULTS.items():
+        if section == 'exports':
+            continue
+        given = config.get(section) or {}
+        extra = set(given) - set(defaults)
+        if extra:
+            raise ValueError(f"unknown setting(s) in [{section}]: {', '.join(sorted(extra))}")
+        out[section] = dict(defaults, **given)
+
+    out['exports'] = []
+    for export in config.get('exports') or []:
+        kind = export.get('kind')
+        if kind not in EXPORT_KINDS:
+            raise ValueError(f"unknown export kind '{kind}' (expected one of "
+                             f"{', '.join(EXPORT_KINDS)})")
+        if not export.get('path'):
+            raise ValueError(f"export '{kind}' needs a path")
+        extra = set(export) - {'kind', 'path'} - set(EXPORT_KINDS[kind])
+        if extra:
+            raise ValueError(f"unknown setting(s) for export '{kind}': {', '.join(sorted(extra))}")
+        out['exports'].append(dict(EXPORT_KINDS[kind], **export))
+    if out['triggers']['detector'] not in DETECTORS:
+        raise ValueError(f"unknown detector '{out['triggers']['detector']}'")
+    return out
+
+
+def load_config(path):
+    """Read a pipeline config from a .toml, .yaml/.yml or .json file"""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.toml':
+        if not HAVE_TOMLLIB:
+            raise ValueError("TOML configs need Python 3.11+ (tomllib)")
+        import tomllib
+        with open(path, 'rb') as f:
+            config = tomllib.load(f)
+    elif ext in ('.yaml', '.yml'):
+        if not HAVE_YAML:
+            raise ValueError("YAML configs need PyYAML (pip install pyyaml)")
+        import yaml
+        with open(path) as f:
+            config = yaml.safe_load(f)
+    elif ext == '.json':
+        with open(path) as f:
+            config = json.load(f)
+    else:
+        raise ValueError(f"unsupported config format '{ext}' (use {', '.join(CONFIG_FORMATS)})")
+
+    # Relative source and export paths are relative to the config file
+    config = config or {}
+    base = os.path.dirname(os.path.abspath(path))
+    source = config.get('source') or {}
+    if source.get('path') and not os.path.isabs(source['path']):
+        source['path'] = os.path.join(base, source['path'])
+    for export in config.get('exports') or []:
+        if export.get('path') and not os.path.isabs(export['path']):
+            export['path'] = os.path.join(base, export['path'])
+    return normalize_config(config)
+
+
+def _toml_value(value):
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, (int, float)):
+        return repr(value)
+    if isinstance(value, (list, tuple)):
+        return '[' + ', '.join(_toml_value(v) for v in value) + ']'
+    return json.dumps(str(value))  # a TOML basic string
+
+
+def dump_config(config):
+    """
+    The config as TOML text (settings left as None are omitted)
+
+    The schema is flat tables plus the exports array of tables, so this
+    small writer covers it without a TOML library.
+    """
+    lines = []
+    for section, settings in config.items():
+        tables = settings if section == 'exports' else [settings]
+        for table in tables:
+            lines.append(f"[[{section}]]" if section == 'exports' else f"[{section}]")
+            lines += [f"{key} = {_toml_value(value)}" for key, value in table.items()
+                      if value is not None]
+            lines.append('')
+    return '\n'.join(lines)
+
+
+def save_config(config, path):
+    """Write a config as TOML (or JSON for a .json path)"""
+    with open(path, 'w') as f:
+        if path.lower().endswith('.json'):
+            json.dump(config, f, indent=2)
+        else:
+            f.write(dump_config(config))
+
+
+def _stage_key(stage, settings, inputs):
+    """Cache key of a stage: its settings plus the keys of the stages it reads"""
+    blob = json.dumps([stage, settings, inputs], sort_keys=True, default=str)
+    return hashlib.sha1(blob.encode()).hexdigest()
+
+
+class Pipeline:
+    """
+    A config and the cached result of each stage
+
+    run() executes the stages up to a given one, reusing every cached
+    result whose key still matches; ran lists the stages the last run
+    actually executed and timings their seconds. update() changes settings
+    between runs.
+    """
+
+    def __init__(self, config=None):
+        self.config = normalize_config(config)
+        self.ran = []
+        self.timings = {}
+        self.progress = None  # optional callback(path, done, total) for report exports
+        self._cache = {}      # stage -> (key, result)
+
+    @classmethod
+    def from_file(cls, path):
+        return cls(load_config(path))
+
+    def update(self, **sections):
+        """Merge settings into sections, e.g. update(triggers={'threshold': 20})"""
+        config = copy.deepcopy(self.config)
+        for section, settings in sections.items():
+            if section == 'exports':
+                config['exports'] = list(settings)
+            else:
+                config.setdefault(section, {}).update(settings)
+        self.config = normalize_config(config)
+
+    def stage_settings(self, stage):
+        """The settings that key a stage's result"""
+        if stage == 'source':
+            path = self.config['source']['path']
+            if not path:
+                raise ValueError("the pipeline has no source path")
+            stat = os.stat(path)
+            return dict(self.config['source'], path=os.path.abspath(path),
+                        size=stat.st_size, mtime=stat.st_mtime_ns)
+        return self.config[stage]
+
+    def run(self, until='exports'):
+        """
+        Run every stage up to and including until, returning their results
+
+        Results are a dict keyed by stage name.
+        """
+        if until not in STAGES:
+            raise ValueError(f"unknown stage '{until}' (expected one of {', '.join(STAGES)})")
+        self.ran = []
+        self.timings = {}
+        keys, results = {}, {}
+        for stage, inputs in STAGES.items():
+            key = _stage_key(stage, self.stage_settings(stage), [keys[name] for name in inputs])
+            cached = self._cache.get(stage)
+            if cached is not None and cached[0] == key:
+                result = cached[1]
+            else:
+                start = time.perf_counter()
+                result = getattr(self, f'_run_{stage}')(self.config[stage], results)
+                self.timings[stage] = time.perf_counter() - start
+                self.ran.append(stage)
+                if stage not in UNCACHED_STAGES:
+                    self._cache[stage] = (key, result)
+            keys[stage], results[stage] = key, result
+            if stage == until:
+                break
+        return results
+
+    def clear(self):
+        """Drop every cached result"""
+        self._cache.clear()
+
+    # Stages: each gets its settings and the results so far, and must not
+    # modify an earlier stage's result (copy LogData/EventTable first)
+
+    def _run_source(self, settings, results):
+        from ae_io import read_log
+        return read_log(settings['path'], engine=settings['engine'])
+
+    def _run_channels(self, settings, results):
+        frame = results['source']
+        columns = guess_columns(frame.columns)
+        for role, col in settings.items():
+            if col:
+                if col not in frame.columns:
+                    raise ValueError(f"no '{col}' channel for {role.upper()} in the log")
+                columns[role] = col
+        if not columns['time'] or not columns['tps']:
+            raise ValueError("could not find Time and TPS channels, set them under [channels]")
+        return columns
+
+    def _run_clean(self, settings, results):
+        columns = results['channels']
+        log = LogData(results['source'], columns['time'])
+        if settings['enabled']:
+            from ae_clean import clean_log
+            clean_log(log, columns, roles=settings['roles'])
+        return log
+
+    def _run_derivative(self, settings, results):
+        log = results['clean'].copy()
+        tps_col = results['channels']['tps']
+        segments = find_segments(log.time, settings['max_gap'])
+        tps_dot = compute_tps_dot_segmented(log.time, log[tps_col], segments)
+        log.define('TPS_dot', lambda log: tps_dot)
+        return log, segments
+
+    def _run_triggers(self, settings, results):
+        log, segments = results['derivative']
+        return detect_events_segmented(log.time, log['TPS_dot'], segments,
+                                       settings['threshold'], settings['duration'],
+                                       context_s=settings['context'],
+                                       workers=settings['workers'],
+                                       detector=settings['detector'])
+
+    def _run_features(self, settings, results):
+        events = EventTable(results['triggers'].records.copy())
+        if settings['enabled']:
+            from ae_features import add_event_features
+            log, _ = results['derivative']
+            add_event_features(log, events, results['channels'])
+        return events
+
+    def _run_resample(self, settings, results):
+        """(Resampler, DataFrame of the grid) - or None when resampling is off"""
+        if not settings['enabled']:
+            return None
+        from ae_resample import Resampler
+        log, segments = results['derivative']
+        columns = results['channels']
+        hold, linear = settings['hold'] or [], settings['linear'] or []
+        channels = list(settings['channels'] or [col for role, col in columns.items()
+                                                 if role != 'time' and col and col in log])
+        channels += [col for col in hold + linear if col not in channels]
+        missing = [col for col in channels if col not in log]
+        if missing:
+            raise ValueError(f"no channel(s) {', '.join(missing)} to resample")
+        if settings['max_gap'] is None:
+            resampler = Resampler(log, settings['rate'], self.config['derivative']['max_gap'],
+                                  segments)
+        else:
+            resampler = Resampler(log, settings['rate'], settings['max_gap'])
+        methods = dict({col: 'linear' for col in linear}, **{col: 'hold' for col in hold})
+        return resampler, resampler.frame(channels, methods)
+
+    def _run_exports(self, settings, results):
+        log, _ = results['derivative']
+        events, columns = results['features'], results['channels']
+        threshold = self.config['triggers']['threshold']
+        written = []
+        for export in settings:
+            kind, path = export['kind'], export['path']
+            if kind == 'report':
+                from ae_render import export_report
+                progress = None
+                if self.progress:
+                    def progress(done, total, path=path):
+                        self.progress(path, done, total)
+                export_report(log, events, columns, threshold, path,
+                              workers=export['workers'], progress=progress)
+            elif kind == 'events':
+                import pandas as pd
+                pd.DataFrame(events.records).to_csv(path, index=False)
+            elif kind == 'afrmap':
+                from matplotlib.figure import Figure
+                from ae_heatmap import AFRHeatmap, draw_heatmap
+                from ae_core import STOICH_AFR
+                target = STOICH_AFR if export['target'] is None else export['target']
+                heatmap = AFRHeatmap.from_log(log, events, columns, target=target,
+                                              load=export['load'], window=export['window'])
+                fig = Figure(figsize=(10, 6))
+                draw_heatmap(fig, heatmap)
+                fig.savefig(path, dpi=100)
+            elif kind == 'aefuel':
+                from ae_fuel import AEFuel, draw_fuel
+                fuel = AEFuel.from_log(log, events, columns, load=export['load'],
+                                       window=export['window'], squirts=export['squirts'],
+                                       flow=export['flow'],
+                                       max_gap=self.config['derivative']['max_gap'])
+                if path.lower().endswith('.csv'):
+                    fuel.to_csv(path)
+                else:
+                    from matplotlib.figure import Figure
+                    fig = Figure(figsize=(10, 8))
+                    draw_fuel(fig, fuel)
+                    fig.savefig(path, dpi=100)
+            written.append(path)
+        return written
+
+
+def summarize_run(pipeline, results):
+    """One line per stage: ran or cached, its time, and what it produced"""
+    lines = []
+    for stage in STAGES:
+        if stage not in results:
+            break
+        result = results[stage]
+        if stage == 'source':
+            what = f"{len(result)} rows, {len(result.columns)} channels"
+        elif stage == 'channels':
+            what = ', '.join(f"{role}={col}" for role, col in result.items() if col)
+        elif stage == 'clean':
+            what = (f"{len(result.quality)} channel(s) cleaned" if result.quality is not None
+                    else "off")
+        elif stage == 'derivative':
+            what = f"TPS_dot over {len(result[1])} segment(s)"
+        elif stage in ('triggers', 'features'):
+            what = f"{len(result)} events" + (f", {len(result.fields)} fields"
+                                              if stage == 'features' else '')
+        elif stage == 'resample':
+            what = (f"{len(result[0])} points at {result[0].rate:g} Hz, "
+                    f"{len(result[1].columns) - 2} channel(s)" if result else "off")
+        else:
+            what = ', '.join(result) or 'none'
+        status = (f"ran {pipeline.timings[stage]:.2f} s" if stage in pipeline.ran
+                  else 'cached')
+        lines.append(f"  {stage:<11} {status:<12} {what}")
+    return '\n'.join(lines)
@@ -0,0 +1,454 @@
+#!/usr/bin/env python3
+"""
+Headless rendering of AE events
+Draws the same 4-panel layout as the GUI onto any matplotlib Figure, and
+exports every detected event to a multi-page PDF or an HTML index with
+thumbnails using the Agg backend in a pool of worker processes
+"""
+
+import os
+import html
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import numpy as np
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+import matplotlib.image as mpimg
+
+from ae_core import STOICH_AFR, as_log
+
+
+# Default page geometry for exported events
+EXPORT_FIGSIZE = (12, 8)
+EXPORT_DPI = 100
+MAX_PLOT_POINTS = 4000  # per trace - about 3 points per pixel column
+THUMBNAIL_STEP = 4  # keep every 4th pixel in each direction
+PNG_OPTIONS = {'compress_level': 1}  # fast zlib level, files are temporary or local
+
+
+class EventFigure:
+    """
+    The 4-panel event layout, built once and updated in place per event
+
+    Rebuilding the axes and re-running tight_layout dominates the cost of
+    drawing an event, so only the line data, event spans, limits and title
+    change between events.
+    """
+
+    def __init__(self, fig, columns, threshold):
+        self.fig = fig
+        self.columns = dict(columns)
+        self.threshold = threshold
+        self._layout_size = None
+        self._spans = []
+
+        # Clear previous plot
+        fig.clear()
+
+        # Create subplots
+        ax1 = fig.add_subplot(4, 1, 1)
+        ax2 = fig.add_subplot(4, 1, 2, sharex=ax1)
+        ax3 = fig.add_subplot(4, 1, 3, sharex=ax1)
+        ax4 = fig.add_subplot(4, 1, 4, sharex=ax1)
+        ax2_twin = ax2.twinx()
+        self.axes = [ax1, ax2, ax2_twin, ax3, ax4]
+
+        # (axis, column) for every trace, plus the axes that carry an event span
+        self.lines = []
+        self.span_axes = [ax2]
+
+        # Plot RPM
+        if columns.get('rpm'):
+            line, = ax1.plot([], [], 'b-', linewidth=1.5)
+            self.lines.append((line, columns['rpm']))
+            self.span_axes.append(ax1)
+            ax1.set_ylabel('RPM', fontweight='bold')
+            ax1.grid(True, alpha=0.3)
+
+        # Plot TPS and TPS_dot
+        line, = ax2.plot([], [], 'g-', linewidth=1.5, label='TPS')
+        self.lines.append((line, columns['tps']))
+        line, = ax2_twin.plot([], [], 'r--', linewidth=1, label='TPS Rate', alpha=0.7)
+        self.lines.append((line, 'TPS_dot'))
+        ax2_twin.axhline(y=threshold, color='orange', linestyle=':', label='Threshold')
+        ax2.set_ylabel('TPS (%)', fontweight='bold', color='g')
+        ax2_twin.set_ylabel('TPS Rate (%/s)', fontweight='bold', color='r')
+        ax2.tick_params(axis='y', labelcolor='g')
+        ax2_twin.tick_params(axis='y', labelcolor='r')
+        ax2.grid(True, alpha=0.3)
+
+        # Combine legends
+        lines1, labels1 = ax2.get_legend_handles_labels()
+        lines2, labels2 = ax2_twin.get_legend_handles_labels()
+        ax2.legend(lines1 + lines2, labels1 + labels2, loc='upper left')
+
+        # Plot Pulsewidth
+        if columns.get('pw'):
+            line, = ax3.plot([], [], 'm-', linewidth=1.5)
+            self.lines.append((line, columns['pw']))
+            self.span_axes.append(ax3)
+            ax3.set_ylabel('Pulsewidth (ms)', fontweight='bold')
+            ax3.grid(True, alpha=0.3)
+
+        # Plot AFR
+        if columns.get('afr'):
+            line, = ax4.plot([], [], 'c-', linewidth=1.5)
+            self.lines.append((line, columns['afr']))
+            self.span_axes.append(ax4)
+            ax4.set_ylabel('AFR', fontweight='bold')
+            ax4.axhline(y=STOICH_AFR, color='gray', linestyle='--', alpha=0.5,
+                        label=f'Stoich ({STOICH_AFR})')
+            ax4.legend(loc='upper left')
+            ax4.grid(True, alpha=0.3)
+
+        ax4.set_xlabel('Time (s)', fontweight='bold')
+        self.title = fig.suptitle('', fontsize=12, fontweight='bold')
+
+    def matches(self, fig, columns, threshold):
+        """True if this layout can be reused for the given settings"""
+        return (fig is self.fig and dict(columns) == self.columns
+                and threshold == self.threshold)
+
+    def show(self, data, event, event_idx, n_events):
+        """
+        Update the figure to show one event
+
+        data -- LogData, DataFrame or dict of arrays holding the channels and 'TPS_dot'
+        """
+        payload = prepare_event(data, event, self.columns, self.threshold)
+        self.show_prepared(payload, event_idx, n_events)
+
+    def show_prepared(self, payload, event_idx, n_events):
+        """Update the figure from a payload built by prepare_event"""
+        for line, col in self.lines:
+            line.set_data(*payload['traces'][col])
+            line.axes.set_ylim(payload['ylim'][col])
+        self.axes[0].set_xlim(payload['xlim'])
+
+        # Highlight the actual event region
+        for span in self._spans:
+            span.remove()
+        self._spans = [ax.axvspan(*payload['span'], alpha=0.2, color='red')
+                       for ax in self.span_axes]
+
+        # Add title
+        self.title.set_text(
+            f'AE Event {event_idx + 1} of {n_events} - '
+            f'Duration: {payload["duration"]:.2f}s, Max TPS Rate: {payload["max_tps_dot"]:.1f} %/s'
+        )
+
+        # Lay out once per figure size - later events reuse the same margins
+        size = tuple(self.fig.get_size_inches())
+        if size != self._layout_size:
+            self.fig.tight_layout()
+            self._layout_size = size
+
+
+def decimate(x, y, max_points=MAX_PLOT_POINTS):
+    """
+    Min/max decimation of one trace to at most about max_points samples
+
+    Keeps the lowest and highest sample of every bucket, so peaks survive
+    while a 1 kHz log plots as fast as a 20 Hz one. Short traces are
+    returned unchanged (as views).
+    """
+    n = len(y)
+    if n <= max_points:
+        return x, y
+    buckets = max_points // 2
+    size = n // buckets
+    used = size * buckets
+    blocks = y[:used].reshape(buckets, size)
+    base = np.arange(buckets) * size
+    lo = base + np.argmin(blocks, axis=1)
+    hi = base + np.argmax(blocks, axis=1)
+    idx = np.concatenate([np.sort(np.stack([lo, hi]), axis=0).T.ravel(),
+                          np.arange(used, n)])
+    return x[idx], y[idx]
+
+
+def _padded_limits(values):
+    """Axis limits with matplotlib's default 5% margin"""
+    finite = values[np.isfinite(values)]
+    if len(finite) == 0:
+        return (0.0, 1.0)
+    lo, hi = float(finite.min()), float(finite.max())
+    if hi == lo:
+        # Flat trace - open up a small band around the value
+        delta = abs(lo) * 0.05 or 1.0
+        lo, hi = lo - delta, hi + delta
+    pad = (hi - lo) * 0.05
+    return (lo - pad, hi + pad)
+
+
+def prepare_event(data, event, columns, threshold, max_points=MAX_PLOT_POINTS):
+    """
+    Everything needed to show one event, computed without touching a figure
+
+    Returns a payload with decimated (x, y) traces and y limits per
+    channel, the x limits, the event span and the title values. Payloads
+    are plain arrays, so they can be built on a background thread.
+    """
+    log = as_log(data, columns['time'])
+    start, end = int(event['start_idx']), int(event['end_idx'])
+    channels = [columns.get('rpm'), columns['tps'], 'TPS_dot',
+                columns.get('pw'), columns.get('afr')]
+    channels = list(dict.fromkeys(col for col in channels if col))
+    # The window's time range, searched within its rows: a slice (so only
+    # the window is ever copied), and on a log whose time resets only the
+    # samples inside the range
+    bounds = log.time[[start, event['event_start'], event['event_end'], end - 1]]
+    window = log.query(bounds.min(), bounds.max(), channels, rows=(start, end))
+    time = log.time[window.index]
+
+    # Reference lines drawn on an axis also count towards its limits
+    reference = {'TPS_dot': [threshold]}
+    if columns.get('afr'):
+        reference[columns['afr']] = [STOICH_AFR]
+
+    traces = {}
+    ylim = {}
+    for col in channels:
+        y = np.asarray(window.channels[col]).astype(float, copy=False)
+        traces[col] = decimate(time, y, max_points)
+        ylim[col] = _padded_limits(np.concatenate([y, reference.get(col, [])]))
+
+    return {
+        'traces': traces,
+        'ylim': ylim,
+        'xlim': _padded_limits(time),
+        'span': (float(log.time[event['event_start']]), float(log.time[event['event_end']])),
+        'duration': event['duration'],
+        'max_tps_dot': event['max_tps_dot'],
+    }
+
+
+class EventPrefetcher:
+    """
+    Prepares render payloads for the events around the one on screen
+
+    Payloads for events N-radius..N+radius are built on a background thread
+    and kept in a small LRU cache, so navigating only swaps in ready data.
+    Navigation wraps around like the GUI's previous/next buttons.
+    """
+
+    def __init__(self, data, events, columns, threshold, radius=2, cache_size=8,
+                 max_points=MAX_PLOT_POINTS):
+        self.data = as_log(data, columns['time'])
+        self.events = events
+        self.columns = dict(columns)
+        self.threshold = threshold
+        self.radius = radius
+        self.cache_size = max(cache_size, 2 * radius + 1)
+        self.max_points = max_points
+        self._cache = OrderedDict()
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='ae-prefetch')
+
+    def _prepare(self, idx):
+        return prepare_event(self.data, self.events[idx], self.columns,
+                             self.threshold, self.max_points)
+
+    def _store(self, idx, payload):
+        """Add a payload to the LRU cache (lock must be held)"""
+        self._cache[idx] = payload
+        self._cache.move_to_end(idx)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def _load(self, idx):
+        payload = self._prepare(idx)
+        with self._lock:
+            self._store(idx, payload)
+            self._pending.pop(idx, None)
+        return payload
+
+    def get(self, idx):
+        """Payload for one event - cached, in flight, or built right now"""
+        with self._lock:
+            if idx in self._cache:
+                self._cache.move_to_end(idx)
+                return self._cache[idx]
+            future = self._pending.get(idx)
+        if future is not None:
+            return future.result()
+        payload = self._prepare(idx)
+        with self._lock:
+            self._store(idx, payload)
+        return payload
+
+    def prefetch(self, center):
+        """Queue the neighbours of event `center`, nearest first"""
+        n = len(self.events)
+        offsets = [sign * step for step in range(1, self.radius + 1) for sign in (1, -1)]
+        with self._lock:
+            for offset in offsets:
+                idx = (center + offset) % n
+                if idx in self._cache or idx in self._pending:
+                    continue
+                self._pending[idx] = self._executor.submit(self._load, idx)
+
+    def close(self):
+        """Stop the background thread, dropping queued work"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def draw_event(fig, data, event, columns, threshold, event_idx, n_events):
+    """
+    Draw the 4-panel plot of one AE event onto fig
+
+    columns -- dict with 'time', 'rpm', 'tps', 'pw' and 'afr' column names
+    """
+    EventFigure(fig, columns, threshold).show(data, event, event_idx, n_events)
+
+
+# Per-process render state, filled in by _init_worker
+_worker = {}
+
+
+def _init_worker(data, events, columns, threshold, figsize, dpi):
+    """Set up one reusable Agg figure per worker process"""
+    fig = Figure(figsize=figsize, dpi=dpi)
+    FigureCanvasAgg(fig)
+    _worker.update(plot=EventFigure(fig, columns, threshold), data=as_log(data, columns['time']),
+                   events=events)
+
+
+def _render_chunk(indices, out_dir, thumbnails):
+    """Render a batch of events to PNG files using this worker's figure"""
+    plot = _worker['plot']
+    fig = plot.fig
+    events = _worker['events']
+    paths = []
+    for idx in indices:
+        plot.show(_worker['data'], events[idx], idx, len(events))
+        # One Agg draw per event - the PNG and thumbnail both come from its buffer
+        fig.canvas.draw()
+        pixels = np.asarray(fig.canvas.buffer_rgba())
+        path = os.path.join(out_dir, f'event_{idx + 1:05d}.png')
+        mpimg.imsave(path, pixels, pil_kwargs=PNG_OPTIONS)
+        if thumbnails:
+            thumb = pixels[::THUMBNAIL_STEP, ::THUMBNAIL_STEP]
+            mpimg.imsave(os.path.join(out_dir, f'thumb_{idx + 1:05d}.png'), thumb,
+                         pil_kwargs=PNG_OPTIONS)
+        paths.append(path)
+    return paths
+
+
+def render_events(data, events, columns, threshold, out_dir, workers=None,
+                  thumbnails=False, figsize=EXPORT_FIGSIZE, dpi=EXPORT_DPI,
+                  progress=None):
+    """
+    Render every event to out_dir/event_NNNNN.png
+
+    The work is spread across a process pool (workers=None uses every core,
+    workers=1 renders in this process). progress(done, total) is called
+    after each finished batch. Returns the image paths in event order.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    n_events = len(events)
+    if n_events == 0:
+        return []
+
+    # Workers only need the plotted channels, not the whole frame
+    wanted = [columns[role] for role in ('time', 'rpm', 'tps', 'pw', 'afr')
+              if columns.get(role)] + ['TPS_dot']
+    arrays = {col: np.asarray(data[col]) for col in dict.fromkeys(wanted)}
+    init_args = (arrays, events, dict(columns), threshold, figsize, dpi)
+
+    workers = workers or os.cpu_count() or 1
+    workers = min(workers, n_events)
+    chunk = max(1, n_events // (workers * 4))
+    batches = [range(i, min(i + chunk, n_events)) for i in range(0, n_events, chunk)]
+
+    paths = []
+    if workers == 1:
+        _init_worker(*init_args)
+        for batch in batches:
+            paths.extend(_render_chunk(batch, out_dir, thumbnails))
+            if progress:
+                progress(len(paths), n_events)
+        return paths
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=init_args) as pool:
+        futures = [pool.submit(_render_chunk, batch, out_dir, thumbnails)
+                   for batch in batches]
+        for future in futures:
+            paths.extend(future.result())
+            if progress:
+                progress(len(paths), n_events)
+    return paths
+
+
+def write_pdf(image_paths, output, figsize=EXPORT_FIGSIZE, dpi=EXPORT_DPI):
+    """Collect rendered event images into a multi-page PDF"""
+    from matplotlib.backends.backend_pdf import PdfPages
+
+    fig = Figure(figsize=figsize, dpi=dpi)
+    FigureCanvasAgg(fig)
+    with PdfPages(output) as pdf:
+        for path in image_paths:
+            fig.clear()
+            ax = fig.add_axes([0, 0, 1, 1])
+            ax.imshow(mpimg.imread(path))
+            ax.axis('off')
+            pdf.savefig(fig)
+
+
+def write_html(image_paths, events, output, title="AE Event Report"):
+    """Write an HTML index of thumbnails linking to the full-size images"""
+    out_dir = os.path.dirname(os.path.abspath(output))
+    rows = []
+    for idx, (path, event) in enumerate(zip(image_paths, events)):
+        full = os.path.relpath(path, out_dir)
+        thumb = os.path.join(os.path.dirname(full), f'thumb_{idx + 1:05d}.png')
+        caption = (f"Event {idx + 1}: {event['duration']:.2f}s, "
+                   f"max {event['max_tps_dot']:.1f} %/s")
+        rows.append(
+            f'<figure><a href="{html.escape(full)}">'
+            f'<img src="{html.escape(thumb)}" alt="{html.escape(caption)}"></a>'
+            f'<figcaption>{html.escape(caption)}</figcaption></figure>'
+        )
+    with open(output, 'w') as f:
+        f.write(
+            "<!DOCTYPE html>\n<html><head><meta charset=\"utf-8\">"
+            f"<title>{html.escape(title)}</title>"
+            "<style>body{font-family:sans-serif}figure{display:inline-block;margin:8px}"
+            "img{border:1px solid #ccc}</style></head><body>\n"
+            f"<h1>{html.escape(title)}</h1>\n<p>{len(events)} events</p>\n"
+            + "\n".join(rows) +
+            "\n</body></html>\n"
+        )
+
+
+def export_report(data, events, columns, threshold, output, workers=None,
+                  progress=None):
+    """
+    Render every event and write a report to output
+
+    A .pdf output gets one page per event. An .html output gets an index of
+    thumbnails, with the images stored in '<name>_files' next to it.
+    """
+    fmt = os.path.splitext(output)[1].lower()
+    if fmt not in ('.pdf', '.html', '.htm'):
+        raise ValueError(f"Unsupported report format '{fmt}' (use .pdf or .html)")
+
+    if fmt == '.pdf':
+        tmp_dir = tempfile.mkdtemp(prefix='ae_report_')
+        try:
+            paths = render_events(data, events, columns, threshold, tmp_dir,
+                                  workers=workers, progress=progress)
+            write_pdf(paths, output)
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+    else:
+        img_dir = os.path.splitext(output)[0] + '_files'
+        paths = render_events(data, events, columns, threshold, img_dir,
+                              workers=workers, thumbnails=True, progress=progress)
+        write_html(paths, events, output)
+    return output
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Uniform time-base resampling for the AE Analyzer
+Puts jittery, mixed-rate logs on a fixed-rate grid for FFTs, overlays
+across logs and fixed-length feature vectors
+
+Each continuous segment (see find_segments) gets its own grid starting at
+its first sample, so nothing is interpolated across a time reset or gap.
+Channels are resampled with linear interpolation (np.interp) or a
+zero-order hold (the last sample at or before each grid point), chosen per
+channel, in chunks so huge logs never need full-size temporaries. Every
+grid point keeps the raw index it came from, so events found on the grid
+can be shown on the raw data and vice versa.
+"""
+
+import weakref
+import numpy as np
+
+from ae_core import find_segments, MAX_GAP_SECONDS
+from ae_events import EventTable, INDEX_FIELDS
+
+
+RESAMPLE_METHODS = ('linear', 'hold')
+
+# Grid points resampled per chunk
+CHUNK_POINTS = 1 << 20
+
+# Grid and channel cache per LogData, rate and max_gap (see resampler_for).
+# The records never point back to their log, so the weak keys can be freed
+_RESAMPLERS = weakref.WeakKeyDictionary()
+
+
+def default_rate(time):
+    """The log's typical sample rate (Hz): 1 / median positive time step"""
+    dt = np.diff(np.asarray(time, dtype=float))
+    with np.errstate(invalid='ignore'):
+        dt = dt[dt > 0]
+    return 1.0 / float(np.median(dt)) if len(dt) else 1.0
+
+
+def default_method(values):
+    """'hold' for integer and boolean channels (states, flags), else 'linear'"""
+    return 'hold' if np.asarray(values).dtype.kind in 'biu' else 'linear'
+
+
+class Resampler:
+    """
+    A log's uniform grid and its channels resampled onto it
+
+    time is the grid, raw_index the raw sample at or before each grid point
+    and segment the number of each point's entry in segments (the
+    find_segments dicts plus grid_start/grid_stop). channel(col) resamples
+    (and caches) one channel.
+    """
+
+    def __init__(self, log, rate=None, max_gap=MAX_GAP_SECONDS, segments=None):
+        self.log = log
+        self.rate = float(rate) if rate else default_rate(log.time)
+        self.max_gap = max_gap
+        if self.rate <= 0:
+            raise ValueError("resampling rate must be positive")
+        time = log.time
+        segments = find_segments(time, max_gap) if segments is None else segments
+
+        grids, raw_index, segment_ids = [], [], []
+        self.segments = []  # grid start/stop per kept segment
+        points = 0
+        for seg in segments:
+            t0, t1 = seg['t_start'], seg['t_end']
+            if not (np.isfinite(t0) and np.isfinite(t1)):
+                continue  # a lone NaN time stamp
+            # Round-off must not drop a final point that lands on t_end
+            m = int(np.floor((t1 - t0) * self.rate + 1e-9)) + 1
+            grid = t0 + np.arange(m) / self.rate
+            local = time[seg['start']:seg['stop']]
+            grids.append(grid)
+            raw_index.append(np.searchsorted(local, grid, side='right') - 1 + seg['start'])
+            segment_ids.append(np.full(m, len(self.segments), dtype=np.int32))
+            self.segments.append(dict(seg, grid_start=points, grid_stop=points + m))
+            points += m
+
+        def join(parts, dtype):
+            return np.concatenate(parts).astype(dtype, copy=False) if parts else np.zeros(0, dtype)
+
+        self.time = join(grids, float)
+        self.raw_index = join(raw_index, np.int64)
+        self.segment = join(segment_ids, np.int32)
+        self._cache = {}
+
+    def __len__(self):
+        return len(self.time)
+
+    def _state(self):
+        """Everything but the log: the grid and the (shared) channel cache"""
+        return {name: value for name, value in self.__dict__.items() if name != 'log'}
+
+    @classmethod
+    def _bind(cls, log, state):
+        """A Resampler of log over a grid and channel cache from _state()"""
+        resampler = cls.__new__(cls)
+        resampler.__dict__.update(state)
+        resampler.log = log
+        return resampler
+
+    def channel(self, col, method=None):
+        """
+        One channel on the grid ('linear' or 'hold'; default_method if None)
+
+        Results are cached and recomputed only if the log's array for col
+        changes (e.g. a cleaned channel is defined after the first call).
+        """
+        values = self.log[col]
+        method = method or default_method(values)
+        if method not in RESAMPLE_METHODS:
+            raise ValueError(f"unknown method '{method}' (expected one of "
+                             f"{', '.join(RESAMPLE_METHODS)})")
+        cached = self._cache.get((col, method))
+        if cached is not None and cached[0] is values:
+            return cached[1]
+
+        if method == 'hold':
+            out = np.asarray(values)[self.raw_index]
+        else:
+            out = np.empty(len(self))
+            values = np.asarray(values, dtype=float)
+            for seg in self.segments:
+                self._interp_segment(seg, values, out)
+        self._cache[(col, method)] = (self.log[col], out)
+        return out
+
+    def _interp_segment(self, seg, values, out):
+        """np.interp one segment's grid chunk by chunk"""
+        time = self.log.time
+        for start in range(seg['grid_start'], seg['grid_stop'], CHUNK_POINTS):
+            stop = min(start + CHUNK_POINTS, seg['grid_stop'])
+            # Raw samples bracketing this chunk of the grid
+            lo = self.raw_index[start]
+            hi = min(self.raw_index[stop - 1] + 2, seg['stop'])
+            out[start:stop] = np.interp(self.time[start:stop], time[lo:hi], values[lo:hi])
+
+    def channels(self, cols, methods=None):
+        """Dict of resampled channels; methods maps a column to its method"""
+        methods = methods or {}
+        return {col: self.channel(col, methods.get(col)) for col in cols}
+
+    def to_grid(self, raw_index):
+        """Nearest grid point (in the same segment) for raw sample indices"""
+        raw_index = np.asarray(raw_index, dtype=np.int64)
+        if not self.segments:
+            raise ValueError("the log has no valid time stamps to resample")
+        starts = np.array([seg['start'] for seg in self.segments])
+        k = np.clip(np.searchsorted(starts, raw_index, side='right') - 1, 0, None)
+        grid_start = np.array([seg['grid_start'] for seg in self.segments])[k]
+        grid_stop = np.array([seg['grid_stop'] for seg in self.segments])[k]
+        t0 = np.array([seg['t_start'] for seg in self.segments])[k]
+        with np.errstate(invalid='ignore'):
+            offset = np.rint((self.log.time[raw_index] - t0) * self.rate)
+        offset = np.nan_to_num(offset).astype(np.int64)
+        return np.clip(grid_start + offset, grid_start, grid_stop - 1)
+
+    def events_to_raw(self, events):
+        """
+        Events detected on the grid with their indices moved to the raw log
+
+        Starts map to the raw sample at or before the grid point; the
+        exclusive end_idx maps past the raw sample of the last grid point.
+        """
+        records = events.records.copy()
+        for name in INDEX_FIELDS:
+            if name == 'end_idx':
+                records[name] = self.raw_index[records[name] - 1] + 1
+            else:
+                records[name] = self.raw_index[records[name]]
+        return EventTable(records)
+
+    def events_to_grid(self, events):
+        """Raw-log events with their indices moved to the nearest grid points"""
+        records = events.records.copy()
+        for name in INDEX_FIELDS:
+            if name == 'end_idx':
+                records[name] = self.to_grid(records[name] - 1) + 1
+            else:
+                records[name] = self.to_grid(records[name])
+        return EventTable(records)
+
+    def event_traces(self, events, col, before=0.5, after=2.0, method=None):
+        """
+        Fixed-length traces of one channel around every event onset
+
+        Returns (offsets in seconds, array of shape (len(events), points)).
+        Rows are cut from the grid with one fancy index and hold their edge
+        value where the window leaves the event's segment.
+        """
+        values = self.channel(col, method)
+        pre, post = int(round(before * self.rate)), int(round(after * self.rate))
+        offsets = np.arange(-pre, post + 1)
+        onset = self.to_grid(events['event_start'])
+        k = self.segment[onset]
+        first = np.array([seg['grid_start'] for seg in self.segments], dtype=np.int64)[k]
+        last = np.array([seg['grid_stop'] for seg in self.segments], dtype=np.int64)[k] - 1
+        index = np.clip(onset[:, None] + offsets, first[:, None], last[:, None])
+        return offsets / self.rate, values[index]
+
+    def frame(self, cols, methods=None):
+        """pandas DataFrame of the grid: time, resampled channels, raw_index"""
+        import pandas as pd
+
+        data = {self.log.time_col: self.time}
+        data.update(self.channels(cols, methods))
+        data['raw_index'] = self.raw_index
+        return pd.DataFrame(data)
+
+
+def resampler_for(log, rate=None, max_gap=MAX_GAP_SECONDS):
+    """
+    A Resampler for a LogData, rate and max_gap over a cached grid
+
+    Every resampler of the same log, rate and max_gap shares one grid and
+    channel cache, which lives as long as the log does.
+    """
+    rate = float(rate) if rate else default_rate(log.time)
+    per_log = _RESAMPLERS.setdefault(log, {})
+    key = (rate, max_gap)
+    state = per_log.get(key)
+    if state is None:
+        resampler = Resampler(log, rate, max_gap)
+        per_log[key] = resampler._state()
+        return resampler
+    return Resampler._bind(log, state)
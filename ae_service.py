@@ -0,0 +1,387 @@
+#!/usr/bin/env python3
+"""
+Local HTTP/JSON service for the AE Analyzer
+Runs detection jobs for dashboards and scripts without the Tk GUI, using
+only the standard library http.server
+
+    POST /jobs                    {"path": "/logs/run1.csv", "threshold": 10}
+    GET  /jobs                    every job and its status
+    GET  /jobs/<id>               status, summary and segments of one job
+    GET  /jobs/<id>/events        events with features as JSON
+    GET  /jobs/<id>/events?format=arrow   the same as an Arrow IPC stream
+    GET  /jobs/<id>/events?min_duration=0.5&sort=-max_tps_dot
+                                  only events at least 0.5 s long, steepest first
+    GET  /health                  job counts and log cache statistics
+
+Jobs run on a thread pool. Parsed logs are kept in an LRU cache keyed by
+path, size and modification time, concurrent loads of the same file share
+one parse, and a request identical to a queued or running job returns
+that job instead of starting another.
+"""
+
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+import json
+import math
+import os
+import re
+import threading
+import time
+import uuid
+
+from ae_io import read_log, CSV_ENGINES, HAVE_PYARROW
+from ae_core import (guess_columns, analyze_log, LogData, COLUMN_PATTERNS,
+                     CONTEXT_SECONDS, MAX_GAP_SECONDS)
+
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+
+# Parsed logs kept in memory, and finished jobs kept for polling
+LOG_CACHE_SIZE = 8
+MAX_FINISHED_JOBS = 500
+
+# Detection settings a job may set, with their defaults
+JOB_PARAMS = {
+    'threshold': 10.0,
+    'duration': 0.1,
+    'context': CONTEXT_SECONDS,
+    'max_gap': MAX_GAP_SECONDS,
+}
+
+ARROW_STREAM = 'application/vnd.apache.arrow.stream'
+
+
+class LogCache:
+    """
+    LRU cache of parsed log DataFrames
+
+    Entries are keyed by path, size, modification time and engine, so an
+    edited log is parsed again. Threads asking for a file that is already
+    being parsed wait for that parse instead of starting their own.
+    """
+
+    def __init__(self, size=LOG_CACHE_SIZE):
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0
+        self._frames = OrderedDict()
+        self._loading = {}
+        self._lock = threading.Lock()
+
+    def get(self, path, engine='auto'):
+        """DataFrame for a log - cached, being parsed by another thread, or parsed now"""
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        key = (path, stat.st_size, stat.st_mtime_ns, engine)
+
+        with self._lock:
+            if key in self._frames:
+                self._frames.move_to_end(key)
+                self.hits += 1
+                return self._frames[key]
+            future = self._loading.get(key)
+            owner = future is None
+            if owner:
+                future = self._loading[key] = Future()
+                self.misses += 1
+            else:
+                self.shared += 1
+
+        if not owner:
+            return future.result()
+
+        try:
+            frame = read_log(path, engine=engine)
+        except BaseException as e:
+            with self._lock:
+                del self._loading[key]
+            future.set_exception(e)
+            raise
+        with self._lock:
+            self._frames[key] = frame
+            while len(self._frames) > self.size:
+                self._frames.popitem(last=False)
+            del self._loading[key]
+        future.set_result(frame)
+        return frame
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._frames), 'size': self.size, 'hits': self.hits,
+                    'misses': self.misses, 'shared': self.shared}
+
+
+def parse_job_request(body):
+    """Validate a submitted job and fill in defaults (raises ValueError)"""
+    if not isinstance(body, dict):
+        raise ValueError("request body must be a JSON object")
+    path = body.get('path')
+    if not isinstance(path, str) or not path:
+        raise ValueError("'path' is required")
+    if not os.path.isfile(path):
+        raise ValueError(f"no such log file: {path}")
+
+    request = {'path': os.path.abspath(path)}
+    for name, default in JOB_PARAMS.items():
+        value = body.get(name, default)
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise ValueError(f"'{name}' must be a number")
+        request[name] = float(value)
+
+    request['engine'] = body.get('engine', 'auto')
+    if request['engine'] not in CSV_ENGINES:
+        raise ValueError(f"'engine' must be one of {', '.join(CSV_ENGINES)}")
+
+    columns = body.get('columns', {})
+    if not isinstance(columns, dict) or any(
+            role not in COLUMN_PATTERNS or not isinstance(col, str)
+            for role, col in columns.items()):
+        raise ValueError(f"'columns' maps roles ({', '.join(COLUMN_PATTERNS)}) to channel names")
+    request['columns'] = columns
+
+    unknown = set(body) - set(request) - {'columns'}
+    if unknown:
+        raise ValueError(f"unknown field(s): {', '.join(sorted(unknown))}")
+    return request
+
+
+class JobManager:
+    """Queues detection jobs on a thread pool and keeps their results"""
+
+    def __init__(self, workers=4, cache_size=LOG_CACHE_SIZE, keep=MAX_FINISHED_JOBS):
+        self.cache = LogCache(cache_size)
+        self.keep = keep
+        self._jobs = OrderedDict()
+        self._active = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='ae-job')
+
+    def submit(self, request):
+        """
+        Queue a parsed job request, returning (job, created)
+
+        A request identical to a queued or running job returns that job
+        with created False.
+        """
+        key = json.dumps(request, sort_keys=True)
+        with self._lock:
+            if key in self._active:
+                return self._jobs[self._active[key]], False
+            job = {'id': uuid.uuid4().hex[:12], 'status': 'queued', 'request': request,
+                   'submitted': time.time(), 'started': None, 'finished': None,
+                   'error': None, 'columns': None, 'segments': None, 'events': None}
+            self._jobs[job['id']] = job
+            self._active[key] = job['id']
+        self._pool.submit(self._run, job, key)
+        return job, True
+
+    def _run(self, job, key):
+        request = job['request']
+        job['status'] = 'running'
+        job['started'] = time.time()
+        try:
+            from ae_features import add_event_features
+
+            frame = self.cache.get(request['path'], request['engine'])
+            columns = guess_columns(frame.columns)
+            columns.update(request['columns'])
+            if not columns['time'] or not columns['tps']:
+                raise ValueError("could not find Time and TPS columns, set 'columns'")
+
+            log = LogData(frame, columns['time'])
+            segments, events = analyze_log(log, columns['tps'], request['threshold'],
+                                           request['duration'], context_s=request['context'],
+                                           max_gap=request['max_gap'])
+            add_event_features(log, events, columns)
+            job.update(columns=columns, segments=segments, events=events,
+                       finished=time.time(), status='done')
+        except Exception as e:
+            job.update(error=f"{type(e).__name__}: {e}", finished=time.time(),
+                       status='failed')
+        finally:
+            with self._lock:
+                self._active.pop(key, None)
+                self._prune()
+
+    def _prune(self):
+        """Forget the oldest finished jobs beyond self.keep (lock must be held)"""
+        finished = [job_id for job_id, job in self._jobs.items()
+                    if job['status'] in ('done', 'failed')]
+        for job_id in finished[:max(0, len(finished) - self.keep)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs(self):
+        with self._lock:
+            return list(self._jobs.values())
+
+    def counts(self):
+        counts = {'queued': 0, 'running': 0, 'done': 0, 'failed': 0}
+        for job in self.jobs():
+            counts[job['status']] += 1
+        return counts
+
+    def shutdown(self, wait=True):
+        self._pool.shutdown(wait=wait)
+
+
+def _clean(value):
+    """NaN/inf -> None so the output is strict JSON"""
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+
+def job_status(job):
+    """JSON view of a job (without the event rows)"""
+    status = {name: job[name] for name in ('id', 'status', 'request', 'submitted',
+                                           'started', 'finished', 'error', 'columns')}
+    if job['status'] == 'done':
+        status['summary'] = job['events'].summary()
+        status['segments'] = [{name: _clean(value) for name, value in seg.items()}
+                              for seg in job['segments']]
+    return status
+
+
+def select_events(events, query):
+    """
+    Apply the min_duration and sort query parameters to an EventTable
+
+    sort names one event field, with a leading '-' for descending order;
+    ties keep log order. Raises ValueError for a bad value.
+    """
+    min_duration = query.get('min_duration', [None])[0]
+    if min_duration is not None:
+        try:
+            min_duration = float(min_duration)
+        except ValueError:
+            raise ValueError("'min_duration' must be a number") from None
+        events = events.filter(events['duration'] >= min_duration)
+
+    by = query.get('sort', [None])[0]
+    if by is not None:
+        descending = by.startswith('-')
+        by = by.lstrip('-')
+        if by not in events.fields:
+            raise ValueError(f"cannot sort by '{by}' (fields: {', '.join(events.fields)})")
+        events = events.sort(by, descending=descending)
+    return events
+
+
+def events_json(events):
+    """Events and their features as a list of plain dicts"""
+    return [{name: _clean(value) for name, value in event.items()}
+            for event in events.to_dicts()]
+
+
+def events_arrow(events):
+    """Events as an Arrow IPC stream (requires pyarrow)"""
+    import pyarrow as pa
+
+    records = events.records
+    table = pa.table({name: records[name] for name in records.dtype.names})
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    """Routes requests to the JobManager on self.server.manager"""
+
+    server_version = 'AEService/1.0'
+    quiet = False
+
+    def log_message(self, format, *args):
+        if not self.quiet:
+            super().log_message(format, *args)
+
+    def _send(self, status, body, content_type='application/json'):
+        if content_type == 'application/json':
+            body = json.dumps(body, allow_nan=False).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _error(self, status, message):
+        self._send(status, {'error': message})
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        manager = self.server.manager
+
+        if url.path == '/health':
+            return self._send(200, {'status': 'ok', 'jobs': manager.counts(),
+                                    'cache': manager.cache.stats()})
+        if url.path == '/jobs':
+            return self._send(200, [job_status(job) for job in manager.jobs()])
+
+        match = re.fullmatch(r'/jobs/(\w+)(/events)?', url.path)
+        if not match:
+            return self._error(404, f"no such endpoint: {url.path}")
+        job = manager.get(match.group(1))
+        if job is None:
+            return self._error(404, f"no such job: {match.group(1)}")
+        if not match.group(2):
+            return self._send(200, job_status(job))
+
+        if job['status'] != 'done':
+            return self._error(409, f"job is {job['status']}")
+        query = parse_qs(url.query)
+        fmt = query.get('format', ['json'])[0]
+        if fmt not in ('json', 'arrow'):
+            return self._error(400, f"unknown format '{fmt}' (expected json or arrow)")
+        try:
+            events = select_events(job['events'], query)
+        except ValueError as e:
+            return self._error(400, str(e))
+        if fmt == 'json':
+            return self._send(200, {'id': job['id'], 'columns': job['columns'],
+                                    'events': events_json(events)})
+        if not HAVE_PYARROW:
+            return self._error(501, "Arrow output requires pyarrow on the server")
+        return self._send(200, events_arrow(events), ARROW_STREAM)
+
+    def do_POST(self):
+        if urlsplit(self.path).path != '/jobs':
+            return self._error(404, f"no such endpoint: {self.path}")
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            request = parse_job_request(json.loads(self.rfile.read(length) or b'null'))
+        except ValueError as e:  # includes JSONDecodeError
+            return self._error(400, str(e))
+        job, created = self.server.manager.submit(request)
+        self._send(202 if created else 200, job_status(job))
+
+
+def make_server(host=DEFAULT_HOST, port=DEFAULT_PORT, workers=4,
+                cache_size=LOG_CACHE_SIZE, quiet=False):
+    """A ready-to-run ThreadingHTTPServer with its JobManager (port 0 = any free port)"""
+    handler = type('Handler', (ServiceHandler,), {'quiet': quiet})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    server.manager = JobManager(workers=workers, cache_size=cache_size)
+    return server
+
+
+def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, workers=4, cache_size=LOG_CACHE_SIZE):
+    """Run the service until interrupted"""
+    server = make_server(host, port, workers, cache_size)
+    print(f"AE service on http://{server.server_address[0]}:{server.server_address[1]}/ "
+          f"({workers} workers, {cache_size} cached logs) - Ctrl+C to stop")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.manager.shutdown(wait=False)
@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+Similar-event search for the AE Analyzer
+Turns each event into a fixed-length vector of onset-aligned, resampled
+TPS/AFR/PW traces and finds the nearest events with a KD-tree
+
+The tree works on a PCA projection of the vectors (KD-trees lose their
+edge in high dimensions) and the candidates it returns are re-ranked by
+exact distance over the full vectors. A projection never lengthens a
+distance, so the candidate set is widened until it provably holds the
+true nearest neighbours (or reaches MAX_CANDIDATES). scipy's cKDTree is
+used when scipy is installed, otherwise a NumPy KD-tree.
+"""
+
+import heapq
+import importlib.util
+import warnings
+import numpy as np
+
+# scipy is optional - without it the NumPy KDTree below is used
+HAVE_SCIPY = importlib.util.find_spec('scipy') is not None
+
+
+# Channels resampled into each vector, in vector order
+TRACE_ROLES = ('tps', 'afr', 'pw')
+
+# Seconds around the event onset covered by each trace, and samples per trace
+TRACE_WINDOW = (-0.5, 2.0)
+TRACE_POINTS = 16
+
+# Dimensions searched by the tree, candidates re-ranked per neighbour on the
+# first pass, and the most candidates a query widens to
+PCA_COMPONENTS = 8
+OVERSAMPLE = 8
+MAX_CANDIDATES = 50_000
+
+
+def event_vectors(log, events, columns, window=TRACE_WINDOW, points=TRACE_POINTS):
+    """
+    Feature vectors of shape (len(events), len(TRACE_ROLES) * points)
+
+    Each trace is resampled with np.interp on a grid aligned to the event
+    onset. The grid is clamped to the event's plot window, so traces hold
+    their edge value at segment boundaries and the end of the log. Missing
+    channels give NaN.
+    """
+    n = len(events)
+    time = np.asarray(log.time, dtype=float)
+    vectors = np.full((n, len(TRACE_ROLES), points), np.nan, dtype=np.float32)
+    if n == 0:
+        return vectors.reshape(n, -1)
+
+    offsets = np.linspace(window[0], window[1], points)
+    grid = time[events['event_start']][:, None] + offsets
+    first = time[events['start_idx']][:, None]
+    last = time[events['end_idx'] - 1][:, None]
+    grid = np.clip(grid, first, last)
+
+    for r, role in enumerate(TRACE_ROLES):
+        col = columns.get(role)
+        if not col or col not in log:
+            continue
+        values = np.asarray(log[col], dtype=float)
+        if log.monotonic:
+            # One call for every event
+            vectors[:, r] = np.interp(grid, time, values)
+        else:
+            # Time resets: each plot window is monotonic on its own
+            for k, (start, stop) in enumerate(zip(events['start_idx'], events['end_idx'])):
+                vectors[k, r] = np.interp(grid[k], time[start:stop], values[start:stop])
+    return vectors.reshape(n, -1)
+
+
+class KDTree:
+    """
+    Static KD-tree over an (n, d) point array
+
+    Built by median splits on the widest dimension with np.argpartition;
+    every node keeps its bounding box for pruning and leaves are contiguous
+    slices of the reordered points, scanned with one vectorized distance.
+    """
+
+    def __init__(self, points, leaf_size=32):
+        points = np.asarray(points, dtype=float)
+        n = len(points)
+        order = np.arange(n)
+        self.leaf_size = leaf_size
+        lows, highs, bounds, children = [], [], [], []
+
+        def add_node(start, stop):
+            block = points[order[start:stop]]
+            lows.append(block.min(axis=0))
+            highs.append(block.max(axis=0))
+            bounds.append((start, stop))
+            children.append(None)
+            return len(bounds) - 1
+
+        stack = [add_node(0, n)] if n else []
+        while stack:
+            node = stack.pop()
+            start, stop = bounds[node]
+            if stop - start <= leaf_size:
+                continue
+            dim = int(np.argmax(highs[node] - lows[node]))
+            mid = (start + stop) // 2
+            index = order[start:stop]
+            order[start:stop] = index[np.argpartition(points[index, dim], mid - start)]
+            left, right = add_node(start, mid), add_node(mid, stop)
+            children[node] = (left, right)
+            stack.extend((left, right))
+
+        self.order = order
+        self.points = points[order]
+        self.lows = np.array(lows)
+        self.highs = np.array(highs)
+        self.bounds = bounds
+        self.children = children
+
+    def __len__(self):
+        return len(self.points)
+
+    def _box_distance(self, node, x):
+        """Squared distance from x to the bounding box of node"""
+        gap = np.maximum(self.lows[node] - x, 0) + np.maximum(x - self.highs[node], 0)
+        return float(gap @ gap)
+
+    def query(self, x, k=1):
+        """(distances, indices) of the k nearest points, closest first"""
+        x = np.asarray(x, dtype=float)
+        k = min(k, len(self))
+        best_d = np.full(k, np.inf)
+        best_i = np.full(k, -1)
+        if k == 0:
+            return best_d, best_i
+
+        heap = [(self._box_distance(0, x), 0)]
+        while heap:
+            bound, node = heapq.heappop(heap)
+            if bound >= best_d[-1]:
+                break  # nothing left can beat the current k-th neighbour
+            if self.children[node] is None:
+                start, stop = self.bounds[node]
+                diff = self.points[start:stop] - x
+                d = np.einsum('ij,ij->i', diff, diff)
+                d = np.concatenate([best_d, d])
+                i = np.concatenate([best_i, np.arange(start, stop)])
+                keep = np.argsort(d, kind='stable')[:k]
+                best_d, best_i = d[keep], i[keep]
+            else:
+                for child in self.children[node]:
+                    child_bound = self._box_distance(child, x)
+                    if child_bound < best_d[-1]:
+                        heapq.heappush(heap, (child_bound, child))
+
+        found = best_i >= 0
+        return np.sqrt(best_d[found]), self.order[best_i[found]]
+
+
+def build_tree(points, leaf_size=32):
+    """scipy's cKDTree when installed, else the NumPy KDTree"""
+    if HAVE_SCIPY:
+        from scipy.spatial import cKDTree
+        return cKDTree(points, leafsize=leaf_size)
+    return KDTree(points, leaf_size)
+
+
+class SimilarityIndex:
+    """
+    k-nearest-neighbour search over event vectors
+
+    Each trace is centred on its mean over all events and every channel is
+    scaled by its own spread, so TPS (%) and AFR differences weigh alike
+    (missing values become the mean). Standardized vectors are projected
+    onto their first PCA components for the tree, and the tree's candidates
+    are re-ranked by distance over the full standardized vectors. keys
+    (e.g. catalog (log_id, idx) pairs) label the rows in results.
+    """
+
+    def __init__(self, vectors, keys=None, channels=len(TRACE_ROLES),
+                 components=PCA_COMPONENTS, leaf_size=32, sample=100_000, seed=0):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        n, dim = vectors.shape
+        with warnings.catch_warnings():
+            # 'Mean of empty slice' for a channel no log recorded
+            warnings.simplefilter('ignore', RuntimeWarning)
+            self.mean = np.nan_to_num(np.nanmean(vectors, axis=0)).astype(np.float32)
+            centred = (vectors - self.mean).reshape(n, channels, -1)
+            scale = np.nan_to_num(np.sqrt(np.nanmean(centred ** 2, axis=(0, 2))))
+        scale = np.where(scale > 0, scale, 1)
+        self.scale = np.repeat(scale, dim // channels).astype(np.float32)
+        self.vectors = self.standardize(vectors)
+        self.keys = np.arange(n) if keys is None else np.asarray(keys)
+
+        # PCA basis from a random sample, enough to fix the main directions
+        rows = self.vectors
+        if n > sample:
+            rows = rows[np.random.default_rng(seed).choice(n, sample, replace=False)]
+        if n:
+            _, _, vt = np.linalg.svd(rows.astype(float), full_matrices=False)
+            self.basis = vt[:min(components, len(vt))].T
+        else:
+            self.basis = np.zeros((dim, 0))
+        self.tree = build_tree(self.vectors @ self.basis, leaf_size)
+
+    def __len__(self):
+        return len(self.vectors)
+
+    def standardize(self, vectors):
+        """Scale raw vectors like the indexed ones (NaN -> 0, the mean)"""
+        z = (np.asarray(vectors, dtype=np.float32) - self.mean) / self.scale
+        return np.nan_to_num(z, nan=0.0)
+
+    def query(self, vector, k=10, oversample=OVERSAMPLE, max_candidates=MAX_CANDIDATES,
+              exclude=()):
+        """
+        The k nearest indexed events to one raw vector
+
+        Returns (rows, keys, distances), closest first. Rows whose key is in
+        exclude (e.g. the query event itself) are skipped.
+        """
+        n = len(self)
+        z = self.standardize(np.asarray(vector)[None])[0]
+        point = z @ self.basis
+        exclude = {_key(key) for key in exclude}
+        wanted = k + len(exclude)
+        candidates = min(n, max(wanted * oversample, wanted))
+
+        while True:
+            projected, rows = self.tree.query(point, candidates)
+            projected, rows = np.atleast_1d(projected), np.atleast_1d(rows)
+            valid = rows < n  # cKDTree pads missing neighbours with n
+            projected, rows = projected[valid], rows[valid]
+
+            diff = self.vectors[rows] - z
+            distances = np.sqrt(np.einsum('ij,ij->i', diff, diff))
+            order = np.argsort(distances, kind='stable')
+            rows, distances = rows[order], distances[order]
+            if exclude:
+                keep = np.array([_key(key) not in exclude for key in self.keys[rows]],
+                                dtype=bool)
+                rows, distances = rows[keep], distances[keep]
+
+            # Every point outside the candidate radius is at least that far
+            # away in full, so the result is exact once the k-th distance fits
+            exact = len(distances) >= k and distances[k - 1] <= projected[-1]
+            if exact or candidates >= min(n, max_candidates):
+                break
+            candidates = min(n, max_candidates, candidates * 4)
+        return rows[:k], self.keys[rows[:k]], distances[:k]
+
+
+def _key(key):
+    """Hashable form of a key row"""
+    return tuple(np.atleast_1d(key).tolist())
+
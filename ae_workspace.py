@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Multi-log workspace for the AE Analyzer
+Keeps several open logs, each with its own pipeline (column mapping,
+settings, cached stages) and events, within a memory budget
+
+Parsed data is the expensive part, so when the loaded logs exceed the
+budget the least recently viewed ones are evicted: their pipeline caches
+are dropped but the entry keeps its metadata, settings, events and the
+event being viewed. Activating an evicted log runs its pipeline again,
+which rereads the file and redetects with the same settings.
+"""
+
+from collections import OrderedDict
+import os
+
+from ae_pipeline import Pipeline
+
+
+DEFAULT_BUDGET_MB = 1024
+MB = 1 << 20
+
+
+class WorkspaceLog:
+    """
+    One open log: its pipeline plus what survives eviction
+
+    name, rows and channels describe the log; events and segments are
+    the last detection and current_event the event on screen. loaded is
+    False once the parsed data has been evicted.
+    """
+
+    def __init__(self, path, engine='auto'):
+        self.path = os.path.abspath(path)
+        self.name = os.path.basename(path)
+        self.pipeline = Pipeline({'source': {'path': self.path, 'engine': engine}})
+        self.rows = None
+        self.channels = ()
+        self.events = None
+        self.segments = []
+        self.current_event = 0
+        self.detected = False
+        self.loaded = False
+        self.nbytes = 0
+
+    def run(self, until):
+        """Run the pipeline up to a stage and refresh the kept metadata"""
+        results = self.pipeline.run(until)
+        frame = results['source']
+        self.rows = len(frame)
+        self.channels = tuple(str(col) for col in frame.columns)
+        if 'triggers' in results:
+            self.segments = results['derivative'][1]
+            self.events = results['triggers']
+            self.detected = True
+        # The latest log in the results shares the frame and carries every
+        # derived channel computed before it
+        if 'derivative' in results:
+            self.nbytes = results['derivative'][0].nbytes
+        elif 'clean' in results:
+            self.nbytes = results['clean'].nbytes
+        else:
+            self.nbytes = int(frame.memory_usage(index=True).sum())
+        self.loaded = True
+        return results
+
+    def evict(self):
+        """Drop the parsed data, keeping settings, events and metadata"""
+        self.pipeline.clear()
+        self.loaded = False
+        self.nbytes = 0
+
+
+class Workspace:
+    """
+    Open logs in least- to most-recently used order
+
+    activate() makes a log current, reloading it if it was evicted, and
+    run() runs the current log's pipeline; both then evict other logs until
+    the loaded ones fit in budget bytes. The current log is never evicted,
+    so a single log larger than the budget still opens.
+    """
+
+    def __init__(self, budget=DEFAULT_BUDGET_MB * MB):
+        self.budget = budget
+        self.logs = OrderedDict()  # path -> WorkspaceLog
+        self.evictions = 0
+        self.reloads = 0
+
+    def __len__(self):
+        return len(self.logs)
+
+    def __iter__(self):
+        return iter(self.logs.values())
+
+    def get(self, path):
+        return self.logs.get(os.path.abspath(path))
+
+    def open(self, path, engine='auto'):
+        """Open (or switch to) a log, returning (entry, results)"""
+        entry = self.get(path)
+        if entry is None:
+            entry = WorkspaceLog(path, engine)
+            self.logs[entry.path] = entry
+        else:
+            entry.pipeline.update(source={'engine': engine})
+        return entry, self.activate(entry)
+
+    def activate(self, entry):
+        """
+        Make a log the most recently used and return its pipeline results
+
+        An evicted log is transparently reloaded, and detected again if it
+        had been detected before.
+        """
+        if not entry.loaded and entry.rows is not None:
+            self.reloads += 1
+        self.logs.move_to_end(entry.path)
+        return self.run(entry, 'triggers' if entry.detected else 'source')
+
+    def run(self, entry, until):
+        """Run a log's pipeline up to a stage, then enforce the budget"""
+        results = entry.run(until)
+        self._enforce(keep=entry)
+        return results
+
+    def close(self, entry):
+        """Forget a log entirely"""
+        entry.evict()
+        self.logs.pop(entry.path, None)
+
+    def set_budget(self, budget):
+        self.budget = budget
+        if self.logs:
+            self._enforce(keep=next(reversed(self.logs.values())))
+
+    @property
+    def loaded_bytes(self):
+        return sum(entry.nbytes for entry in self.logs.values())
+
+    def _enforce(self, keep):
+        for entry in list(self.logs.values()):
+            if self.loaded_bytes <= self.budget:
+                break
+            if entry is not keep and entry.loaded:
+                entry.evict()
+                self.evictions += 1
+
+    def stats(self):
+        """Open and loaded counts, memory use and eviction/reload totals"""
+        return {'open': len(self.logs),
+                'loaded': sum(entry.loaded for entry in self.logs.values()),
+                'bytes': self.loaded_bytes, 'budget': self.budget,
+                'evictions': self.evictions, 'reloads': self.reloads}
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Benchmark the .aelog archive format in ae_archive against CSV
+Compares file size and full-read time per codec, plus the time to read
+one short window from the archive
+"""
+
+import os
+import sys
+import time
+import tempfile
+import numpy as np
+import pandas as pd
+
+import ae_io
+import ae_archive
+
+
+def make_log(path, rows, extra_channels=20):
+    """Write a synthetic ECU-like CSV log: smooth channels at logger resolution"""
+    rng = np.random.default_rng(0)
+    t = np.arange(rows) * 0.01
+    phase = np.arange(rows) % 500
+    frame = {
+        'Time': t.round(3),
+        'RPM': (2500 + 1500 * np.sin(t / 7) + rng.normal(0, 20, rows)).round(0),
+        'TPS': np.where(phase < 50, phase * 1.5, 5.0).round(1),
+        'PW': (3 + np.sin(t / 5) + rng.normal(0, 0.02, rows)).round(3),
+        'AFR': (14.7 + 0.5 * np.sin(t / 3) + rng.normal(0, 0.05, rows)).round(1),
+        'Status': (phase < 50).astype(int),
+    }
+    for i in range(extra_channels):
+        frame[f'Channel{i}'] = (50 + 10 * np.sin(t / (i + 2)) + rng.normal(0, 0.1, rows)).round(2)
+    pd.DataFrame(frame).to_csv(path, index=False)
+
+
+def best_of(func, repeats=3):
+    """Best-of-N wall time of func()"""
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    sizes = [int(s) for s in sys.argv[1:]] or [100_000, 1_000_000]
+    codecs = [codec for codec in ae_archive.CODECS
+              if codec != 'zstd' or ae_archive.HAVE_ZSTD]
+
+    print("=" * 70)
+    print("Archive Benchmark")
+    print(f"codecs: {', '.join(codecs)} (zstd needs zstandard); "
+          f"pyarrow available: {ae_io.HAVE_PYARROW}")
+    print("=" * 70)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in sizes:
+            csv_path = os.path.join(tmp, f'log_{rows}.csv')
+            make_log(csv_path, rows)
+            csv_size = os.path.getsize(csv_path)
+            frame = ae_io.read_log_csv(csv_path)
+            duration = frame['Time'].iloc[-1]
+            t0 = duration / 2
+            print(f"\n{rows:,} rows, {len(frame.columns)} channels")
+            print(f"  {'format':<22} {'MB':>8} {'ratio':>7} {'read (s)':>9} "
+                  f"{'10 s window (ms)':>17}")
+
+            for engine in ('pandas', 'pyarrow'):
+                if engine == 'pyarrow' and not ae_io.HAVE_PYARROW:
+                    continue
+                t = best_of(lambda: ae_io.read_log_csv(csv_path, engine=engine))
+                print(f"  {'csv ' + engine:<22} {csv_size / 1e6:8.1f} {1.0:7.1f} {t:9.3f}")
+
+            for codec in codecs:
+                path = os.path.join(tmp, f'log_{rows}_{codec}.aelog')
+                start = time.perf_counter()
+                ae_archive.write_archive(frame, path, codec=codec)
+                written = time.perf_counter() - start
+                size = os.path.getsize(path)
+                reader = ae_archive.ArchiveReader(path)
+                t = best_of(reader.read)
+                w = best_of(lambda: reader.read_window(t0, t0 + 10))
+                print(f"  {'aelog ' + codec:<22} {size / 1e6:8.1f} {csv_size / size:7.1f} "
+                      f"{t:9.3f} {w * 1000:17.1f}   (written in {written:.1f} s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Query latency of the SQLite log catalog
+Fills a catalog with synthetic logs and events (no CSV parsing involved)
+and times typical searches against the indexed event table
+"""
+
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+
+from ae_catalog import open_catalog, write_record, query_events, DEFAULT_PARAMS, EVENT_COLUMNS
+from ae_similarity import TRACE_ROLES, TRACE_POINTS
+
+VECTOR_SIZE = len(TRACE_ROLES) * TRACE_POINTS
+
+QUERIES = {
+    'cold-start stabs': ['max_tps_dot > 200', 'rpm < 3000', 'clt < 40'],
+    'long events': ['duration > 0.8'],
+    'lean spikes': ['afr_max > 16', 'map > 80'],
+    'top 50 overall': [],
+}
+
+
+# Uniform (low, high) range of each synthetic event column
+RANGES = {
+    'duration': (0.1, 1.0), 'max_tps_dot': (10, 600), 't_start': (0, 1800),
+    'rpm': (700, 7000), 'clt': (0, 95), 'map': (20, 100), 'tps_start': (0, 50),
+    'tps_end': (50, 100), 'afr_min': (10, 14), 'afr_max': (14, 18), 'pw_max': (1, 15),
+}
+
+
+def fill_catalog(conn, logs, events_per_log):
+    """Write synthetic records in one transaction"""
+    rng = np.random.default_rng(0)
+    names = EVENT_COLUMNS[1:]
+    low = np.array([RANGES.get(name, (0, 0))[0] for name in names])
+    high = np.array([RANGES.get(name, (0, 0))[1] for name in names])
+    for k in range(logs):
+        values = rng.uniform(low, high, (events_per_log, len(names)))
+        vectors = rng.normal(size=(events_per_log, VECTOR_SIZE)).astype(np.float32)
+        events = [(i,) + tuple(row) + (vector.tobytes(),)
+                  for i, (row, vector) in enumerate(zip(values.tolist(), vectors))]
+        write_record(conn, {
+            'path': f'/logs/car{k % 20}/log{k:05d}.csv', 'size': 0, 'mtime': 0.0,
+            'rows': 100_000, 'duration': 1800.0, 'segments': 1, 'params': DEFAULT_PARAMS,
+            'columns': {}, 'channels': ['Time', 'RPM', 'TPS', 'CLT', 'MAP'],
+            'events': events, 'error': None})
+    conn.commit()
+
+
+def main():
+    logs = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    events_per_log = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+
+    print("=" * 70)
+    print(f"Catalog query latency: {logs:,} logs x {events_per_log} events")
+    print("=" * 70)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = os.path.join(tmp, 'catalog.sqlite')
+        conn = open_catalog(db)
+        start = time.perf_counter()
+        fill_catalog(conn, logs, events_per_log)
+        print(f"Filled in {time.perf_counter() - start:.1f} s, "
+              f"{os.path.getsize(db) / 1e6:.1f} MB on disk\n")
+
+        for name, conditions in QUERIES.items():
+            times = []
+            for _ in range(5):
+                start = time.perf_counter()
+                rows = query_events(conn, conditions, limit=50)
+                times.append(time.perf_counter() - start)
+            print(f"  {name:<20} {len(rows):>4} rows  best {min(times) * 1000:8.2f} ms")
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
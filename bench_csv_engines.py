@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Benchmark the CSV ingestion engines in ae_io
+Compares pandas and pyarrow across file sizes and pyarrow thread counts
+(the benchmark owns its process, so it sizes Arrow's CPU pool for each run)
+"""
+
+import os
+import sys
+import time
+import tempfile
+import numpy as np
+import pandas as pd
+
+import ae_io
+
+
+def make_log(path, rows, extra_channels=20):
+    """Write a synthetic MegaSquirt-like CSV log with the given number of rows"""
+    rng = np.random.default_rng(0)
+    t = np.arange(rows) * 0.05
+    frame = {
+        'Time': t,
+        'RPM': 1000 + 3000 * rng.random(rows),
+        'TPS': 100 * rng.random(rows),
+        'PW': 2 + 8 * rng.random(rows),
+        'AFR': 12 + 4 * rng.random(rows),
+    }
+    for i in range(extra_channels):
+        frame[f'Channel{i}'] = rng.random(rows)
+    pd.DataFrame(frame).to_csv(path, index=False, float_format='%.4f')
+
+
+def time_read(path, repeats=3, **kwargs):
+    """Best-of-N wall time for one read_log_csv configuration"""
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        ae_io.read_log_csv(path, **kwargs)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    sizes = [int(s) for s in sys.argv[1:]] or [10_000, 100_000, 1_000_000]
+    thread_counts = [1, 2, 4, os.cpu_count() or 1]
+    channels = ['Time', 'RPM', 'TPS', 'PW', 'AFR']
+
+    print("=" * 70)
+    print("CSV Engine Benchmark")
+    print(f"pyarrow available: {ae_io.HAVE_PYARROW}")
+    print("=" * 70)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in sizes:
+            path = os.path.join(tmp, f'log_{rows}.csv')
+            make_log(path, rows)
+            size_mb = os.path.getsize(path) / 1e6
+            print(f"\n{rows:,} rows ({size_mb:.1f} MB)")
+
+            base = time_read(path, engine='pandas')
+            print(f"  {'pandas':<28} {base:8.3f} s")
+            base_sel = time_read(path, engine='pandas', channels=channels)
+            print(f"  {'pandas (5 channels)':<28} {base_sel:8.3f} s")
+
+            if not ae_io.HAVE_PYARROW:
+                continue
+            import pyarrow as pa
+            default_pool = pa.cpu_count()
+            try:
+                for threads in sorted(set(thread_counts)):
+                    pa.set_cpu_count(threads)
+                    t = time_read(path, engine='pyarrow', use_threads=threads > 1)
+                    print(f"  {f'pyarrow x{threads}':<28} {t:8.3f} s  ({base / t:4.1f}x)")
+            finally:
+                pa.set_cpu_count(default_pool)
+            t = time_read(path, engine='pyarrow', channels=channels)
+            print(f"  {'pyarrow (5 channels)':<28} {t:8.3f} s  ({base_sel / t:4.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Memory profile of adding TPS_dot to a large log
+Compares writing TPS_dot into the DataFrame (the old detect_ae_events)
+with the lazily derived channel in LogData. Peak allocations are traced
+with tracemalloc and reported relative to the size of the raw frame.
+"""
+
+import sys
+import tracemalloc
+import numpy as np
+import pandas as pd
+
+from ae_core import LogData, analyze_log, compute_tps_dot
+from ae_render import prepare_event
+
+
+def make_frame(rows, channels):
+    """Synthetic log: Time, TPS and a block of float channels"""
+    rng = np.random.default_rng(0)
+    frame = {'Time': np.arange(rows) * 0.05,
+             'TPS': np.abs(np.sin(np.arange(rows) / 200.0)) * 80}
+    block = rng.random((rows, channels))
+    for i in range(channels):
+        frame[f'Channel{i}'] = block[:, i]
+    # Build from a single block first so the frame starts consolidated
+    return pd.DataFrame(frame)
+
+
+def traced(func):
+    """Peak bytes allocated while running func"""
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def old_path(frame):
+    """TPS_dot written into the frame, then the frame sliced per event"""
+    tps_dot = compute_tps_dot(frame['Time'].values, frame['TPS'].values)
+    frame['TPS_dot'] = tps_dot
+    # What the old plot_event did for each event
+    frame.iloc[1000:1200]
+
+
+def new_path(frame):
+    """TPS_dot as a derived channel, windows read as views"""
+    log = LogData(frame, 'Time')
+    segments, events = analyze_log(log, 'TPS', 10.0, 0.1)
+    columns = {'time': 'Time', 'rpm': None, 'tps': 'TPS', 'pw': None, 'afr': None}
+    for event in events[:20]:
+        prepare_event(log, event, columns, 10.0)
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+    channels = int(sys.argv[2]) if len(sys.argv) > 2 else 40
+
+    print("=" * 70)
+    print(f"Derived channel memory profile: {rows:,} rows x {channels + 2} channels")
+    print("=" * 70)
+
+    frame = make_frame(rows, channels)
+    frame_mb = frame.memory_usage(index=False).sum() / 1e6
+    column_mb = rows * 8 / 1e6
+    print(f"Raw frame: {frame_mb:.1f} MB, one float column: {column_mb:.1f} MB\n")
+
+    for name, func in (("DataFrame column (old)", old_path),
+                       ("LogData derived channel", new_path)):
+        # The old path mutates its frame, so give it a private copy up front
+        target = frame.copy(deep=True) if func is old_path else frame
+        peak = traced(lambda: func(target))
+        peak_mb = peak / 1e6
+        verdict = "no full-frame allocation" if peak_mb < frame_mb / 2 else "FULL-FRAME COPY"
+        print(f"  {name:<26} peak {peak_mb:8.1f} MB "
+              f"= {peak_mb / frame_mb:5.2f} x frame, {peak_mb / column_mb:6.1f} columns  ({verdict})")
+
+
+if __name__ == "__main__":
+    main()
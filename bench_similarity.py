@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Similar-event index benchmark
+Builds SimilarityIndex over synthetic clustered event vectors of growing
+size and reports build time, kNN query time, brute-force query time and
+recall against an exact brute-force search over the full vectors
+"""
+
+import sys
+import time
+import numpy as np
+
+from ae_similarity import SimilarityIndex, HAVE_SCIPY, TRACE_ROLES, TRACE_POINTS
+
+K = 10
+QUERIES = 50
+
+
+def make_vectors(n, templates=200, seed=0):
+    """Event vectors scattered around a set of trace templates"""
+    rng = np.random.default_rng(seed)
+    dim = len(TRACE_ROLES) * TRACE_POINTS
+    # Smooth random traces, like resampled sensor channels
+    shapes = np.cumsum(rng.normal(size=(templates, dim)), axis=1).astype(np.float32)
+    vectors = shapes[rng.integers(0, templates, n)]
+    # Event-to-event variation is mostly smooth (offsets, drift) plus sensor noise
+    vectors += np.cumsum(rng.normal(scale=0.3, size=(n, dim)), axis=1, dtype=np.float32)
+    vectors += rng.normal(scale=0.05, size=(n, dim)).astype(np.float32)
+    return vectors
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10_000, 100_000, 1_000_000]
+    tree = "scipy cKDTree" if HAVE_SCIPY else "NumPy KDTree"
+
+    print("=" * 78)
+    print(f"Similar-event index ({tree}), k={K}, {QUERIES} queries per size")
+    print("=" * 78)
+    print(f"{'events':>10} {'build (s)':>10} {'query (ms)':>11} {'brute (ms)':>11} "
+          f"{'speedup':>8} {'recall':>7}")
+
+    for n in sizes:
+        vectors = make_vectors(n)
+        start = time.perf_counter()
+        index = SimilarityIndex(vectors)
+        build = time.perf_counter() - start
+
+        rng = np.random.default_rng(1)
+        queries = vectors[rng.integers(0, n, QUERIES)] + rng.normal(
+            scale=0.05, size=(QUERIES, vectors.shape[1])).astype(np.float32)
+
+        start = time.perf_counter()
+        found = [index.query(q, k=K)[0] for q in queries]
+        query_ms = (time.perf_counter() - start) / QUERIES * 1000
+
+        start = time.perf_counter()
+        exact = []
+        for q in queries:
+            diff = index.vectors - index.standardize(q[None])[0]
+            exact.append(np.argsort(np.einsum('ij,ij->i', diff, diff))[:K])
+        brute_ms = (time.perf_counter() - start) / QUERIES * 1000
+
+        recall = np.mean([len(np.intersect1d(f, e)) / K for f, e in zip(found, exact)])
+        print(f"{n:>10,} {build:>10.2f} {query_ms:>11.2f} {brute_ms:>11.2f} "
+              f"{brute_ms / query_ms:>7.1f}x {recall:>7.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Cold start benchmark for the AE Analyzer
+Times fresh interpreters importing each entry point, checks that the
+library and CLI never load tkinter, and (when a display is available)
+measures time to first window paint and to a ready plot area
+"""
+
+import os
+import statistics
+import subprocess
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# name -> code run in a fresh interpreter; it must print elapsed seconds
+CASES = {
+    'import ae_core (library)': "import ae_core",
+    'import ae_cli (CLI)': "import ae_cli",
+    'import ae_analyzer (GUI module)': "import ae_analyzer",
+    'eager pandas + mpl TkAgg (old cost)':
+        "import pandas, matplotlib.pyplot, matplotlib.backends.backend_tkagg",
+}
+
+TIMER = """
+import time, sys
+start = time.perf_counter()
+{code}
+elapsed = time.perf_counter() - start
+print(elapsed, 'tkinter' in sys.modules, 'pandas' in sys.modules, 'matplotlib' in sys.modules)
+"""
+
+GUI_TIMER = """
+import time
+start = time.perf_counter()
+import tkinter as tk
+from ae_analyzer import AEAnalyzer
+root = tk.Tk()
+app = AEAnalyzer(root)
+root.update()
+painted = time.perf_counter() - start
+while app.canvas is None:
+    root.update()
+    time.sleep(0.005)
+print(painted, time.perf_counter() - start)
+root.destroy()
+"""
+
+
+def run(code):
+    """Run code in a fresh interpreter from the repo directory, return its output"""
+    result = subprocess.run([sys.executable, '-c', code], cwd=HERE,
+                            capture_output=True, text=True, check=True)
+    return result.stdout.split()
+
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+
+    print("=" * 78)
+    print(f"Cold start benchmark (median of {repeats} fresh interpreters)")
+    print("=" * 78)
+    print(f"{'case':<38} {'time':>8}  {'tkinter':>8} {'pandas':>7} {'mpl':>5}")
+
+    for name, code in CASES.items():
+        times = []
+        for _ in range(repeats):
+            elapsed, tk_loaded, pd_loaded, mpl_loaded = run(TIMER.format(code=code))
+            times.append(float(elapsed))
+        print(f"{name:<38} {statistics.median(times) * 1000:6.0f} ms  "
+              f"{tk_loaded:>8} {pd_loaded:>7} {mpl_loaded:>5}")
+
+    if sys.platform != 'win32' and not os.environ.get('DISPLAY'):
+        print("\nNo display - skipping the GUI first-paint measurement")
+        return
+
+    painted, ready = [], []
+    for _ in range(repeats):
+        first, plot = run(GUI_TIMER)
+        painted.append(float(first))
+        ready.append(float(plot))
+    print(f"\nGUI window first paint: {statistics.median(painted) * 1000:6.0f} ms")
+    print(f"GUI plot area ready:    {statistics.median(ready) * 1000:6.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Test the added-fuel estimate: the baseline fit, per-event residuals
+against a per-event reference, and the CLI and pipeline exports
+"""
+
+import os
+import sys
+import tempfile
+import numpy as np
+import pandas as pd
+
+from ae_core import LogData, guess_columns, analyze_log
+from ae_fuel import AEFuel, BaselineModel, outside_windows
+from ae_pipeline import Pipeline
+from ae_cli import main as cli_main
+
+ENRICHMENT_MS = 1.5
+
+
+def make_log(n=30000, stab_every=1000):
+    """100 Hz log: PW is a quadratic in RPM and MAP plus a fixed AE pulse after each stab"""
+    rng = np.random.default_rng(3)
+    t = np.arange(n) * 0.01
+    phase = np.arange(n) % stab_every
+    rpm = 2500 + 900 * np.sin(t / 7)
+    map_kpa = 55 + 25 * np.sin(t / 4.3)
+    base = 0.8 + 0.0005 * rpm + 0.02 * map_kpa + 0.00008 * map_kpa ** 2
+    enrichment = np.where((phase >= 5) & (phase < 45), ENRICHMENT_MS, 0.0)
+    tps = np.where(phase < 20, phase * 3.0, 0.0) + 10.0
+    return pd.DataFrame({
+        'Time': t, 'RPM': rpm, 'MAP': map_kpa, 'TPS': tps,
+        'PW': base + enrichment + rng.normal(0, 0.01, n), 'AFR': 14.7,
+    }), enrichment
+
+
+def detect(frame):
+    log = LogData(frame, 'Time')
+    columns = guess_columns(frame.columns)
+    segments, events = analyze_log(log, columns['tps'], 10.0, 0.1)
+    return log, columns, events
+
+
+def test_baseline_recovers_enrichment():
+    """The fit explains steady state and the residual is the injected AE pulse"""
+    frame, enrichment = make_log()
+    log, columns, events = detect(frame)
+    fuel = AEFuel.from_log(log, events, columns, window='context', flow=4.0)
+    assert fuel.model.r2 > 0.99 and fuel.model.rmse < 0.02
+    assert len(fuel) == len(events) == 30
+
+    # Known added open time: 1.5 ms for 40 samples at RPM/120 injections per second
+    rpm = frame['RPM'].to_numpy()
+    expected = np.array([np.sum(enrichment[s:e] * rpm[s:e] / 120 * 0.01)
+                         for s, e in zip(events['start_idx'], events['end_idx'])])
+    assert np.allclose(fuel['added_open_ms'], expected, rtol=0.05)
+    assert np.allclose(fuel['added_pw_peak'], ENRICHMENT_MS, atol=0.05)
+    assert np.allclose(fuel['added_fuel_mg'], 4.0 * fuel['added_open_ms'])
+    print(f"✓ Baseline R² {fuel.model.r2:.4f}, added open time within 5% "
+          f"({expected.mean():.1f} ms per event)")
+
+
+def test_vectorized_matches_per_event_loop():
+    """Every event's figures match a plain per-event loop over the same model"""
+    frame, _ = make_log(n=12000, stab_every=700)
+    log, columns, events = detect(frame)
+    fuel = AEFuel.from_log(log, events, columns, load='map', window='after', squirts=2)
+
+    rpm, load, pw = (frame[c].to_numpy() for c in ('RPM', 'MAP', 'PW'))
+    dt = np.nan_to_num(np.diff(frame['Time'].to_numpy(), append=np.nan))  # last sample: 0
+    steady = outside_windows(len(frame), events)
+    model = BaselineModel.fit(rpm[steady], load[steady], pw[steady])
+    assert np.allclose(model.coef, fuel.model.coef)
+    for k, event in enumerate(events):
+        s, e = event['event_start'], event['end_idx']
+        residual = pw[s:e] - model.predict(rpm[s:e], load[s:e])
+        assert np.isclose(fuel['added_pw'][k], residual.mean())
+        assert np.isclose(fuel['added_pw_peak'][k], residual.max())
+        assert np.isclose(fuel['added_open_ms'][k], np.sum(residual * rpm[s:e] / 60 * dt[s:e]))
+    print(f"✓ {len(events)} events match the per-event reference")
+
+
+def test_cli_and_pipeline_export():
+    """aefuel writes the per-event table and plot; the pipeline export matches it"""
+    frame, _ = make_log(n=10000)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'run.csv')
+        frame.to_csv(path, index=False)
+        table, image = os.path.join(tmp, 'fuel.csv'), os.path.join(tmp, 'fuel.png')
+        assert cli_main(['aefuel', path, '--table', table, '-o', image, '--flow', '3']) == 0
+        written = pd.read_csv(table)
+        assert len(written) == 10 and os.path.getsize(image) > 0
+        assert (written['added_fuel_mg'] > 0).all()
+
+        exported = os.path.join(tmp, 'pipeline.csv')
+        Pipeline({'source': {'path': path},
+                  'exports': [{'kind': 'aefuel', 'path': exported, 'flow': 3.0}]}).run()
+        assert np.allclose(pd.read_csv(exported)['added_fuel_mg'], written['added_fuel_mg'])
+
+        try:
+            log, columns, events = detect(frame.drop(columns=['PW']))
+            AEFuel.from_log(log, events, columns)
+            assert False, "missing PW accepted"
+        except ValueError:
+            pass
+    print("✓ CLI table and plot, pipeline export")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("AE Fuel Tests")
+    print("=" * 60)
+    ok = True
+    for test in (test_baseline_recovers_enrichment, test_vectorized_matches_per_event_loop,
+                 test_cli_and_pipeline_export):
+        try:
+            test()
+        except AssertionError as e:
+            print(f"✗ {test.__name__} failed: {e}")
+            ok = False
+    sys.exit(0 if ok else 1)
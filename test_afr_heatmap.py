@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Test the AFR error heatmap over RPM x load during AE windows
+"""
+
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+
+from ae_core import LogData, analyze_log
+from ae_heatmap import AFRHeatmap, window_indices, RPM_EDGES, LOAD_EDGES
+from ae_cli import main as cli_main
+
+COLUMNS = {'time': 'Time', 'rpm': 'RPM', 'tps': 'TPS', 'map': 'MAP', 'afr': 'AFR'}
+
+
+def _frame(n_events=40, period=200):
+    """Stabs at a new RPM each time; AFR goes lean above 3000 RPM"""
+    i = np.arange(n_events * period)
+    phase = i % period
+    tps = np.where(phase < 20, phase * 4.0, 80 * np.exp(-(phase - 20) / 50.0))
+    rpm = 1000 + (i // period % 8) * 500 + tps * 5
+    afr = 14.7 + np.where(rpm > 3000, 1.0, -0.5) * (tps > 5)
+    return pd.DataFrame({'Time': i * 0.01, 'RPM': rpm, 'TPS': tps, 'MAP': 30 + tps,
+                         'AFR': afr, 'AFR Target': np.full(len(i), 13.0)})
+
+
+def test_bins_match_histogram2d():
+    """Counts equal np.histogram2d and drill-down finds the contributing events"""
+    frame = _frame()
+    log = LogData(frame, 'Time')
+    _, events = analyze_log(log, 'TPS', 10.0, 0.1)
+    heatmap = AFRHeatmap.from_log(log, events, COLUMNS)
+
+    index, owners = window_indices(events, 'after')
+    assert np.all(np.diff(owners) >= 0)
+    assert index[0] == events[0]['event_start'] and len(index) == np.sum(
+        events['end_idx'] - events['event_start'])
+    expected, _, _ = np.histogram2d(frame['RPM'].to_numpy()[index], frame['MAP'].to_numpy()[index],
+                                    bins=[RPM_EDGES, LOAD_EDGES['map']])
+    assert np.array_equal(heatmap.count, expected)
+    assert heatmap.samples == len(index) and heatmap.events == len(events)
+
+    # Lean above 3000 RPM at load, rich below
+    lean = heatmap.cell_at(3600, 100)
+    rich = heatmap.cell_at(1600, 100)
+    assert heatmap.mean[lean] > 0.5 and heatmap.mean[rich] < -0.2
+
+    # Context windows reach into the next stab, so drill down on the runs alone
+    during = AFRHeatmap.from_log(log, events, COLUMNS, window='event')
+    contributors = during.cell_events(*lean)
+    assert sum(row['samples'] for row in contributors) == during.count[lean]
+    assert len(contributors) == during.event_count[lean] > 0
+    starts_rpm = frame['RPM'].to_numpy()[events['event_start']]
+    assert all(3500 <= starts_rpm[row['event']] < 4000 for row in contributors)
+    print(f"✓ {heatmap.samples} samples binned like histogram2d, "
+          f"lean cell has {len(contributors)} events")
+
+
+def test_target_channel_and_windows():
+    """A target channel replaces the fixed target; windows select samples"""
+    log = LogData(_frame(), 'Time')
+    _, events = analyze_log(log, 'TPS', 10.0, 0.1)
+    fixed = AFRHeatmap.from_log(log, events, COLUMNS, target=13.0)
+    channel = AFRHeatmap.from_log(log, events, COLUMNS, target='AFR Target')
+    assert np.allclose(fixed.mean, channel.mean, equal_nan=True)
+    assert channel.describe_target() == 'AFR Target'
+
+    sizes = {window: AFRHeatmap.from_log(log, events, COLUMNS, window=window).samples
+             for window in ('event', 'after', 'context')}
+    assert sizes['event'] < sizes['after'] < sizes['context']
+    tps_load = AFRHeatmap.from_log(log, events, COLUMNS, load='tps')
+    assert tps_load.shape == (len(RPM_EDGES) - 1, len(LOAD_EDGES['tps']) - 1)
+
+    for bad in ({'target': 'missing'}, {'window': 'all'}):
+        try:
+            AFRHeatmap.from_log(log, events, COLUMNS, **bad)
+            assert False, f"accepted {bad}"
+        except ValueError:
+            pass
+    try:
+        AFRHeatmap.from_log(log, events, dict(COLUMNS, map=None))
+        assert False, "accepted a missing MAP channel"
+    except ValueError as e:
+        assert 'MAP' in str(e)
+    print(f"✓ Target channel, windows {sizes} and TPS load")
+
+
+def test_windows_skip_time_glitches():
+    """On non-monotonic time a window drops samples outside its time range"""
+    frame = _frame()
+    _, events = analyze_log(LogData(frame, 'Time'), 'TPS', 10.0, 0.1)
+    clean, clean_owners = window_indices(events, 'after')
+
+    # A logger glitch stamps one sample inside the first window with time 0
+    glitch = int(events[0]['event_start']) + 5
+    frame.loc[glitch, 'Time'] = 0.0
+    log = LogData(frame, 'Time')
+    assert not log.monotonic
+    index, owners = window_indices(events, 'after', log)
+    assert glitch in clean and glitch not in index
+    assert np.array_equal(index, clean[clean != glitch])
+    assert np.array_equal(owners, clean_owners[clean != glitch])
+    assert AFRHeatmap.from_log(log, events, COLUMNS).samples < len(clean)
+    print(f"✓ Glitched sample {glitch} left out of its window")
+
+
+def test_millions_of_samples():
+    """Binning a million window samples stays interactive"""
+    rng = np.random.default_rng(0)
+    n = 2_000_000
+    owners = np.repeat(np.arange(n // 200), 200)
+    start = time.perf_counter()
+    heatmap = AFRHeatmap(rng.uniform(0, 8000, n), rng.uniform(0, 250, n),
+                         rng.normal(0, 1, n), owners)
+    elapsed = time.perf_counter() - start
+    assert heatmap.count.sum() == n
+    assert heatmap.event_count.max() <= n // 200
+    assert elapsed < 2.0, f"{elapsed:.2f} s"
+    print(f"✓ {n:,} samples binned in {elapsed * 1000:.0f} ms")
+
+
+def test_cli_afrmap():
+    """The afrmap command lists cells and writes the image and CSV"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'log.csv')
+        _frame().to_csv(path, index=False)
+        image, cells = os.path.join(tmp, 'map.png'), os.path.join(tmp, 'cells.csv')
+        assert cli_main(['afrmap', path, '--target', 'AFR Target', '-o', image,
+                         '--cells', cells]) == 0
+        assert os.path.getsize(image) > 0
+        table = pd.read_csv(cells)
+        assert {'rpm_lo', 'load_lo', 'samples', 'events', 'mean_error'} <= set(table.columns)
+    print(f"✓ CLI afrmap wrote {len(table)} cells and an image")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("AFR Heatmap Tests")
+    print("=" * 60)
+    ok = True
+    for test in (test_bins_match_histogram2d, test_target_channel_and_windows,
+                 test_windows_skip_time_glitches, test_millions_of_samples, test_cli_afrmap):
+        try:
+            test()
+        except AssertionError as e:
+            print(f"✗ {test.__name__} failed: {e}")
+            ok = False
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Test the .aelog archive format: lossless round trips, time-window reads
+that decode only the chunks they need, and loading archives like CSV logs
+"""
+
+import os
+import sys
+import tempfile
+import numpy as np
+import pandas as pd
+
+from ae_archive import (ArchiveReader, write_archive, import_log, is_archive,
+                        CODECS, HAVE_ZSTD)
+from ae_io import read_log, read_log_csv
+from ae_pipeline import Pipeline
+from ae_cli import main as cli_main
+
+
+def make_frame(n=5000):
+    """Mixed channels: logged decimals, full-precision floats, NaN, ints, bools, text"""
+    rng = np.random.default_rng(1)
+    t = np.arange(n) * 0.01
+    phase = np.arange(n) % 200
+    afr = (14.7 + rng.normal(0, 0.3, n)).round(1)
+    afr[100:110] = np.nan
+    return pd.DataFrame({
+        'Time': t.round(2),
+        'RPM': (2500 + 300 * np.sin(t)).round(0),
+        'TPS': np.where(phase < 20, phase * 3.0, 0.0),
+        'AFR': afr,
+        'MAP': rng.normal(60, 5, n),  # full precision: stored by XOR
+        'Gear': (np.arange(n) // 1000).astype(np.int64),
+        'Status': phase < 20,
+        'Note': np.where(phase == 0, 'stab', ''),
+    })
+
+
+def assert_same(a, b):
+    assert list(a.columns) == list(b.columns)
+    for col in a.columns:
+        x, y = a[col].to_numpy(), b[col].to_numpy()
+        assert x.dtype == y.dtype, (col, x.dtype, y.dtype)
+        if x.dtype.kind == 'f':
+            assert np.array_equal(x, y, equal_nan=True), col
+        else:
+            assert list(x) == list(y), col
+
+
+def test_round_trip_is_lossless():
+    """Every channel reads back bit for bit, in small and default chunks"""
+    frame = make_frame()
+    with tempfile.TemporaryDirectory() as tmp:
+        for chunk_rows in (777, 1 << 14):
+            path = os.path.join(tmp, f'log{chunk_rows}.aelog')
+            write_archive(frame, path, chunk_rows=chunk_rows)
+            assert is_archive(path)
+            reader = ArchiveReader(path)
+            assert len(reader) == 5000 and reader.time_col == 'Time'
+            assert_same(reader.read(), frame)
+            assert_same(reader.read(['AFR', 'Time']), frame[['AFR', 'Time']])
+        size = os.path.getsize(path)
+    print(f"✓ Lossless round trip of {len(frame.columns)} channels ({size / 1e3:.0f} kB)")
+
+
+def test_window_decodes_only_overlapping_chunks():
+    """A time window reads the chunks whose index range overlaps it, and no others"""
+    frame = make_frame(20000)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'log.aelog')
+        write_archive(frame, path, chunk_rows=1000)
+        reader = ArchiveReader(path)
+        chunks = reader.chunks_for(52.5, 57.5)
+        assert chunks == [5]
+        window = reader.read_window(52.5, 57.5, ['Time', 'TPS'])
+        expected = frame[(frame['Time'] >= 52.5) & (frame['Time'] <= 57.5)]
+        assert_same(window.reset_index(drop=True),
+                    expected[['Time', 'TPS']].reset_index(drop=True))
+
+        # Only the first chunk's blobs are valid: any other read would fail
+        first = reader.chunks[0]['blobs']
+        end = max(offset + length for offset, length in first)
+        with open(path, 'r+b') as f:
+            f.seek(end)
+            f.write(b'\xff' * (reader.chunks[-1]['blobs'][-1][0] - end))
+        window = ArchiveReader(path).read_window(0.0, 5.0)
+        assert len(window) == 501
+    print(f"✓ 5 s window decoded from {len(chunks)} of {len(reader.chunks)} chunks")
+
+
+def test_every_codec():
+    """zlib and lzma (and zstd when installed) round-trip; an unknown codec is refused"""
+    frame = make_frame(3000)
+    sizes = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for codec in CODECS:
+            if codec == 'zstd' and not HAVE_ZSTD:
+                continue
+            path = os.path.join(tmp, f'{codec}.aelog')
+            write_archive(frame, path, codec=codec)
+            assert_same(ArchiveReader(path).read(), frame)
+            sizes[codec] = os.path.getsize(path)
+        try:
+            write_archive(frame, os.path.join(tmp, 'bad.aelog'), codec='brotli')
+            assert False, "unknown codec accepted"
+        except ValueError:
+            pass
+    print("✓ Codecs: " + ", ".join(f"{codec} {size / 1e3:.0f} kB"
+                                   for codec, size in sizes.items()))
+
+
+def test_import_and_load_like_csv():
+    """Imported archives load through read_log, the pipeline and the CLI"""
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, 'run.csv')
+        make_frame().drop(columns=['Note']).to_csv(csv_path, index=False)
+        assert cli_main(['archive', 'import', csv_path, '-o', os.path.join(tmp, 'out')]) == 0
+        path = os.path.join(tmp, 'out', 'run.aelog')
+        assert_same(read_log(path), read_log_csv(csv_path))
+        assert os.path.getsize(path) < os.path.getsize(csv_path)
+
+        archived = Pipeline({'source': {'path': path}}).run('features')
+        csv = Pipeline({'source': {'path': csv_path}}).run('features')
+        assert len(archived['features']) == len(csv['features']) > 0
+        assert np.array_equal(archived['triggers'].records, csv['triggers'].records)
+
+        output, index = import_log(csv_path, codec='lzma')
+        assert output == os.path.join(tmp, 'run.aelog') and index['source'] == 'run.csv'
+        assert cli_main(['archive', 'window', output, '--start', '1', '--end', '2',
+                         '-o', os.path.join(tmp, 'w.csv')]) == 0
+        assert len(pd.read_csv(os.path.join(tmp, 'w.csv'))) == 101
+    print(f"✓ Archive detects the same {len(csv['triggers'])} events as the CSV")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Archive Format Tests")
+    print("=" * 60)
+    ok = True
+    for test in (test_round_trip_is_lossless, test_window_decodes_only_overlapping_chunks,
+                 test_every_codec, test_import_and_load_like_csv):
+        try:
+            test()
+        except AssertionError as e:
+            print(f"✗ {test.__name__} failed: {e}")
+            ok = False
+    sys.exit(0 if ok else 1)
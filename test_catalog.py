@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Test the SQLite log catalog and per-event features
+"""
+
+import os
+import sys
+import tempfile
+import numpy as np
+import pandas as pd
+
+from ae_core import LogData, analyze_log
+from ae_features import event_features, window_reduce
+from ae_catalog import (open_catalog, scan_directory, query_events, parse_conditions,
+                        catalog_summary)
+from ae_cli import main as cli_main
+
+
+def _log(clt, rpm=1500.0, n_events=4, period=100):
+    """Log with one throttle stab every `period` samples at 20 Hz"""
+    n = n_events * period
+    i = np.arange(n)
+    tps = np.where(i % period < 10, (i % period) * 8.0, 5.0)
+    return pd.DataFrame({
+        'Time': i * 0.05,
+        'RPM': rpm + tps * 10,
+        'TPS': tps,
+        'PW': 2 + tps / 10,
+        'AFR': 14.7 - tps / 50,
+        'CLT': np.full(n, clt),
+    })
+
+
+def _library(root):
+    """Cold/warm and low/high RPM logs in nested folders, plus a broken file"""
+    os.makedirs(os.path.join(root, 'cold'))
+    os.makedirs(os.path.join(root, 'warm', 'track'))
+    _log(clt=20.0).to_csv(os.path.join(root, 'cold', 'idle.csv'), index=False)
+    _log(clt=20.0, rpm=4000.0).to_csv(os.path.join(root, 'cold', 'rev.csv'), index=False)
+    _log(clt=85.0).to_csv(os.path.join(root, 'warm', 'track', 'lap.CSV'), index=False)
+    with open(os.path.join(root, 'warm', 'notes.csv'), 'w') as f:
+        f.write("when,what\nmonday,oil change\n")
+
+
+def test_features_match_loop():
+    """Vectorized event features equal a per-event Python loop"""
+    data = _log(clt=40.0)
+    data.loc[15, 'AFR'] = np.nan  # a dropout inside the first event
+    log = LogData(data, 'Time')
+    columns = {'time': 'Time', 'rpm': 'RPM', 'tps': 'TPS', 'pw': 'PW', 'afr': 'AFR',
+               'clt': 'CLT', 'map': None}
+    _, events = analyze_log(log, 'TPS', 10.0, 0.1)
+    features = event_features(log, events, columns)
+
+    for k, event in enumerate(events):
+        window = slice(event['event_start'], event['event_end'] + 1)
+        assert features['rpm'][k] == data['RPM'][event['event_start']]
+        assert features['clt'][k] == 40.0
+        assert features['afr_min'][k] == np.nanmin(data['AFR'][window])
+        assert features['pw_max'][k] == np.max(data['PW'][window])
+    assert np.all(np.isnan(features['map']))
+    assert len(window_reduce(np.fmax, np.arange(5), [], [])) == 0
+    print(f"✓ Features of {len(events)} events match the loop (NaN-safe)")
+
+
+def test_scan_and_query():
+    """Scan records every log and conditions select the right events"""
+    with tempfile.TemporaryDirectory() as root:
+        _library(root)
+        conn = open_catalog(os.path.join(root, 'catalog.sqlite'))
+        result = scan_directory(conn, root, workers=2)
+        assert result == {'found': 4, 'scanned': 4, 'failed': 1, 'removed': 0}
+        assert catalog_summary(conn) == {'logs': 4, 'failed': 1, 'events': 12}
+
+        cold_low = query_events(conn, parse_conditions("max_tps_dot > 100, rpm < 3000 and clt < 40"))
+        assert {os.path.basename(row['path']) for row in cold_low} == {'idle.csv'}
+        assert len(cold_low) == 4
+
+        with_clt = query_events(conn, channel='CLT', order_by='t_start', descending=False)
+        assert len(with_clt) == 12 and with_clt[0]['t_start'] <= with_clt[-1]['t_start']
+        assert with_clt[0]['columns']['clt'] == 'CLT'
+        assert with_clt[0]['params']['threshold'] == 10.0
+
+        try:
+            query_events(conn, ["rpm; DROP TABLE logs < 1"])
+            assert False, "bad condition accepted"
+        except ValueError:
+            pass
+        conn.close()
+    print(f"✓ 4 logs cataloged, cold low-RPM query found {len(cold_low)} events")
+
+
+def test_rescan_is_incremental():
+    """Unchanged logs are skipped, changed and deleted logs are picked up"""
+    with tempfile.TemporaryDirectory() as root:
+        _library(root)
+        conn = open_catalog(os.path.join(root, 'catalog.sqlite'))
+        scan_directory(conn, root, workers=1)
+        assert scan_directory(conn, root, workers=1)['scanned'] == 0
+
+        lap = os.path.join(root, 'warm', 'track', 'lap.CSV')
+        _log(clt=85.0, n_events=2).to_csv(lap, index=False)
+        os.utime(lap, (0, 12345))
+        os.remove(os.path.join(root, 'cold', 'rev.csv'))
+        result = scan_directory(conn, root, workers=1)
+        assert result['scanned'] == 1 and result['removed'] == 1
+        assert catalog_summary(conn)['events'] == 6
+
+        # New detection settings invalidate every log
+        assert scan_directory(conn, root, workers=1, threshold=50.0)['scanned'] == 3
+        conn.close()
+    print("✓ Rescan skipped unchanged logs, refreshed 1 and dropped 1")
+
+
+def test_cli_catalog():
+    """The catalog sub-commands scan and query from the command line"""
+    with tempfile.TemporaryDirectory() as root:
+        _library(root)
+        db = os.path.join(root, 'catalog.sqlite')
+        assert cli_main(['catalog', 'scan', root, '--db', db, '--workers', '1']) == 0
+        assert cli_main(['catalog', 'query', '--db', db, '-w', 'clt > 50']) == 0
+    print("✓ CLI catalog scan and query")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Catalog Tests")
+    print("=" * 60)
+    ok = True
+    for test in (test_features_match_loop, test_scan_and_query, test_rescan_is_incremental,
+                 test_cli_catalog):
+        try:
+            test()
+        except AssertionError as e:
+            print(f"✗ {test.__name__} failed: {e}")
+            ok = False
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Test cached MLG conversion: content-hash caching, background jobs with
+progress, cancellation and timeouts
+
+mlg-converter needs Node.js, so the tests run a small Python stand-in
+that "converts" by copying its input to <name>.csv, as the real one does.
+"""
+
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+
+import ae_convert
+from ae_convert import MLGCache, MLGConverter, conversion_timeout, BASE_TIMEOUT_SECONDS
+from ae_io import read_log
+
+CONVERTER_SCRIPT = '''
+import os, sys, time
+source = sys.argv[-1]
+with open({calls!r}, 'a') as f:
+    f.write(source + "\\n")
+if {fail!r}:
+    sys.stderr.write("bad MLG header\\n")
+    sys.exit(1)
+with open(source, 'rb') as f:
+    data = f.read()
+with open(os.path.splitext(source)[0] + '.csv', 'wb') as out:
+    for i in range(0, len(data), 4096):
+        out.write(data[i:i + 4096])
+        out.flush()
+        time.sleep({delay!r})
+'''
+
+
+def make_cache(tmp, delay=0.0, fail=False):
+    """An MLGCache whose converter is the stand-in script; returns (cache, calls file)"""
+    calls = os.path.join(tmp, 'calls.txt')
+    script = os.path.join(tmp, 'fake_converter.py')
+    with open(script, 'w') as f:
+        f.write(CONVERTER_SCRIPT.format(calls=calls, fail=fail, delay=delay))
+    return MLGCache(os.path.join(tmp, 'cache'), command=[sys.executable, script]), calls
+
+
+def write_mlg(path, n=2000, seed=0):
+    rng = np.random.default_rng(seed)
+    pd.DataFrame({'Time': np.arange(n) * 0.01, 'RPM': rng.integers(800, 6000, n),
+                  'TPS': rng.random(n) * 100}).to_csv(path, index=False)
+
+
+def count_calls(calls):
+    if not os.path.exists(calls):
+        return 0
+    with open(calls) as f:
+        return len(f.readlines())
+
+
+def test_each_content_converted_once():
+    """Same content under any name or path converts once, and nothing lands beside it"""
+    with tempfile.TemporaryDirectory() as tmp:
+        cache, calls = make_cache(tmp)
+        logs = os.path.join(tmp, 'logs')
+        os.makedirs(logs)
+        first = os.path.join(logs, 'run1.mlg')
+        write_mlg(first)
+        csv = cache.convert(first)
+        assert os.path.dirname(csv) == cache.cache_dir
+        assert sorted(os.listdir(logs)) == ['run1.mlg']
+        assert cache.cached(first) == csv
+
+        copy = os.path.join(logs, 'copy of run1.mlg')
+        with open(first, 'rb') as src, open(copy, 'wb') as dst:
+            dst.write(src.read())
+        phases = []
+        assert cache.convert(copy) == csv
+        assert cache.convert(first, progress=lambda *p: phases.append(p[0])) == csv
+        assert count_calls(calls) == 1 and phases == []  # indexed: not even hashed
+        assert MLGCache(cache.cache_dir, cache.command).cached(copy) == csv  # index persists
+
+        write_mlg(first, seed=1)  # changed content converts again
+        os.utime(first, ns=(1, 1))
+        assert cache.convert(first) != csv and count_calls(calls) == 2
+        assert cache.stats()['logs'] == 2
+    print("✓ Content-hash cache: one conversion per content, nothing beside the MLG")
+
+
+def test_parallel_jobs_with_progress():
+    """Several background conversions report progress and finish"""
+    with tempfile.TemporaryDirectory() as tmp:
+        cache, calls = make_cache(tmp, delay=0.01)
+        paths = []
+        for i in range(3):
+            paths.append(os.path.join(tmp, f'run{i}.mlg'))
+            write_mlg(paths[-1], seed=i)
+        converter = MLGConverter(cache, workers=2)
+        jobs = [converter.submit(path) for path in paths]
+        assert converter.submit(paths[0]) is jobs[0]
+        seen = set()
+        while any(job.active for job in jobs):
+            seen.update(job.describe().split(',')[0] for job in jobs)
+            time.sleep(0.01)
+        converter.shutdown()
+        assert [job.status for job in jobs] == ['done'] * 3
+        assert 'converting' in seen
+        for job, path in zip(jobs, paths):
+            assert pd.read_csv(job.result()).equals(pd.read_csv(path))
+        assert count_calls(calls) == 3
+    print(f"✓ 3 jobs on 2 workers, progress seen: {', '.join(sorted(seen))}")
+
+
+def test_cancel_timeout_and_failure():
+    """Cancelled and timed-out conversions are killed and leave no cache entry"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'big.mlg')
+        write_mlg(path, n=20000)
+        cache, calls = make_cache(tmp, delay=0.2)
+        converter = MLGConverter(cache, workers=1)
+
+        job = converter.submit(path)
+        while job.status != 'converting':
+            time.sleep(0.01)
+        start = time.perf_counter()
+        job.cancel()
+        while job.active:
+            time.sleep(0.01)
+        assert job.status == 'cancelled' and time.perf_counter() - start < 2
+
+        job = converter.submit(path, timeout=0.5)
+        while job.active:
+            time.sleep(0.01)
+        assert job.status == 'failed' and 'more than' in job.error
+        assert cache.stats()['logs'] == 0
+        assert os.listdir(cache.cache_dir) == ['index.json']  # work folders removed
+        converter.shutdown()
+
+        os.makedirs(os.path.join(tmp, 'failing'))
+        failing, _ = make_cache(os.path.join(tmp, 'failing'), fail=True)
+        job = MLGConverter(failing).submit(path)
+        while job.active:
+            time.sleep(0.01)
+        assert job.status == 'failed' and 'bad MLG header' in job.error
+
+        assert conversion_timeout(0) == BASE_TIMEOUT_SECONDS
+        assert conversion_timeout(200 << 20) > 10 * BASE_TIMEOUT_SECONDS
+    print("✓ Cancel and size-scaled timeout kill the converter; errors are reported")
+
+
+def test_read_log_uses_cache():
+    """read_log opens MLG files through the shared conversion cache"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'run.mlg')
+        write_mlg(path)
+        saved = ae_convert._default_cache
+        ae_convert._default_cache, calls = make_cache(tmp)
+        try:
+            first = read_log(path)
+            again = read_log(path)
+        finally:
+            ae_convert._default_cache = saved
+        assert len(first) == 2000 and first.equals(again)
+        assert count_calls(calls) == 1
+
+        # A failed conversion reports the converter's own reason
+        os.makedirs(os.path.join(tmp, 'failing'))
+        ae_convert._default_cache, _ = make_cache(os.path.join(tmp, 'failing'), fail=True)
+        try:
+            read_log(path)
+            assert False, "failed conversion accepted"
+        except ValueError as e:
+            assert 'bad MLG header' in str(e)
+        finally:
+            ae_convert._default_cache = saved
+    print("✓ read_log converts an MLG once and reports conversion errors")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("MLG Conversion Tests")
+    print("=" * 60)
+    ok = True
+    for test in (test_each_content_converted_once, test_parallel_jobs_with_progress,
+                 test_cancel_timeout_and_failure, test_read_log_uses_cache):
+        try:
+            test()
+        except AssertionError as e:
+            print(f"✗ {test.__name__} failed: {e}")
+            ok = False
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Test the CSV ingestion engines in ae_io
+Both engines must produce the same columns and values for the same file
+"""
+
+import os
+import sys
+import tempfile
+import numpy as np
+import pandas as pd
+
+import ae_io
+
+
+def _write_semicolon_csv(path):
+    with open(path, 'w') as f:
+        f.write("Time;RPM;TPS;PW;AFR\n")
+        f.write("0.00;1000;5.2;2.1;14.7\n")
+        f.write("0.05;1020;5.5;2.1;14.6\n")
+
+
+def test_separator_detection():
+    """Comma and semicolon files are told apart from the header"""
+    assert ae_io.detect_separator('sample_data.csv') == ','
+    print("✓ sample_data.csv detected as comma-separated")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'semi.csv')
+        _write_semicolon_csv(path)
+        assert ae_io.detect_separator(path) == ';'
+        data = ae_io.read_log_csv(path, engine='pandas')
+        assert list(data.columns) == ['Time', 'RPM', 'TPS', 'PW', 'AFR']
+        print("✓ Semicolon file parsed into 5 columns")
+
+
+def test_pandas_engine():
+    """The pandas engine reads the sample file like pd.read_csv"""
+    data = ae_io.read_log_csv('sample_data.csv', engine='pandas')
+    expected = pd.read_csv('sample_data.csv')
+    assert list(data.columns) == list(expected.columns)
+    assert np.allclose(data.values, expected.values)
+    print(f"✓ pandas engine: {data.shape}")
+
+
+def test_selected_channels_are_float():
+    """Selected channels are loaded with an explicit float64 schema"""
+    channels = ['Time', 'RPM', 'TPS']
+    for engine in ('pandas', 'pyarrow'):
+        if engine == 'pyarrow' and not ae_io.HAVE_PYARROW:
+            continue
+        data = ae_io.read_log_csv('sample_data.csv', engine=engine, channels=channels)
+        assert list(data.columns) == channels
+        assert all(data[col].dtype == np.float64 for col in channels)
+        print(f"✓ {engine} engine: selected channels are float64")
+
+
+def test_pyarrow_matches_pandas():
+    """The pyarrow engine produces the same frame as the pandas engine"""
+    if not ae_io.HAVE_PYARROW:
+        print("  pyarrow not installed - skipping comparison")
+        return
+    import pyarrow as pa
+    expected = ae_io.read_log_csv('sample_data.csv', engine='pandas')
+    pool = pa.cpu_count()
+    for use_threads in (False, True):
+        data = ae_io.read_log_csv('sample_data.csv', engine='pyarrow', use_threads=use_threads)
+        assert list(data.columns) == list(expected.columns)
+        assert np.allclose(data.values.astype(float), expected.values.astype(float))
+    assert pa.cpu_count() == pool  # the process-wide Arrow pool is left alone
+    print("✓ pyarrow engine matches pandas engine")
+
+
+def test_engine_resolution():
+    """'auto' falls back to pandas when pyarrow is missing"""
+    resolved = ae_io.resolve_engine('auto')
+    assert resolved == ('pyarrow' if ae_io.HAVE_PYARROW else 'pandas')
+    try:
+        ae_io.resolve_engine('polars')
+    except ValueError:
+        print(f"✓ 'auto' resolves to {resolved}, unknown engines are rejected")
+    else:
+        raise AssertionError("unknown engine accepted")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("CSV Engine Tests")
+    print("=" * 60)
+    tests = [test_separator_detection, test_pandas_engine,
+             test_selected_channels_are_float, test_pyarrow_matches_pandas,
+             test_engine_resolution]
+    ok = True
+    for test in tests:
+        try:
+            test()
+        except AssertionError as e:
+            print(f"✗ {test.__name__} failed: {e}")
+            ok = False
+    sys.exit(0 if ok else 1)
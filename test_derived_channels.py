@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Test derived channels in LogData: lazy, non-mutating and zero-copy
+"""
+
+import sys
+import numpy as np
+import pandas as pd
+
+from ae_core import LogData, analyze_log, compute_tps_dot
+
+
+def _frame():
+    data = pd.read_csv('sample_data.csv')
+    # Some logs already carry an ECU-computed TPS rate under the same name
+    data['TPS_dot'] = np.full(len(data), -1.0)
+    return data
+
+
+def test_frame_is_not_mutated():
+    """Detection leaves the loaded DataFrame and its TPS_dot channel alone"""
+    data = _frame()
+    before = data.copy()
+    log = LogData(data, 'Time')
+    segments, events = analyze_log(log, 'TPS', 10.0, 0.1)
+    assert len(events) == 1
+    pd.testing.assert_frame_equal(data, before)
+    assert np.all(log.raw('TPS_dot') == -1.0)
+    expected = compute_tps_dot(data['Time'].values, data['TPS'].values)
+    assert np.allclose(log['TPS_dot'], expected)
+    print("✓ Frame unchanged, logged TPS_dot kept, derived TPS_dot computed")
+
+
+def test_derived_is_lazy_and_cached():
+    """A derived channel is computed once, on first access"""
+    log = LogData(_frame(), 'Time')
+    calls = []
+
+    def double_rpm(log):
+        calls.append(1)
+        return log.raw('RPM') * 2
+
+    log.define('RPM2', double_rpm)
+    assert calls == [] and 'RPM2' in log
+    first = log['RPM2']
+    assert log['RPM2'] is first and len(calls) == 1
+    log.define('RPM2', double_rpm)  # redefining drops the cached value
+    log['RPM2']
+    assert len(calls) == 2
+    print("✓ Derived channel evaluated lazily and cached")
+
+
+def test_raw_channels_are_views():
+    """Raw channels and query windows share memory with the frame"""
+    data = pd.DataFrame({'Time': np.arange(1000) * 0.01, 'RPM': np.arange(1000.0)})
+    log = LogData(data, 'Time')
+    window = log.query(1.0, 2.0, ['RPM'])
+    assert np.shares_memory(log.raw('RPM'), data['RPM'].to_numpy())
+    assert np.shares_memory(window.channels['RPM'], log.raw('RPM'))
+    print("✓ Raw channels and windows are zero-copy views")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Derived Channel Tests")
+    print("=" * 60)
+    ok = True
+    for test in (test_frame_is_not_mutated, test_derived_is_lazy_and_cached,
+                 test_raw_channels_are_views):
+        try:
+            test()
+        except AssertionError as e:
+            print(f"✗ {test.__name__} failed: {e}")
+            ok = False
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Test headless event rendering and report export (no Tk required)
+"""
+
+import os
+import sys
+import tempfile
+import numpy as np
+import pandas as pd
+
+from ae_core import guess_columns, compute_tps_dot, detect_events
+from ae_render import render_events, export_report
+
+
+def _synthetic_log(n_events=6, period=100):
+    """Log with one throttle stab every `period` samples at 20 Hz"""
+    n = n_events * period
+    i = np.arange(n)
+    tps = np.where(i % period < 10, (i % period) * 8.0, 5.0)
+    return pd.DataFrame({
+        'Time': i * 0.05,
+        'RPM': 1000 + tps * 10,
+        'TPS': tps,
+        'PW': 2 + tps / 10,
+        'AFR': 14.7 - tps / 50,
+    })
+
+
+def _detect(data):
+    columns = guess_columns(data.columns)
+    time = data[columns['time']].values
+    tps_dot = compute_tps_dot(time, data[columns['tps']].values)
+    data['TPS_dot'] = tps_dot
+    return columns, detect_events(time, tps_dot, 10.0, 0.1)
+
+
+def test_core_detection_matches_sample():
+    """ae_core finds the throttle stab in sample_data.csv"""
+    data = pd.read_csv('sample_data.csv')
+    columns, events = _detect(data)
+    assert columns == {'time': 'Time', 'rpm': 'RPM', 'tps': 'TPS', 'pw': 'PW', 'afr': 'AFR',
+                       'clt': None, 'map': None}
+    assert len(events) == 1
+    print(f"✓ Detected {len(events)} event in sample_data.csv")
+
+
+def test_render_in_process_and_pool():
+    """Serial and pooled rendering produce one image per event"""
+    data = _synthetic_log()
+    columns, events = _detect(data)
+    assert len(events) == 6
+    with tempfile.TemporaryDirectory() as tmp:
+        for workers in (1, 2):
+            out_dir = os.path.join(tmp, f'w{workers}')
+            paths = render_events(data, events, columns, 10.0, out_dir, workers=workers)
+            assert len(paths) == len(events)
+            assert all(os.path.getsize(p) > 0 for p in paths)
+            print(f"✓ workers={workers}: rendered {len(paths)} events")
+
+
+def test_export_pdf_and_html():
+    """PDF and HTML reports are written with every event"""
+    data = _synthetic_log(n_events=3)
+    columns, events = _detect(data)
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf = export_report(data, events, columns, 10.0, os.path.join(tmp, 'r.pdf'), workers=1)
+        with open(pdf, 'rb') as f:
+            assert f.read(4) == b'%PDF'
+        print("✓ PDF report written")
+
+        report = export_report(data, events, columns, 10.0, os.path.join(tmp, 'r.html'), workers=1)
+        with open(report) as f:
+            page = f.read()
+        assert page.count('<figure>') == len(events)
+        assert os.path.exists(os.path.join(tmp, 'r_files', 'thumb_00003.png'))
+        print("✓ HTML index with thumbnails written")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Event Export Tests")
+    print("=" * 60)
+    ok = True
+    for test in (test_core_detection_matches_sample, test_render_in_process_and_pool,
+                 test_export_pdf_and_html):
+        try:
+            test()
+        except AssertionError as e:
+            print(f"✗ {test.__name__} failed: {e}")
+            ok = False
+    sys.exit(0 if ok else 1)
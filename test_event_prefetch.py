@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Test render payload preparation and background prefetching of events
+"""
+
+import sys
+import numpy as np
+import pandas as pd
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+from ae_core import guess_columns, compute_tps_dot, detect_events, LogData
+from ae_render import decimate, prepare_event, EventPrefetcher, EventFigure
+
+
+def _log(rate_hz=1000, n_events=8, period_s=6.0):
+    """High-rate log with one throttle stab every period_s seconds"""
+    t = np.arange(0, n_events * period_s, 1.0 / rate_hz)
+    phase = t % period_s
+    tps = np.clip((phase - 3.0) * 400.0, 0, 80) * (phase < 4.0) + 5.0
+    frame = pd.DataFrame({'Time': t, 'RPM': 1000 + tps * 10, 'TPS': tps,
+                          'PW': 2 + tps / 10, 'AFR': 14.7 - tps / 50})
+    columns = guess_columns(frame.columns)
+    frame['TPS_dot'] = compute_tps_dot(t, tps)
+    events = detect_events(t, frame['TPS_dot'].values, 10.0, 0.1)
+    return LogData(frame, 'Time'), columns, events
+
+
+def test_decimate_keeps_extremes():
+    """Min/max decimation bounds the point count and keeps the peaks"""
+    rng = np.random.default_rng(2)
+    x = np.arange(100_000, dtype=float)
+    y = rng.normal(size=len(x))
+    y[54_321] = 50.0
+    xd, yd = decimate(x, y, max_points=2000)
+    assert len(yd) <= 2100
+    assert yd.max() == y.max() and yd.min() == y.min()
+    assert np.all(np.diff(xd) > 0)
+    short_x, short_y = decimate(x[:100], y[:100], max_points=2000)
+    assert np.shares_memory(short_y, y)
+    print(f"✓ 100,000 samples decimated to {len(yd)} with peaks kept")
+
+
+def test_prefetcher_prepares_neighbours():
+    """Neighbouring events are prepared in the background and cached"""
+    data, columns, events = _log()
+    assert len(events) == 8
+    prefetcher = EventPrefetcher(data, events, columns, 10.0, radius=2, cache_size=5)
+    try:
+        first = prefetcher.get(0)
+        prefetcher.prefetch(0)
+        for idx in (1, 7, 2, 6):  # wraps around like previous/next
+            assert prefetcher.get(idx)['span'] == prepare_event(data, events[idx], columns, 10.0)['span']
+        assert prefetcher.get(0) is first
+        assert len(prefetcher._cache) <= 5
+    finally:
+        prefetcher.close()
+    print("✓ Neighbours N-2..N+2 prepared and served from the LRU cache")
+
+
+def test_event_figure_reuse():
+    """One EventFigure shows several prepared events without rebuilding axes"""
+    data, columns, events = _log()
+    fig = Figure(figsize=(12, 6))
+    FigureCanvasAgg(fig)
+    plot = EventFigure(fig, columns, 10.0)
+    axes = list(fig.axes)
+    for idx in range(3):
+        payload = prepare_event(data, events[idx], columns, 10.0)
+        plot.show_prepared(payload, idx, len(events))
+        fig.canvas.draw()
+        assert fig.axes == axes
+        xlim = fig.axes[0].get_xlim()
+        assert xlim[0] <= payload['span'][0] and payload['span'][1] <= xlim[1]
+    assert plot.matches(fig, columns, 10.0) and not plot.matches(fig, columns, 20.0)
+    print("✓ EventFigure reused across events")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Event Prefetch Tests")
+    print("=" * 60)
+    ok = True
+    for test in (test_decimate_keeps_extremes, test_prefetcher_prepares_neighbours,
+                 test_event_figure_reuse):
+        try:
+            test()
+        except AssertionError as e:
+            print(f"✗ {test.__name__} failed: {e}")
+            ok = False
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Test the structured-array event table
+"""
+
+import sys
+import numpy as np
+
+from ae_events import EventTable, EVENT_DTYPE
+
+
+def _table(n=1000, seed=3):
+    rng = np.random.default_rng(seed)
+    starts = np.sort(rng.integers(100, 10**6, n))
+    records = np.zeros(n, dtype=EVENT_DTYPE)
+    records['event_start'] = starts
+    records['event_end'] = starts + rng.integers(2, 20, n)
+    records['start_idx'] = starts - 50
+    records['end_idx'] = records['event_end'] + 50
+    records['duration'] = rng.uniform(0.1, 1.0, n)
+    records['max_tps_dot'] = rng.uniform(10, 500, n)
+    records['segment'] = rng.integers(0, 4, n)
+    return EventTable(records)
+
+
+def test_dict_round_trip():
+    """Old list-of-dicts events convert to a table and back"""
+    events = [{'start_idx': 0, 'end_idx': 60, 'event_start': 10, 'event_end': 14,
+               'duration': 0.2, 'max_tps_dot': 96.0, 'segment': 0}]
+    table = EventTable.from_dicts(events)
+    assert table.to_dicts() == events
+    assert table[0]['duration'] == 0.2 and len(table) == 1
+    print("✓ Dicts -> EventTable -> dicts round trip")
+
+
+def test_filter_sort_select():
+    """Vectorized filter, sort and select match the Python equivalents"""
+    table = _table()
+    fast = table.filter(table['max_tps_dot'] > 200)
+    slow = [e for e in table.to_dicts() if e['max_tps_dot'] > 200]
+    assert fast.to_dicts() == slow
+
+    ordered = table.sort('duration', descending=True)
+    assert np.all(np.diff(ordered['duration']) <= 0)
+
+    # Ties keep log order in both directions, like Python's stable sorted()
+    for descending in (False, True):
+        by_segment = table.sort('segment', descending=descending).to_dicts()
+        assert by_segment == sorted(table.to_dicts(), key=lambda e: e['segment'],
+                                    reverse=descending)
+
+    picked = table.select(['event_start', 'duration'])
+    assert picked.dtype.names == ('event_start', 'duration')
+    assert np.array_equal(picked['duration'], table['duration'])
+
+    counts = table.segment_counts(4)
+    assert counts.sum() == len(table)
+    assert list(counts) == [int(np.sum(table['segment'] == k)) for k in range(4)]
+    print(f"✓ filter kept {len(fast)}/{len(table)}, sort and select OK")
+
+
+def test_feature_columns_and_concat():
+    """Feature columns are added on demand and tables stack across logs"""
+    table = _table(10)
+    table.add_column('peak_afr', np.linspace(11, 15, 10))
+    assert 'peak_afr' in table.fields
+    assert table[3]['peak_afr'] == np.linspace(11, 15, 10)[3]
+    assert table.sort('peak_afr', descending=True)[0]['peak_afr'] == 15.0
+
+    pooled = EventTable.concat([_table(5, seed=1), _table(7, seed=2)])
+    assert len(pooled) == 12
+    shifted = pooled.offset(1000)
+    assert np.array_equal(shifted['event_start'], pooled['event_start'] + 1000)
+    print("✓ Feature column added, tables concatenated and offset")
+
+
+def test_compact_memory():
+    """A table uses far less memory than the equivalent list of dicts"""
+    table = _table(100_000)
+    dicts = table.to_dicts()
+    dict_bytes = sum(sys.getsizeof(d) + sum(sys.getsizeof(v) for v in d.values())
+                     for d in dicts)
+    print(f"  EventTable: {table.nbytes / 1e6:.1f} MB, list of dicts: {dict_bytes / 1e6:.1f} MB")
+    assert table.nbytes * 5 < dict_bytes
+    print("✓ EventTable is at least 5x smaller")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Event Table Tests")
+    print("=" * 60)
+    ok = True
+    for test in (test_dict_round_trip, test_filter_sort_select,
+                 test_feature_columns_and_concat, test_compact_memory):
+        try:
+            test()
+        except AssertionError as e:
+            print(f"✗ {test.__name__} failed: {e}")
+            ok = False
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Test that every detection backend matches the reference on the golden corpus
+"""
+
+import json
+import os
+import sys
+import tempfile
+import numpy as np
+
+from ae_core import StreamingDetector, detect_events, detect_events_vectorized
+from ae_golden import make_corpus, check_corpus, main as golden_main, TRACE_KINDS
+
+
+def test_backends_match_reference():
+    """Loop, vectorized, streaming and parallel give identical events"""
+    corpus = make_corpus(traces=10 * len(TRACE_KINDS), seed=7)
+    results = check_corpus(corpus, workers=2, seed=7)
+    for name, result in results.items():
+        assert not result['mismatches'], f"{name}: {result['mismatches'][:3]}"
+    assert results['loop']['events'] > 100
+    counts = {name: result['events'] for name, result in results.items()}
+    print(f"✓ {len(corpus)} traces, no mismatches: {counts}")
+
+
+def test_run_on_last_sample():
+    """A run starting on the final sample is an event when duration_thresh is 0"""
+    time = np.arange(6) * 0.1
+    tps_dot = np.array([0, 0, 0, 0, 0, 50.0])
+    for detector in (detect_events, detect_events_vectorized):
+        events = detector(time, tps_dot, 10, 0.0, context_s=0.2)
+        assert len(events) == 1
+        assert events[0]['event_start'] == events[0]['event_end'] == 5
+        assert events[0]['max_tps_dot'] == 50.0 and events[0]['end_idx'] == 6
+    print("✓ Run on the last sample: one event, peak from that sample")
+
+
+def test_streaming_memory_is_bounded():
+    """The streaming detector keeps about context_s of samples, not the whole log"""
+    n = 200_000
+    time = np.arange(n) * 0.01
+    tps = np.where(np.arange(n) % 500 < 10, (np.arange(n) % 500) * 5.0, 0.0)
+    detector = StreamingDetector(10.0, 0.05, context_s=1.0)
+    largest, found = 0, 0
+    for i in range(0, n, 1000):
+        found += len(detector.feed(time[i:i + 1000], tps[i:i + 1000]))
+        largest = max(largest, len(detector._time))
+    found += len(detector.finish())
+    assert found == n // 500
+    assert largest < 1000 + 2 * 100, f"buffer grew to {largest} samples"
+    print(f"✓ Streamed {n:,} samples, {found} events, buffer peaked at {largest} samples")
+
+
+def test_record_throughput():
+    """The harness writes per-backend throughput to JSON"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'golden.json')
+        assert golden_main(['--traces', '20', '--samples', '20000', '--record', path]) == 0
+        with open(path) as f:
+            record = json.load(f)
+    for name in ('loop', 'vectorized', 'streaming', 'parallel'):
+        assert record['backends'][name]['long_log_samples_per_s'] > 0
+        assert record['backends'][name]['mismatches'] == []
+    print("✓ Throughput recorded for all four backends")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Golden Corpus Tests")
+    print("=" * 60)
+    ok = True
+    for test in (test_backends_match_reference, test_run_on_last_sample,
+                 test_streaming_memory_is_bounded, test_record_throughput):
+        try:
+            test()
+        except AssertionError as e:
+            print(f"✗ {test.__name__} failed: {e}")
+            ok = False
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Test the watched-folder ingest daemon: stability detection, the bounded
+queue, restart ledger and metrics
+"""
+
+import json
+import os
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+
+import ae_ingest
+from ae_ingest import IngestDaemon, QUEUE_SLACK, MAX_POOL_CRASHES
+from ae_cli import main as cli_main
+
+
+def write_log(path, n=600):
+    """A 100 Hz log with a throttle stab every 2 s"""
+    t = np.arange(n) * 0.01
+    phase = np.arange(n) % 200
+    pd.DataFrame({
+        'Time': t,
+        'RPM': 2500 + 300 * np.sin(t),
+        'TPS': np.where(phase < 20, phase * 3.0, 0.0),
+        'AFR': 14.7 - np.where(phase < 40, 1.0, 0.0),
+    }).to_csv(path, index=False)
+
+
+def make_daemon(drop, out, **kwargs):
+    # One thread keeps the tests fast; the CLI uses a process pool
+    kwargs.setdefault('executor', ThreadPoolExecutor(max_workers=1))
+    return IngestDaemon(drop, out, workers=1, settle_s=0.0, poll_s=0.01, **kwargs)
+
+
+def test_growing_file_waits():
+    """A file is only processed once its size stops changing"""
+    with tempfile.TemporaryDirectory() as tmp:
+        drop, out = os.path.join(tmp, 'drop'), os.path.join(tmp, 'out')
+        os.makedirs(drop)
+        path = os.path.join(drop, 'run1.csv')
+        write_log(path, n=300)
+        daemon = make_daemon(drop, out)
+        daemon.poll()
+        with open(path, 'a') as f:  # the logger is still writing
+            f.write("3.00,2500,0,14.7\n")
+        daemon.poll()
+        assert daemon.metrics()['settling'] == 1 and daemon.counts['processed'] == 0
+        metrics = daemon.run(until_idle=True)
+        assert metrics['processed'] == 1 and metrics['failed'] == 0
+        result = os.path.join(out, 'run1')
+        with open(os.path.join(result, 'summary.json')) as f:
+            summary = json.load(f)
+        assert summary['rows'] == 301
+        assert os.path.exists(os.path.join(result, 'events.csv'))
+        assert os.path.exists(os.path.join(result, 'report.html'))
+        assert any(name.startswith('thumb_') for name in os.listdir(
+            os.path.join(result, 'report_files')))
+    print(f"✓ Growing file held back, then ingested ({summary['summary']['count']} events)")
+
+
+def test_restart_skips_finished_files():
+    """A restarted daemon skips ingested files until they change"""
+    with tempfile.TemporaryDirectory() as tmp:
+        drop, out = os.path.join(tmp, 'drop'), os.path.join(tmp, 'out')
+        os.makedirs(drop)
+        for name in ('a.csv', 'b.csv'):
+            write_log(os.path.join(drop, name))
+        with open(os.path.join(drop, 'bad.csv'), 'w') as f:
+            f.write("nothing,useful\n1,2\n")
+        first = make_daemon(drop, out).run(until_idle=True)
+        assert first['processed'] == 2 and first['failed'] == 1
+
+        second = make_daemon(drop, out).run(until_idle=True)
+        assert second['processed'] == 0 and second['failed'] == 0
+        assert second['skipped'] == 3
+
+        write_log(os.path.join(drop, 'a.csv'), n=800)
+        os.utime(os.path.join(drop, 'a.csv'), ns=(1, 1))
+        third = make_daemon(drop, out).run(until_idle=True)
+        assert third['processed'] == 1 and third['skipped'] == 2
+    print("✓ Restarts skip finished and failed files, changed files are redone")
+
+
+def test_bounded_queue_and_metrics():
+    """At most workers + QUEUE_SLACK files are submitted; metrics.json tracks the rest"""
+    with tempfile.TemporaryDirectory() as tmp:
+        drop, out = os.path.join(tmp, 'drop'), os.path.join(tmp, 'out')
+        os.makedirs(os.path.join(drop, 'dyno'))
+        for i in range(8):
+            write_log(os.path.join(drop, 'dyno', f'pull{i}.csv'))
+        daemon = make_daemon(drop, out)
+        daemon.poll()
+        daemon.poll()  # second unchanged poll: all 8 complete
+        metrics = daemon.metrics()
+        assert metrics['in_flight'] <= 1 + QUEUE_SLACK
+        assert metrics['in_flight'] + metrics['backlog'] + metrics['processed'] == 8
+        with open(os.path.join(out, 'metrics.json')) as f:
+            assert json.load(f)['polls'] == 2
+        metrics = daemon.run(until_idle=True)
+        assert metrics['processed'] == 8 and metrics['backlog'] == 0
+        assert metrics['files_per_minute'] > 0 and metrics['rows_per_second'] > 0
+        assert os.path.isdir(os.path.join(out, 'dyno__pull7'))
+    print(f"✓ 8 files through a bounded queue, {metrics['rows_per_second']:,.0f} rows/s")
+
+
+def _ingest_or_die(path, output, config):
+    """ingest_log, except that a file named crash*.csv kills its worker process"""
+    if os.path.basename(path).startswith('crash'):
+        os._exit(1)
+    return _ingest_log(path, output, config)
+
+
+_ingest_log = ae_ingest.ingest_log
+
+
+def test_worker_crash_spares_other_files():
+    """Files in flight when a worker dies are retried; only the culprit fails"""
+    with tempfile.TemporaryDirectory() as tmp:
+        drop, out = os.path.join(tmp, 'drop'), os.path.join(tmp, 'out')
+        os.makedirs(drop)
+        for name in ('a.csv', 'b.csv', 'c.csv', 'crash.csv'):
+            write_log(os.path.join(drop, name))
+        # Worker processes are forked from here, so they see the patched function
+        ae_ingest.ingest_log = _ingest_or_die
+        try:
+            daemon = IngestDaemon(drop, out, workers=2, settle_s=0.0, poll_s=0.01)
+            metrics = daemon.run(until_idle=True)
+        finally:
+            ae_ingest.ingest_log = _ingest_log
+        assert metrics['processed'] == 3 and metrics['failed'] == 1
+        assert 'crash.csv' in metrics['last_error']
+        assert f"crashed {MAX_POOL_CRASHES} times" in metrics['last_error']
+        for name in ('a', 'b', 'c'):
+            assert os.path.exists(os.path.join(out, name, 'summary.json'))
+    print("✓ A dying worker only fails its own file; the others are re-run")
+
+
+def test_cli_ingest_once():
+    """ae_cli.py ingest --once processes the folder and exits"""
+    with tempfile.TemporaryDirectory() as tmp:
+        drop, out = os.path.join(tmp, 'drop'), os.path.join(tmp, 'out')
+        os.makedirs(drop)
+        write_log(os.path.join(drop, 'run.csv'))
+        assert cli_main(['ingest', drop, '-o', out, '--workers', '1', '--poll', '0.05',
+                         '--settle', '0', '--once']) == 0
+        assert os.path.exists(os.path.join(out, 'run', 'summary.json'))
+    print("✓ CLI ingest --once")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Ingest Daemon Tests")
+    print("=" * 60)
+    ok = True
+    for test in (test_growing_file_waits, test_restart_skips_finished_files,
+                 test_bounded_queue_and_metrics, test_worker_crash_spares_other_files,
+                 test_cli_ingest_once):
+        try:
+            test()
+        except AssertionError as e:
+            print(f"✗ {test.__name__} failed: {e}")
+            ok = False
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Test the declarative pipeline: config files, per-stage caching and the CLI
+"""
+
+import os
+import sys
+import tempfile
+import numpy as np
+import pandas as pd
+
+from ae_io import read_log_csv
+from ae_core import LogData, analyze_log
+from ae_pipeline import Pipeline, load_config, save_config, normalize_config
+from ae_cli import main as cli_main
+
+
+def write_log(path, n=3000):
+    """A 100 Hz log with a throttle stab every 2 s"""
+    t = np.arange(n) * 0.01
+    phase = np.arange(n) % 200
+    pd.DataFrame({
+        'Time': t,
+        'RPM': 2500 + 300 * np.sin(t),
+        'TPS': np.where(phase < 20, phase * 3.0, 0.0),
+        'PW': 3 + np.where(phase < 40, 2.0, 0.0),
+        'AFR': 14.7 - np.where(phase < 40, 1.0, 0.0),
+    }).to_csv(path, index=False)
+
+
+CONFIG = """
+[source]
+path = "log.csv"
+
+[channels]
+tps = "TPS"
+
+[triggers]
+threshold = 20.0
+duration = 0.05
+
+[[exports]]
+kind = "events"
+path = "events.csv"
+"""
+
+
+def test_matches_analyze_log():
+    """The pipeline finds the same events as analyze_log"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'log.csv')
+        write_log(path)
+        pipeline = Pipeline({'source': {'path': path}, 'triggers': {'threshold': 20.0}})
+        results = pipeline.run('features')
+        log = LogData(read_log_csv(path), 'Time')
+        segments, events = analyze_log(log, 'TPS', 20.0, 0.1)
+    assert np.array_equal(results['triggers'].records, events.records)
+    assert 'rpm' in results['features'].fields and 'rpm' not in results['triggers'].fields
+    print(f"✓ {len(events)} events, identical to analyze_log")
+
+
+def test_only_downstream_stages_rerun():
+    """Changing a stage's settings re-runs it and the stages after it"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'log.csv')
+        write_log(path)
+        pipeline = Pipeline({'source': {'path': path}})
+        pipeline.run('features')
+        assert pipeline.ran == ['source', 'channels', 'clean', 'derivative', 'triggers',
+                                'features']
+        pipeline.run('features')
+        assert pipeline.ran == []
+
+        pipeline.update(triggers={'threshold': 30.0})
+        pipeline.run('features')
+        assert pipeline.ran == ['triggers', 'features']
+
+        pipeline.update(clean={'enabled': True})
+        results = pipeline.run('features')
+        assert pipeline.ran == ['clean', 'derivative', 'triggers', 'features']
+        assert results['clean'].quality is not None
+
+        # Rewriting the source re-runs everything that depends on it
+        write_log(path, n=4000)
+        os.utime(path, ns=(1, 1))
+        results = pipeline.run('triggers')
+        assert pipeline.ran == ['source', 'channels', 'clean', 'derivative', 'triggers']
+        assert len(results['source']) == 4000
+
+        # Exports always run, so a deleted output is written again
+        output = os.path.join(tmp, 'events.csv')
+        pipeline.update(exports=[{'kind': 'events', 'path': output}])
+        pipeline.run()
+        os.remove(output)
+        assert pipeline.run()['exports'] == [output]
+        assert pipeline.ran == ['exports'] and os.path.exists(output)
+    print("✓ Cached stages reused, changed stages and their dependents re-run")
+
+
+def test_stage_results_are_not_shared():
+    """A later stage never modifies an earlier stage's cached result"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'log.csv')
+        write_log(path)
+        pipeline = Pipeline({'source': {'path': path}})
+        results = pipeline.run('features')
+    assert 'TPS_dot' not in results['clean'].derived_names
+    assert 'TPS_dot' in results['derivative'][0].derived_names
+    assert results['triggers'].fields != results['features'].fields
+    print("✓ Derived channels and feature columns stay in their own stage")
+
+
+def test_config_files():
+    """TOML configs load relative to their folder and round-trip through save"""
+    with tempfile.TemporaryDirectory() as tmp:
+        write_log(os.path.join(tmp, 'log.csv'))
+        with open(os.path.join(tmp, 'pipeline.toml'), 'w') as f:
+            f.write(CONFIG)
+        config = load_config(os.path.join(tmp, 'pipeline.toml'))
+        assert config['source']['path'] == os.path.join(tmp, 'log.csv')
+        assert config['triggers']['threshold'] == 20.0
+        assert config['triggers']['context'] == 2.5  # default filled in
+
+        saved = os.path.join(tmp, 'saved.toml')
+        save_config(config, saved)
+        assert load_config(saved) == config
+
+        for bad in ({'trigger': {}}, {'triggers': {'thresh': 1}},
+                    {'exports': [{'kind': 'pdf', 'path': 'x'}]}):
+            try:
+                normalize_config(bad)
+            except ValueError:
+                continue
+            raise AssertionError(f"{bad} accepted")
+    print("✓ TOML config loaded, saved and reloaded, bad settings rejected")
+
+
+def test_resample_stage():
+    """The resample stage is cached like any other and re-runs when its settings change"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'log.csv')
+        write_log(path)
+        pipeline = Pipeline({'source': {'path': path}})
+        assert pipeline.run('resample')['resample'] is None  # off by default
+
+        pipeline.update(resample={'enabled': True, 'rate': 50.0, 'hold': ['TPS']})
+        resampler, frame = pipeline.run('resample')['resample']
+        assert pipeline.ran == ['resample']
+        assert list(frame.columns) == ['Time', 'RPM', 'TPS', 'PW', 'AFR', 'raw_index']
+        assert len(frame) == len(resampler) == 1500 and resampler.rate == 50.0
+        assert set(frame['TPS']) <= set(resampler.log['TPS'])  # held, not interpolated
+
+        pipeline.run('resample')
+        assert pipeline.ran == []
+        pipeline.update(resample={'rate': 25.0})
+        assert len(pipeline.run('resample')['resample'][1]) == 750
+        assert pipeline.ran == ['resample']
+    print("✓ Resample stage cached and re-run on a new rate")
+
+
+def test_cli_run():
+    """ae_cli.py run executes a config, with --set overrides"""
+    with tempfile.TemporaryDirectory() as tmp:
+        write_log(os.path.join(tmp, 'log.csv'))
+        config = os.path.join(tmp, 'pipeline.toml')
+        with open(config, 'w') as f:
+            f.write(CONFIG)
+        assert cli_main(['run', config, '--set', 'triggers.threshold=25',
+                         '--set', 'clean.enabled=true']) == 0
+        events = pd.read_csv(os.path.join(tmp, 'events.csv'))
+    assert len(events) == 15
+    assert {'max_tps_dot', 'rpm', 'afr_min'} <= set(events.columns)
+    print(f"✓ CLI run exported {len(events)} events with features")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Pipeline Tests")
+    print("=" * 60)
+    ok = True
+    for test in (test_matches_analyze_log, test_only_downstream_stages_rerun,
+                 test_stage_results_are_not_shared, test_config_files, test_resample_stage,
+                 test_cli_run):
+        try:
+            test()
+        except AssertionError as e:
+            print(f"✗ {test.__name__} failed: {e}")
+            ok = False
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Test resampling of jittery, segmented logs onto a uniform time grid
+"""
+
+import gc
+import os
+import sys
+import weakref
+import tempfile
+import numpy as np
+import pandas as pd
+
+import ae_resample
+from ae_core import LogData, analyze_log, detect_events_vectorized
+from ae_resample import Resampler, resampler_for, default_rate
+from ae_cli import main as cli_main
+
+
+def make_log(n=2000, seed=3):
+    """A jittery ~50 Hz log with a time reset halfway and a status channel"""
+    rng = np.random.default_rng(seed)
+    dt = 0.02 + rng.uniform(-0.006, 0.006, n)
+    time = np.cumsum(dt)
+    time[n // 2:] -= time[n // 2] - 0.01  # logger reset
+    tps = np.where((np.arange(n) % 200) < 20, (np.arange(n) % 200) * 4.0, 0.0)
+    data = pd.DataFrame({
+        'Time': time,
+        'TPS': tps,
+        'RPM': 2000 + 500 * np.sin(time),
+        'Status': (np.arange(n) // 7 % 3).astype(np.int64),
+    })
+    return LogData(data, 'Time')
+
+
+def test_grid_is_uniform_per_segment():
+    """Each segment gets its own evenly spaced grid, none spans the reset"""
+    log = make_log()
+    resampler = Resampler(log, rate=100)
+    assert len(resampler.segments) == 2
+    for k, seg in enumerate(resampler.segments):
+        grid = resampler.time[seg['grid_start']:seg['grid_stop']]
+        assert np.allclose(np.diff(grid), 0.01)
+        assert grid[0] == seg['t_start'] and grid[-1] <= seg['t_end']
+        assert np.all(resampler.segment[seg['grid_start']:seg['grid_stop']] == k)
+        raw = resampler.raw_index[seg['grid_start']:seg['grid_stop']]
+        assert raw.min() >= seg['start'] and raw.max() < seg['stop']
+    assert 45 < default_rate(log.time) < 55
+    print(f"✓ {len(resampler)} grid points at 100 Hz over {len(resampler.segments)} segments")
+
+
+def test_linear_and_hold():
+    """Linear matches np.interp per segment, hold takes the last raw sample"""
+    log = make_log()
+    resampler = Resampler(log, rate=75)
+    rpm = resampler.channel('RPM')
+    status = resampler.channel('Status')
+    assert status.dtype == np.int64  # integer channels hold by default
+    for seg in resampler.segments:
+        g = slice(seg['grid_start'], seg['grid_stop'])
+        r = slice(seg['start'], seg['stop'])
+        expected = np.interp(resampler.time[g], log.time[r], log['RPM'][r])
+        assert np.allclose(rpm[g], expected)
+    assert np.array_equal(status, log['Status'][resampler.raw_index])
+    assert np.all(log.time[resampler.raw_index] <= resampler.time)
+    held = resampler.channel('RPM', 'hold')
+    assert np.array_equal(held, log['RPM'][resampler.raw_index])
+    print("✓ Linear matches np.interp, zero-order hold takes the prior sample")
+
+
+def test_chunked_matches_whole():
+    """Chunked interpolation gives the same result as one pass"""
+    log = make_log(n=5000)
+    whole = Resampler(log, rate=120).channel('TPS')
+    original = ae_resample.CHUNK_POINTS
+    ae_resample.CHUNK_POINTS = 97
+    try:
+        chunked = Resampler(log, rate=120).channel('TPS')
+    finally:
+        ae_resample.CHUNK_POINTS = original
+    assert np.array_equal(whole, chunked)
+    print(f"✓ {len(whole)} points identical in 97-point chunks")
+
+
+def test_cache_and_invalidation():
+    """Channels are cached until the log's array for them changes"""
+    log = make_log()
+    resampler = resampler_for(log, 100)
+    assert resampler_for(log, 100).time is resampler.time
+    first = resampler.channel('RPM')
+    assert resampler.channel('RPM') is first
+    assert resampler_for(log, 100).channel('RPM') is first
+    log.define('RPM', lambda log: log.raw('RPM') + 100)
+    shifted = resampler.channel('RPM')
+    assert shifted is not first and np.allclose(shifted, first + 100)
+
+    # The cache does not keep the log (or its resamplers) alive
+    ref = weakref.ref(log)
+    del log, resampler
+    gc.collect()
+    assert ref() is None
+
+    # A Resampler built directly keeps its own log alive
+    direct = Resampler(make_log(), rate=100)
+    gc.collect()
+    assert len(direct.log) == 2000 and len(direct.channel('RPM')) == len(direct)
+    print("✓ Resamplers and channels cached, redefined channels recomputed, log freed")
+
+
+def test_event_mapping():
+    """Events found on the grid map back onto the raw samples around them"""
+    log = make_log()
+    segments, raw_events = analyze_log(log, 'TPS', 20, 0.05, context_s=0.5)
+    resampler = Resampler(log, rate=100)
+    tps = resampler.channel('TPS')
+    tps_dot = np.zeros(len(resampler))
+    for seg in resampler.segments:
+        g = slice(seg['grid_start'], seg['grid_stop'])
+        tps_dot[g] = np.gradient(tps[g], resampler.time[g])
+    grid_events = detect_events_vectorized(resampler.time, tps_dot, 20, 0.05, context_s=0.5)
+    assert len(grid_events) == len(raw_events)
+
+    mapped = resampler.events_to_raw(grid_events)
+    onset_gap = np.abs(log.time[mapped['event_start']] - log.time[raw_events['event_start']])
+    assert onset_gap.max() < 0.06
+    assert np.all(mapped['end_idx'] <= len(log))
+
+    back = resampler.events_to_grid(raw_events)
+    assert np.all(np.abs(back['event_start'] - grid_events['event_start']) <= 6)
+    offsets, traces = resampler.event_traces(raw_events, 'TPS', before=0.2, after=0.5)
+    assert traces.shape == (len(raw_events), len(offsets))
+    print(f"✓ {len(grid_events)} grid events mapped to raw samples within 60 ms")
+
+
+def test_cli_resample():
+    """The resample command writes the grid with its raw row indices"""
+    log = make_log()
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, 'log.csv')
+        output = os.path.join(tmp, 'grid.csv')
+        log.frame.to_csv(source, index=False)
+        assert cli_main(['resample', source, '--rate', '100', '--channels', 'RPM',
+                         '--hold', 'Status', '-o', output]) == 0
+        grid = pd.read_csv(output)
+    assert list(grid.columns) == ['Time', 'RPM', 'Status', 'raw_index']
+    assert len(grid) == len(Resampler(log, rate=100))
+    print(f"✓ CLI wrote {len(grid)} grid rows")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Resampling Tests")
+    print("=" * 60)
+    ok = True
+    for test in (test_grid_is_uniform_per_segment, test_linear_and_hold,
+                 test_chunked_matches_whole, test_cache_and_invalidation,
+                 test_event_mapping, test_cli_resample):
+        try:
+            test()
+        except AssertionError as e:
+            print(f"✗ {test.__name__} failed: {e}")
+            ok = False
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Test log segmentation at time resets and gaps
+"""
+
+import sys
+import numpy as np
+
+from ae_core import (find_segments, compute_tps_dot, compute_tps_dot_segmented,
+                     detect_events, detect_events_segmented)
+from ae_events import EventTable
+
+
+def _log(n=400, t0=0.0, seed=0):
+    """20 Hz log with a throttle stab every 100 samples"""
+    i = np.arange(n)
+    tps = np.where(i % 100 < 10, (i % 100) * 8.0, 5.0) + seed
+    return t0 + i * 0.05, tps
+
+
+def test_find_segments():
+    """Resets, gaps and NaN times each start a new segment"""
+    time = np.array([0.0, 0.1, 0.2, 0.0, 0.1, 5.0, 5.1, np.nan, 6.0])
+    segments = find_segments(time, max_gap=1.0)
+    assert [(s['start'], s['stop'], s['reason']) for s in segments] == [
+        (0, 3, 'start'), (3, 5, 'reset'), (5, 7, 'gap'), (7, 8, 'invalid'), (8, 9, 'invalid')]
+    assert find_segments(np.arange(10) * 0.05) == [
+        {'start': 0, 'stop': 10, 't_start': 0.0, 't_end': 0.45, 'reason': 'start'}]
+    print("✓ Resets, gaps and NaN times split the log")
+
+
+def test_concatenated_logs():
+    """Two concatenated logs give the same events as each log on its own"""
+    t1, tps1 = _log()
+    t2, tps2 = _log(seed=40)  # ends at high TPS, starts the next log low
+    time = np.concatenate([t1, t2])
+    tps = np.concatenate([tps1, tps2])
+
+    segments = find_segments(time)
+    assert len(segments) == 2 and segments[1]['reason'] == 'reset'
+
+    tps_dot = compute_tps_dot_segmented(time, tps, segments)
+    events = detect_events_segmented(time, tps_dot, segments, 10.0, 0.1)
+
+    expected = EventTable.concat([
+        detect_events(t1, compute_tps_dot(t1, tps1), 10.0, 0.1),
+        detect_events(t2, compute_tps_dot(t2, tps2), 10.0, 0.1).offset(len(t1)),
+    ])
+
+    assert len(events) == len(expected)
+    for got, want in zip(events, expected):
+        seg = segments[got['segment']]
+        assert seg['start'] <= got['start_idx'] and got['end_idx'] <= seg['stop']
+        for key in ('start_idx', 'end_idx', 'event_start', 'event_end'):
+            assert got[key] == want[key]
+    print(f"✓ {len(events)} events, none crossing the reset")
+
+
+def test_parallel_matches_serial():
+    """Process-pool detection returns the same events as serial detection"""
+    parts = [_log(t0=k * 100.0) for k in range(4)]  # 100 s gaps between parts
+    time = np.concatenate([p[0] for p in parts])
+    tps = np.concatenate([p[1] for p in parts])
+    segments = find_segments(time)
+    assert len(segments) == 4
+    tps_dot = compute_tps_dot_segmented(time, tps, segments)
+    serial = detect_events_segmented(time, tps_dot, segments, 10.0, 0.1)
+    parallel = detect_events_segmented(time, tps_dot, segments, 10.0, 0.1, workers=2)
+    assert np.array_equal(serial.records, parallel.records)
+    print(f"✓ Parallel detection matches serial ({len(serial)} events)")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Segmentation Tests")
+    print("=" * 60)
+    ok = True
+    for test in (test_find_segments, test_concatenated_logs, test_parallel_matches_serial):
+        try:
+            test()
+        except AssertionError as e:
+            print(f"✗ {test.__name__} failed: {e}")
+            ok = False
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Test the sensor-cleaning stage: rolling medians, repairs and quality report
+"""
+
+import os
+import sys
+import tempfile
+import numpy as np
+import pandas as pd
+
+from ae_core import LogData, analyze_log
+from ae_clean import (rolling_median, stuck_runs, clean_channel, clean_log, format_report,
+                      FLAG_MISSING, FLAG_RANGE, FLAG_STUCK, FLAG_SPIKE)
+from ae_cli import main as cli_main
+
+
+def _frame(n=20_000, seed=1):
+    """Throttle stabs every 4 s with dropouts, TPS spikes, a stuck RPM and bad AFR"""
+    rng = np.random.default_rng(seed)
+    i = np.arange(n)
+    phase = i % 400
+    tps = np.where(phase < 20, phase * 4.0, 80 * np.exp(-(phase - 20) / 50.0))
+    tps += rng.normal(0, 0.02, n)
+    rpm = 1500 + tps * 20 + rng.normal(0, 5, n)
+    afr = 14.7 + rng.normal(0, 0.1, n)
+    frame = pd.DataFrame({'Time': i * 0.01, 'RPM': rpm, 'TPS': tps, 'AFR': afr})
+
+    # Single-sample TPS spikes well away from the stabs, and dropouts
+    spikes = 200 + 400 * rng.choice(n // 400 - 1, 25, replace=False)
+    frame.loc[spikes, 'TPS'] += 40
+    frame.loc[rng.integers(0, n, 20), 'TPS'] = np.nan
+    frame.loc[5000:5599, 'RPM'] = frame.loc[5000, 'RPM']
+    frame.loc[100:109, 'AFR'] = 99.0
+    return frame, spikes
+
+
+def test_rolling_median_matches_numpy():
+    """The sorting-network median equals np.median for every window size"""
+    values = np.random.default_rng(0).normal(size=10_001)
+    for window in (1, 3, 5, 7):
+        padded = np.pad(values, window // 2, mode='edge')
+        expected = np.median(np.lib.stride_tricks.sliding_window_view(padded, window), axis=1)
+        assert np.array_equal(rolling_median(values, window), expected), window
+    assert len(rolling_median([])) == 0
+    print("✓ Rolling median (windows 1, 3, 5, 7) matches np.median")
+
+
+def test_repairs_and_flags():
+    """NaN, out-of-range and stuck samples are interpolated; spikes take the median"""
+    values = np.array([np.nan, 1, 2, np.nan, np.nan, 5, 200, 7, np.nan])
+    cleaned, flags = clean_channel(values, 'tps', stuck_seconds=False, spike_floor=False)
+    assert np.array_equal(cleaned, [1, 1, 2, 3, 4, 5, 6, 7, 7])
+    assert list(flags) == [FLAG_MISSING, 0, 0, FLAG_MISSING, FLAG_MISSING, 0, FLAG_RANGE,
+                           0, FLAG_MISSING]
+
+    # A spike goes, a genuine step and ramp stay
+    values = np.array([0, 0, 0, 80, 0, 0, 0, 10, 20, 30, 40, 50, 50, 50, 50.0])
+    cleaned, flags = clean_channel(values, 'tps')
+    assert cleaned[3] == 0 and flags[3] == FLAG_SPIKE
+    assert np.array_equal(cleaned[4:], values[4:]) and not flags[4:].any()
+
+    starts, stops = stuck_runs(np.array([1, 1, 1, 2, 3, 3, np.nan, np.nan, 4.0]), None, 2)
+    assert list(starts) == [0, 4] and list(stops) == [3, 6]
+    time = np.arange(9) * 0.5
+    cleaned, flags = clean_channel(np.array([900, 1000, 1000, 1000, 1000, 1000, 1100, 1200,
+                                             1300.0]), 'rpm', time)
+    assert np.all(flags[1:6] == FLAG_STUCK)
+    assert np.allclose(cleaned[:7], np.linspace(900, 1100, 7))
+
+    cleaned, flags = clean_channel(np.full(4, np.nan), 'afr')
+    assert np.isnan(cleaned).all() and np.all(flags == FLAG_MISSING)
+    print("✓ Missing, range, stuck and spike samples repaired and flagged")
+
+
+def test_clean_log_removes_spurious_events():
+    """Spikes that fake events disappear; the real stabs and raw data remain"""
+    frame, spikes = _frame()
+    columns = {'time': 'Time', 'rpm': 'RPM', 'tps': 'TPS', 'afr': 'AFR'}
+    raw_tps = frame['TPS'].to_numpy().copy()
+
+    _, raw_events = analyze_log(LogData(frame, 'Time'), 'TPS', 20.0, 0.0)
+    log = LogData(frame, 'Time')
+    report = clean_log(log, columns)
+    _, events = analyze_log(log, 'TPS', 20.0, 0.0)
+    assert len(events) == len(frame) // 400
+    assert len(raw_events) > len(events)
+    assert np.array_equal(log.raw('TPS'), raw_tps, equal_nan=True)  # frame untouched
+
+    rows = {row['role']: row for row in report}
+    assert rows['tps']['spikes'] >= len(spikes) and rows['tps']['missing'] == 20
+    assert rows['rpm']['stuck_runs'] == 1 and rows['rpm']['stuck'] == 600
+    assert rows['afr']['out_of_range'] == 10
+    assert log.quality is report and len(rows['tps']['flags']) == len(frame)
+    assert 'TPS' in format_report(report)
+    print(f"✓ {len(raw_events)} raw events -> {len(events)} after cleaning; "
+          f"{rows['tps']['spikes']} TPS spikes repaired")
+
+
+def test_cli_quality():
+    """'quality' prints the report and --clean applies to any log command"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'log.csv')
+        _frame()[0].to_csv(path, index=False)
+        assert cli_main(['quality', path]) == 0
+        assert cli_main(['segments', path, '--clean', '--duration', '0']) == 0
+    print("✓ CLI quality report and --clean")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Sensor Cleaning Tests")
+    print("=" * 60)
+    ok = True
+    for test in (test_rolling_median_matches_numpy, test_repairs_and_flags,
+                 test_clean_log_removes_spurious_events, test_cli_quality):
+        try:
+            test()
+        except AssertionError as e:
+            print(f"✗ {test.__name__} failed: {e}")
+            ok = False
+    sys.exit(0 if ok else 1)
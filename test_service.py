@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Test the local HTTP/JSON job service
+"""
+
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+import numpy as np
+import pandas as pd
+
+from ae_io import HAVE_PYARROW
+from ae_service import make_server, LogCache, parse_job_request
+
+
+def _write_log(path, n_events=5, period=100):
+    i = np.arange(n_events * period)
+    tps = np.where(i % period < 10, (i % period) * 8.0, 5.0)
+    pd.DataFrame({'Time': i * 0.05, 'RPM': 1500 + tps * 10, 'TPS': tps,
+                  'PW': 2 + tps / 10, 'AFR': 14.7 - tps / 50}).to_csv(path, index=False)
+
+
+def _call(base, path, body=None):
+    """(status, parsed JSON or raw bytes) for one request"""
+    data = json.dumps(body).encode() if body is not None else None
+    request = urllib.request.Request(base + path, data=data, method='POST' if data else 'GET',
+                                     headers={'Content-Type': 'application/json'})
+    try:
+        with urllib.request.urlopen(request, timeout=10) as response:
+            payload = response.read()
+            if response.headers['Content-Type'] == 'application/json':
+                payload = json.loads(payload)
+            return response.status, payload
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def _wait(base, job_id):
+    for _ in range(200):
+        status, job = _call(base, f'/jobs/{job_id}')
+        if job['status'] in ('done', 'failed'):
+            return job
+        time.sleep(0.02)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+def test_cache_shares_concurrent_loads():
+    """Threads loading the same file at once parse it only once"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'log.csv')
+        _write_log(path, n_events=200)
+        cache = LogCache(size=1)
+        barrier = threading.Barrier(4)
+        frames = []
+
+        def load():
+            barrier.wait()
+            frames.append(cache.get(path))
+
+        threads = [threading.Thread(target=load) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        stats = cache.stats()
+        assert stats['misses'] == 1 and stats['hits'] + stats['shared'] == 3
+        assert all(frame is frames[0] for frame in frames)
+
+        # A second file evicts the first from a one-entry cache
+        other = os.path.join(tmp, 'other.csv')
+        _write_log(other)
+        cache.get(other)
+        cache.get(path)
+        assert cache.stats()['misses'] == 3
+    print(f"✓ 4 concurrent loads -> 1 parse ({stats['shared']} waited on it)")
+
+
+def test_request_validation():
+    """Bad job requests are rejected with a message"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'log.csv')
+        _write_log(path)
+        assert parse_job_request({'path': path})['threshold'] == 10.0
+        for body in ([], {}, {'path': path + '.missing'}, {'path': path, 'threshold': 'x'},
+                     {'path': path, 'engine': 'excel'}, {'path': path, 'columns': {'foo': 'x'}},
+                     {'path': path, 'colour': 'red'}):
+            try:
+                parse_job_request(body)
+                assert False, f"accepted {body}"
+            except ValueError:
+                pass
+    print("✓ Invalid job requests raise ValueError")
+
+
+def test_jobs_over_http():
+    """Submit, poll and fetch events as JSON and Arrow; duplicates share a job"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'log.csv')
+        _write_log(path)
+        server = make_server(port=0, workers=1, quiet=True)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        base = f'http://127.0.0.1:{server.server_address[1]}'
+        try:
+            # Hold the single worker so the next two submissions stay queued
+            gate = threading.Event()
+            server.manager._pool.submit(gate.wait)
+            status, first = _call(base, '/jobs', {'path': path, 'threshold': 20})
+            assert status == 202 and first['status'] == 'queued'
+            status, again = _call(base, '/jobs', {'path': path, 'threshold': 20})
+            assert status == 200 and again['id'] == first['id']
+            gate.set()
+
+            job = _wait(base, first['id'])
+            assert job['status'] == 'done' and job['summary']['count'] == 5
+            status, result = _call(base, f"/jobs/{job['id']}/events")
+            assert status == 200 and len(result['events']) == 5
+            assert result['events'][0]['clt'] is None  # NaN feature -> null
+            assert result['events'][0]['rpm'] == 1580.0
+
+            status, ranked = _call(base, f"/jobs/{job['id']}/events?sort=-max_tps_dot")
+            rates = [event['max_tps_dot'] for event in ranked['events']]
+            assert status == 200 and rates == sorted(rates, reverse=True)
+            longest = max(event['duration'] for event in result['events'])
+            status, long_only = _call(base, f"/jobs/{job['id']}/events?min_duration={longest}")
+            assert status == 200 and 1 <= len(long_only['events']) <= 5
+            assert all(event['duration'] == longest for event in long_only['events'])
+            assert _call(base, f"/jobs/{job['id']}/events?sort=bogus")[0] == 400
+            assert _call(base, f"/jobs/{job['id']}/events?min_duration=x")[0] == 400
+
+            status, stream = _call(base, f"/jobs/{job['id']}/events?format=arrow")
+            if HAVE_PYARROW:
+                import pyarrow as pa
+                table = pa.ipc.open_stream(stream).read_all()
+                assert table.num_rows == 5 and 'max_tps_dot' in table.column_names
+            else:
+                assert status == 501
+
+            # Finished jobs are not deduplicated; the parsed log comes from the cache
+            status, second = _call(base, '/jobs', {'path': path})
+            assert status == 202
+            assert _wait(base, second['id'])['status'] == 'done'
+            status, health = _call(base, '/health')
+            assert health['cache']['misses'] == 1 and health['cache']['hits'] == 1
+            assert health['jobs']['done'] == 2
+
+            assert _call(base, '/jobs', {'path': 'nope.csv'})[0] == 400
+            assert _call(base, '/jobs/unknown')[0] == 404
+            assert _call(base, f"/jobs/{job['id']}/events?format=xml")[0] == 400
+        finally:
+            server.shutdown()
+            server.server_close()
+            server.manager.shutdown()
+    print("✓ HTTP jobs: submit, dedupe, poll, JSON and Arrow events, cache hit")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Service Tests")
+    print("=" * 60)
+    ok = True
+    for test in (test_cache_shares_concurrent_loads, test_request_validation,
+                 test_jobs_over_http):
+        try:
+            test()
+        except AssertionError as e:
+            print(f"✗ {test.__name__} failed: {e}")
+            ok = False
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Test event trace vectors, the KD-tree and similar-event search
+"""
+
+import os
+import sys
+import tempfile
+import numpy as np
+import pandas as pd
+
+from ae_core import LogData, analyze_log
+from ae_similarity import KDTree, SimilarityIndex, event_vectors, TRACE_POINTS
+from ae_catalog import open_catalog, scan_directory, event_key, stored_vector, similar_events
+from ae_cli import main as cli_main
+
+COLUMNS = {'time': 'Time', 'tps': 'TPS', 'afr': 'AFR', 'pw': 'PW'}
+
+
+def _log(lean=0.0, n_events=4, period=100, t0=0.0):
+    """Throttle stabs mid-way through every `period` samples; `lean` adds an AFR spike"""
+    i = np.arange(n_events * period)
+    phase = i % period - period // 2
+    tps = np.where((phase >= 0) & (phase < 10), phase * 8.0, 5.0)
+    afr = 14.7 - tps / 50 + lean * np.exp(-((phase - 15) / 4.0) ** 2)
+    return pd.DataFrame({'Time': t0 + i * 0.05, 'TPS': tps, 'AFR': afr, 'PW': 2 + tps / 10})
+
+
+def test_kdtree_matches_brute_force():
+    """KDTree returns exactly the brute-force nearest neighbours"""
+    rng = np.random.default_rng(1)
+    points = rng.normal(size=(5000, 6))
+    tree = KDTree(points, leaf_size=16)
+    for _ in range(25):
+        x = rng.normal(size=6)
+        distances, indices = tree.query(x, k=7)
+        brute = np.sqrt(((points - x) ** 2).sum(axis=1))
+        assert np.array_equal(indices, np.argsort(brute, kind='stable')[:7])
+        assert np.allclose(distances, np.sort(brute)[:7])
+    assert len(KDTree(points[:3]).query(points[0], k=10)[1]) == 3
+    print("✓ KDTree matches brute force (25 queries, k=7)")
+
+
+def test_vectors_ignore_time_resets():
+    """Vectors of a log with a time reset equal those of its parts"""
+    part = _log()
+    joined = pd.concat([part, part], ignore_index=True)  # time starts over
+    vectors = []
+    for frame in (part, joined):
+        log = LogData(frame, 'Time')
+        _, events = analyze_log(log, 'TPS', 10.0, 0.1)
+        vectors.append(event_vectors(log, events, COLUMNS))
+    assert not LogData(joined, 'Time').monotonic
+    assert vectors[0].shape == (4, 3 * TRACE_POINTS)
+    assert np.allclose(np.vstack([vectors[0], vectors[0]]), vectors[1])
+
+    # A missing channel is NaN, never a crash
+    log = LogData(part, 'Time')
+    _, events = analyze_log(log, 'TPS', 10.0, 0.1)
+    partial = event_vectors(log, events, {'tps': 'TPS', 'afr': None, 'pw': 'PW'})
+    assert np.isnan(partial[:, TRACE_POINTS:2 * TRACE_POINTS]).all()
+    print("✓ Resampled traces survive time resets and missing channels")
+
+
+def test_index_finds_lookalikes():
+    """A lean event's nearest neighbours are the other lean events"""
+    logs = [_log(lean=0.0), _log(lean=3.0, t0=500.0), _log(lean=0.5, t0=900.0)]
+    vectors, labels = [], []
+    for lean, frame in zip((0.0, 3.0, 0.5), logs):
+        log = LogData(frame, 'Time')
+        _, events = analyze_log(log, 'TPS', 10.0, 0.1)
+        vectors.append(event_vectors(log, events, COLUMNS))
+        labels += [lean] * len(events)
+    vectors = np.vstack(vectors)
+    vectors += np.random.default_rng(2).normal(scale=0.01, size=vectors.shape)
+
+    index = SimilarityIndex(vectors, components=4)
+    lean_row = labels.index(3.0)
+    rows, keys, distances = index.query(vectors[lean_row], k=3, exclude=[lean_row])
+    assert lean_row not in rows
+    assert all(labels[r] == 3.0 for r in rows)
+    assert np.all(np.diff(distances) >= 0)
+    print(f"✓ Nearest 3 to a lean event are lean (distances {np.round(distances, 2)})")
+
+
+def test_catalog_similar_events():
+    """Cataloged vectors support kNN search across logs and from the CLI"""
+    with tempfile.TemporaryDirectory() as root:
+        _log(lean=3.0).to_csv(os.path.join(root, 'lean.csv'), index=False)
+        _log(lean=3.0, n_events=2).to_csv(os.path.join(root, 'lean2.csv'), index=False)
+        _log().to_csv(os.path.join(root, 'ok.csv'), index=False)
+        db = os.path.join(root, 'catalog.sqlite')
+        conn = open_catalog(db)
+        scan_directory(conn, root, workers=1)
+
+        key = event_key(conn, os.path.join(root, 'lean.csv'), 0)
+        rows = similar_events(conn, stored_vector(conn, key), k=5, exclude=[key])
+        assert len(rows) == 5
+        assert all(os.path.basename(row['path']).startswith('lean') for row in rows)
+        assert (rows[0]['log_id'], rows[0]['idx']) != key
+        conn.close()
+
+        assert cli_main(['catalog', 'similar', '--db', db,
+                         os.path.join(root, 'ok.csv'), '--event', '1', '-k', '3']) == 0
+    print("✓ Catalog kNN found 5 lean events for a lean event")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Similar Event Search Tests")
+    print("=" * 60)
+    ok = True
+    for test in (test_kdtree_matches_brute_force, test_vectors_ignore_time_resets,
+                 test_index_finds_lookalikes, test_catalog_similar_events):
+        try:
+            test()
+        except AssertionError as e:
+            print(f"✗ {test.__name__} failed: {e}")
+            ok = False
+    sys.exit(0 if ok else 1)
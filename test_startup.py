@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Test that heavy modules stay out of the import path
+The CLI and library must never load tkinter, and importing the GUI module
+must not load pandas or matplotlib (they are preloaded in the background)
+"""
+
+import os
+import subprocess
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def _loaded_after(statement, modules):
+    """Which of `modules` a fresh interpreter has loaded after `statement`"""
+    code = f"import sys; {statement}; print(' '.join(m for m in {modules!r} if m in sys.modules))"
+    result = subprocess.run([sys.executable, '-c', code], cwd=HERE,
+                            capture_output=True, text=True, check=True)
+    return result.stdout.split()
+
+
+def test_cli_and_library_skip_tk():
+    """ae_cli, ae_core, ae_io, ae_render and ae_pipeline never import tkinter"""
+    for module in ('ae_cli', 'ae_core', 'ae_io', 'ae_render', 'ae_pipeline'):
+        loaded = _loaded_after(f"import {module}", ['tkinter'])
+        assert loaded == [], f"{module} loaded {loaded}"
+    print("✓ CLI and library imports never touch tkinter")
+
+
+def test_lazy_heavy_imports():
+    """Importing the CLI or GUI module does not load pandas or matplotlib"""
+    for module in ('ae_cli', 'ae_analyzer'):
+        loaded = _loaded_after(f"import {module}", ['pandas', 'matplotlib', 'pyarrow'])
+        assert loaded == [], f"{module} loaded {loaded}"
+    print("✓ pandas, matplotlib and pyarrow load lazily")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Startup Import Tests")
+    print("=" * 60)
+    ok = True
+    for test in (test_cli_and_library_skip_tk, test_lazy_heavy_imports):
+        try:
+            test()
+        except AssertionError as e:
+            print(f"✗ {test.__name__} failed: {e}")
+            ok = False
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Test time-range queries and time-based event context in ae_core
+"""
+
+import sys
+import numpy as np
+import pandas as pd
+
+from ae_core import LogData, time_slice, compute_tps_dot, detect_events, guess_columns
+from ae_events import EventTable
+from ae_features import event_features
+from ae_render import prepare_event
+
+
+def _stab_log(rate_hz, seconds=20.0):
+    """A log with one throttle stab at t=10 s sampled at rate_hz"""
+    t = np.arange(0, seconds, 1.0 / rate_hz)
+    tps = np.clip((t - 10.0) * 200.0, 0, 80) + 5.0
+    return t, tps
+
+
+def test_query_matches_mask():
+    """query() returns exactly the samples a boolean mask would select"""
+    rng = np.random.default_rng(1)
+    time = np.cumsum(rng.uniform(0.01, 0.1, 5000))
+    log = LogData(pd.DataFrame({'Time': time, 'RPM': rng.random(5000)}), 'Time')
+    for _ in range(200):
+        t0, t1 = np.sort(rng.uniform(time[0] - 1, time[-1] + 1, 2))
+        window = log.query(t0, t1, ['RPM'])
+        expected = np.flatnonzero((time >= t0) & (time <= t1))
+        got = np.arange(len(time))[window.index]
+        assert np.array_equal(got, expected)
+        assert np.shares_memory(window.channels['RPM'], log['RPM'])
+    print("✓ 200 random queries match the linear-scan result")
+
+
+def test_context_is_time_based():
+    """The same context in seconds is shown at 20 Hz and at 1 kHz"""
+    spans = []
+    for rate in (20, 1000):
+        t, tps = _stab_log(rate)
+        events = detect_events(t, compute_tps_dot(t, tps), 10.0, 0.1, context_s=2.5)
+        assert len(events) == 1
+        event = events[0]
+        before = t[event['event_start']] - t[event['start_idx']]
+        after = t[event['end_idx'] - 1] - t[event['event_end']]
+        spans.append((before, after))
+        print(f"  {rate:>4} Hz: {before:.3f} s before, {after:.3f} s after")
+    for before, after in spans:
+        assert abs(before - 2.5) < 0.06 and abs(after - 2.5) < 0.06
+    print("✓ Context covers 2.5 s at both sample rates")
+
+
+def test_non_monotonic_fallback():
+    """Logs whose time resets return exactly the matching samples"""
+    time = np.array([0.0, 0.1, 0.2, 0.3, 0.0, 0.1, 0.2])
+    assert np.array_equal(time_slice(time, 0.15, 0.35, monotonic=False), [2, 3, 6])
+    log = LogData(pd.DataFrame({'Time': time, 'RPM': np.arange(7.0)}), 'Time')
+    assert not log.monotonic
+    assert np.array_equal(log.query(0.15, 0.35, ['RPM']).channels['RPM'], [2, 3, 6])
+    assert np.array_equal(log.query(0.15, 0.35, rows=(3, 7)).index, [3, 6])
+    print("✓ Non-monotonic time falls back to a scan")
+
+
+def test_time_reset_inside_window():
+    """A time reset inside an event's window never brings out-of-range samples in"""
+    # Stab at t=10 s, then the logger restarts at t=0 at 11 s and runs on to 20 s
+    t = np.concatenate([np.arange(0, 11, 0.01), np.arange(0, 20, 0.01)])
+    tps = np.clip((t - 10.0) * 200.0, 0, 80) * (np.arange(len(t)) < 1100) + 5.0
+    frame = pd.DataFrame({'Time': t, 'RPM': 3000.0, 'TPS': tps, 'PW': 3.0, 'AFR': 14.7})
+    frame['TPS_dot'] = compute_tps_dot(t, tps)
+    log = LogData(frame, 'Time')
+    columns = guess_columns(frame.columns)
+
+    event = detect_events(t, frame['TPS_dot'].to_numpy(), 10.0, 0.1, context_s=2.5)[0]
+    assert event['end_idx'] == 1100  # the window stops at the reset
+    assert t[event['start_idx']:event['end_idx']].min() >= t[event['event_start']] - 2.5
+
+    # A window spanning the reset (as the old first-to-last fallback stored it)
+    # still shows only the samples inside its time range
+    spanning = EventTable.from_rows([(event['start_idx'], len(t) - 1, event['event_start'],
+                                      event['event_end'], event['duration'],
+                                      event['max_tps_dot'], 0)])[0]
+    x = prepare_event(log, spanning, columns, 10.0)['traces']['RPM'][0]
+    lo, hi = t[spanning['start_idx']], t[spanning['end_idx'] - 1]
+    assert x.min() >= lo and x.max() <= hi
+    assert len(x) < spanning['end_idx'] - spanning['start_idx']
+
+    # Features of the reset log match those of its monotonic first part
+    features = event_features(log, EventTable.from_rows([tuple(event)]), columns)
+    head = LogData(frame.iloc[:1100].reset_index(drop=True), 'Time')
+    expected = event_features(head, EventTable.from_rows([tuple(event)]), columns)
+    for name, values in expected.items():
+        assert np.allclose(features[name], values, equal_nan=True), name
+    print("✓ Windows, plot traces and features exclude samples past the reset")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Time Query Tests")
+    print("=" * 60)
+    ok = True
+    for test in (test_query_matches_mask, test_context_is_time_based,
+                 test_non_monotonic_fallback, test_time_reset_inside_window):
+        try:
+            test()
+        except AssertionError as e:
+            print(f"✗ {test.__name__} failed: {e}")
+            ok = False
+    sys.exit(0 if ok else 1)
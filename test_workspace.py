@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Test the multi-log workspace: per-log settings, LRU eviction within the
+memory budget and transparent reloads
+"""
+
+import os
+import sys
+import tempfile
+import numpy as np
+import pandas as pd
+
+from ae_workspace import Workspace, MB
+
+
+def write_log(path, n=20000, stab_every=200):
+    """A 100 Hz log with a throttle stab every stab_every samples"""
+    t = np.arange(n) * 0.01
+    phase = np.arange(n) % stab_every
+    pd.DataFrame({
+        'Time': t,
+        'RPM': 2500 + 300 * np.sin(t),
+        'TPS': np.where(phase < 20, phase * 3.0, 0.0),
+        'AFR': 14.7 - np.where(phase < 40, 1.0, 0.0),
+    }).to_csv(path, index=False)
+
+
+def open_logs(tmp, count=3):
+    paths = []
+    for i in range(count):
+        path = os.path.join(tmp, f'log{i}.csv')
+        write_log(path, stab_every=200 + 100 * i)
+        paths.append(path)
+    return paths
+
+
+def test_each_log_keeps_its_settings():
+    """Logs keep their own thresholds and events when switching between them"""
+    with tempfile.TemporaryDirectory() as tmp:
+        a, b = open_logs(tmp, 2)
+        workspace = Workspace()
+        entry_a, _ = workspace.open(a)
+        entry_a.pipeline.update(triggers={'threshold': 20.0})
+        workspace.run(entry_a, 'triggers')
+        entry_b, _ = workspace.open(b)
+        entry_b.pipeline.update(triggers={'threshold': 40.0})
+        workspace.run(entry_b, 'triggers')
+
+        again, results = workspace.open(a)
+        assert again is entry_a and len(workspace) == 2
+        assert results['triggers'] is entry_a.events  # still cached, not rerun
+        assert entry_a.pipeline.config['triggers']['threshold'] == 20.0
+        assert entry_b.pipeline.config['triggers']['threshold'] == 40.0
+        assert len(entry_a.events) != len(entry_b.events)
+    print(f"✓ Two logs with their own settings: {len(entry_a.events)} and "
+          f"{len(entry_b.events)} events")
+
+
+def test_lru_eviction_and_reload():
+    """Over budget, the least recently used log is unloaded and reloads on demand"""
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = open_logs(tmp, 3)
+        workspace = Workspace()
+        entries = []
+        for path in paths:
+            entry, _ = workspace.open(path)
+            workspace.run(entry, 'triggers')
+            entries.append(entry)
+        size = max(entry.nbytes for entry in entries)
+        assert size > 0 and all(entry.loaded for entry in entries)
+
+        # Room for two logs: the least recently used one goes
+        workspace.set_budget(int(2.5 * size))
+        assert [entry.loaded for entry in entries] == [False, True, True]
+        evicted = entries[0]
+        assert evicted.events is not None and evicted.rows == 20000
+        assert evicted.pipeline._cache == {}
+        events = evicted.events.records.copy()
+
+        # Viewing it again reloads and redetects it, evicting the next oldest
+        results = workspace.activate(evicted)
+        assert evicted.loaded and not entries[1].loaded and entries[2].loaded
+        assert np.array_equal(results['triggers'].records, events)
+        assert workspace.loaded_bytes <= workspace.budget
+        stats = workspace.stats()
+        assert stats['evictions'] == 2 and stats['reloads'] == 1
+    print(f"✓ LRU eviction at {2.5 * size / MB:.1f} MB, reload gives identical events")
+
+
+def test_current_log_never_evicted():
+    """A log larger than the budget still opens and stays loaded while current"""
+    with tempfile.TemporaryDirectory() as tmp:
+        a, b = open_logs(tmp, 2)
+        workspace = Workspace(budget=1)
+        entry_a, _ = workspace.open(a)
+        assert entry_a.loaded
+        entry_b, results = workspace.open(b)
+        assert entry_b.loaded and not entry_a.loaded
+        assert len(results['source']) == 20000
+        workspace.close(entry_b)
+        assert len(workspace) == 1 and workspace.get(b) is None
+    print("✓ The current log stays loaded even over budget; close forgets a log")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Workspace Tests")
+    print("=" * 60)
+    ok = True
+    for test in (test_each_log_keeps_its_settings, test_lru_eviction_and_reload,
+                 test_current_log_never_evicted):
+        try:
+            test()
+        except AssertionError as e:
+            print(f"✗ {test.__name__} failed: {e}")
+            ok = False
+    sys.exit(0 if ok else 1)